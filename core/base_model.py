@@ -14,17 +14,16 @@ class BaseModel:  # Clase base para modelos CRUD
         if where_clause:
             query += f" WHERE {where_clause}"
 
-        conn = db.get_connection()
-        conn.row_factory = sqlite3.Row  # → Para acceder por nombre de columna
-        cursor = conn.cursor()
+        with db.connection() as conn:
+            conn.row_factory = sqlite3.Row  # → Para acceder por nombre de columna
+            cursor = conn.cursor()
 
-        if params:
-            cursor.execute(query, params)
-        else:
-            cursor.execute(query)
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
 
-        rows = cursor.fetchall()
-        conn.close()
+            rows = cursor.fetchall()
 
         # Convertir a lista de diccionarios
         return [dict(row) for row in rows]
@@ -32,12 +31,11 @@ class BaseModel:  # Clase base para modelos CRUD
     def obtenerRegistro(self, record_id, id_column='id'):
         query = f"SELECT * FROM {self.table_name} WHERE {id_column} = ?"
 
-        conn = db.get_connection()              # → Conectarse con la Base de Datos
-        conn.row_factory = sqlite3.Row          # → Conexión que permite acceder a las columnas por nombre
-        cursor = conn.cursor()                  # → Permite ejecutar comando SQL
-        cursor.execute(query, (record_id,))     # → Ejecuta una consulta SQL (parametros necesarios) previene inyecciones
-        row = cursor.fetchone()                 # → Recupera la primera fila de resultados arrojada
-        conn.close()                            # → Cierra la conexión
+        with db.connection() as conn:               # → Toma una conexión del pool y la devuelve al salir
+            conn.row_factory = sqlite3.Row          # → Conexión que permite acceder a las columnas por nombre
+            cursor = conn.cursor()                  # → Permite ejecutar comando SQL
+            cursor.execute(query, (record_id,))     # → Ejecuta una consulta SQL (parametros necesarios) previene inyecciones
+            row = cursor.fetchone()                 # → Recupera la primera fila de resultados arrojada
 
         return dict(row) if row else None       # → Devuelve fila como diccionario.
 
@@ -54,12 +52,11 @@ class BaseModel:  # Clase base para modelos CRUD
         # → Construye la consulta SQL
         query = f"INSERT INTO {self.table_name} ({columns}) VALUES ({placeholders})"
 
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(query, values)
-        last_id = cursor.lastrowid      # → Obtiene el último ID insertado
-        conn.commit()
-        conn.close()
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, values)
+            last_id = cursor.lastrowid      # → Obtiene el último ID insertado
+            conn.commit()
 
         return last_id
 
@@ -115,13 +112,12 @@ class BaseModel:  # Clase base para modelos CRUD
     def eliminarRegistroID(self, record_id, id_column='id'):
         query = f"DELETE FROM {self.table_name} WHERE {id_column} = ?"
 
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(query, (record_id,))
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, (record_id,))
 
-        rows_affected = cursor.rowcount
-        conn.commit()
-        conn.close()
+            rows_affected = cursor.rowcount
+            conn.commit()
 
         return rows_affected > 0
 
@@ -146,16 +142,15 @@ class BaseModel:  # Clase base para modelos CRUD
         if where_clause:
             query += f" WHERE {where_clause}"
 
-        conn = db.get_connection()
-        cursor = conn.cursor()
+        with db.connection() as conn:
+            cursor = conn.cursor()
 
-        if params:
-            cursor.execute(query, params)
-        else:
-            cursor.execute(query)
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
 
-        count = cursor.fetchone()[0]
-        conn.close()
+            count = cursor.fetchone()[0]
 
         return count
 
@@ -163,16 +158,15 @@ class BaseModel:  # Clase base para modelos CRUD
         return self.contarRegistro(f"{id_column} = ?", (record_id,)) > 0
 
     def consultaPersonalizada(self, query, params=None):
-        conn = db.get_connection()
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        with db.connection() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
 
-        if params:
-            cursor.execute(query, params)
-        else:
-            cursor.execute(query)
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
 
-        rows = cursor.fetchall()
-        conn.close()
+            rows = cursor.fetchall()
 
         return [dict(row) for row in rows]
\ No newline at end of file
@@ -16,6 +16,10 @@ APP_VERSION = "1.9.11"
 WINDOW_SIZE = "1800x1200"
 USE_SQLITE = True
 
+# Identificador de la caja (terminal) que usa esta instalación: va como prefijo en los IDs
+# de venta para que varias cajas sobre la misma BD nunca generen el mismo ID
+TERMINAL_ID = os.environ.get("MINIMARKET_TERMINAL", "01")
+
 # Esquema de colores
 PRIMARY_COLOR = "#1E3A5F"
 THEME_COLOR = "#1E3A5F"
@@ -0,0 +1,229 @@
+## Pool de conexiones SQLite compartido por todos los modelos
+
+import gc
+import sqlite3
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from core.exceptions import PoolAgotadoError
+
+
+class PooledConnection(sqlite3.Connection):
+    """Conexión SQLite cuyo close() la devuelve al pool en lugar de cerrarla.
+
+    Así el código existente que hace `conn = db.get_connection() ... conn.close()`
+    reutiliza conexiones sin cambios.
+    """
+
+    def close(self):
+        pool = getattr(self, '_pool', None)
+        if pool is None:
+            super().close()
+        else:
+            pool.checkin(self)
+
+    def _cerrar_real(self):
+        self._pool = None
+        super().close()
+
+
+class ConnectionPool:
+    """Pool acotado de conexiones SQLite con afinidad por hilo.
+
+    - checkout()/checkin() o el context manager connection()
+    - max_size: máximo de conexiones abiertas (prestadas + ociosas)
+    - idle_timeout: segundos tras los cuales una conexión ociosa se cierra
+    - health_check_after: segundos ociosa a partir de los cuales se verifica con SELECT 1
+    - wait_timeout: segundos a esperar una conexión libre antes de PoolAgotadoError
+    """
+
+    def __init__(self, db_path, configurar=None, max_size=8, idle_timeout=300.0,
+                 wait_timeout=30.0, health_check_after=30.0):
+        self.db_path = db_path
+        self.configurar = configurar
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.wait_timeout = wait_timeout
+        self.health_check_after = health_check_after
+
+        # RLock: los callbacks de weakref pueden dispararse dentro de una sección crítica
+        self._cond = threading.Condition(threading.RLock())
+        self._ociosas = []      # → lista de (conexión, instante en que se devolvió)
+        self._prestadas = {}    # → id(conexión) -> weakref (detecta conexiones nunca devueltas)
+        self._total = 0         # → conexiones vivas (prestadas + ociosas)
+        self._generacion = 0    # → se incrementa en close_all() para descartar las prestadas
+
+        self._hits = 0
+        self._misses = 0
+        self._esperas = 0
+        self._timeouts = 0
+        self._descartadas = 0
+        self._tiempo_espera_total = 0.0
+        self._tiempo_espera_max = 0.0
+
+    def _crear(self):
+        conn = sqlite3.connect(self.db_path, factory=PooledConnection, check_same_thread=False)
+        if self.configurar:
+            self.configurar(conn)
+        # Guardar la configuración base para restaurarla en cada checkin
+        conn._text_factory_base = conn.text_factory
+        conn._pool = self
+        return conn
+
+    def _tomar_ociosa(self):
+        # Preferir la última conexión usada por este hilo (caché de páginas caliente)
+        hilo = threading.get_ident()
+        for i in range(len(self._ociosas) - 1, -1, -1):
+            if getattr(self._ociosas[i][0], '_hilo', None) == hilo:
+                return self._ociosas.pop(i)
+        return self._ociosas.pop() if self._ociosas else None
+
+    def _purgar_ociosas(self, ahora):
+        vigentes = []
+        for conn, devuelta in self._ociosas:
+            if ahora - devuelta > self.idle_timeout:
+                self._descartar(conn)
+            else:
+                vigentes.append((conn, devuelta))
+        self._ociosas = vigentes
+
+    def _descartar(self, conn):
+        with self._cond:
+            self._total -= 1
+            self._descartadas += 1
+            self._cond.notify()
+        try:
+            conn._cerrar_real()
+        except sqlite3.Error:
+            pass
+
+    def _registrar_prestamo(self, conn):
+        clave = id(conn)
+
+        def _liberada_sin_checkin(_ref, clave=clave):
+            # La conexión se recolectó sin devolverse: liberar su cupo
+            with self._cond:
+                if self._prestadas.pop(clave, None) is not None:
+                    self._total -= 1
+                    self._cond.notify()
+
+        conn._hilo = threading.get_ident()
+        conn._generacion = self._generacion
+        self._prestadas[clave] = weakref.ref(conn, _liberada_sin_checkin)
+
+    def checkout(self):
+        """Obtiene una conexión del pool (reutilizada o nueva)."""
+        inicio = time.monotonic()
+        limite = inicio + self.wait_timeout
+        espero = False
+
+        with self._cond:
+            while True:
+                ahora = time.monotonic()
+                self._purgar_ociosas(ahora)
+                ociosa = self._tomar_ociosa()
+                if ociosa is not None:
+                    conn, devuelta = ociosa
+                    self._hits += 1
+                    break
+                if self._total < self.max_size:
+                    self._total += 1
+                    self._misses += 1
+                    conn, devuelta = None, None
+                    break
+                if not espero:
+                    espero = True
+                    self._esperas += 1
+                    # Las conexiones olvidadas sin close() quedan en ciclos de referencias;
+                    # recolectarlas libera su cupo antes de esperar
+                    gc.collect()
+                    continue
+                restante = limite - ahora
+                if restante <= 0:
+                    self._timeouts += 1
+                    raise PoolAgotadoError(
+                        f"No hay conexiones libres tras {self.wait_timeout:.0f}s (máximo {self.max_size})")
+                self._cond.wait(restante)
+
+            if espero:
+                espera = time.monotonic() - inicio
+                self._tiempo_espera_total += espera
+                self._tiempo_espera_max = max(self._tiempo_espera_max, espera)
+
+        if conn is None:
+            try:
+                conn = self._crear()
+            except Exception:
+                with self._cond:
+                    self._total -= 1
+                    self._cond.notify()
+                raise
+        elif time.monotonic() - devuelta > self.health_check_after:
+            # Verificación de salud de conexiones que estuvieron ociosas un buen rato
+            try:
+                conn.execute("SELECT 1").fetchone()
+            except sqlite3.Error:
+                self._descartar(conn)
+                return self.checkout()
+
+        with self._cond:
+            self._registrar_prestamo(conn)
+        return conn
+
+    def checkin(self, conn):
+        """Devuelve una conexión al pool. Llamarlo dos veces es inofensivo."""
+        with self._cond:
+            if self._prestadas.pop(id(conn), None) is None:
+                return
+
+        try:
+            # Deshacer lo que no se confirmó (mismo efecto que cerrar sin commit)
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = None
+            conn.text_factory = conn._text_factory_base
+        except sqlite3.Error:
+            self._descartar(conn)
+            return
+
+        with self._cond:
+            if conn._generacion != self._generacion or len(self._ociosas) >= self.max_size:
+                self._descartar(conn)
+                return
+            self._ociosas.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Context manager: `with pool.connection() as conn:` hace checkout/checkin."""
+        conn = self.checkout()
+        try:
+            yield conn
+        finally:
+            self.checkin(conn)
+
+    def close_all(self):
+        """Cierra las conexiones ociosas; las prestadas se cierran al devolverse."""
+        with self._cond:
+            self._generacion += 1
+            ociosas, self._ociosas = self._ociosas, []
+        for conn, _ in ociosas:
+            self._descartar(conn)
+
+    def stats(self):
+        """Contadores de uso del pool."""
+        with self._cond:
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'esperas': self._esperas,
+                'timeouts': self._timeouts,
+                'descartadas': self._descartadas,
+                'tiempo_espera_total': round(self._tiempo_espera_total, 6),
+                'tiempo_espera_max': round(self._tiempo_espera_max, 6),
+                'abiertas': self._total,
+                'ociosas': len(self._ociosas),
+                'prestadas': len(self._prestadas),
+                'max_size': self.max_size,
+            }
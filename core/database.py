@@ -4,15 +4,23 @@ import sqlite3
 import os
 import bcrypt
 from core.config import DB_DIR
+from core.connection_pool import ConnectionPool
+from core.secuencias import generador_ids
 
 class Database:
+    # Un pool por archivo de BD: instancias adicionales de Database comparten conexiones
+    _pools = {}
+
     def __init__(self):
         # Conectar a la base de datos SQLite
         self.db_path = os.path.join(DB_DIR, "minimarket.db")
+        if self.db_path not in Database._pools:
+            Database._pools[self.db_path] = ConnectionPool(self.db_path, configurar=self._configurar_conexion)
+        self.pool = Database._pools[self.db_path]
         self.init_database()
 
-    def get_connection(self): # Conecta a la BD - SQLite
-        conn = sqlite3.connect(self.db_path)
+    @staticmethod
+    def _configurar_conexion(conn): # Se ejecuta una sola vez por conexión física
         # Configurar la conexión para manejar UTF-8 correctamente
         conn.execute("PRAGMA encoding = 'UTF-8'")
         conn.execute("PRAGMA foreign_keys = ON") # Habilitar claves foráneas
@@ -20,368 +28,1129 @@ class Database:
         # Usar text_factory para manejar correctamente los strings
         # replace caracteres inválidos con el caracter de reemplazo �
         conn.text_factory = lambda x: str(x, 'utf-8', 'replace') if isinstance(x, bytes) else x
-        return conn
+
+    def get_connection(self): # Obtiene una conexión del pool; conn.close() la devuelve
+        return self.pool.checkout()
+
+    def connection(self): # Context manager: with db.connection() as conn
+        return self.pool.connection()
+
+    def pool_stats(self): # Contadores hit/miss y tiempos de espera del pool
+        return self.pool.stats()
 
     # Helper de ejecución centralizada para evitar manejo manual de commit/close
     def execute(self, sql, params=(), commit=False):
-        conn = None
-        try:
-            conn = self.get_connection()
+        with self.connection() as conn:
             cur = conn.cursor()
             cur.execute(sql, params)
             if commit:
                 conn.commit()
             return cur
-        finally:
-            if conn:
-                conn.close()
 
     def fetchall(self, sql, params=()):
-        conn = None
-        try:
-            conn = self.get_connection()
+        with self.connection() as conn:
             cur = conn.cursor()
             cur.execute(sql, params)
-            rows = cur.fetchall()
-            return rows
-        finally:
-            if conn:
-                conn.close()
+            return cur.fetchall()
 
     def fetchone(self, sql, params=()):
-        conn = None
-        try:
-            conn = self.get_connection()
+        with self.connection() as conn:
             cur = conn.cursor()
             cur.execute(sql, params)
             return cur.fetchone()
-        finally:
-            if conn:
-                conn.close()
 
     def query_df(self, sql, params=None):
         # Usar pandas para consultas tabulares cuando sea conveniente
         try:
             import pandas as pd
-            conn = self.get_connection()
-            df = pd.read_sql_query(sql, conn, params=params)
-            conn.close()
-            return df
+            with self.connection() as conn:
+                return pd.read_sql_query(sql, conn, params=params)
         except Exception:
             # Si falla, devolver None para que el llamador lo maneje
             return None
 
-    def init_database(self): # Inicializa la base de datos y crea tablas si no existen
+    # Migraciones de esquema en orden → (versión, descripción, método)
+    # La versión aplicada se guarda en PRAGMA user_version; solo se ejecutan las pendientes.
+    MIGRACIONES = [
+        (1, 'Esquema inicial, datos base, triggers e índices', 'migracion_001_esquema_inicial'),
+        (2, 'Índice de búsqueda FTS5 de productos', 'migracion_002_busqueda_productos'),
+        (3, 'Secuencia de IDs de productos', 'migracion_003_secuencia_productos'),
+        (4, 'Pausa del índice de búsqueda para cargas masivas', 'migracion_004_pausa_busqueda'),
+        (5, 'Versiones de datos de promociones', 'migracion_005_versiones_promociones'),
+        (6, 'Triggers incrementales de total_venta y fecha de productos', 'migracion_006_triggers_incrementales'),
+        (7, 'Resúmenes diarios de ventas para reportes', 'migracion_007_resumenes_diarios'),
+        (8, 'Índices de fechas de comprobantes y devoluciones', 'migracion_008_indices_fechas'),
+        (9, 'Versión de datos de reportes para el caché de gráficos', 'migracion_009_version_reportes'),
+        (10, 'Versión de datos del catálogo de productos', 'migracion_010_version_catalogo'),
+        (11, 'Fecha de modificación de productos sin UPDATE anidado', 'migracion_011_fecha_productos'),
+    ]
+
+    # Día de una fecha guardada; '' si no se puede interpretar (la fila no se pierde del total)
+    DIA_RESUMEN = "COALESCE(DATE({col}), '')"
+    # Los pagos con tarjeta guardan un JSON en metodo_pago
+    METODO_RESUMEN = "CASE WHEN {col} LIKE '{{%' THEN 'tarjeta' ELSE COALESCE({col}, '') END"
+
+    def init_database(self): # Aplica las migraciones pendientes del esquema
+        conn = None
         try:
-            # conn = conexión
-            # cursor para crear tablas
             conn = self.get_connection()
-            cursor = conn.cursor()
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version >= self.MIGRACIONES[-1][0]:
+                return # Esquema al día: no se toca DDL ni triggers
+
+            for numero, descripcion, metodo in self.MIGRACIONES:
+                # BEGIN IMMEDIATE toma el bloqueo de escritura: si otro proceso migra a la vez,
+                # releer la versión dentro de la transacción evita aplicar el paso dos veces
+                conn.execute("BEGIN IMMEDIATE")
+                if conn.execute("PRAGMA user_version").fetchone()[0] >= numero:
+                    conn.rollback()
+                    continue
+                cursor = conn.cursor()
+                getattr(self, metodo)(cursor)
+                cursor.execute(f"PRAGMA user_version = {int(numero)}")
+                conn.commit() # Guardar cambios
+                print(f"✓ Migración {numero} aplicada: {descripcion}")
+        except Exception as e:
+            if conn and conn.in_transaction:
+                conn.rollback()
+            print(f"Error al migrar la base de datos: {e}")
+        finally:
+            if conn:
+                conn.close() # Devolver conexión al pool
 
-            # Tabla de tipo de productos
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS tipo_productos (
-                    id_tipo_producto INTEGER PRIMARY KEY AUTOINCREMENT,
-                    nombre_tipo TEXT NOT NULL UNIQUE,
-                    descripcion TEXT
-                )
-            ''')
+    def schema_version(self): # Versión de esquema aplicada en la BD
+        return self.fetchone("PRAGMA user_version")[0]
+
+    def migracion_001_esquema_inicial(self, cursor): # Tablas, datos iniciales, triggers e índices
+        self.crear_tablas(cursor)
+        # Insertar datos iniciales si no existen
+        self.datos_iniciales(cursor)
+        # Crear triggers de lógica de negocio
+        self.triggers(cursor)
 
-            # Tabla de categorías de productos
+    def migracion_002_busqueda_productos(self, cursor): # Índice FTS5 para la búsqueda del POS
+        try:
+            # Índice sin acentos (unicode61 remove_diacritics) y con prefijos de 2-4 letras
+            # para responder búsquedas mientras se escribe. rowid = rowid de productos.
             cursor.execute('''
-                CREATE TABLE IF NOT EXISTS categoria_productos (
-                    id_categoria_productos INTEGER PRIMARY KEY AUTOINCREMENT,
-                    nombre_categoria TEXT NOT NULL UNIQUE,
-                    descripcion TEXT
+                CREATE VIRTUAL TABLE IF NOT EXISTS productos_fts USING fts5(
+                    id_producto,
+                    nombre_producto,
+                    nombre_categoria,
+                    tokenize = "unicode61 remove_diacritics 2",
+                    prefix = '2 3 4'
                 )
             ''')
+        except sqlite3.OperationalError as e:
+            # SQLite compilado sin FTS5: la búsqueda sigue funcionando con LIKE
+            print(f"Info: índice FTS5 no disponible ({e})")
+            return
+
+        # Mantener el índice sincronizado: solo cambios de id, nombre o categoría lo tocan,
+        # las actualizaciones de stock de cada venta no reescriben el índice
+        cursor.execute('DROP TRIGGER IF EXISTS productos_fts_insert')
+        cursor.execute('''
+            CREATE TRIGGER productos_fts_insert
+            AFTER INSERT ON productos
+            FOR EACH ROW
+            BEGIN
+                INSERT INTO productos_fts (rowid, id_producto, nombre_producto, nombre_categoria)
+                VALUES (NEW.rowid, NEW.id_producto, NEW.nombre_producto,
+                        (SELECT nombre_categoria FROM categoria_productos
+                         WHERE id_categoria_productos = NEW.id_categoria_productos));
+            END
+        ''')
 
-            # Tabla de unidades de medida
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS unidad_medida (
-                id_unidad_medida INTEGER PRIMARY KEY AUTOINCREMENT,
-                nombre_unidad TEXT NOT NULL UNIQUE,
+        cursor.execute('DROP TRIGGER IF EXISTS productos_fts_delete')
+        cursor.execute('''
+            CREATE TRIGGER productos_fts_delete
+            AFTER DELETE ON productos
+            FOR EACH ROW
+            BEGIN
+                DELETE FROM productos_fts WHERE rowid = OLD.rowid;
+            END
+        ''')
+
+        cursor.execute('DROP TRIGGER IF EXISTS productos_fts_update')
+        cursor.execute('''
+            CREATE TRIGGER productos_fts_update
+            AFTER UPDATE OF id_producto, nombre_producto, id_categoria_productos ON productos
+            FOR EACH ROW
+            BEGIN
+                DELETE FROM productos_fts WHERE rowid = OLD.rowid;
+                INSERT INTO productos_fts (rowid, id_producto, nombre_producto, nombre_categoria)
+                VALUES (NEW.rowid, NEW.id_producto, NEW.nombre_producto,
+                        (SELECT nombre_categoria FROM categoria_productos
+                         WHERE id_categoria_productos = NEW.id_categoria_productos));
+            END
+        ''')
+
+        cursor.execute('DROP TRIGGER IF EXISTS productos_fts_categoria')
+        cursor.execute('''
+            CREATE TRIGGER productos_fts_categoria
+            AFTER UPDATE OF nombre_categoria ON categoria_productos
+            FOR EACH ROW
+            BEGIN
+                UPDATE productos_fts SET nombre_categoria = NEW.nombre_categoria
+                WHERE rowid IN (SELECT rowid FROM productos
+                                WHERE id_categoria_productos = NEW.id_categoria_productos);
+            END
+        ''')
+
+        self.reconstruir_indice_busqueda(cursor)
+
+    def migracion_003_secuencia_productos(self, cursor): # Contador de IDs PROD#### y lista de huecos
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS secuencias (
+                nombre TEXT PRIMARY KEY,
+                prefijo TEXT NOT NULL,
+                ancho INTEGER NOT NULL DEFAULT 4,
+                siguiente INTEGER NOT NULL DEFAULT 1,
+                reutilizar_huecos INTEGER NOT NULL DEFAULT 1 CHECK (reutilizar_huecos IN (0, 1))
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS secuencia_huecos (
+                nombre TEXT NOT NULL,
+                numero INTEGER NOT NULL,
+                PRIMARY KEY (nombre, numero)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            INSERT OR IGNORE INTO secuencias (nombre, prefijo, ancho, siguiente, reutilizar_huecos)
+            VALUES ('productos', 'PROD', 4, 1, 1)
+        ''')
+        generador_ids.sincronizar(cursor, 'productos', 'productos', 'id_producto')
+
+        # IDs insertados o borrados por fuera del generador (importaciones, restauraciones,
+        # eliminaciones) mantienen el contador y los huecos al día
+        es_prod = "{col} GLOB 'PROD[0-9]*' AND NOT substr({col}, 5) GLOB '*[^0-9]*'"
+        numero = "CAST(substr({col}, 5) AS INTEGER)"
+
+        cursor.execute('DROP TRIGGER IF EXISTS secuencia_productos_insert')
+        cursor.execute(f'''
+            CREATE TRIGGER secuencia_productos_insert
+            AFTER INSERT ON productos
+            FOR EACH ROW WHEN {es_prod.format(col='NEW.id_producto')}
+            BEGIN
+                DELETE FROM secuencia_huecos
+                WHERE nombre = 'productos' AND numero = {numero.format(col='NEW.id_producto')};
+                UPDATE secuencias SET siguiente = {numero.format(col='NEW.id_producto')} + 1
+                WHERE nombre = 'productos' AND siguiente <= {numero.format(col='NEW.id_producto')};
+            END
+        ''')
+
+        cursor.execute('DROP TRIGGER IF EXISTS secuencia_productos_delete')
+        cursor.execute(f'''
+            CREATE TRIGGER secuencia_productos_delete
+            AFTER DELETE ON productos
+            FOR EACH ROW WHEN {es_prod.format(col='OLD.id_producto')}
+            BEGIN
+                INSERT OR IGNORE INTO secuencia_huecos (nombre, numero)
+                SELECT 'productos', {numero.format(col='OLD.id_producto')}
+                FROM secuencias
+                WHERE nombre = 'productos' AND {numero.format(col='OLD.id_producto')} < siguiente;
+            END
+        ''')
+
+    def migracion_004_pausa_busqueda(self, cursor): # Permite indexar cargas masivas en bloque
+        # Una fila en busqueda_pausa desactiva el trigger de inserción del índice FTS.
+        # Solo se escribe dentro de la transacción de la carga (que tiene el bloqueo de escritura)
+        # y se borra antes del commit: ninguna otra conexión llega a verla.
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS busqueda_pausa (
+                activa INTEGER NOT NULL DEFAULT 1
+            )
+        ''')
+        if not self._existe_indice_busqueda(cursor):
+            return
+        cursor.execute('DROP TRIGGER IF EXISTS productos_fts_insert')
+        cursor.execute('''
+            CREATE TRIGGER productos_fts_insert
+            AFTER INSERT ON productos
+            FOR EACH ROW WHEN NOT EXISTS (SELECT 1 FROM busqueda_pausa)
+            BEGIN
+                INSERT INTO productos_fts (rowid, id_producto, nombre_producto, nombre_categoria)
+                VALUES (NEW.rowid, NEW.id_producto, NEW.nombre_producto,
+                        (SELECT nombre_categoria FROM categoria_productos
+                         WHERE id_categoria_productos = NEW.id_categoria_productos));
+            END
+        ''')
+
+    def migracion_005_versiones_promociones(self, cursor): # Contador de cambios para cachés en memoria
+        # Cada escritura en un grupo de tablas incrementa su versión: los cachés comparan
+        # un entero en vez de releer las tablas (también detecta cambios hechos por otras cajas)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS versiones_tablas (
+                grupo TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        self.versionar_tablas(cursor, 'promociones', ['promocion', 'promocion_producto', 'promocion_categoria'])
+
+    def migracion_006_triggers_incrementales(self, cursor): # total_venta por diferencias, sin SUM por fila
+        self.triggers_incrementales(cursor)
+
+    def triggers_incrementales(self, cursor): # Reemplaza los triggers de total_venta y quita actualizar_fecha_producto
+        # Invariante (igual que los triggers originales): si una venta tiene detalles,
+        # total_venta = SUM(subtotal_detalle). En vez de recalcular la suma en cada fila
+        # (N detalles = N recorridos), se suma/resta la diferencia. Los EXISTS solo buscan
+        # un detalle hermano por idx_detalle_venta_id_venta para saber si es el primero/último.
+
+        # Primer detalle de la venta: reemplaza el total insertado con la venta
+        cursor.execute('DROP TRIGGER IF EXISTS actualizar_total_venta_insert')
+        cursor.execute('''
+            CREATE TRIGGER actualizar_total_venta_insert
+            AFTER INSERT ON detalle_venta
+            FOR EACH ROW
+            BEGIN
+                UPDATE ventas
+                SET total_venta = CASE
+                    WHEN EXISTS (SELECT 1 FROM detalle_venta
+                                 WHERE id_venta = NEW.id_venta AND id_detalle_venta != NEW.id_detalle_venta)
+                    THEN total_venta + NEW.subtotal_detalle
+                    ELSE NEW.subtotal_detalle
+                END
+                WHERE id_venta = NEW.id_venta;
+            END
+        ''')
+
+        # Último detalle eliminado: el total queda en 0 exacto (sin residuos de coma flotante)
+        cursor.execute('DROP TRIGGER IF EXISTS actualizar_total_venta_delete')
+        cursor.execute('''
+            CREATE TRIGGER actualizar_total_venta_delete
+            AFTER DELETE ON detalle_venta
+            FOR EACH ROW
+            BEGIN
+                UPDATE ventas
+                SET total_venta = CASE
+                    WHEN EXISTS (SELECT 1 FROM detalle_venta WHERE id_venta = OLD.id_venta)
+                    THEN total_venta - OLD.subtotal_detalle
+                    ELSE 0
+                END
+                WHERE id_venta = OLD.id_venta;
+            END
+        ''')
+
+        # Cambio de subtotal dentro de la misma venta
+        cursor.execute('DROP TRIGGER IF EXISTS actualizar_total_venta_update')
+        cursor.execute('''
+            CREATE TRIGGER actualizar_total_venta_update
+            AFTER UPDATE OF subtotal_detalle, id_venta ON detalle_venta
+            FOR EACH ROW
+            WHEN OLD.id_venta = NEW.id_venta AND OLD.subtotal_detalle != NEW.subtotal_detalle
+            BEGIN
+                UPDATE ventas
+                SET total_venta = total_venta + NEW.subtotal_detalle - OLD.subtotal_detalle
+                WHERE id_venta = NEW.id_venta;
+            END
+        ''')
+
+        # Detalle movido a otra venta: sale de una (como un DELETE) y entra en la otra (como un INSERT)
+        cursor.execute('DROP TRIGGER IF EXISTS actualizar_total_venta_mover')
+        cursor.execute('''
+            CREATE TRIGGER actualizar_total_venta_mover
+            AFTER UPDATE OF id_venta ON detalle_venta
+            FOR EACH ROW
+            WHEN OLD.id_venta != NEW.id_venta
+            BEGIN
+                UPDATE ventas
+                SET total_venta = CASE
+                    WHEN EXISTS (SELECT 1 FROM detalle_venta WHERE id_venta = OLD.id_venta)
+                    THEN total_venta - OLD.subtotal_detalle
+                    ELSE 0
+                END
+                WHERE id_venta = OLD.id_venta;
+                UPDATE ventas
+                SET total_venta = CASE
+                    WHEN EXISTS (SELECT 1 FROM detalle_venta
+                                 WHERE id_venta = NEW.id_venta AND id_detalle_venta != NEW.id_detalle_venta)
+                    THEN total_venta + NEW.subtotal_detalle
+                    ELSE NEW.subtotal_detalle
+                END
+                WHERE id_venta = NEW.id_venta;
+            END
+        ''')
+
+        # Fecha de modificación: la fija cada sentencia que escribe productos (ver migración 11).
+        # El original hacía un UPDATE anidado de la misma fila en un BEFORE UPDATE en cada
+        # cambio (p. ej. cada descuento de stock, que ya fija fecha_actualizacion)
+        cursor.execute('DROP TRIGGER IF EXISTS actualizar_fecha_producto')
+
+    def verificar_totales_venta(self, reparar=False, tolerancia=0.005): # Compara total_venta con la suma completa
+        """Lista las ventas cuyo total_venta difiere de SUM(subtotal_detalle).
+
+        Solo revisa ventas con detalles (las que no tienen conservan el total con que se
+        insertaron). Con reparar=True reescribe el total de las que no cuadran.
+        Retorna [(id_venta, total_venta, total_recalculado)].
+        """
+        with self.connection() as conn:
+            if reparar:
+                conn.execute("BEGIN IMMEDIATE")
+            diferencias = conn.execute('''
+                SELECT v.id_venta, v.total_venta, d.total
+                FROM ventas v
+                JOIN (SELECT id_venta, SUM(subtotal_detalle) AS total
+                      FROM detalle_venta GROUP BY id_venta) d ON d.id_venta = v.id_venta
+                WHERE ABS(v.total_venta - d.total) > ?
+            ''', [tolerancia]).fetchall()
+            if reparar and diferencias:
+                conn.executemany("UPDATE ventas SET total_venta = ? WHERE id_venta = ?",
+                                 [(total, id_venta) for id_venta, _, total in diferencias])
+            if reparar:
+                conn.commit()
+        return diferencias
+
+    def migracion_007_resumenes_diarios(self, cursor): # Totales precalculados por día para los reportes
+        # Una fila por día (y por día×producto, día×método de pago, día×empleado): un reporte
+        # de cualquier rango lee como máximo una fila por día y dimensión en vez de cada venta.
+        # Los triggers los mantienen al día en ventas, devoluciones y cancelaciones.
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS resumen_ventas_dia (
+                fecha TEXT PRIMARY KEY,
+                num_ventas INTEGER NOT NULL DEFAULT 0,
+                total_venta REAL NOT NULL DEFAULT 0,
+                descuento_venta REAL NOT NULL DEFAULT 0,
+                num_canceladas INTEGER NOT NULL DEFAULT 0,
+                total_cancelado REAL NOT NULL DEFAULT 0,
+                num_devoluciones INTEGER NOT NULL DEFAULT 0,
+                monto_devuelto REAL NOT NULL DEFAULT 0
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS resumen_ventas_producto (
+                fecha TEXT NOT NULL,
+                id_producto TEXT NOT NULL,
+                cantidad REAL NOT NULL DEFAULT 0,
+                ingresos REAL NOT NULL DEFAULT 0,
+                num_lineas INTEGER NOT NULL DEFAULT 0,
+                cantidad_devuelta REAL NOT NULL DEFAULT 0,
+                monto_devuelto REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (fecha, id_producto)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS resumen_ventas_metodo (
+                fecha TEXT NOT NULL,
+                metodo_pago TEXT NOT NULL,
+                num_ventas INTEGER NOT NULL DEFAULT 0,
+                total_venta REAL NOT NULL DEFAULT 0,
+                total_cancelado REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (fecha, metodo_pago)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS resumen_ventas_empleado (
+                fecha TEXT NOT NULL,
+                id_empleado INTEGER NOT NULL,
+                num_ventas INTEGER NOT NULL DEFAULT 0,
+                total_venta REAL NOT NULL DEFAULT 0,
+                total_cancelado REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (fecha, id_empleado)
+            ) WITHOUT ROWID
+        ''')
+        self.triggers_resumenes(cursor)
+        self.reconstruir_resumenes(cursor)
+
+    def migracion_008_indices_fechas(self, cursor): # Filtros por rango de fechas sin recorrer la tabla
+        # Los reportes filtran con `fecha >= ? AND fecha < ?` (core/rango_fechas.py): con estos
+        # índices buscan el rango en vez de leer todos los comprobantes/devoluciones
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_comprobante_fecha ON comprobante(fecha_emision_comprobante)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_devolucion_fecha ON devolucion(fecha_devolucion)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_devolucion_venta ON devolucion(id_venta)')
+        # Último número emitido por tipo y serie (ComprobanteService._siguiente_numero)
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_comprobante_serie ON comprobante(tipo_comprobante, serie_comprobante)')
+
+    def migracion_009_version_reportes(self, cursor): # Contador de cambios de los datos que grafican los reportes
+        # Los gráficos se leen de los resúmenes diarios y muestran nombres de productos: el caché
+        # de imágenes (modules/reportes/graficos_service.py) usa esta versión en su clave
+        self.versionar_tablas(cursor, 'reportes', ['resumen_ventas_dia', 'resumen_ventas_producto'])
+        # productos se actualiza en cada venta (stock): solo un cambio de nombre afecta a los gráficos
+        cursor.execute('DROP TRIGGER IF EXISTS version_productos_nombre')
+        cursor.execute('''
+            CREATE TRIGGER version_productos_nombre
+            AFTER UPDATE OF nombre_producto ON productos
+            FOR EACH ROW WHEN NEW.nombre_producto IS NOT OLD.nombre_producto
+            BEGIN
+                UPDATE versiones_tablas SET version = version + 1 WHERE grupo = 'reportes';
+            END
+        ''')
+
+    def migracion_010_version_catalogo(self, cursor): # Contador de cambios del catálogo en memoria
+        # modules/productos/models/catalogo_cache.py recarga solo cuando esta versión cambia
+        # (incluye el stock que descuentan las ventas de cualquier caja)
+        self.versionar_tablas(cursor, 'catalogo',
+                              ['productos', 'categoria_productos', 'tipo_productos', 'unidad_medida'])
+
+    def migracion_011_fecha_productos(self, cursor): # Sin trigger que reescriba la fila modificada
+        # Las sentencias que escriben productos fijan fecha_actualizacion ellas mismas (triggers de
+        # stock, ProductoModel, BaseModel.update, importación): así cada cambio es un solo UPDATE
+        cursor.execute('DROP TRIGGER IF EXISTS actualizar_fecha_producto')
+        # La devolución era la única escritura que dependía del trigger para la fecha
+        cursor.execute('DROP TRIGGER IF EXISTS restaurar_stock_devolucion')
+        cursor.execute('''
+            CREATE TRIGGER restaurar_stock_devolucion
+            AFTER INSERT ON detalle_devolucion
+            FOR EACH ROW
+            WHEN NEW.estado_devolucion = 'completada'
+            BEGIN
+                UPDATE productos
+                SET stock_producto = stock_producto + NEW.cantidad_devolucion,
+                    fecha_actualizacion = CURRENT_TIMESTAMP
+                WHERE productos.id_producto = NEW.id_producto;
+            END
+        ''')
+
+    def _resumen_venta(self, fila, signo, origen='WHERE true'): # Suma (signo '') o resta (signo '-') una venta de sus resúmenes
+        # `fila` es NEW/OLD o el alias de `origen` (un FROM que lee la fila viva de ventas)
+        dia = self.DIA_RESUMEN.format(col=f'{fila}.fecha_venta')
+        metodo = self.METODO_RESUMEN.format(col=f'{fila}.metodo_pago')
+        total = f"COALESCE({fila}.total_venta, 0)"
+        cancelada = f"({fila}.estado_venta = 'cancelado')"
+        return f'''
+            INSERT INTO resumen_ventas_dia
+                (fecha, num_ventas, total_venta, descuento_venta, num_canceladas, total_cancelado)
+            SELECT {dia}, {signo}1, {signo}{total}, {signo}COALESCE({fila}.descuento_venta, 0),
+                    {signo}{cancelada}, {signo}({cancelada} * {total})
+            {origen}
+            ON CONFLICT (fecha) DO UPDATE SET
+                num_ventas = num_ventas + excluded.num_ventas,
+                total_venta = total_venta + excluded.total_venta,
+                descuento_venta = descuento_venta + excluded.descuento_venta,
+                num_canceladas = num_canceladas + excluded.num_canceladas,
+                total_cancelado = total_cancelado + excluded.total_cancelado;
+            INSERT INTO resumen_ventas_metodo (fecha, metodo_pago, num_ventas, total_venta, total_cancelado)
+            SELECT {dia}, {metodo}, {signo}1, {signo}{total}, {signo}({cancelada} * {total})
+            {origen}
+            ON CONFLICT (fecha, metodo_pago) DO UPDATE SET
+                num_ventas = num_ventas + excluded.num_ventas,
+                total_venta = total_venta + excluded.total_venta,
+                total_cancelado = total_cancelado + excluded.total_cancelado;
+            INSERT INTO resumen_ventas_empleado (fecha, id_empleado, num_ventas, total_venta, total_cancelado)
+            SELECT {dia}, {fila}.id_empleado, {signo}1, {signo}{total}, {signo}({cancelada} * {total})
+            {origen}
+            ON CONFLICT (fecha, id_empleado) DO UPDATE SET
+                num_ventas = num_ventas + excluded.num_ventas,
+                total_venta = total_venta + excluded.total_venta,
+                total_cancelado = total_cancelado + excluded.total_cancelado;
+        '''
+
+    def _resumen_detalle(self, fila, signo): # Suma o resta una línea de venta en día×producto (día de la venta)
+        dia = self.DIA_RESUMEN.format(col='v.fecha_venta')
+        return f'''
+            INSERT INTO resumen_ventas_producto (fecha, id_producto, cantidad, ingresos, num_lineas)
+            SELECT {dia}, {fila}.id_producto, {signo}{fila}.cantidad_detalle, {signo}{fila}.subtotal_detalle, {signo}1
+            FROM ventas v WHERE v.id_venta = {fila}.id_venta
+            ON CONFLICT (fecha, id_producto) DO UPDATE SET
+                cantidad = cantidad + excluded.cantidad,
+                ingresos = ingresos + excluded.ingresos,
+                num_lineas = num_lineas + excluded.num_lineas;
+        '''
+
+    def _resumen_devolucion(self, fila, signo): # Devolución completada: cuenta en el día en que se devolvió
+        dia = self.DIA_RESUMEN.format(col=f'{fila}.fecha_devolucion')
+        return f'''
+            INSERT INTO resumen_ventas_dia (fecha, num_devoluciones, monto_devuelto)
+            VALUES ({dia}, {signo}1, {signo}COALESCE({fila}.monto_devolucion, 0))
+            ON CONFLICT (fecha) DO UPDATE SET
+                num_devoluciones = num_devoluciones + excluded.num_devoluciones,
+                monto_devuelto = monto_devuelto + excluded.monto_devuelto;
+        '''
+
+    def _resumen_detalle_devolucion(self, fila, signo): # Producto devuelto, en el día de su devolución
+        dia = self.DIA_RESUMEN.format(col='d.fecha_devolucion')
+        return f'''
+            INSERT INTO resumen_ventas_producto (fecha, id_producto, cantidad_devuelta, monto_devuelto)
+            SELECT {dia}, {fila}.id_producto, {signo}{fila}.cantidad_devolucion, {signo}COALESCE({fila}.monto_devolucion, 0)
+            FROM devolucion d WHERE d.id_devolucion = {fila}.id_devolucion
+            ON CONFLICT (fecha, id_producto) DO UPDATE SET
+                cantidad_devuelta = cantidad_devuelta + excluded.cantidad_devuelta,
+                monto_devuelto = monto_devuelto + excluded.monto_devuelto;
+        '''
+
+    def triggers_resumenes(self, cursor): # Mantenimiento incremental de las tablas resumen_ventas_*
+        # Venta cuyo día, método, empleado y estado no cambian: solo se aplica la diferencia de montos
+        # (es lo que ocurre con cada detalle insertado, vía actualizar_total_venta_*)
+        mismo_grupo = (f"{self.DIA_RESUMEN.format(col='OLD.fecha_venta')} = {self.DIA_RESUMEN.format(col='NEW.fecha_venta')}"
+                       " AND OLD.metodo_pago IS NEW.metodo_pago AND OLD.id_empleado IS NEW.id_empleado"
+                       " AND OLD.estado_venta IS NEW.estado_venta")
+        cancelada = "(NEW.estado_venta = 'cancelado')"
+        dif_total = "(COALESCE(NEW.total_venta, 0) - COALESCE(OLD.total_venta, 0))"
+        dia_nuevo = self.DIA_RESUMEN.format(col='NEW.fecha_venta')
+        dia_viejo = self.DIA_RESUMEN.format(col='OLD.fecha_venta')
+
+        triggers = {
+            'resumen_venta_insert': f'''
+                AFTER INSERT ON ventas
+                FOR EACH ROW
+                BEGIN {self._resumen_venta('NEW', '')} END
+            ''',
+            # Reemplaza al trigger original: borra los detalles (sus triggers descuentan día×producto
+            # y llevan total_venta a 0) y recién entonces resta la venta, leyendo la fila viva porque
+            # en un BEFORE DELETE el OLD no ve lo que cambiaron esos triggers
+            'eliminar_detalles_al_eliminar_venta': f'''
+                BEFORE DELETE ON ventas
+                FOR EACH ROW
+                BEGIN
+                    DELETE FROM detalle_venta WHERE id_venta = OLD.id_venta;
+                    {self._resumen_venta('v', '-', 'FROM ventas v WHERE v.id_venta = OLD.id_venta')}
+                END
+            ''',
+            'resumen_venta_montos': f'''
+                AFTER UPDATE OF total_venta, descuento_venta ON ventas
+                FOR EACH ROW
+                WHEN {mismo_grupo}
+                BEGIN
+                    UPDATE resumen_ventas_dia
+                    SET total_venta = total_venta + {dif_total},
+                        descuento_venta = descuento_venta + COALESCE(NEW.descuento_venta, 0) - COALESCE(OLD.descuento_venta, 0),
+                        total_cancelado = total_cancelado + {cancelada} * {dif_total}
+                    WHERE fecha = {dia_nuevo};
+                    UPDATE resumen_ventas_metodo
+                    SET total_venta = total_venta + {dif_total},
+                        total_cancelado = total_cancelado + {cancelada} * {dif_total}
+                    WHERE fecha = {dia_nuevo} AND metodo_pago = {self.METODO_RESUMEN.format(col='NEW.metodo_pago')};
+                    UPDATE resumen_ventas_empleado
+                    SET total_venta = total_venta + {dif_total},
+                        total_cancelado = total_cancelado + {cancelada} * {dif_total}
+                    WHERE fecha = {dia_nuevo} AND id_empleado = NEW.id_empleado;
+                END
+            ''',
+            # Cancelación, cambio de método de pago, de empleado o de día: sale del grupo viejo y entra al nuevo
+            'resumen_venta_reagrupar': f'''
+                AFTER UPDATE OF fecha_venta, metodo_pago, id_empleado, estado_venta ON ventas
+                FOR EACH ROW
+                WHEN NOT ({mismo_grupo})
+                BEGIN
+                    {self._resumen_venta('OLD', '-')}
+                    {self._resumen_venta('NEW', '')}
+                END
+            ''',
+            # Si cambia el día de la venta, sus líneas se mueven de día en día×producto
+            'resumen_venta_mover_dia': f'''
+                AFTER UPDATE OF fecha_venta ON ventas
+                FOR EACH ROW
+                WHEN {dia_viejo} != {dia_nuevo}
+                BEGIN
+                    INSERT INTO resumen_ventas_producto (fecha, id_producto, cantidad, ingresos, num_lineas)
+                    SELECT {dia_viejo}, id_producto, -SUM(cantidad_detalle), -SUM(subtotal_detalle), -COUNT(*)
+                    FROM detalle_venta WHERE id_venta = NEW.id_venta GROUP BY id_producto
+                    ON CONFLICT (fecha, id_producto) DO UPDATE SET
+                        cantidad = cantidad + excluded.cantidad,
+                        ingresos = ingresos + excluded.ingresos,
+                        num_lineas = num_lineas + excluded.num_lineas;
+                    INSERT INTO resumen_ventas_producto (fecha, id_producto, cantidad, ingresos, num_lineas)
+                    SELECT {dia_nuevo}, id_producto, SUM(cantidad_detalle), SUM(subtotal_detalle), COUNT(*)
+                    FROM detalle_venta WHERE id_venta = NEW.id_venta GROUP BY id_producto
+                    ON CONFLICT (fecha, id_producto) DO UPDATE SET
+                        cantidad = cantidad + excluded.cantidad,
+                        ingresos = ingresos + excluded.ingresos,
+                        num_lineas = num_lineas + excluded.num_lineas;
+                END
+            ''',
+            'resumen_detalle_insert': f'''
+                AFTER INSERT ON detalle_venta
+                FOR EACH ROW
+                BEGIN {self._resumen_detalle('NEW', '')} END
+            ''',
+            'resumen_detalle_delete': f'''
+                AFTER DELETE ON detalle_venta
+                FOR EACH ROW
+                BEGIN {self._resumen_detalle('OLD', '-')} END
+            ''',
+            'resumen_detalle_update': f'''
+                AFTER UPDATE OF cantidad_detalle, subtotal_detalle, id_producto, id_venta ON detalle_venta
+                FOR EACH ROW
+                BEGIN
+                    {self._resumen_detalle('OLD', '-')}
+                    {self._resumen_detalle('NEW', '')}
+                END
+            ''',
+            'resumen_devolucion_insert': f'''
+                AFTER INSERT ON devolucion
+                FOR EACH ROW
+                WHEN NEW.estado_devolucion = 'completada'
+                BEGIN {self._resumen_devolucion('NEW', '')} END
+            ''',
+            'resumen_devolucion_delete': f'''
+                AFTER DELETE ON devolucion
+                FOR EACH ROW
+                WHEN OLD.estado_devolucion = 'completada'
+                BEGIN {self._resumen_devolucion('OLD', '-')} END
+            ''',
+            'resumen_devolucion_update_viejo': f'''
+                AFTER UPDATE OF estado_devolucion, monto_devolucion, fecha_devolucion ON devolucion
+                FOR EACH ROW
+                WHEN OLD.estado_devolucion = 'completada'
+                BEGIN {self._resumen_devolucion('OLD', '-')} END
+            ''',
+            'resumen_devolucion_update_nuevo': f'''
+                AFTER UPDATE OF estado_devolucion, monto_devolucion, fecha_devolucion ON devolucion
+                FOR EACH ROW
+                WHEN NEW.estado_devolucion = 'completada'
+                BEGIN {self._resumen_devolucion('NEW', '')} END
+            ''',
+            'resumen_detalle_devolucion_insert': f'''
+                AFTER INSERT ON detalle_devolucion
+                FOR EACH ROW
+                WHEN NEW.estado_devolucion = 'completada'
+                BEGIN {self._resumen_detalle_devolucion('NEW', '')} END
+            ''',
+            'resumen_detalle_devolucion_delete': f'''
+                AFTER DELETE ON detalle_devolucion
+                FOR EACH ROW
+                WHEN OLD.estado_devolucion = 'completada'
+                BEGIN {self._resumen_detalle_devolucion('OLD', '-')} END
+            ''',
+            'resumen_detalle_devolucion_update_viejo': f'''
+                AFTER UPDATE OF estado_devolucion, cantidad_devolucion, monto_devolucion, id_producto ON detalle_devolucion
+                FOR EACH ROW
+                WHEN OLD.estado_devolucion = 'completada'
+                BEGIN {self._resumen_detalle_devolucion('OLD', '-')} END
+            ''',
+            'resumen_detalle_devolucion_update_nuevo': f'''
+                AFTER UPDATE OF estado_devolucion, cantidad_devolucion, monto_devolucion, id_producto ON detalle_devolucion
+                FOR EACH ROW
+                WHEN NEW.estado_devolucion = 'completada'
+                BEGIN {self._resumen_detalle_devolucion('NEW', '')} END
+            ''',
+        }
+        for nombre, cuerpo in triggers.items():
+            cursor.execute(f'DROP TRIGGER IF EXISTS {nombre}')
+            cursor.execute(f'CREATE TRIGGER {nombre} {cuerpo}')
+
+    def reconstruir_resumenes(self, cursor=None): # Recalcula resumen_ventas_* desde ventas y devoluciones
+        dia_venta = self.DIA_RESUMEN.format(col='v.fecha_venta')
+        dia_devolucion = self.DIA_RESUMEN.format(col='d.fecha_devolucion')
+        metodo = self.METODO_RESUMEN.format(col='v.metodo_pago')
+        total = "COALESCE(v.total_venta, 0)"
+        cancelada = "(v.estado_venta = 'cancelado')"
+        sentencias = [
+            "DELETE FROM resumen_ventas_dia",
+            "DELETE FROM resumen_ventas_producto",
+            "DELETE FROM resumen_ventas_metodo",
+            "DELETE FROM resumen_ventas_empleado",
+            f'''
+                INSERT INTO resumen_ventas_dia
+                    (fecha, num_ventas, total_venta, descuento_venta, num_canceladas, total_cancelado)
+                SELECT {dia_venta}, COUNT(*), SUM({total}), SUM(COALESCE(v.descuento_venta, 0)),
+                       SUM({cancelada}), SUM({cancelada} * {total})
+                FROM ventas v GROUP BY 1
+            ''',
+            f'''
+                INSERT INTO resumen_ventas_dia (fecha, num_devoluciones, monto_devuelto)
+                SELECT {dia_devolucion}, COUNT(*), SUM(COALESCE(d.monto_devolucion, 0))
+                FROM devolucion d WHERE d.estado_devolucion = 'completada' GROUP BY 1
+                ON CONFLICT (fecha) DO UPDATE SET
+                    num_devoluciones = excluded.num_devoluciones,
+                    monto_devuelto = excluded.monto_devuelto
+            ''',
+            f'''
+                INSERT INTO resumen_ventas_metodo (fecha, metodo_pago, num_ventas, total_venta, total_cancelado)
+                SELECT {dia_venta}, {metodo}, COUNT(*), SUM({total}), SUM({cancelada} * {total})
+                FROM ventas v GROUP BY 1, 2
+            ''',
+            f'''
+                INSERT INTO resumen_ventas_empleado (fecha, id_empleado, num_ventas, total_venta, total_cancelado)
+                SELECT {dia_venta}, v.id_empleado, COUNT(*), SUM({total}), SUM({cancelada} * {total})
+                FROM ventas v GROUP BY 1, 2
+            ''',
+            f'''
+                INSERT INTO resumen_ventas_producto (fecha, id_producto, cantidad, ingresos, num_lineas)
+                SELECT {dia_venta}, dv.id_producto, SUM(dv.cantidad_detalle), SUM(dv.subtotal_detalle), COUNT(*)
+                FROM detalle_venta dv JOIN ventas v ON v.id_venta = dv.id_venta
+                GROUP BY 1, 2
+            ''',
+            f'''
+                INSERT INTO resumen_ventas_producto (fecha, id_producto, cantidad_devuelta, monto_devuelto)
+                SELECT {dia_devolucion}, dd.id_producto, SUM(dd.cantidad_devolucion), SUM(COALESCE(dd.monto_devolucion, 0))
+                FROM detalle_devolucion dd JOIN devolucion d ON d.id_devolucion = dd.id_devolucion
+                WHERE dd.estado_devolucion = 'completada'
+                GROUP BY 1, 2
+                ON CONFLICT (fecha, id_producto) DO UPDATE SET
+                    cantidad_devuelta = excluded.cantidad_devuelta,
+                    monto_devuelto = excluded.monto_devuelto
+            ''',
+        ]
+        if cursor is not None:
+            for sql in sentencias:
+                cursor.execute(sql)
+            return
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for sql in sentencias:
+                conn.execute(sql)
+            conn.commit()
+
+    def compactar_resumenes(self): # Borra las filas de resumen_ventas_* que quedaron en cero
+        # Los triggers restan al cancelar, borrar o mover ventas a otro día: la fila queda con
+        # contadores en cero (y restos de redondeo en los montos) y solo ocupa lugar en los reportes
+        sentencias = [
+            "DELETE FROM resumen_ventas_dia WHERE num_ventas = 0 AND num_devoluciones = 0",
+            "DELETE FROM resumen_ventas_producto WHERE num_lineas = 0 AND cantidad_devuelta = 0",
+            "DELETE FROM resumen_ventas_metodo WHERE num_ventas = 0",
+            "DELETE FROM resumen_ventas_empleado WHERE num_ventas = 0",
+        ]
+        borradas = 0
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for sql in sentencias:
+                borradas += conn.execute(sql).rowcount
+            conn.commit()
+        return borradas
+
+    def versionar_tablas(self, cursor, grupo, tablas): # Triggers que incrementan versiones_tablas[grupo]
+        cursor.execute("INSERT OR IGNORE INTO versiones_tablas (grupo, version) VALUES (?, 0)", [grupo])
+        for tabla in tablas:
+            for evento in ('INSERT', 'UPDATE', 'DELETE'):
+                nombre = f"version_{tabla}_{evento.lower()}"
+                cursor.execute(f'DROP TRIGGER IF EXISTS {nombre}')
+                cursor.execute(f'''
+                    CREATE TRIGGER {nombre}
+                    AFTER {evento} ON {tabla}
+                    FOR EACH ROW
+                    BEGIN
+                        UPDATE versiones_tablas SET version = version + 1 WHERE grupo = '{grupo}';
+                    END
+                ''')
+
+    def version_tablas(self, grupo): # Versión actual de un grupo de tablas (None si no existe)
+        fila = self.fetchone("SELECT version FROM versiones_tablas WHERE grupo = ?", (grupo,))
+        return fila[0] if fila else None
+
+    def _existe_indice_busqueda(self, cursor):
+        return cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'productos_fts'").fetchone() is not None
+
+    def pausar_indice_busqueda(self, cursor): # Inicio de carga masiva (dentro de la transacción)
+        cursor.execute("INSERT INTO busqueda_pausa (activa) VALUES (1)")
+        return cursor.execute("SELECT COALESCE(MAX(rowid), 0) FROM productos").fetchone()[0]
+
+    def reanudar_indice_busqueda(self, cursor, desde_rowid): # Indexa en bloque lo insertado durante la pausa
+        cursor.execute("DELETE FROM busqueda_pausa")
+        if not self._existe_indice_busqueda(cursor):
+            return
+        # productos sin AUTOINCREMENT: las filas nuevas reciben rowid mayor al máximo previo
+        cursor.execute('''
+            INSERT INTO productos_fts (rowid, id_producto, nombre_producto, nombre_categoria)
+            SELECT p.rowid, p.id_producto, p.nombre_producto, c.nombre_categoria
+            FROM productos p
+            LEFT JOIN categoria_productos c ON p.id_categoria_productos = c.id_categoria_productos
+            WHERE p.rowid > ?
+        ''', [desde_rowid])
+
+    def reconstruir_indice_busqueda(self, cursor=None): # Regenera productos_fts desde productos
+        # Útil tras un VACUUM, que puede renumerar los rowid de productos
+        sql_borrar = "DELETE FROM productos_fts"
+        sql_llenar = '''
+            INSERT INTO productos_fts (rowid, id_producto, nombre_producto, nombre_categoria)
+            SELECT p.rowid, p.id_producto, p.nombre_producto, c.nombre_categoria
+            FROM productos p
+            LEFT JOIN categoria_productos c ON p.id_categoria_productos = c.id_categoria_productos
+        '''
+        if cursor is not None:
+            cursor.execute(sql_borrar)
+            cursor.execute(sql_llenar)
+            return
+        with self.connection() as conn:
+            conn.execute(sql_borrar)
+            conn.execute(sql_llenar)
+            conn.commit()
+
+    def crear_tablas(self, cursor): # Crea las tablas si no existen
+        # Tabla de tipo de productos
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS tipo_productos (
+                id_tipo_producto INTEGER PRIMARY KEY AUTOINCREMENT,
+                nombre_tipo TEXT NOT NULL UNIQUE,
                 descripcion TEXT
-                )
-            ''')
+            )
+        ''')
 
-            # Tabla de productos
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS productos (
-                    id_producto TEXT PRIMARY KEY,
-                    nombre_producto VARCHAR(100) NOT NULL,
-                    descripcion_producto TEXT,
-                    precio_producto REAL NOT NULL,
-                    stock_producto INTEGER NOT NULL CHECK (stock_producto >= 0) DEFAULT 0,
-                    stock_minimo INTEGER NOT NULL CHECK (stock_minimo >= 0) DEFAULT 0,
-                    estado_producto TEXT CHECK(estado_producto IN ('activo', 'descontinuado', 'no disponible', 'en oferta')) NOT NULL DEFAULT 'activo',
-                    tipo_corte TEXT,
-                    imagen TEXT,
-                    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    id_tipo_productos INTEGER NOT NULL,
-                    id_categoria_productos INTEGER NOT NULL,
-                    id_unidad_medida INTEGER NOT NULL,
-                    FOREIGN KEY (id_tipo_productos) REFERENCES tipo_productos (id_tipo_producto),
-                    FOREIGN KEY (id_categoria_productos) REFERENCES categoria_productos (id_categoria_productos),
-                    FOREIGN KEY (id_unidad_medida) REFERENCES unidad_medida (id_unidad_medida)
-                )
-            ''')
+        # Tabla de categorías de productos
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS categoria_productos (
+                id_categoria_productos INTEGER PRIMARY KEY AUTOINCREMENT,
+                nombre_categoria TEXT NOT NULL UNIQUE,
+                descripcion TEXT
+            )
+        ''')
 
-            # Tabla de promocion
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS promocion (
-                    id_promocion INTEGER PRIMARY KEY AUTOINCREMENT,
-                    nombre_promocion TEXT NOT NULL,
-                    descripcion_promocion TEXT,
-                    descuento REAL NOT NULL CHECK (descuento >= 0 AND descuento <= 100),
-                    fecha_inicio DATETIME NOT NULL,
-                    fecha_fin DATETIME NOT NULL,
-                    estado_promocion TEXT CHECK(estado_promocion IN ('activa', 'inactiva', 'expirada')) NOT NULL DEFAULT 'inactiva'
-                )
-            ''')
+        # Tabla de unidades de medida
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS unidad_medida (
+            id_unidad_medida INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre_unidad TEXT NOT NULL UNIQUE,
+            descripcion TEXT
+            )
+        ''')
 
-            # Tabla de promocion_producto
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS promocion_producto (
-                    descuento_aplicado REAL NOT NULL,
-                    id_promocion INTEGER NOT NULL,
-                    id_producto TEXT NOT NULL,
-                    PRIMARY KEY (id_promocion, id_producto),
-                    FOREIGN KEY (id_promocion) REFERENCES promocion (id_promocion),
-                    FOREIGN KEY (id_producto) REFERENCES productos (id_producto)
-                )
-            ''')
+        # Tabla de productos
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS productos (
+                id_producto TEXT PRIMARY KEY,
+                nombre_producto VARCHAR(100) NOT NULL,
+                descripcion_producto TEXT,
+                precio_producto REAL NOT NULL,
+                stock_producto INTEGER NOT NULL CHECK (stock_producto >= 0) DEFAULT 0,
+                stock_minimo INTEGER NOT NULL CHECK (stock_minimo >= 0) DEFAULT 0,
+                estado_producto TEXT CHECK(estado_producto IN ('activo', 'descontinuado', 'no disponible', 'en oferta')) NOT NULL DEFAULT 'activo',
+                tipo_corte TEXT,
+                imagen TEXT,
+                fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                id_tipo_productos INTEGER NOT NULL,
+                id_categoria_productos INTEGER NOT NULL,
+                id_unidad_medida INTEGER NOT NULL,
+                FOREIGN KEY (id_tipo_productos) REFERENCES tipo_productos (id_tipo_producto),
+                FOREIGN KEY (id_categoria_productos) REFERENCES categoria_productos (id_categoria_productos),
+                FOREIGN KEY (id_unidad_medida) REFERENCES unidad_medida (id_unidad_medida)
+            )
+        ''')
 
-            # Tabla de promocion_categoria (asignar promociones a categorías)
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS promocion_categoria (
-                    id_promocion INTEGER NOT NULL,
-                    id_categoria INTEGER NOT NULL,
-                    PRIMARY KEY (id_promocion, id_categoria),
-                    FOREIGN KEY (id_promocion) REFERENCES promocion (id_promocion),
-                    FOREIGN KEY (id_categoria) REFERENCES categoria_productos (id_categoria_productos)
-                )
-            ''')
+        # Tabla de promocion
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS promocion (
+                id_promocion INTEGER PRIMARY KEY AUTOINCREMENT,
+                nombre_promocion TEXT NOT NULL,
+                descripcion_promocion TEXT,
+                descuento REAL NOT NULL CHECK (descuento >= 0 AND descuento <= 100),
+                fecha_inicio DATETIME NOT NULL,
+                fecha_fin DATETIME NOT NULL,
+                estado_promocion TEXT CHECK(estado_promocion IN ('activa', 'inactiva', 'expirada')) NOT NULL DEFAULT 'inactiva'
+            )
+        ''')
 
-            # Tabla de roles
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS rol (
-                    id_rol INTEGER PRIMARY KEY AUTOINCREMENT,
-                    nombre_rol TEXT NOT NULL UNIQUE
-                )
-            ''')
+        # Tabla de promocion_producto
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS promocion_producto (
+                descuento_aplicado REAL NOT NULL,
+                id_promocion INTEGER NOT NULL,
+                id_producto TEXT NOT NULL,
+                PRIMARY KEY (id_promocion, id_producto),
+                FOREIGN KEY (id_promocion) REFERENCES promocion (id_promocion),
+                FOREIGN KEY (id_producto) REFERENCES productos (id_producto)
+            )
+        ''')
 
-            # Tabla de empleados
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS empleado (
-                    id_empleado INTEGER PRIMARY KEY AUTOINCREMENT,
-                    nombre_empleado TEXT NOT NULL,
-                    apellido_empleado TEXT NOT NULL,
-                    estado_empleado TEXT CHECK(estado_empleado IN ('activo', 'inactivo')) NOT NULL DEFAULT 'activo',
-                    fecha_contratacion DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    id_rol INTEGER NOT NULL,
-                    FOREIGN KEY (id_rol) REFERENCES rol (id_rol)
-                )
-            ''')
+        # Tabla de promocion_categoria (asignar promociones a categorías)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS promocion_categoria (
+                id_promocion INTEGER NOT NULL,
+                id_categoria INTEGER NOT NULL,
+                PRIMARY KEY (id_promocion, id_categoria),
+                FOREIGN KEY (id_promocion) REFERENCES promocion (id_promocion),
+                FOREIGN KEY (id_categoria) REFERENCES categoria_productos (id_categoria_productos)
+            )
+        ''')
 
-            # Tabla de usuarios - separada de empleados para autenticación
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS usuario (
-                    id_usuario INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username TEXT NOT NULL UNIQUE,
-                    password_hash TEXT NOT NULL,
-                    estado_usuario TEXT CHECK(estado_usuario IN ('activo', 'inactivo')) NOT NULL DEFAULT 'activo',
-                    ultimo_login DATETIME,
-                    id_empleado INTEGER NOT NULL,
-                    FOREIGN KEY (id_empleado) REFERENCES empleado (id_empleado)
-                )
-            ''')
+        # Tabla de roles
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS rol (
+                id_rol INTEGER PRIMARY KEY AUTOINCREMENT,
+                nombre_rol TEXT NOT NULL UNIQUE
+            )
+        ''')
 
-            # Tabla de ventas
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS ventas (
-                    id_venta TEXT PRIMARY KEY,
-                    fecha_venta DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    metodo_pago TEXT CHECK(metodo_pago IN ('efectivo', 'tarjeta', 'yape', 'plin', 'transferencia', 'vale')) NOT NULL DEFAULT 'efectivo',
-                    total_venta REAL NOT NULL DEFAULT 0,
-                    estado_venta TEXT CHECK(estado_venta IN ('completado', 'cancelado', 'devuelto')) NOT NULL DEFAULT 'completado',
-                    descuento_venta REAL DEFAULT 0,
-                    descuento_pct REAL DEFAULT 0,
-                    descuento_tipo TEXT DEFAULT '',
-                    id_empleado INTEGER NOT NULL,
-                    FOREIGN KEY (id_empleado) REFERENCES empleado (id_empleado)
-                )
-            ''')
+        # Tabla de empleados
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS empleado (
+                id_empleado INTEGER PRIMARY KEY AUTOINCREMENT,
+                nombre_empleado TEXT NOT NULL,
+                apellido_empleado TEXT NOT NULL,
+                estado_empleado TEXT CHECK(estado_empleado IN ('activo', 'inactivo')) NOT NULL DEFAULT 'activo',
+                fecha_contratacion DATETIME DEFAULT CURRENT_TIMESTAMP,
+                id_rol INTEGER NOT NULL,
+                FOREIGN KEY (id_rol) REFERENCES rol (id_rol)
+            )
+        ''')
 
-            # Tabla dme detalle de ventas
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS detalle_venta (
-                    id_detalle_venta INTEGER PRIMARY KEY AUTOINCREMENT,
-                    cantidad_detalle INTEGER NOT NULL,
-                    precio_unitario_detalle REAL NOT NULL,
-                    descuento_aplicado REAL DEFAULT 0,
-                    subtotal_detalle REAL NOT NULL,
-                    id_producto TEXT NOT NULL,
-                    id_venta TEXT NOT NULL,
-                    id_promocion INTEGER,
-                    FOREIGN KEY (id_producto) REFERENCES productos (id_producto),
-                    FOREIGN KEY (id_venta) REFERENCES ventas (id_venta),
-                    FOREIGN KEY (id_promocion) REFERENCES promocion (id_promocion)
-                )
-            ''')
-            # Si la base ya existía sin la columna `id_promocion`, añadirla ahora
-            try:
-                cursor.execute("PRAGMA table_info(detalle_venta)")
-                cols = [r[1] for r in cursor.fetchall()]
-                if 'id_promocion' not in cols:
-                    cursor.execute('ALTER TABLE detalle_venta ADD COLUMN id_promocion INTEGER')
-            except Exception:
-                # No interrumpir la inicialización por este paso
-                pass
-
-            # Tabla de comprobantes
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS comprobante (
-                    id_comprobante INTEGER PRIMARY KEY AUTOINCREMENT,
-                    tipo_comprobante TEXT CHECK(tipo_comprobante IN ('factura', 'boleta')) NOT NULL,
-                    numero_comprobante VARCHAR(30) NOT NULL,
-                    serie_comprobante TEXT,
-                    fecha_emision_comprobante DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    monto_total_comprobante REAL NOT NULL,
-                    ruc_emisor CHAR(11),
-                    razon_social VARCHAR(100),
-                    direccion_fiscal VARCHAR(100),
-                    num_documento CHAR(8),
-                    nombre_cliente VARCHAR(100),
-                    xml_path TEXT,
-                    pdf_path TEXT,
-                    estado_sunat TEXT,
-                    respuesta_api TEXT,
-                    id_venta TEXT NOT NULL,
-                    FOREIGN KEY (id_venta) REFERENCES ventas (id_venta),
-                    CHECK (
-                        (tipo_comprobante = 'factura' AND ruc_emisor IS NOT NULL) OR
-                        (tipo_comprobante = 'boleta' AND num_documento IS NOT NULL)
-                    )
-                )
-            ''')
-            
-            # Migrar tabla comprobante: agregar columna respuesta_api si no existe
-            try:
-                cursor.execute("PRAGMA table_info(comprobante)")
-                columns = [row[1] for row in cursor.fetchall()]
-                if 'respuesta_api' not in columns:
-                    cursor.execute("ALTER TABLE comprobante ADD COLUMN respuesta_api TEXT")
-                    print("✓ Columna 'respuesta_api' agregada a tabla comprobante")
-            except Exception as e:
-                print(f"Info: {e}")
-
-            # Tabla de devoluciones
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS devolucion (
-                    id_devolucion INTEGER PRIMARY KEY AUTOINCREMENT,
-                    fecha_devolucion DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    motivo_devolucion TEXT,
-                    monto_devolucion REAL NOT NULL,
-                    tipo_devolucion TEXT CHECK(tipo_devolucion IN ('total', 'parcial')) NOT NULL,
-                    estado_devolucion TEXT CHECK(estado_devolucion IN ('pendiente', 'completada', 'en proceso')) DEFAULT 'pendiente',
-                    id_venta TEXT NOT NULL,
-                    id_detalle_venta INTEGER NOT NULL,
-                    FOREIGN KEY (id_venta) REFERENCES ventas (id_venta),
-                    FOREIGN KEY (id_detalle_venta) REFERENCES detalle_venta (id_detalle_venta)
-                )
-            ''')
+        # Tabla de usuarios - separada de empleados para autenticación
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS usuario (
+                id_usuario INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT NOT NULL UNIQUE,
+                password_hash TEXT NOT NULL,
+                estado_usuario TEXT CHECK(estado_usuario IN ('activo', 'inactivo')) NOT NULL DEFAULT 'activo',
+                ultimo_login DATETIME,
+                id_empleado INTEGER NOT NULL,
+                FOREIGN KEY (id_empleado) REFERENCES empleado (id_empleado)
+            )
+        ''')
 
-            # Tabla detalle devoluciones
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS detalle_devolucion (
-                    id_detalle_devolucion INTEGER PRIMARY KEY AUTOINCREMENT,
-                    cantidad_devolucion INTEGER NOT NULL,
-                    monto_devolucion REAL NOT NULL,
-                    estado_devolucion TEXT CHECK(estado_devolucion IN ('pendiente', 'completada', 'en proceso')) DEFAULT 'pendiente', 
-                    id_devolucion INTEGER NOT NULL,
-                    id_producto TEXT NOT NULL, 
-                    FOREIGN KEY (id_devolucion) REFERENCES devolucion (id_devolucion),
-                    FOREIGN KEY (id_producto) REFERENCES productos (id_producto)
-                )
-            ''')
+        # Tabla de ventas
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ventas (
+                id_venta TEXT PRIMARY KEY,
+                fecha_venta DATETIME DEFAULT CURRENT_TIMESTAMP,
+                metodo_pago TEXT CHECK(metodo_pago IN ('efectivo', 'tarjeta', 'yape', 'plin', 'transferencia', 'vale')) NOT NULL DEFAULT 'efectivo',
+                total_venta REAL NOT NULL DEFAULT 0,
+                estado_venta TEXT CHECK(estado_venta IN ('completado', 'cancelado', 'devuelto')) NOT NULL DEFAULT 'completado',
+                descuento_venta REAL DEFAULT 0,
+                descuento_pct REAL DEFAULT 0,
+                descuento_tipo TEXT DEFAULT '',
+                id_empleado INTEGER NOT NULL,
+                FOREIGN KEY (id_empleado) REFERENCES empleado (id_empleado)
+            )
+        ''')
 
-            # Tabla de nota de crédito
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS nota_credito(
-                    id_nota_credito INTEGER PRIMARY KEY AUTOINCREMENT,
-                    fecha_emision_nota DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    monto_total_nota REAL NOT NULL,
-                    motivo TEXT,
-                    id_comprobante INTEGER NOT NULL,
-                    id_venta TEXT NOT NULL,
-                    FOREIGN KEY (id_venta) REFERENCES ventas (id_venta),
-                    FOREIGN KEY (id_comprobante) REFERENCES comprobante (id_comprobante)
-                )
-            ''')
+        # Tabla dme detalle de ventas
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS detalle_venta (
+                id_detalle_venta INTEGER PRIMARY KEY AUTOINCREMENT,
+                cantidad_detalle INTEGER NOT NULL,
+                precio_unitario_detalle REAL NOT NULL,
+                descuento_aplicado REAL DEFAULT 0,
+                subtotal_detalle REAL NOT NULL,
+                id_producto TEXT NOT NULL,
+                id_venta TEXT NOT NULL,
+                id_promocion INTEGER,
+                FOREIGN KEY (id_producto) REFERENCES productos (id_producto),
+                FOREIGN KEY (id_venta) REFERENCES ventas (id_venta),
+                FOREIGN KEY (id_promocion) REFERENCES promocion (id_promocion)
+            )
+        ''')
+        # Si la base ya existía sin la columna `id_promocion`, añadirla ahora
+        try:
+            cursor.execute("PRAGMA table_info(detalle_venta)")
+            cols = [r[1] for r in cursor.fetchall()]
+            if 'id_promocion' not in cols:
+                cursor.execute('ALTER TABLE detalle_venta ADD COLUMN id_promocion INTEGER')
+        except Exception:
+            # No interrumpir la inicialización por este paso
+            pass
 
-            # Tabla de auditoría
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS auditoria (
-                    id_auditoria INTEGER PRIMARY KEY AUTOINCREMENT,
-                    accion_auditoria VARCHAR(100),
-                    tabla_afectada VARCHAR(50),
-                    fecha_hora_auditoria DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    descripcion_auditoria TEXT,
-                    ip_cliente_auditoria VARCHAR(45),
-                    id_usuario INTEGER NOT NULL,
-                    FOREIGN KEY (id_usuario) REFERENCES usuario (id_usuario)
+        # Tabla de comprobantes
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS comprobante (
+                id_comprobante INTEGER PRIMARY KEY AUTOINCREMENT,
+                tipo_comprobante TEXT CHECK(tipo_comprobante IN ('factura', 'boleta')) NOT NULL,
+                numero_comprobante VARCHAR(30) NOT NULL,
+                serie_comprobante TEXT,
+                fecha_emision_comprobante DATETIME DEFAULT CURRENT_TIMESTAMP,
+                monto_total_comprobante REAL NOT NULL,
+                ruc_emisor CHAR(11),
+                razon_social VARCHAR(100),
+                direccion_fiscal VARCHAR(100),
+                num_documento CHAR(8),
+                nombre_cliente VARCHAR(100),
+                xml_path TEXT,
+                pdf_path TEXT,
+                estado_sunat TEXT,
+                respuesta_api TEXT,
+                id_venta TEXT NOT NULL,
+                FOREIGN KEY (id_venta) REFERENCES ventas (id_venta),
+                CHECK (
+                    (tipo_comprobante = 'factura' AND ruc_emisor IS NOT NULL) OR
+                    (tipo_comprobante = 'boleta' AND num_documento IS NOT NULL)
                 )
-            ''')
+            )
+        ''')
+        
+        # Migrar tabla comprobante: agregar columna respuesta_api si no existe
+        try:
+            cursor.execute("PRAGMA table_info(comprobante)")
+            columns = [row[1] for row in cursor.fetchall()]
+            if 'respuesta_api' not in columns:
+                cursor.execute("ALTER TABLE comprobante ADD COLUMN respuesta_api TEXT")
+                print("✓ Columna 'respuesta_api' agregada a tabla comprobante")
+        except Exception as e:
+            print(f"Info: {e}")
 
-            # Tabla de backups
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS backup_log (
-                    id_backup INTEGER PRIMARY KEY AUTOINCREMENT,
-                    fecha_backup DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    tipo_backup TEXT CHECK(tipo_backup IN ('completo', 'incremental')) NOT NULL,
-                    estado_backup TEXT CHECK(estado_backup IN ('exitoso', 'fallido')) NOT NULL,
-                    ubicacion_archivo_backup VARCHAR(255),
-                    descripcion_backup TEXT,
-                    usuario_responsable INTEGER NOT NULL,
-                    FOREIGN KEY (usuario_responsable) REFERENCES usuario (id_usuario)
-                )
-            ''')
+        # Tabla de devoluciones
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS devolucion (
+                id_devolucion INTEGER PRIMARY KEY AUTOINCREMENT,
+                fecha_devolucion DATETIME DEFAULT CURRENT_TIMESTAMP,
+                motivo_devolucion TEXT,
+                monto_devolucion REAL NOT NULL,
+                tipo_devolucion TEXT CHECK(tipo_devolucion IN ('total', 'parcial')) NOT NULL,
+                estado_devolucion TEXT CHECK(estado_devolucion IN ('pendiente', 'completada', 'en proceso')) DEFAULT 'pendiente',
+                id_venta TEXT NOT NULL,
+                id_detalle_venta INTEGER NOT NULL,
+                FOREIGN KEY (id_venta) REFERENCES ventas (id_venta),
+                FOREIGN KEY (id_detalle_venta) REFERENCES detalle_venta (id_detalle_venta)
+            )
+        ''')
 
-            # Tabla Configuraciones
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS configuracion (
-                    clave TEXT PRIMARY KEY,
-                    valor TEXT NOT NULL,
-                    descripcion TEXT,
-                    fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
+        # Tabla detalle devoluciones
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS detalle_devolucion (
+                id_detalle_devolucion INTEGER PRIMARY KEY AUTOINCREMENT,
+                cantidad_devolucion INTEGER NOT NULL,
+                monto_devolucion REAL NOT NULL,
+                estado_devolucion TEXT CHECK(estado_devolucion IN ('pendiente', 'completada', 'en proceso')) DEFAULT 'pendiente', 
+                id_devolucion INTEGER NOT NULL,
+                id_producto TEXT NOT NULL, 
+                FOREIGN KEY (id_devolucion) REFERENCES devolucion (id_devolucion),
+                FOREIGN KEY (id_producto) REFERENCES productos (id_producto)
+            )
+        ''')
 
-            # Tabla de caché de documentos (DNI/RUC)
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS cache_documentos (
-                    id_cache INTEGER PRIMARY KEY AUTOINCREMENT,
-                    tipo_documento TEXT CHECK(tipo_documento IN ('DNI', 'RUC')) NOT NULL,
-                    numero_documento TEXT NOT NULL,
-                    datos_json TEXT NOT NULL,
-                    fecha_consulta DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    fecha_expiracion DATETIME,
-                    UNIQUE(tipo_documento, numero_documento)
-                )
-            ''')
+        # Tabla de nota de crédito
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS nota_credito(
+                id_nota_credito INTEGER PRIMARY KEY AUTOINCREMENT,
+                fecha_emision_nota DATETIME DEFAULT CURRENT_TIMESTAMP,
+                monto_total_nota REAL NOT NULL,
+                motivo TEXT,
+                id_comprobante INTEGER NOT NULL,
+                id_venta TEXT NOT NULL,
+                FOREIGN KEY (id_venta) REFERENCES ventas (id_venta),
+                FOREIGN KEY (id_comprobante) REFERENCES comprobante (id_comprobante)
+            )
+        ''')
 
-            # Insertar datos iniciales si no existen
-            self.datos_iniciales(cursor)
-            # Crear triggers de lógica de negocio
-            self.triggers(cursor)
+        # Tabla de auditoría
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS auditoria (
+                id_auditoria INTEGER PRIMARY KEY AUTOINCREMENT,
+                accion_auditoria VARCHAR(100),
+                tabla_afectada VARCHAR(50),
+                fecha_hora_auditoria DATETIME DEFAULT CURRENT_TIMESTAMP,
+                descripcion_auditoria TEXT,
+                ip_cliente_auditoria VARCHAR(45),
+                id_usuario INTEGER NOT NULL,
+                FOREIGN KEY (id_usuario) REFERENCES usuario (id_usuario)
+            )
+        ''')
 
-            conn.commit() # Guardar cambios
-        except Exception as e:
-            print(f"Error al crear la base de datos: {e}")
-        finally:
-            conn.close() # Cerrar conexión
+        # Tabla de backups
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS backup_log (
+                id_backup INTEGER PRIMARY KEY AUTOINCREMENT,
+                fecha_backup DATETIME DEFAULT CURRENT_TIMESTAMP,
+                tipo_backup TEXT CHECK(tipo_backup IN ('completo', 'incremental')) NOT NULL,
+                estado_backup TEXT CHECK(estado_backup IN ('exitoso', 'fallido')) NOT NULL,
+                ubicacion_archivo_backup VARCHAR(255),
+                descripcion_backup TEXT,
+                usuario_responsable INTEGER NOT NULL,
+                FOREIGN KEY (usuario_responsable) REFERENCES usuario (id_usuario)
+            )
+        ''')
+
+        # Tabla Configuraciones
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS configuracion (
+                clave TEXT PRIMARY KEY,
+                valor TEXT NOT NULL,
+                descripcion TEXT,
+                fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        # Tabla de caché de documentos (DNI/RUC)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS cache_documentos (
+                id_cache INTEGER PRIMARY KEY AUTOINCREMENT,
+                tipo_documento TEXT CHECK(tipo_documento IN ('DNI', 'RUC')) NOT NULL,
+                numero_documento TEXT NOT NULL,
+                datos_json TEXT NOT NULL,
+                fecha_consulta DATETIME DEFAULT CURRENT_TIMESTAMP,
+                fecha_expiracion DATETIME,
+                UNIQUE(tipo_documento, numero_documento)
+            )
+        ''')
 
     def datos_iniciales(self, cursor): # → Insertar datos iniciales del minimarket
         try:
@@ -548,31 +1317,29 @@ class Database:
             print(f"Error insertando datos iniciales: {e}")
 
     def execute_query(self, query, params=None): # Ejecuta una consulta
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        if params:
-            cursor.execute(query, params)
-        else:
-            cursor.execute(query)
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
 
-        result = cursor.fetchall()
-        conn.commit()
-        conn.close()
+            result = cursor.fetchall()
+            conn.commit()
 
         return result
 
     def execute_insert(self, query, params=None): # Ejecuta un INSERT y retorna el ID último
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            cursor = conn.cursor()
 
-        if params:
-            cursor.execute(query, params)
-        else:
-            cursor.execute(query)
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
 
-        last_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+            last_id = cursor.lastrowid
+            conn.commit()
 
         return last_id
 
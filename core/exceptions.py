@@ -0,0 +1,6 @@
+## Excepciones propias del núcleo del sistema
+
+
+class PoolAgotadoError(Exception):
+    """Se agotó el tiempo de espera para obtener una conexión del pool."""
+    pass
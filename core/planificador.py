@@ -0,0 +1,220 @@
+## Planificador de tareas periódicas (backups, vencimiento de promociones, mantenimiento)
+# Un solo hilo duerme hasta la próxima tarea de un montículo (heapq) ordenado por hora de
+# ejecución; registrar, quitar o detener lo despiertan con un threading.Event. Cada ejecución
+# corre en su propio hilo, así una tarea larga (un backup) no atrasa a las demás, y una tarea
+# nunca se solapa consigo misma: la siguiente ejecución se programa cuando termina la actual.
+#
+# La última ejecución de cada tarea se guarda en DB_DIR/planificador.json: si la aplicación
+# estaba cerrada o el equipo suspendido a la hora programada, la tarea se recupera una sola vez
+# al registrarla o al despertar, en vez de perderse hasta el día siguiente.
+
+import heapq
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from core.config import DB_DIR
+
+# Tope de cada espera: tras una suspensión o un cambio de hora el reloj se vuelve a leer a lo
+# sumo cada 5 minutos (no es un sondeo de tareas: solo recalcula la espera)
+ESPERA_MAXIMA = 300.0
+
+
+class _Tarea:
+    def __init__(self, nombre, funcion, cada, a_las, jitter, recuperar):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.cada = cada            # → segundos entre ejecuciones, o None
+        self.a_las = a_las          # → (hora, minuto) diario, o None
+        self.jitter = jitter        # → segundos aleatorios [0, jitter) sumados a cada ejecución
+        self.recuperar = recuperar
+        self.generacion = 0         # → invalida las entradas viejas del montículo
+        self.proxima = None
+        self.ultima = None
+        self.en_curso = False
+
+    def _con_jitter(self, instante):
+        return instante + (random.uniform(0, self.jitter) if self.jitter else 0)
+
+    def _siguiente_horario(self, desde):
+        hora, minuto = self.a_las
+        momento = datetime.fromtimestamp(desde).replace(hour=hora, minute=minuto, second=0, microsecond=0)
+        if momento.timestamp() <= desde:
+            momento += timedelta(days=1)
+        return momento.timestamp()
+
+    def _ultimo_horario(self, ahora):
+        return self._siguiente_horario(ahora) - 24 * 3600
+
+    def primera(self, ahora):
+        """Primera ejecución al registrar; recupera la perdida si `recuperar` y hay una última conocida."""
+        if self.cada:
+            if self.recuperar and self.ultima is not None:
+                return max(ahora, self._con_jitter(self.ultima + self.cada))
+            return self._con_jitter(ahora + self.cada)
+        if self.recuperar and self.ultima is not None and self.ultima < self._ultimo_horario(ahora):
+            return self._con_jitter(ahora)  # → Se perdió la última ejecución diaria
+        return self._con_jitter(self._siguiente_horario(ahora))
+
+    def siguiente(self, inicio, fin):
+        """Próxima ejecución de una tarea que empezó en `inicio` y terminó en `fin`."""
+        if self.cada:
+            # Ritmo fijo desde el inicio; si la ejecución duró más que el intervalo, una sola vez ya
+            return max(fin, self._con_jitter(inicio + self.cada))
+        return self._con_jitter(self._siguiente_horario(fin))
+
+
+class Planificador:
+    """Ejecuta funciones sin argumentos cada N segundos o todos los días a una hora.
+
+    - registrar(nombre, funcion, cada=segundos | a_las='HH:MM', jitter=segundos, recuperar=True)
+      agrega o reemplaza una tarea; quitar(nombre) la retira.
+    - Varias programaciones conviven (p. ej. backup incremental cada hora y completo a las 02:00).
+    - detener() no espera a las tareas en curso: el hilo del planificador termina al instante.
+    """
+
+    def __init__(self, ruta_estado=None):
+        self.ruta_estado = ruta_estado or os.path.join(DB_DIR, 'planificador.json')
+        self._lock = threading.Lock()
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._tareas = {}
+        self._monticulo = []          # → (instante, secuencia, generación, nombre)
+        self._secuencia = itertools.count()
+        self._hilo = None
+        self._estado = None           # → {nombre: última ejecución}, cargado al primer registro
+
+    # ==================== ESTADO ====================
+
+    def _cargar_estado(self):
+        if self._estado is None:
+            try:
+                with open(self.ruta_estado, 'r', encoding='utf-8') as f:
+                    self._estado = json.load(f)
+            except (OSError, ValueError):
+                self._estado = {}
+        return self._estado
+
+    def _guardar_estado(self):
+        try:
+            temporal = self.ruta_estado + '.tmp'
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump(self._estado, f)
+            os.replace(temporal, self.ruta_estado)
+        except OSError as e:
+            print(f"Error guardando estado del planificador: {e}")
+
+    # ==================== REGISTRO ====================
+
+    def _programar(self, tarea, instante):
+        tarea.proxima = instante
+        heapq.heappush(self._monticulo, (instante, next(self._secuencia), tarea.generacion, tarea.nombre))
+        self._despertar.set()
+
+    def registrar(self, nombre, funcion, cada=None, a_las=None, jitter=0, recuperar=True):
+        """Agrega (o reemplaza) la tarea `nombre`. Indicar `cada` (segundos) o `a_las` ('HH:MM')."""
+        if (cada is None) == (a_las is None):
+            raise ValueError("Indique 'cada' (segundos) o 'a_las' ('HH:MM'), no ambos")
+        horario = None
+        if a_las is not None:
+            hora, minuto = a_las.split(':')
+            horario = (int(hora), int(minuto))
+
+        with self._lock:
+            anterior = self._tareas.get(nombre)
+            tarea = _Tarea(nombre, funcion, cada, horario, jitter, recuperar)
+            tarea.generacion = anterior.generacion + 1 if anterior else 0
+            tarea.en_curso = anterior.en_curso if anterior else False
+            tarea.ultima = self._cargar_estado().get(nombre)
+            self._tareas[nombre] = tarea
+            if not tarea.en_curso:  # → Si está corriendo, se programa al terminar
+                self._programar(tarea, tarea.primera(time.time()))
+
+    def quitar(self, nombre):
+        with self._lock:
+            tarea = self._tareas.pop(nombre, None)
+            if tarea is not None:
+                tarea.generacion += 1
+                self._despertar.set()
+
+    def ejecutar_ahora(self, nombre):
+        """Adelanta la próxima ejecución de `nombre` a este momento."""
+        with self._lock:
+            tarea = self._tareas.get(nombre)
+            if tarea is not None and not tarea.en_curso:
+                tarea.generacion += 1
+                self._programar(tarea, time.time())
+
+    def tareas(self):
+        """[{nombre, proxima, ultima, en_curso}] con fechas datetime (o None)."""
+        a_fecha = lambda t: datetime.fromtimestamp(t) if t is not None else None
+        with self._lock:
+            return [{'nombre': t.nombre, 'proxima': a_fecha(t.proxima), 'ultima': a_fecha(t.ultima),
+                     'en_curso': t.en_curso} for t in self._tareas.values()]
+
+    # ==================== EJECUCIÓN ====================
+
+    def iniciar(self):
+        with self._lock:
+            if self._hilo is not None and self._hilo.is_alive():
+                return
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._bucle, name='planificador', daemon=True)
+            self._hilo.start()
+
+    def detener(self, timeout=1.0):
+        self._detener.set()
+        self._despertar.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout=timeout)
+            self._hilo = None
+
+    def _bucle(self):
+        while not self._detener.is_set():
+            self._despertar.clear()
+            vencidas = []
+            with self._lock:
+                ahora = time.time()
+                while self._monticulo and self._monticulo[0][0] <= ahora:
+                    _, _, generacion, nombre = heapq.heappop(self._monticulo)
+                    tarea = self._tareas.get(nombre)
+                    if tarea is None or tarea.generacion != generacion:
+                        continue  # → Tarea quitada o reprogramada
+                    tarea.en_curso = True
+                    vencidas.append(tarea)
+                espera = self._monticulo[0][0] - ahora if self._monticulo else ESPERA_MAXIMA
+
+            for tarea in vencidas:
+                threading.Thread(target=self._ejecutar, args=(tarea,), name=f"tarea-{tarea.nombre}",
+                                 daemon=True).start()
+
+            self._despertar.wait(min(max(espera, 0), ESPERA_MAXIMA))
+
+    def _ejecutar(self, tarea):
+        inicio = time.time()
+        try:
+            tarea.funcion()
+        except Exception as e:
+            print(f"Error en tarea programada '{tarea.nombre}': {e}")
+        fin = time.time()
+
+        with self._lock:
+            tarea.en_curso = False
+            tarea.ultima = inicio
+            self._cargar_estado()[tarea.nombre] = inicio
+            self._guardar_estado()
+            vigente = self._tareas.get(tarea.nombre)
+            if vigente is tarea:
+                self._programar(tarea, tarea.siguiente(inicio, fin))
+            elif vigente is not None:
+                # Se registró de nuevo mientras corría: programarla con su nueva configuración
+                vigente.en_curso = False
+                vigente.ultima = inicio
+                self._programar(vigente, vigente.primera(fin))
+
+
+# Instancia global del planificador
+planificador = Planificador()
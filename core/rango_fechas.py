@@ -0,0 +1,38 @@
+## Rangos de fechas para consultas SQL que aprovechan los índices
+
+from datetime import date, datetime, timedelta
+
+# Consultas de reportes registradas para revisar su plan (herramientas/verificar_planes.py)
+CONSULTAS_REGISTRADAS = {}
+
+
+def _a_fecha(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return datetime.strptime(str(valor)[:10], '%Y-%m-%d').date()
+
+
+def rango_dias(desde, hasta=None):
+    """Convierte los días [desde, hasta] (ambos incluidos) en el intervalo semiabierto [inicio, fin).
+
+    Acepta date, datetime o texto 'YYYY-MM-DD'. Retorna dos textos para usar con filtro_fechas():
+    las fechas guardadas ('YYYY-MM-DD HH:MM:SS[.ffffff]') se comparan como texto, así que
+    `col >= '2025-03-01' AND col < '2025-03-02'` equivale a `DATE(col) = '2025-03-01'`
+    pero puede buscar por el índice de `col` en vez de recorrer la tabla.
+    """
+    inicio = _a_fecha(desde)
+    fin = _a_fecha(hasta) if hasta is not None else inicio
+    return inicio.strftime('%Y-%m-%d'), (fin + timedelta(days=1)).strftime('%Y-%m-%d')
+
+
+def filtro_fechas(columna):
+    """Predicado semiabierto sobre `columna`; sus dos parámetros son los de rango_dias()."""
+    return f"{columna} >= ? AND {columna} < ?"
+
+
+def registrar_consulta(nombre, sql):
+    """Registra una consulta de reporte para verificar su plan de ejecución. Retorna el mismo SQL."""
+    CONSULTAS_REGISTRADAS[nombre] = sql
+    return sql
@@ -0,0 +1,139 @@
+## Generador de IDs correlativos respaldado por la tabla `secuencias`
+
+import threading
+from collections import deque
+from itertools import islice
+
+# Máximo de huecos que guarda sincronizar(): un ID suelto muy alto (p. ej. PROD99999999)
+# no debe llenar secuencia_huecos con millones de filas
+MAX_HUECOS = 10000
+
+
+class GeneradorIds:
+    """Reparte IDs con prefijo (PROD0001, PROD0002, ...) sin recorrer la tabla de datos.
+
+    - `secuencias` guarda por nombre el prefijo, el ancho mínimo y el siguiente número libre.
+    - `secuencia_huecos` es la lista opcional de números liberados (p. ej. productos eliminados);
+      si la secuencia tiene reutilizar_huecos = 1 se entregan primero, del menor al mayor.
+    - Siempre trabaja sobre el cursor de la transacción que inserta: si esa transacción
+      hace rollback, los números vuelven a quedar libres (no se pierden ni se repiten).
+    - El ancho es mínimo, no un tope: después de PROD9999 viene PROD10000.
+    - Un ID insertado a mano por encima del contador lo adelanta (trigger); los números
+      saltados no pasan a la lista de huecos hasta correr sincronizar().
+    """
+
+    def _iniciar_escritura(self, cursor):
+        # Tomar el bloqueo de escritura antes de leer el contador: dos cajas
+        # no pueden leer el mismo "siguiente"
+        if not cursor.connection.in_transaction:
+            cursor.execute("BEGIN IMMEDIATE")
+
+    def _secuencia(self, cursor, nombre):
+        fila = cursor.execute(
+            "SELECT prefijo, ancho, siguiente, reutilizar_huecos FROM secuencias WHERE nombre = ?",
+            [nombre]).fetchone()
+        if fila is None:
+            raise ValueError(f"Secuencia '{nombre}' no registrada")
+        return fila
+
+    def registrar(self, cursor, nombre, prefijo, ancho, reutilizar_huecos=0):
+        """Crea la secuencia si no existe (idempotente)."""
+        cursor.execute('''
+            INSERT OR IGNORE INTO secuencias (nombre, prefijo, ancho, siguiente, reutilizar_huecos)
+            VALUES (?, ?, ?, 1, ?)
+        ''', [nombre, prefijo, ancho, reutilizar_huecos])
+
+    def formatear(self, prefijo, ancho, numero):
+        return f"{prefijo}{numero:0{ancho}d}"
+
+    def siguiente(self, cursor, nombre):
+        """Reserva y devuelve un ID. O(1): un hueco por índice o el contador."""
+        return self.reservar(cursor, nombre, 1)[0]
+
+    def reservar(self, cursor, nombre, cantidad):
+        """Reserva `cantidad` IDs de una vez (importaciones masivas)."""
+        if cantidad <= 0:
+            return []
+        self._iniciar_escritura(cursor)
+        prefijo, ancho, siguiente, reutilizar = self._secuencia(cursor, nombre)
+
+        numeros = []
+        if reutilizar:
+            numeros = [fila[0] for fila in cursor.execute(
+                "SELECT numero FROM secuencia_huecos WHERE nombre = ? ORDER BY numero LIMIT ?",
+                [nombre, cantidad]).fetchall()]
+            if numeros:
+                cursor.execute(
+                    "DELETE FROM secuencia_huecos WHERE nombre = ? AND numero <= ?",
+                    [nombre, numeros[-1]])
+
+        faltan = cantidad - len(numeros)
+        if faltan:
+            numeros.extend(range(siguiente, siguiente + faltan))
+            cursor.execute("UPDATE secuencias SET siguiente = ? WHERE nombre = ?",
+                           [siguiente + faltan, nombre])
+        return [self.formatear(prefijo, ancho, n) for n in numeros]
+
+    def sincronizar(self, cursor, nombre, tabla, columna, max_huecos=MAX_HUECOS):
+        """Recalcula contador y huecos a partir de los IDs existentes en `tabla`.
+
+        Recorre la tabla una sola vez; se usa al crear la secuencia o para repararla.
+        Solo guarda los `max_huecos` huecos menores; los demás números libres no se reutilizan.
+        """
+        prefijo, ancho, _, _ = self._secuencia(cursor, nombre)
+        largo = len(prefijo)
+        usados = set()
+        for (valor,) in cursor.execute(
+                f"SELECT {columna} FROM {tabla} WHERE {columna} GLOB ?", [prefijo + '[0-9]*']):
+            sufijo = valor[largo:]
+            if sufijo.isdigit():
+                usados.add(int(sufijo))
+
+        siguiente = max(usados) + 1 if usados else 1
+        cursor.execute("UPDATE secuencias SET siguiente = ? WHERE nombre = ?", [siguiente, nombre])
+        cursor.execute("DELETE FROM secuencia_huecos WHERE nombre = ?", [nombre])
+        huecos = (n for n in range(1, siguiente) if n not in usados)
+        cursor.executemany(
+            "INSERT INTO secuencia_huecos (nombre, numero) VALUES (?, ?)",
+            ((nombre, n) for n in islice(huecos, max_huecos)))
+        return siguiente
+
+
+# Instancia global del generador
+generador_ids = GeneradorIds()
+
+
+class BloqueIds:
+    """Reparte IDs de una secuencia sin escribir en la BD por cada ID.
+
+    - Reserva `tamano_bloque` números de una vez en una transacción corta propia
+      (BEGIN IMMEDIATE): dos procesos sobre la misma BD nunca reciben el mismo bloque.
+    - Dentro del proceso los entrega en orden creciente bajo un lock; cada ID es mayor
+      que el anterior, así las inserciones van al final del índice de la clave.
+    - Los números de un bloque que no se llegan a usar (cierre del programa, venta
+      fallida) se pierden: deja huecos, nunca repetidos. No reutiliza huecos.
+    """
+
+    def __init__(self, nombre, prefijo, ancho, tamano_bloque=50):
+        self.nombre = nombre
+        self.prefijo = prefijo
+        self.ancho = ancho
+        self.tamano_bloque = tamano_bloque
+        self._lock = threading.Lock()
+        self._disponibles = deque()
+
+    def siguiente(self):
+        with self._lock:
+            if not self._disponibles:
+                self._disponibles.extend(self._reservar_bloque())
+            return self._disponibles.popleft()
+
+    def _reservar_bloque(self):
+        from core.database import db
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            generador_ids.registrar(cursor, self.nombre, self.prefijo, self.ancho)
+            ids = generador_ids.reservar(cursor, self.nombre, self.tamano_bloque)
+            conn.commit()
+        return ids
@@ -0,0 +1,110 @@
+## Benchmark: compresión de backups actual (gzip 9, un hilo) vs compresores por bloques
+# Uso: python -m herramientas.benchmark_compresion [--bd ruta.db] [--ventas N] [--hilos N]
+# Sin --bd crea una BD temporal con N ventas de prueba; con --bd copia esa BD con la API de
+# backup (solo lectura). No toca la base de datos del sistema.
+
+import gzip
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import core.config
+
+# Importar core.database crea su instancia global: que sea sobre una carpeta temporal
+core.config.DB_DIR = tempfile.mkdtemp(prefix='minimarket_benchmark_')
+
+from core.database import Database  # noqa: E402
+from modules.sistema.compresion_backups import obtener_compresor, ZSTD_DISPONIBLE  # noqa: E402
+
+# Solo se usan los métodos de esquema, que trabajan sobre el cursor recibido: sin pool ni migraciones
+esquema = Database.__new__(Database)
+
+VENTAS_POR_DEFECTO = 200000
+
+
+def crear_bd(ruta, ventas):
+    conn = sqlite3.connect(ruta)
+    cursor = conn.cursor()
+    for _, _, metodo in esquema.MIGRACIONES:
+        getattr(esquema, metodo)(cursor)
+    cursor.execute("UPDATE productos SET stock_producto = 1e12")
+    productos = [fila[0] for fila in cursor.execute("SELECT id_producto FROM productos")]
+    cursor.executemany('''
+        INSERT INTO ventas (id_venta, fecha_venta, id_empleado, total_venta, metodo_pago, estado_venta)
+        VALUES (?, ?, 1, 0, 'efectivo', 'completado')
+    ''', ((f"B{i:08d}", f"2025-{1 + i % 12:02d}-{1 + i % 28:02d} {i % 24:02d}:{i % 60:02d}:00")
+          for i in range(ventas)))
+    cursor.executemany('''
+        INSERT INTO detalle_venta
+        (id_venta, id_producto, cantidad_detalle, precio_unitario_detalle, subtotal_detalle, descuento_aplicado)
+        VALUES (?, ?, ?, 2.5, ?, 0)
+    ''', ((f"B{i:08d}", productos[(i * 7) % len(productos)], 1 + i % 5, 2.5 * (1 + i % 5))
+          for i in range(ventas)))
+    conn.commit()
+    conn.close()
+
+
+def copiar_bd(origen, ruta):
+    fuente = sqlite3.connect(f"file:{origen}?mode=ro", uri=True)
+    destino = sqlite3.connect(ruta)
+    fuente.backup(destino)
+    destino.close()
+    fuente.close()
+
+
+def medir(nombre, comprimir, abrir_lectura, ruta_bd, carpeta):
+    tamano = os.path.getsize(ruta_bd)
+    ruta = os.path.join(carpeta, 'backup.bin')
+
+    inicio = time.perf_counter()
+    with open(ruta_bd, 'rb') as f_in, open(ruta, 'wb') as f_out:
+        comprimir(f_in, f_out)
+    t_comprimir = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    with abrir_lectura(ruta) as f_in:
+        while f_in.read(1024 * 1024):
+            pass
+    t_descomprimir = time.perf_counter() - inicio
+
+    mb = tamano / (1024 * 1024)
+    print(f"{nombre:<28} {os.path.getsize(ruta) / tamano:>6.1%} "
+          f"{mb / t_comprimir:>10.1f} {mb / t_descomprimir:>13.1f}")
+    os.remove(ruta)
+
+
+def main(argv):
+    ventas = int(argv[argv.index('--ventas') + 1]) if '--ventas' in argv else VENTAS_POR_DEFECTO
+    hilos = int(argv[argv.index('--hilos') + 1]) if '--hilos' in argv else None
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta_bd = os.path.join(carpeta, 'benchmark.db')
+        if '--bd' in argv:
+            copiar_bd(argv[argv.index('--bd') + 1], ruta_bd)
+        else:
+            crear_bd(ruta_bd, ventas)
+
+        print(f"BD de {os.path.getsize(ruta_bd) / (1024 * 1024):.1f} MB, "
+              f"{hilos or os.cpu_count()} hilo(s) para los compresores por bloques")
+        print(f"{'Compresor':<28} {'Tamaño':>6} {'MB/s compr':>10} {'MB/s descompr':>13}")
+
+        def gzip_actual(f_in, f_out):
+            with gzip.open(f_out, 'wb', compresslevel=9) as f_gz:
+                shutil.copyfileobj(f_in, f_gz)
+
+        medir('actual (gzip 9, 1 hilo)', gzip_actual, lambda r: gzip.open(r, 'rb'), ruta_bd, carpeta)
+
+        casos = [('gzip', 6), ('gzip', 1)]
+        if ZSTD_DISPONIBLE:
+            casos += [('zstd', 3), ('zstd', 1), ('zstd', 9)]
+        else:
+            print("(zstd omitido: instale 'zstandard' para compararlo)")
+        for nombre, nivel in casos:
+            compresor = obtener_compresor(nombre, nivel, hilos)
+            medir(f"{nombre} {nivel} por bloques", compresor.comprimir, compresor.abrir_lectura, ruta_bd, carpeta)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,85 @@
+## Benchmark: triggers de total_venta originales (SUM por fila) vs incrementales
+# Uso: python -m herramientas.benchmark_triggers [lineas ...]
+# Trabaja sobre BDs temporales; no toca la base de datos del sistema.
+
+import os
+import sys
+import sqlite3
+import tempfile
+import time
+import core.config
+
+# Importar core.database crea su instancia global: que sea sobre una carpeta temporal
+core.config.DB_DIR = tempfile.mkdtemp(prefix='minimarket_benchmark_')
+
+from core.database import Database  # noqa: E402
+
+# Solo se usan los métodos de esquema, que trabajan sobre el cursor recibido: sin pool ni migraciones
+esquema = Database.__new__(Database)
+
+LINEAS_POR_DEFECTO = [10, 100, 1000, 5000]
+VENTAS_PREVIAS = 2000  # → historial para que el índice de detalle_venta no esté vacío
+
+
+def crear_bd(ruta, incremental):
+    conn = sqlite3.connect(ruta)
+    cursor = conn.cursor()
+    esquema.crear_tablas(cursor)
+    esquema.datos_iniciales(cursor)
+    esquema.triggers(cursor)  # → conjunto original
+    if incremental:
+        esquema.triggers_incrementales(cursor)
+    cursor.execute("UPDATE productos SET stock_producto = 1e12")
+    conn.commit()
+    return conn
+
+
+def insertar_venta(conn, id_venta, productos, lineas):
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    cursor.execute('''
+        INSERT INTO ventas (id_venta, id_empleado, total_venta, metodo_pago, estado_venta)
+        VALUES (?, 1, 0, 'efectivo', 'completado')
+    ''', [id_venta])
+    cursor.executemany('''
+        INSERT INTO detalle_venta
+        (id_venta, id_producto, cantidad_detalle, precio_unitario_detalle, subtotal_detalle, descuento_aplicado)
+        VALUES (?, ?, 1, 1.5, 1.5, 0)
+    ''', ((id_venta, productos[i % len(productos)]) for i in range(lineas)))
+    conn.commit()
+
+
+def medir(incremental, lineas_por_venta):
+    with tempfile.TemporaryDirectory() as carpeta:
+        conn = crear_bd(os.path.join(carpeta, 'benchmark.db'), incremental)
+        productos = [fila[0] for fila in conn.execute("SELECT id_producto FROM productos")]
+        for i in range(VENTAS_PREVIAS):
+            insertar_venta(conn, f"H{i:06d}", productos, 3)
+
+        resultados = {}
+        for lineas in lineas_por_venta:
+            id_venta = f"B{lineas:06d}"
+            inicio = time.perf_counter()
+            insertar_venta(conn, id_venta, productos, lineas)
+            segundos = time.perf_counter() - inicio
+            total = conn.execute("SELECT total_venta FROM ventas WHERE id_venta = ?", [id_venta]).fetchone()[0]
+            resultados[lineas] = (segundos, total)
+        conn.close()
+        return resultados
+
+
+def main(argv):
+    lineas_por_venta = [int(a) for a in argv] or LINEAS_POR_DEFECTO
+    original = medir(False, lineas_por_venta)
+    incremental = medir(True, lineas_por_venta)
+
+    print(f"{'Líneas':>8} {'Original (ms)':>15} {'Incremental (ms)':>18} {'Mejora':>8}  Totales")
+    for lineas in lineas_por_venta:
+        t_orig, total_orig = original[lineas]
+        t_inc, total_inc = incremental[lineas]
+        iguales = "iguales" if abs(total_orig - total_inc) < 0.005 else f"DIFIEREN ({total_orig} vs {total_inc})"
+        print(f"{lineas:>8} {t_orig * 1000:>15.1f} {t_inc * 1000:>18.1f} {t_orig / t_inc:>7.1f}x  {iguales}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
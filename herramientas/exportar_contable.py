@@ -0,0 +1,34 @@
+## Exporta ventas, detalles, comprobantes y devoluciones por mes para contabilidad
+# Uso: python -m herramientas.exportar_contable DESDE HASTA CARPETA [--parquet] [--sin-gzip] [--tablas ventas,comprobante]
+# DESDE y HASTA son días 'YYYY-MM-DD' (ambos incluidos). Ver modules/reportes/exportacion_contable_service.py
+
+import sys
+from modules.reportes.exportacion_contable_service import exportar_periodo
+
+
+def mostrar_archivo(archivo):
+    print(f"  {archivo['ruta']}: {archivo['filas']} filas en {archivo['segundos']:.2f}s "
+          f"({archivo['filas_por_segundo']:,.0f} filas/s)")
+
+
+def main(argv):
+    posicionales = [a for i, a in enumerate(argv) if not a.startswith('--') and (i == 0 or argv[i - 1] != '--tablas')]
+    if len(posicionales) != 3:
+        print("Uso: python -m herramientas.exportar_contable DESDE HASTA CARPETA [--parquet] [--sin-gzip] [--tablas t1,t2]")
+        return 2
+    desde, hasta, carpeta = posicionales
+    tablas = argv[argv.index('--tablas') + 1].split(',') if '--tablas' in argv else None
+
+    resumen = exportar_periodo(
+        carpeta, desde, hasta, tablas=tablas,
+        formato='parquet' if '--parquet' in argv else 'csv',
+        comprimir='--sin-gzip' not in argv,
+        progreso=mostrar_archivo,
+    )
+    print(f"✓ {resumen['filas']} filas en {len(resumen['archivos'])} archivo(s), "
+          f"{resumen['segundos']:.2f}s ({resumen['filas_por_segundo']:,.0f} filas/s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
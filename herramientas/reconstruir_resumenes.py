@@ -0,0 +1,18 @@
+## Recalcula las tablas resumen_ventas_* desde ventas y devoluciones
+# Uso: python -m herramientas.reconstruir_resumenes
+# Los triggers las mantienen al día; esto es para cargarlas la primera vez o repararlas
+# después de cambios hechos con los triggers desactivados (restauraciones, scripts).
+
+import time
+from core.database import db
+
+
+def main():
+    inicio = time.perf_counter()
+    db.reconstruir_resumenes()
+    dias = db.fetchone("SELECT COUNT(*) FROM resumen_ventas_dia")[0]
+    print(f"✓ Resúmenes reconstruidos: {dias} día(s) en {time.perf_counter() - inicio:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
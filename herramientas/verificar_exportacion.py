@@ -0,0 +1,98 @@
+## Verifica que la exportación contable en CSV y en Parquet guarde los mismos valores
+# Uso: python -m herramientas.verificar_exportacion
+# Crea una BD temporal (no toca db/minimarket.db), registra con procesar_venta_completa una
+# venta por peso (0.75 kg) y una por unidad, exporta ese día en ambos formatos y compara celda
+# por celda. Termina con código 1 si algún valor difiere (p. ej. una cantidad truncada a entero).
+
+import csv
+import os
+import sys
+import tempfile
+from datetime import date, datetime
+import core.config
+
+# Importar core.database crea su instancia global: que sea sobre una carpeta temporal
+core.config.DB_DIR = tempfile.mkdtemp(prefix='minimarket_verificar_')
+
+from modules.reportes.exportacion_contable_service import exportar_periodo, EXPORTACIONES  # noqa: E402
+from modules.ventas.service.venta_service import VentaService  # noqa: E402
+
+# (producto, precio, cantidad): PROD0001 se vende por kilogramo
+VENTAS_PRUEBA = [
+    [('PROD0001', 3.80, 0.75)],
+    [('PROD0005', 4.50, 2), ('PROD0001', 3.80, 1.25)],
+]
+
+
+def registrar_ventas():
+    servicio = VentaService()
+    for lineas in VENTAS_PRUEBA:
+        carrito = [{
+            'id': id_producto, 'precio': precio, 'cantidad': cantidad,
+            'base_total': round(precio * cantidad, 2), 'total': round(precio * cantidad, 2),
+            'descuento': None, 'descuento_pct_aplicado': 0.0, 'id_promocion': None,
+        } for id_producto, precio, cantidad in lineas]
+        exito, _, mensaje, _ = servicio.procesar_venta_completa(carrito)
+        if not exito:
+            raise RuntimeError(mensaje)
+
+
+def _valor_csv(texto, tipo):
+    if texto == '':
+        return None
+    if tipo in ('entero', 'real'):
+        return float(texto)  # → 2 == 2.0; una columna entera que guardó 0.75 queda como diferencia
+    if tipo == 'fecha':
+        return datetime.fromisoformat(texto)
+    return texto
+
+
+def leer_csv(ruta, columnas):
+    with open(ruta, 'r', encoding='utf-8', newline='') as f:
+        lector = csv.reader(f)
+        next(lector)  # → Encabezado
+        return [tuple(_valor_csv(texto, tipo) for texto, (_, tipo) in zip(fila, columnas)) for fila in lector]
+
+
+def leer_parquet(pq, ruta):
+    tabla = pq.read_table(ruta).to_pydict()
+    return list(zip(*tabla.values()))
+
+
+def main(argv):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("Falta la dependencia 'pyarrow' para exportar a Parquet. Instálala: pip install pyarrow")
+        return 2
+
+    registrar_ventas()
+    hoy = date.today().isoformat()
+    carpeta = tempfile.mkdtemp(prefix='minimarket_exportacion_')
+    en_csv = exportar_periodo(os.path.join(carpeta, 'csv'), hoy, hoy, formato='csv', comprimir=False)
+    en_parquet = exportar_periodo(os.path.join(carpeta, 'parquet'), hoy, hoy, formato='parquet')
+
+    diferencias = 0
+    for archivo_csv, archivo_parquet in zip(en_csv['archivos'], en_parquet['archivos']):
+        columnas = EXPORTACIONES[archivo_csv['tabla']]['columnas']
+        filas_csv = leer_csv(archivo_csv['ruta'], columnas)
+        filas_parquet = leer_parquet(pq, archivo_parquet['ruta'])
+        if len(filas_csv) != len(filas_parquet):
+            print(f"✗ {archivo_csv['tabla']}: {len(filas_csv)} filas en CSV y {len(filas_parquet)} en Parquet")
+            diferencias += 1
+            continue
+        for fila_csv, fila_parquet in zip(filas_csv, filas_parquet):
+            for (nombre, _), valor_csv, valor_parquet in zip(columnas, fila_csv, fila_parquet):
+                if valor_csv != valor_parquet:
+                    print(f"✗ {archivo_csv['tabla']}.{nombre}: CSV={valor_csv!r} Parquet={valor_parquet!r}")
+                    diferencias += 1
+
+    if diferencias:
+        print(f"✗ {diferencias} valor(es) distintos entre CSV y Parquet")
+        return 1
+    print(f"✓ CSV y Parquet coinciden en {en_csv['filas']} filas ({len(en_csv['archivos'])} archivos)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,87 @@
+## Revisa el plan de ejecución de las consultas de reportes registradas
+# Uso: python -m herramientas.verificar_planes [--bd ruta.db]
+# Sin --bd crea una BD temporal con todas las migraciones; con --bd la abre en solo lectura.
+# Termina con código 1 si alguna consulta recorre una tabla completa (SCAN, aunque sea por un índice).
+
+import os
+import sys
+import sqlite3
+import tempfile
+import core.config
+
+# Importar core.database crea su instancia global: que sea sobre una carpeta temporal
+core.config.DB_DIR = tempfile.mkdtemp(prefix='minimarket_planes_')
+
+from core.database import Database  # noqa: E402
+from core.rango_fechas import CONSULTAS_REGISTRADAS  # noqa: E402
+
+# Solo se usan los métodos de esquema, que trabajan sobre el cursor recibido: sin pool ni migraciones
+esquema = Database.__new__(Database)
+
+# Módulos que registran consultas al importarse
+MODULOS_CONSULTAS = [
+    'modules.reportes.reporte_service',
+    'modules.reportes.exportacion_contable_service',
+    'modules.ventas.models.venta_model',
+    'modules.ventas.service.comprobante_service',
+]
+
+
+def crear_bd(ruta):
+    conn = sqlite3.connect(ruta)
+    cursor = conn.cursor()
+    for _, _, metodo in esquema.MIGRACIONES:
+        getattr(esquema, metodo)(cursor)
+    conn.commit()
+    return conn
+
+
+def recorridos_completos(conn, sql):
+    """Pasos del plan que leen una tabla entera; lista vacía si todos buscan (SEARCH) por índice.
+
+    `SCAN t USING INDEX i` también cuenta: recorre el índice completo en vez de buscar un rango.
+    """
+    parametros = [None] * sql.count('?')
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", parametros).fetchall()
+    detalles = [fila[-1] for fila in plan]
+    malos = [d for d in detalles if d.startswith('SCAN') and d != 'SCAN CONSTANT ROW']
+    return detalles, malos
+
+
+def verificar(conn):
+    fallidas = 0
+    for nombre, sql in sorted(CONSULTAS_REGISTRADAS.items()):
+        detalles, malos = recorridos_completos(conn, sql)
+        marca = '✗' if malos else '✓'
+        print(f"{marca} {nombre}")
+        for detalle in detalles:
+            print(f"      {detalle}")
+        if malos:
+            fallidas += 1
+    return fallidas
+
+
+def main(argv):
+    for modulo in MODULOS_CONSULTAS:
+        __import__(modulo)
+
+    if '--bd' in argv:
+        ruta = argv[argv.index('--bd') + 1]
+        conn = sqlite3.connect(f"file:{ruta}?mode=ro", uri=True)
+        fallidas = verificar(conn)
+        conn.close()
+    else:
+        with tempfile.TemporaryDirectory() as carpeta:
+            conn = crear_bd(os.path.join(carpeta, 'planes.db'))
+            fallidas = verificar(conn)
+            conn.close()
+
+    if fallidas:
+        print(f"✗ {fallidas} de {len(CONSULTAS_REGISTRADAS)} consulta(s) recorren una tabla completa")
+        return 1
+    print(f"✓ {len(CONSULTAS_REGISTRADAS)} consulta(s) usan índices")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,25 @@
+## Verifica que total_venta (mantenido por diferencias) coincida con la suma completa de detalles
+# Uso: python -m herramientas.verificar_totales [--reparar]
+
+import sys
+from core.database import db
+
+
+def main(argv):
+    reparar = '--reparar' in argv
+    diferencias = db.verificar_totales_venta(reparar=reparar)
+    if not diferencias:
+        print("✓ Todos los totales de venta coinciden con la suma de sus detalles")
+        return 0
+
+    for id_venta, total_venta, recalculado in diferencias:
+        print(f"{id_venta}: total_venta={total_venta:.2f} suma_detalles={recalculado:.2f}")
+    if reparar:
+        print(f"✓ {len(diferencias)} venta(s) corregida(s)")
+        return 0
+    print(f"✗ {len(diferencias)} venta(s) con total distinto (usar --reparar para corregir)")
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -60,6 +60,17 @@ def main():
         except Exception as backup_error:
             print(f"Advertencia: No se pudo iniciar backup automático: {backup_error}")
 
+        # Tareas periódicas de mantenimiento (mismo planificador que los backups)
+        try:
+            from core.planificador import planificador
+            from modules.productos.models.promocion_model import PromocionModel
+            from core.database import db
+            planificador.registrar('expirar_promociones', PromocionModel().expirar_vencidas, cada=15 * 60, jitter=30)
+            planificador.registrar('compactar_resumenes', db.compactar_resumenes, a_las="03:00", jitter=600)
+            planificador.iniciar()
+        except Exception as tareas_error:
+            print(f"Advertencia: No se pudieron programar las tareas de mantenimiento: {tareas_error}")
+
         # Importar y crear la ventana principal de login
         from modules.seguridad.view.login import LoginVentana
         login_window = LoginVentana()
@@ -0,0 +1,213 @@
+## Caché en memoria del catálogo de productos
+
+import bisect
+import sqlite3
+import threading
+import time
+import pandas as pd
+from core.database import db
+
+# Consulta base del catálogo con nombres de categoría, tipo y unidad ya resueltos
+CONSULTA_CATALOGO = '''
+    SELECT p.id_producto, p.nombre_producto, p.descripcion_producto, p.precio_producto,
+           p.stock_producto, p.stock_minimo, p.estado_producto, p.tipo_corte, p.imagen,
+           p.id_categoria_productos, c.nombre_categoria,
+           p.id_tipo_productos, t.nombre_tipo,
+           p.id_unidad_medida, u.nombre_unidad
+    FROM productos p
+    LEFT JOIN categoria_productos c ON p.id_categoria_productos = c.id_categoria_productos
+    LEFT JOIN tipo_productos t ON p.id_tipo_productos = t.id_tipo_producto
+    LEFT JOIN unidad_medida u ON p.id_unidad_medida = u.id_unidad_medida
+'''
+
+SQL_VERSION_CATALOGO = "SELECT version FROM versiones_tablas WHERE grupo = 'catalogo'"
+
+# Columnas del DataFrame que esperan las vistas (mismo formato que ProductoModel.obtener_todos)
+COLUMNAS_VISTA = ["ID", "Nombre", "Categoría", "Tipo", "Precio", "Stock", "Stock Mínimo",
+                  "Imagen", "Unidad", "id_unidad_medida"]
+
+
+def version_catalogo(cursor):
+    """versiones_tablas['catalogo'] vista por la transacción de `cursor` (None si no existe)."""
+    fila = cursor.execute(SQL_VERSION_CATALOGO).fetchone()
+    return fila[0] if fila else None
+
+
+def mapear_dataframe(registros):
+    """Convierte registros del catálogo al DataFrame que usan las vistas."""
+    if not registros:
+        return pd.DataFrame(columns=COLUMNAS_VISTA)
+    return pd.DataFrame({
+        "ID": [r['id_producto'] for r in registros],
+        "Nombre": [r['nombre_producto'] for r in registros],
+        "Categoría": [r['nombre_categoria'] or 'Sin categoría' for r in registros],
+        "Tipo": [r['nombre_tipo'] or 'Sin tipo' for r in registros],
+        "Precio": [r['precio_producto'] for r in registros],
+        "Stock": [r['stock_producto'] for r in registros],
+        "Stock Mínimo": [r['stock_minimo'] for r in registros],
+        "Imagen": [r['imagen'] or '' for r in registros],
+        "Unidad": [r['nombre_unidad'] or 'Sin unidad' for r in registros],
+        "id_unidad_medida": [r['id_unidad_medida'] for r in registros],
+    }, columns=COLUMNAS_VISTA)
+
+
+class CatalogoCache:
+    """Catálogo de productos en memoria indexado por id_producto.
+
+    - obtener(id) es O(1) y listar() no consulta SQLite mientras nada cambie.
+    - Las escrituras de este proceso parchean el caché con refrescar_productos()/quitar_producto().
+      Si además pasan `versiones` = (antes, después), leídas con version_catalogo() dentro de su
+      transacción con el bloqueo de escritura tomado, el parche no provoca una recarga completa.
+    - Cualquier escritura en productos, categorías, tipos o unidades (de esta u otra caja)
+      incrementa versiones_tablas['catalogo']; esa versión se revisa como máximo cada
+      `verificar_cada` segundos y solo si cambió se recarga el catálogo completo.
+    - `version` aumenta con cada cambio real; sirve como clave para cachés derivados.
+    """
+
+    def __init__(self, verificar_cada=2.0):
+        self.verificar_cada = verificar_cada
+        self._lock = threading.RLock()
+        self._productos = {}    # → id_producto -> registro (dict)
+        self._orden = []        # → ids ordenados como ORDER BY id_producto
+        self._cargado = False
+        self._version_bd = None     # → versiones_tablas['catalogo'] de la última recarga
+        self._verificado_en = None
+        self._version = 0
+        self._df = None
+        self._df_version = -1
+
+    @property
+    def version(self):
+        self._asegurar_cargado()
+        return self._version
+
+    def _asegurar_cargado(self):
+        with self._lock:
+            if not self._cargado:
+                self.recargar()
+                return
+            if self._verificado_en is None or time.monotonic() - self._verificado_en >= self.verificar_cada:
+                self._verificado_en = time.monotonic()
+                if db.version_tablas('catalogo') != self._version_bd:
+                    self.recargar()
+
+    def _leer(self, where='', params=()):
+        with db.connection() as conn:
+            conn.row_factory = sqlite3.Row
+            filas = conn.execute(f"{CONSULTA_CATALOGO} {where}", params).fetchall()
+        return [dict(f) for f in filas]
+
+    def recargar(self):
+        """Recarga el catálogo completo desde la BD."""
+        with db.connection() as conn:
+            # Leer la versión antes que los datos: si algo cambia entre medio, la
+            # próxima verificación verá una versión distinta y volverá a cargar
+            version_bd = version_catalogo(conn)
+            conn.row_factory = sqlite3.Row
+            registros = [dict(f) for f in conn.execute(f"{CONSULTA_CATALOGO} ORDER BY p.id_producto").fetchall()]
+        with self._lock:
+            nuevos = {r['id_producto']: r for r in registros}
+            if nuevos != self._productos:
+                self._productos = nuevos
+                self._orden = [r['id_producto'] for r in registros]
+                self._version += 1
+            self._version_bd = version_bd
+            self._verificado_en = time.monotonic()
+            self._cargado = True
+
+    def invalidar(self):
+        """Fuerza una recarga completa en el siguiente acceso."""
+        with self._lock:
+            self._cargado = False
+
+    def _parche_vigente(self, versiones):
+        # Una recarga posterior a la escritura ya trae sus cambios: el parche sería más viejo
+        return versiones is None or self._version_bd is None or self._version_bd < versiones[1]
+
+    def _confirmar_version(self, versiones):
+        # Si la transacción empezó en la versión ya cargada, nadie más cambió el catálogo entre
+        # medio: con el parche aplicado el caché queda al día en la versión "después". Si no,
+        # la versión no avanza y la próxima verificación recarga lo de las otras cajas.
+        if versiones is not None and self._version_bd is not None and versiones[0] == self._version_bd:
+            self._version_bd = versiones[1]
+
+    def refrescar_productos(self, ids, versiones=None):
+        """Vuelve a leer solo los productos indicados (tras crear, editar, vender o devolver).
+
+        versiones: (antes, después) de version_catalogo() en la transacción que los escribió.
+        """
+        ids = [str(i) for i in dict.fromkeys(ids)]
+        if not ids:
+            return
+        if not self._cargado:
+            return  # Aún no se cargó: la primera lectura ya traerá los datos actuales
+        placeholders = ', '.join('?' for _ in ids)
+        registros = self._leer(f"WHERE p.id_producto IN ({placeholders})", ids)
+        encontrados = {r['id_producto']: r for r in registros}
+        with self._lock:
+            if not self._parche_vigente(versiones):
+                return
+            for id_producto in ids:
+                if id_producto in encontrados:
+                    self._poner(encontrados[id_producto])
+                else:
+                    self._sacar(id_producto)
+            self._confirmar_version(versiones)
+
+    def actualizar_stock(self, stocks, versiones=None):
+        """Parchea el stock de varios productos sin consultar la BD. stocks: {id_producto: stock}"""
+        with self._lock:
+            if not self._parche_vigente(versiones):
+                return
+            for id_producto, stock in stocks.items():
+                registro = self._productos.get(str(id_producto))
+                if registro is not None and registro['stock_producto'] != stock:
+                    self._poner(dict(registro, stock_producto=stock))
+            self._confirmar_version(versiones)
+
+    def quitar_producto(self, id_producto, versiones=None):
+        with self._lock:
+            if not self._parche_vigente(versiones):
+                return
+            self._sacar(str(id_producto))
+            self._confirmar_version(versiones)
+
+    def _poner(self, registro):
+        id_producto = registro['id_producto']
+        actual = self._productos.get(id_producto)
+        if actual == registro:
+            return
+        if actual is None:
+            bisect.insort(self._orden, id_producto)
+        self._productos[id_producto] = registro
+        self._version += 1
+
+    def _sacar(self, id_producto):
+        if self._productos.pop(id_producto, None) is not None:
+            self._orden.remove(id_producto)
+            self._version += 1
+
+    def obtener(self, id_producto):
+        """Registro de un producto o None. O(1)."""
+        self._asegurar_cargado()
+        return self._productos.get(str(id_producto))
+
+    def listar(self):
+        """Lista de registros ordenada por id_producto. Los registros no deben modificarse."""
+        self._asegurar_cargado()
+        with self._lock:
+            return [self._productos[i] for i in self._orden]
+
+    def dataframe(self):
+        """DataFrame del catálogo en formato de vista; se reconstruye solo si cambió la versión."""
+        self._asegurar_cargado()
+        with self._lock:
+            if self._df_version != self._version:
+                self._df = mapear_dataframe([self._productos[i] for i in self._orden])
+                self._df_version = self._version
+            # Copia: los llamadores pueden modificar columnas del DataFrame
+            return self._df.copy()
+
+
+# Instancia global del catálogo
+catalogo_cache = CatalogoCache()
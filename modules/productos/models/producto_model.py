@@ -1,11 +1,19 @@
 ## Modelo para manejar los datos de productos
 
+import re
 import shutil
+from itertools import islice
+import sqlite3
 from core.config import *
 from core.base_model import BaseModel
 from core.database import db
+from core.secuencias import generador_ids
+from modules.productos.models.catalogo_cache import catalogo_cache, mapear_dataframe, version_catalogo
 import pandas as pd
 
+# Máximo de coincidencias que se ordenan por relevancia (bm25) en buscar_ranking
+MAX_COINCIDENCIAS_RANKING = 1000
+
 # → Modelo para gestionar productos
 class ProductoModel(BaseModel):
 # → Inicializa el modelo de productos con las columnas definidas
@@ -17,115 +25,30 @@ class ProductoModel(BaseModel):
         super().__init__('productos', columns)
         self.columnas = ["ID", "Nombre", "Categoría", "Tipo", "Precio", "Stock", "Stock Mínimo", "Imagen"]
     
-# → Genera el siguiente ID de producto en formato PROD0001, PROD0002, etc., rellenando huecos.
-    def generar_siguiente_id(self):
-        try:
-            conn = db.get_connection()
-            cursor = conn.cursor()
-            # Obtener todos los IDs existentes ordenados
-            cursor.execute("SELECT id_producto FROM productos ORDER BY id_producto ASC")
-            ids_existentes = [row[0] for row in cursor.fetchall()]
-            
-            # Buscar el primer hueco en la secuencia
-            for i in range(1, 9999):  # PROD0001 hasta PROD9999
-                id_esperado = f"PROD{i:04d}"
-                if id_esperado not in ids_existentes:
-                    conn.close()
-                    return id_esperado
-            
-            # Si no hay huecos, usar el siguiente después del último
-            if ids_existentes:
-                # Extraer el número del último ID
-                ultimo_id = max(ids_existentes)
-                ultimo_numero = int(ultimo_id[4:])  # Remover 'PROD' y convertir a int
-                nuevo_numero = ultimo_numero + 1
-            else:
-                nuevo_numero = 1
-            
-            conn.close()
-            return f"PROD{nuevo_numero:04d}"
-            
-        except Exception as e:
-            print(f"Error generando ID: {e}")
-            # Fallback: usar timestamp
-            from datetime import datetime
-            return f"P{datetime.now().strftime('%Y%m%d%H%M%S')}"
+# → Reserva el siguiente ID de producto (PROD0001, PROD0002, ...) reutilizando huecos.
+#   Debe llamarse con el cursor de la transacción que inserta: si hace rollback, el ID vuelve a quedar libre.
+    def generar_siguiente_id(self, cursor):
+        return generador_ids.siguiente(cursor, 'productos')
+
+# → Reserva varios IDs de producto de una vez (importaciones masivas), en la misma transacción.
+    def reservar_ids(self, cursor, cantidad):
+        return generador_ids.reservar(cursor, 'productos', cantidad)
     
-# → Obtiene todos los productos con sus detalles relacionados.
+# → Obtiene todos los productos con sus detalles relacionados (desde el caché del catálogo).
     def obtener_todos(self):
         try:
-            from core.database import db
-            import pandas as pd
-            
-            conexion = db.get_connection()
-            query = '''
-                SELECT p.id_producto, p.nombre_producto, p.precio_producto, 
-                       p.stock_producto, p.stock_minimo, p.tipo_corte, p.imagen,
-                       c.nombre_categoria, t.nombre_tipo, u.nombre_unidad, p.id_unidad_medida
-                FROM productos p
-                LEFT JOIN categoria_productos c ON p.id_categoria_productos = c.id_categoria_productos
-                LEFT JOIN tipo_productos t ON p.id_tipo_productos = t.id_tipo_producto
-                LEFT JOIN unidad_medida u ON p.id_unidad_medida = u.id_unidad_medida
-                ORDER BY p.id_producto
-            '''
-            productos = pd.read_sql_query(query, conexion)
-            conexion.close()
-            
-            if productos.empty:
-                return pd.DataFrame(columns=self.columnas)
-            
-            # Mapear a formato esperado
-            productos_mapeados = pd.DataFrame({
-                "ID": productos['id_producto'],
-                "Nombre": productos['nombre_producto'],
-                "Categoría": productos['nombre_categoria'].fillna('Sin categoría'),
-                "Tipo": productos['nombre_tipo'].fillna('Sin tipo'),
-                "Precio": productos['precio_producto'],
-                "Stock": productos['stock_producto'],
-                "Stock Mínimo": productos['stock_minimo'],
-                "Imagen": productos['imagen'].fillna(''),
-                "Unidad": productos['nombre_unidad'].fillna('Sin unidad'),
-                "id_unidad_medida": productos['id_unidad_medida']
-            })
-            
-            return productos_mapeados
-            
+            return catalogo_cache.dataframe()
         except Exception as e:
             print(f"Error obteniendo productos: {e}")
-            import pandas as pd
             return pd.DataFrame(columns=self.columnas)
 
 # → Obtiene un producto por su ID con detalles relacionados
     def obtenerPorId(self, id_producto):
         try:
-            conexion = db.get_connection()
-            query = '''
-                SELECT p.id_producto, p.nombre_producto, p.precio_producto, 
-                       p.stock_producto, p.stock_minimo, p.tipo_corte, p.imagen,
-                       c.nombre_categoria, t.nombre_tipo
-                FROM productos p
-                LEFT JOIN categoria_productos c ON p.id_categoria_productos = c.id_categoria_productos
-                LEFT JOIN tipo_productos t ON p.id_tipo_productos = t.id_tipo_producto
-                WHERE p.id_producto = ?
-            '''
-            producto = pd.read_sql_query(query, conexion, params=[id_producto])
-            conexion.close()
-            
-            if producto.empty:
+            registro = catalogo_cache.obtener(id_producto)
+            if registro is None:
                 return pd.DataFrame(columns=self.columnas)
-            
-            # Mapear a formato esperado
-            data_mapeada = pd.DataFrame({
-                "ID": producto['id_producto'],
-                "Nombre": producto['nombre_producto'],
-                "Categoría": producto['nombre_categoria'].fillna('Sin categoría'),
-                "Tipo": producto['nombre_tipo'].fillna('Sin tipo'),
-                "Precio": producto['precio_producto'],
-                "Stock": producto['stock_producto'],
-                "Stock Mínimo": producto['stock_minimo'],
-                "Imagen": producto['imagen'].fillna('')
-            })
-            return data_mapeada
+            return mapear_dataframe([registro])
 
         except Exception as e:
             print(f"Error al obtener producto por ID: {e}")
@@ -133,85 +56,88 @@ class ProductoModel(BaseModel):
 
     def crearProducto(self, datos):
         try:
-            from core.database import db
-            
-            # Generar ID usando el nuevo sistema PROD0001, PROD0002, etc.
-            nuevo_id = self.generar_siguiente_id()
-            
-            # Manejar imagen si existe
-            imagen_destino = ""
-            if datos.get("imagen_origen"):
-                imagen_destino = self.plagiarImagen(datos["imagen_origen"], nuevo_id)
-            
-            # Obtener IDs de categoria, tipo y unidad
-            conexion = db.get_connection()
-            cursor = conexion.cursor()
-            
-            # Categoria
-            categoria_nombre = datos.get('Categoría', '')
-            cursor.execute("SELECT id_categoria_productos FROM categoria_productos WHERE nombre_categoria = ?", [categoria_nombre])
-            categoria_row = cursor.fetchone()
-            id_categoria = categoria_row[0] if categoria_row else 1
-            
-            # Tipo
-            tipo_nombre = datos.get('Tipo', '')
-            cursor.execute("SELECT id_tipo_producto FROM tipo_productos WHERE nombre_tipo = ?", [tipo_nombre])
-            tipo_row = cursor.fetchone()
-            id_tipo = tipo_row[0] if tipo_row else 1
-            
-            # Unidad
-            unidad_nombre = datos.get('Unidad', '')
-            cursor.execute("SELECT id_unidad_medida FROM unidad_medida WHERE nombre_unidad = ?", [unidad_nombre])
-            unidad_row = cursor.fetchone()
-            id_unidad = unidad_row[0] if unidad_row else 1
-            
-            # Insertar producto
-            cursor.execute('''
-                INSERT INTO productos (
-                    id_producto, nombre_producto, descripcion_producto, precio_producto,
-                    stock_producto, stock_minimo, estado_producto, tipo_corte, imagen,
-                    id_tipo_productos, id_categoria_productos, id_unidad_medida
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                nuevo_id,
-                datos.get('Nombre', ''),
-                datos.get('Descripción', ''),
-                float(datos.get('Precio', 0)),
-                int(datos.get('Stock inicial', datos.get('Stock', 0))),
-                int(datos.get('Stock Mínimo', 0)),
-                'activo',
-                datos.get('Tipo de Corte', ''),
-                imagen_destino,
-                id_tipo,
-                id_categoria,
-                id_unidad
-            ))
-            
-            conexion.commit()
-            conexion.close()
+            with db.connection() as conexion:
+                cursor = conexion.cursor()
+                # Bloqueo de escritura desde el inicio: entre las dos lecturas de la versión del
+                # catálogo solo cabe este INSERT, así el caché en memoria no necesita recargar todo
+                cursor.execute("BEGIN IMMEDIATE")
+                version_antes = version_catalogo(cursor)
+                
+                # Categoria
+                categoria_nombre = datos.get('Categoría', '')
+                cursor.execute("SELECT id_categoria_productos FROM categoria_productos WHERE nombre_categoria = ?", [categoria_nombre])
+                categoria_row = cursor.fetchone()
+                id_categoria = categoria_row[0] if categoria_row else 1
+                
+                # Tipo
+                tipo_nombre = datos.get('Tipo', '')
+                cursor.execute("SELECT id_tipo_producto FROM tipo_productos WHERE nombre_tipo = ?", [tipo_nombre])
+                tipo_row = cursor.fetchone()
+                id_tipo = tipo_row[0] if tipo_row else 1
+                
+                # Unidad
+                unidad_nombre = datos.get('Unidad', '')
+                cursor.execute("SELECT id_unidad_medida FROM unidad_medida WHERE nombre_unidad = ?", [unidad_nombre])
+                unidad_row = cursor.fetchone()
+                id_unidad = unidad_row[0] if unidad_row else 1
+                
+                # Reservar el ID dentro de la transacción del INSERT (PROD0001, PROD0002, etc.)
+                nuevo_id = self.generar_siguiente_id(cursor)
+                
+                # Solo la ruta de la imagen: el archivo se copia tras el commit, sin el bloqueo
+                # de escritura y sin dejar una copia huérfana si el INSERT falla
+                imagen_destino = self.rutaImagen(datos.get("imagen_origen"), nuevo_id)
+                
+                # Insertar producto
+                cursor.execute('''
+                    INSERT INTO productos (
+                        id_producto, nombre_producto, descripcion_producto, precio_producto,
+                        stock_producto, stock_minimo, estado_producto, tipo_corte, imagen,
+                        id_tipo_productos, id_categoria_productos, id_unidad_medida
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    nuevo_id,
+                    datos.get('Nombre', ''),
+                    datos.get('Descripción', ''),
+                    float(datos.get('Precio', 0)),
+                    int(datos.get('Stock inicial', datos.get('Stock', 0))),
+                    int(datos.get('Stock Mínimo', 0)),
+                    'activo',
+                    datos.get('Tipo de Corte', ''),
+                    imagen_destino,
+                    id_tipo,
+                    id_categoria,
+                    id_unidad
+                ))
+                
+                versiones = (version_antes, version_catalogo(cursor))
+                conexion.commit()
+            if imagen_destino:
+                self._copiar_imagen_guardada(datos["imagen_origen"], nuevo_id, "")
+            catalogo_cache.refrescar_productos([nuevo_id], versiones)
             return nuevo_id
             
         except Exception as e:
             print(f"Error creando producto: {e}")
-            if conexion:
-                conexion.close()
             raise
     
     def actualizarProducto(self, id_producto, datos):
         try:
             conexion = db.get_connection()
             cursor = conexion.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            version_antes = version_catalogo(cursor)
             
             # Verificar que el producto existe
-            cursor.execute("SELECT id_producto FROM productos WHERE id_producto = ?", [id_producto])
-            if not cursor.fetchone():
+            cursor.execute("SELECT imagen FROM productos WHERE id_producto = ?", [id_producto])
+            fila = cursor.fetchone()
+            if not fila:
                 conexion.close()
                 raise ValueError(f"Producto con ID {id_producto} no encontrado")
+            imagen_anterior = fila[0] or ""
             
-            # Manejar imagen si se proporciona una nueva
-            imagen_destino = None
-            if datos.get("imagen_origen"):
-                imagen_destino = self.plagiarImagen(datos["imagen_origen"], id_producto)
+            # Nueva imagen: solo la ruta; el archivo se copia cuando el UPDATE ya se confirmó
+            imagen_destino = self.rutaImagen(datos.get("imagen_origen"), id_producto)
 
             # Construir UPDATE dinámicamente
             updates = []
@@ -256,11 +182,15 @@ class ProductoModel(BaseModel):
             
             if updates:
                 params.append(id_producto)
-                query = f"UPDATE productos SET {', '.join(updates)} WHERE id_producto = ?"
+                query = f"UPDATE productos SET {', '.join(updates)}, fecha_actualizacion = CURRENT_TIMESTAMP WHERE id_producto = ?"
                 cursor.execute(query, params)
-                conexion.commit()
+            versiones = (version_antes, version_catalogo(cursor))
+            conexion.commit()
             
             conexion.close()
+            if imagen_destino:
+                self._copiar_imagen_guardada(datos["imagen_origen"], id_producto, imagen_anterior)
+            catalogo_cache.refrescar_productos([id_producto], versiones)
             return True
             
         except Exception as e:
@@ -271,25 +201,46 @@ class ProductoModel(BaseModel):
     
     def eliminarProducto(self, id_producto):
         try:
-            conexion = db.get_connection()
-            cursor = conexion.cursor()
-            cursor.execute("DELETE FROM productos WHERE id_producto = ?", [id_producto])
-            conexion.commit()
-            rows_affected = cursor.rowcount
-            conexion.close()
+            # Context manager: si el DELETE falla, la conexión vuelve al pool con rollback
+            # y no retiene el bloqueo de escritura
+            with db.connection() as conexion:
+                cursor = conexion.cursor()
+                cursor.execute("BEGIN IMMEDIATE")
+                version_antes = version_catalogo(cursor)
+                cursor.execute("DELETE FROM productos WHERE id_producto = ?", [id_producto])
+                rows_affected = cursor.rowcount
+                versiones = (version_antes, version_catalogo(cursor))
+                conexion.commit()
+            if rows_affected > 0:
+                catalogo_cache.quitar_producto(id_producto, versiones)
             return rows_affected > 0
         except Exception as e:
             print(f"Error eliminando producto {id_producto}: {e}")
             return False
     
+# → Ruta que tendrá la imagen del producto en IMG_DIR ("" si no hay imagen de origen).
+    def rutaImagen(self, origen, id_producto):
+        if not origen or not os.path.exists(origen):
+            return ""
+        extension = os.path.splitext(origen)[1]
+        return os.path.join(IMG_DIR, f"{id_producto}{extension}")
+
+# → Copia la imagen de un producto ya guardado; si la copia falla, el producto vuelve a su
+#   imagen anterior en vez de apuntar a un archivo que no existe.
+    def _copiar_imagen_guardada(self, origen, id_producto, imagen_anterior):
+        if self.plagiarImagen(origen, id_producto):
+            return
+        db.execute('''
+            UPDATE productos SET imagen = ?, fecha_actualizacion = CURRENT_TIMESTAMP
+            WHERE id_producto = ?
+        ''', [imagen_anterior, id_producto], commit=True)
+
     def plagiarImagen(self, origen, id_producto):
         try:
-            if not os.path.exists(origen):
+            destino = self.rutaImagen(origen, id_producto)
+            if not destino:
                 return ""
             
-            extension = os.path.splitext(origen)[1]
-            destino = os.path.join(IMG_DIR, f"{id_producto}{extension}")
-            
             # Si ya existe la misma imagen, no copiar
             if os.path.exists(destino) and os.path.samefile(origen, destino):
                 return destino
@@ -304,11 +255,66 @@ class ProductoModel(BaseModel):
             print(f"Error al copiar imagen: {e}")
             return ""
 
+# → Búsqueda con ranking sobre el índice FTS5 (prefijos, sin acentos).
+#   Devuelve registros del catálogo ordenados por relevancia, o None si no hay FTS5.
+    def buscar_ranking(self, termino, limite=-1):
+        # Cada palabra se busca como prefijo ("arro"* → arroz); las comillas evitan la sintaxis FTS
+        palabras = re.findall(r'\w+', termino)
+        if not palabras:
+            return []
+        consulta = ' '.join(f'"{p}"*' for p in palabras)
+        try:
+            with db.connection() as conexion:
+                # Calcular bm25 cuesta por cada coincidencia: con prefijos muy comunes
+                # (p. ej. "a") se devuelven en orden del índice para no pasar de unos ms
+                filas = conexion.execute(
+                    "SELECT id_producto FROM productos_fts WHERE productos_fts MATCH ? LIMIT ?",
+                    (consulta, MAX_COINCIDENCIAS_RANKING + 1)).fetchall()
+                if len(filas) <= MAX_COINCIDENCIAS_RANKING:
+                    filas = conexion.execute('''
+                        SELECT id_producto FROM productos_fts
+                        WHERE productos_fts MATCH ?
+                        ORDER BY bm25(productos_fts, 5.0, 10.0, 2.0)
+                        LIMIT ?
+                    ''', (consulta, limite)).fetchall()
+                elif limite >= 0:
+                    filas = filas[:limite]
+                else:
+                    filas = conexion.execute(
+                        "SELECT id_producto FROM productos_fts WHERE productos_fts MATCH ?",
+                        (consulta,)).fetchall()
+        except sqlite3.OperationalError:
+            return None
+        registros = (catalogo_cache.obtener(fila[0]) for fila in filas)
+        return [r for r in registros if r is not None]
+
+# → Búsqueda que devuelve registros del catálogo (apta para hilos de trabajo: no usa pandas ni Qt)
+#   limite = -1 devuelve todas las coincidencias.
+    def buscar_registros(self, termino, limite=-1):
+        if not termino.strip():
+            registros = catalogo_cache.listar()
+            return registros if limite < 0 else registros[:limite]
+        registros = self.buscar_ranking(termino, limite)
+        if registros is not None:
+            return registros
+        # Sin índice FTS5: filtrar el catálogo en memoria como hacía el LIKE
+        termino = termino.strip().lower()
+        coincidencias = (r for r in catalogo_cache.listar()
+                         if termino in str(r['nombre_producto']).lower()
+                         or termino in str(r['id_producto']).lower()
+                         or termino in str(r['nombre_categoria'] or '').lower())
+        return list(coincidencias if limite < 0 else islice(coincidencias, limite))
+
     def buscarProducto(self, termino):
         try:
             if not termino.strip():
                 return self.obtener_todos()
-            
+
+            registros = self.buscar_ranking(termino)
+            if registros is not None:
+                return mapear_dataframe(registros)
+
+            # Sin índice FTS5: búsqueda por LIKE
             conexion = db.get_connection()
             query = '''
                 SELECT p.id_producto, p.nombre_producto, p.precio_producto, 
@@ -62,6 +62,18 @@ class PromocionModel:
         db.execute('UPDATE promocion SET estado_promocion = ? WHERE id_promocion = ?', (estado, id_promocion), commit=True)
         return True
 
+    def expirar_vencidas(self):
+        """Pasa a 'expirada' las promociones activas cuya fecha_fin ya pasó; retorna cuántas.
+
+        El trigger actualizar_estado_promocion_expirada solo actúa cuando se edita la promoción;
+        esta tarea periódica (core/planificador.py) cubre las que nadie vuelve a tocar.
+        """
+        ahora = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        cur = db.execute(
+            "UPDATE promocion SET estado_promocion = 'expirada' WHERE estado_promocion = 'activa' AND datetime(fecha_fin) < ?",
+            (ahora,), commit=True)
+        return cur.rowcount
+
     def actualizar(self, id_promocion, nombre=None, descripcion=None, descuento_pct=None, fecha_inicio=None, fecha_fin=None, estado=None):
         """Actualiza los campos de una promoción. Solo los parámetros no-None serán actualizados."""
         updates = []
@@ -1,5 +1,6 @@
 
 from modules.productos.models.producto_model import ProductoModel
+from modules.productos.models.catalogo_cache import catalogo_cache
 import pandas as pd
 
 class AlertasService:
@@ -22,6 +23,14 @@ class AlertasService:
         bajo_stock = df[df['Stock'] < df['Stock Mínimo']]
         return bajo_stock
 
+    def obtener_registros_bajo_stock(self):
+        """
+        Igual que obtener_productos_bajo_stock pero devuelve registros del catálogo
+        (sin armar DataFrame), listos para ProductosTableModel.
+        """
+        return [r for r in catalogo_cache.listar()
+                if (r['stock_producto'] or 0) < (r['stock_minimo'] or 0)]
+
     def verificar_cambio_stock(self, stock_inicial, stock_final, stock_minimo):
         """
         Verifica si el stock bajó del mínimo (transición).
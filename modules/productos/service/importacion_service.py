@@ -0,0 +1,369 @@
+## Servicio de Importación masiva de productos (CSV / XLSX) → Lógica de negocio
+
+import csv
+import math
+import os
+import sqlite3
+import time
+import unicodedata
+from core.database import db
+from modules.productos.models.producto_model import ProductoModel
+from modules.productos.models.catalogo_cache import catalogo_cache
+
+# Filas por transacción: acota el tiempo que se retiene el bloqueo de escritura
+FILAS_POR_LOTE = 5000
+
+# Encabezados aceptados (sin acentos, en minúsculas) → columna de la tabla productos
+ENCABEZADOS = {
+    'id': 'id_producto', 'id_producto': 'id_producto', 'codigo': 'id_producto',
+    'nombre': 'nombre_producto', 'nombre_producto': 'nombre_producto', 'producto': 'nombre_producto',
+    'descripcion': 'descripcion_producto', 'descripcion_producto': 'descripcion_producto',
+    'precio': 'precio_producto', 'precio_producto': 'precio_producto',
+    'stock': 'stock_producto', 'stock inicial': 'stock_producto', 'stock_producto': 'stock_producto',
+    'stock minimo': 'stock_minimo', 'stock_minimo': 'stock_minimo', 'stock min': 'stock_minimo',
+    'estado': 'estado_producto', 'estado_producto': 'estado_producto',
+    'tipo de corte': 'tipo_corte', 'tipo_corte': 'tipo_corte',
+    'categoria': 'categoria', 'tipo': 'tipo', 'unidad': 'unidad',
+}
+
+# Columnas del archivo que se resuelven por nombre → columna con el ID de catálogo
+COLUMNAS_CATALOGO = {'categoria': 'id_categoria_productos', 'tipo': 'id_tipo_productos',
+                     'unidad': 'id_unidad_medida'}
+
+# Columnas escritas en productos; las ausentes en una fila nueva toman el valor de crearProducto
+COLUMNAS_DESTINO = ['nombre_producto', 'descripcion_producto', 'precio_producto', 'stock_producto',
+                    'stock_minimo', 'estado_producto', 'tipo_corte', 'id_tipo_productos',
+                    'id_categoria_productos', 'id_unidad_medida']
+VALORES_POR_DEFECTO = {'descripcion_producto': "''", 'stock_producto': '0', 'stock_minimo': '0',
+                       'estado_producto': "'activo'", 'tipo_corte': "''", 'id_tipo_productos': '1',
+                       'id_categoria_productos': '1', 'id_unidad_medida': '1'}
+
+ESTADOS_VALIDOS = ('activo', 'descontinuado', 'no disponible', 'en oferta')
+
+# Mayor entero que SQLite guarda como INTEGER: un stock más grande haría fallar todo el lote
+MAX_ENTERO = 2 ** 63 - 1
+
+
+def _normalizar(texto):
+    """Minúsculas, sin acentos ni espacios sobrantes (para encabezados y nombres de catálogo)."""
+    texto = unicodedata.normalize('NFKD', str(texto).strip().lower())
+    return ' '.join(''.join(c for c in texto if not unicodedata.combining(c)).split())
+
+
+def _numero(valor, campo):
+    try:
+        numero = float(valor) if isinstance(valor, (int, float)) else float(valor.replace(',', '.'))
+    except (ValueError, AttributeError, OverflowError):
+        raise ValueError(f"{campo} no numérico: '{valor}'")
+    # "inf" y "nan" son float válidos para Python, pero no un precio ni un stock
+    if not math.isfinite(numero):
+        raise ValueError(f"{campo} no numérico: '{valor}'")
+    return numero
+
+
+def leer_filas(ruta):
+    """Itera (número de fila, lista de valores) sin cargar el archivo completo.
+
+    La primera tupla es la fila de encabezados.
+    """
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension in ('.xlsx', '.xlsm'):
+        try:
+            from openpyxl import load_workbook
+        except ImportError as e:
+            raise ImportError("Falta la dependencia 'openpyxl'. Instálala: pip install openpyxl") from e
+        libro = load_workbook(ruta, read_only=True, data_only=True)
+        try:
+            yield from enumerate(libro.active.iter_rows(values_only=True), start=1)
+        finally:
+            libro.close()
+    elif extension in ('.csv', '.txt'):
+        with open(ruta, newline='', encoding='utf-8-sig') as archivo:
+            muestra = archivo.read(8192)
+            archivo.seek(0)
+            try:
+                dialecto = csv.Sniffer().sniff(muestra, delimiters=',;\t|')
+            except csv.Error:
+                dialecto = csv.excel
+            yield from enumerate(csv.reader(archivo, dialect=dialecto), start=1)
+    else:
+        raise ValueError(f"Formato no soportado: {extension} (usa .csv o .xlsx)")
+
+
+class ImportacionProductosService:
+    """
+    Importa o actualiza productos en lote desde CSV/XLSX.
+
+    - Categoría, tipo y unidad se resuelven por nombre con diccionarios en memoria.
+    - Upsert por id_producto: si el ID ya existe se actualizan solo las celdas con valor;
+      las filas sin ID reciben uno nuevo del generador de IDs, reservados en bloque.
+    - Se escribe con executemany en transacciones de FILAS_POR_LOTE filas; el índice de
+      búsqueda de las filas nuevas se llena con un único INSERT ... SELECT por lote.
+    - dry_run valida y ejecuta todo dentro de una transacción que se deshace al final.
+    """
+
+    def __init__(self):
+        self.producto_model = ProductoModel()
+
+    def _cargar_mapas(self, cursor):
+        mapas = {}
+        for clave, sql in (
+            ('categoria', "SELECT nombre_categoria, id_categoria_productos FROM categoria_productos"),
+            ('tipo', "SELECT nombre_tipo, id_tipo_producto FROM tipo_productos"),
+            ('unidad', "SELECT nombre_unidad, id_unidad_medida FROM unidad_medida"),
+        ):
+            mapas[clave] = {_normalizar(nombre): id_ for nombre, id_ in cursor.execute(sql).fetchall()}
+        return mapas
+
+    def _crear_categoria(self, cursor, nombre):
+        cursor.execute("INSERT INTO categoria_productos (nombre_categoria, descripcion) VALUES (?, ?)",
+                       [nombre, 'Creada por importación'])
+        return cursor.lastrowid
+
+    def _sql_insertar(self):
+        valores = ', '.join(f"COALESCE(?, {VALORES_POR_DEFECTO[c]})" if c in VALORES_POR_DEFECTO else '?'
+                            for c in COLUMNAS_DESTINO)
+        return f"INSERT INTO productos (id_producto, {', '.join(COLUMNAS_DESTINO)}) VALUES (?, {valores})"
+
+    def _sql_actualizar(self, columnas):
+        """UPDATE de las columnas del archivo; una celda vacía conserva el valor actual.
+
+        El WHERE evita reescribir filas idénticas: re-importar el mismo archivo no escribe nada.
+        """
+        sets = ', '.join(f"{c} = COALESCE(?{i}, {c})" for i, c in enumerate(columnas, start=2))
+        distinto = ' OR '.join(f"(?{i} IS NOT NULL AND {c} IS NOT ?{i})"
+                               for i, c in enumerate(columnas, start=2))
+        return (f"UPDATE productos SET {sets}, fecha_actualizacion = CURRENT_TIMESTAMP "
+                f"WHERE id_producto = ?1 AND ({distinto})")
+
+    def _preparar_fila(self, fila, columnas, mapas, existentes, cursor, crear_categorias):
+        """Valida y convierte una fila del archivo. Devuelve (id_producto o None, dict de valores)."""
+        valores = {}
+        for i, columna in columnas:
+            if i < len(fila):
+                valor = fila[i]
+                if isinstance(valor, str):
+                    valor = valor.strip()
+                    if not valor:
+                        continue
+                elif valor is None:
+                    continue
+                valores[columna] = valor
+
+        id_producto = valores.pop('id_producto', None)
+        if id_producto is not None:
+            id_producto = str(id_producto)
+        if id_producto is None or id_producto not in existentes:
+            if 'nombre_producto' not in valores:
+                raise ValueError("Falta el nombre del producto")
+            if 'precio_producto' not in valores:
+                raise ValueError("Falta el precio del producto")
+
+        if 'nombre_producto' in valores:
+            valores['nombre_producto'] = str(valores['nombre_producto'])[:100]
+        if 'precio_producto' in valores:
+            precio = _numero(valores['precio_producto'], 'Precio')
+            if precio < 0:
+                raise ValueError("El precio no puede ser negativo")
+            valores['precio_producto'] = precio
+        for columna, campo in (('stock_producto', 'Stock'), ('stock_minimo', 'Stock Mínimo')):
+            if columna in valores:
+                cantidad = int(_numero(valores[columna], campo))
+                if cantidad < 0:
+                    raise ValueError(f"{campo} no puede ser negativo")
+                if cantidad > MAX_ENTERO:
+                    raise ValueError(f"{campo} fuera de rango: '{valores[columna]}'")
+                valores[columna] = cantidad
+        if 'estado_producto' in valores:
+            estado = _normalizar(valores['estado_producto'])
+            if estado not in ESTADOS_VALIDOS:
+                raise ValueError(f"Estado inválido: '{valores['estado_producto']}'")
+            valores['estado_producto'] = estado
+
+        # Nombres de catálogo → IDs (O(1) por diccionario)
+        for clave, columna in COLUMNAS_CATALOGO.items():
+            if clave not in valores:
+                continue
+            nombre = str(valores.pop(clave))
+            id_ = mapas[clave].get(_normalizar(nombre))
+            if id_ is None:
+                if clave == 'categoria' and crear_categorias:
+                    id_ = mapas[clave][_normalizar(nombre)] = self._crear_categoria(cursor, nombre)
+                elif clave == 'tipo':
+                    raise ValueError(f"Tipo no registrado en el sistema: '{nombre}'")
+                else:
+                    etiqueta = 'Categoría' if clave == 'categoria' else 'Unidad'
+                    raise ValueError(f"{etiqueta} no registrada en el sistema: '{nombre}'")
+            valores[columna] = id_
+
+        return id_producto, valores
+
+    def importar(self, ruta, dry_run=False, crear_categorias=False, filas_por_lote=FILAS_POR_LOTE,
+                 progreso=None):
+        """
+        Importa productos desde `ruta` (.csv o .xlsx).
+
+        Args:
+            ruta: Archivo a importar. La primera fila son encabezados (ID, Nombre, Precio,
+                  Stock, Stock Mínimo, Categoría, Tipo, Unidad, Descripción, Tipo de Corte, Estado)
+            dry_run: Si True no se guarda nada; el reporte indica qué pasaría
+            crear_categorias: Crear categorías desconocidas en lugar de reportar error
+            filas_por_lote: Filas por transacción
+            progreso: Callback opcional progreso(filas_procesadas)
+
+        Returns:
+            Diccionario con procesadas, insertados, actualizados, sin_cambios, errores
+            (lista de {'fila', 'id_producto', 'mensaje'}), ids_nuevos, segundos y filas_por_segundo
+        """
+        inicio = time.perf_counter()
+        resultado = {'procesadas': 0, 'insertados': 0, 'actualizados': 0, 'sin_cambios': 0,
+                     'errores': [], 'ids_nuevos': [], 'dry_run': dry_run}
+
+        filas = leer_filas(ruta)
+        _, encabezados = next(filas, (None, None))
+
+        # Encabezado del archivo → columna destino (las columnas desconocidas se ignoran)
+        columnas = []
+        for i, encabezado in enumerate(encabezados or ()):
+            columna = ENCABEZADOS.get(_normalizar(encabezado)) if encabezado is not None else None
+            if columna and columna not in (c for _, c in columnas):
+                columnas.append((i, columna))
+        presentes = {COLUMNAS_CATALOGO.get(c, c) for _, c in columnas}
+        if encabezados and 'nombre_producto' not in presentes and 'id_producto' not in presentes:
+            raise ValueError("El archivo debe tener al menos la columna 'Nombre' o 'ID'")
+
+        actualizables = [c for c in COLUMNAS_DESTINO if c in presentes]
+        sentencias = (self._sql_insertar(),
+                      self._sql_actualizar(actualizables) if actualizables else None,
+                      actualizables)
+
+        with db.connection() as conexion:
+            cursor = conexion.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                mapas = self._cargar_mapas(cursor)
+                existentes = {fila[0] for fila in cursor.execute("SELECT id_producto FROM productos").fetchall()}
+
+                lote = []
+                for numero, fila in filas:
+                    lote.append((numero, fila))
+                    if len(lote) >= filas_por_lote:
+                        self._escribir_lote(cursor, lote, columnas, mapas, existentes, sentencias,
+                                            crear_categorias, resultado)
+                        if not dry_run:
+                            conexion.commit()
+                            cursor.execute("BEGIN IMMEDIATE")
+                        lote = []
+                        if progreso:
+                            progreso(resultado['procesadas'])
+                if lote:
+                    self._escribir_lote(cursor, lote, columnas, mapas, existentes, sentencias,
+                                        crear_categorias, resultado)
+                    if progreso:
+                        progreso(resultado['procesadas'])
+
+                if dry_run:
+                    conexion.rollback()
+                else:
+                    conexion.commit()
+            except Exception:
+                conexion.rollback()
+                raise
+            finally:
+                # Con lotes ya confirmados el catálogo cambió aunque luego falle uno
+                if not dry_run and (resultado['insertados'] or resultado['actualizados']):
+                    catalogo_cache.invalidar()
+
+        resultado['segundos'] = round(time.perf_counter() - inicio, 3)
+        resultado['filas_por_segundo'] = round(resultado['procesadas'] / max(resultado['segundos'], 1e-9), 1)
+        return resultado
+
+    def _escribir_lote(self, cursor, lote, columnas, mapas, existentes, sentencias,
+                       crear_categorias, resultado):
+        sql_insertar, sql_actualizar, actualizables = sentencias
+        indice_id = next((i for i, c in columnas if c == 'id_producto'), None)
+
+        nuevas = []         # → (número de fila, id o None, valores)
+        cambios = []        # → (número de fila, id, valores)
+        vistos = set()
+        for numero, fila in lote:
+            if not any(v not in (None, '') for v in fila):
+                continue  # Fila en blanco
+            resultado['procesadas'] += 1
+            try:
+                id_producto, valores = self._preparar_fila(fila, columnas, mapas, existentes,
+                                                           cursor, crear_categorias)
+                if id_producto is not None:
+                    if id_producto in vistos:
+                        raise ValueError("ID repetido en el archivo")
+                    vistos.add(id_producto)
+                if id_producto in existentes:
+                    cambios.append((numero, id_producto, valores))
+                else:
+                    nuevas.append((numero, id_producto, valores))
+            except (ValueError, OverflowError) as e:
+                id_archivo = fila[indice_id] if indice_id is not None and indice_id < len(fila) else ''
+                resultado['errores'].append({'fila': numero, 'id_producto': id_archivo or '',
+                                             'mensaje': str(e)})
+
+        # IDs nuevos de una sola vez para las filas sin ID
+        sin_id = [i for i, (_, id_producto, _) in enumerate(nuevas) if id_producto is None]
+        for i, nuevo_id in zip(sin_id, self.producto_model.reservar_ids(cursor, len(sin_id))):
+            numero, _, valores = nuevas[i]
+            nuevas[i] = (numero, nuevo_id, valores)
+
+        if nuevas:
+            # El trigger FTS se pausa: las filas nuevas se indexan juntas al final del lote
+            desde_rowid = db.pausar_indice_busqueda(cursor)
+            insertadas, _ = self._ejecutar(cursor, sql_insertar, nuevas, COLUMNAS_DESTINO, resultado)
+            db.reanudar_indice_busqueda(cursor, desde_rowid)
+            ids = [id_producto for _, id_producto, _ in insertadas]
+            resultado['insertados'] += len(ids)
+            resultado['ids_nuevos'].extend(ids)
+            existentes.update(ids)
+
+        if cambios and sql_actualizar:
+            aplicadas, escritas = self._ejecutar(cursor, sql_actualizar, cambios, actualizables, resultado)
+            resultado['actualizados'] += escritas
+            resultado['sin_cambios'] += len(aplicadas) - escritas
+        elif cambios:
+            resultado['sin_cambios'] += len(cambios)
+
+    def _ejecutar(self, cursor, sql, filas, nombres, resultado):
+        """executemany del lote; si algo viola una restricción, repite fila por fila para aislarlo.
+
+        Devuelve (filas aplicadas, filas realmente escritas). rowcount no incluye lo que
+        escriben los triggers, y un UPDATE descartado por su WHERE cuenta 0.
+        """
+        parametros = [[id_producto] + [valores.get(c) for c in nombres] for _, id_producto, valores in filas]
+        cursor.execute("SAVEPOINT lote_importacion")
+        try:
+            cursor.executemany(sql, parametros)
+            escritas = cursor.rowcount
+            cursor.execute("RELEASE lote_importacion")
+            return filas, escritas
+        except sqlite3.DatabaseError:
+            cursor.execute("ROLLBACK TO lote_importacion")
+
+        aplicadas = []
+        escritas = 0
+        for fila, params in zip(filas, parametros):
+            cursor.execute("SAVEPOINT fila_importacion")
+            try:
+                cursor.execute(sql, params)
+                escritas += cursor.rowcount
+                aplicadas.append(fila)
+            except sqlite3.DatabaseError as e:
+                cursor.execute("ROLLBACK TO fila_importacion")
+                resultado['errores'].append({'fila': fila[0], 'id_producto': fila[1], 'mensaje': str(e)})
+            cursor.execute("RELEASE fila_importacion")
+        cursor.execute("RELEASE lote_importacion")
+        return aplicadas, escritas
+
+    def exportar_errores(self, resultado, ruta):
+        """Guarda el reporte de errores por fila en CSV (fila, id_producto, mensaje)."""
+        with open(ruta, 'w', newline='', encoding='utf-8-sig') as archivo:
+            escritor = csv.DictWriter(archivo, fieldnames=['fila', 'id_producto', 'mensaje'])
+            escritor.writeheader()
+            escritor.writerows(sorted(resultado['errores'], key=lambda e: e['fila']))
+        return ruta
@@ -1,5 +1,182 @@
+import bisect
+import threading
+import time
+from datetime import datetime, timedelta
 from core.database import db
-from datetime import datetime
+from modules.productos.models.catalogo_cache import catalogo_cache
+
+# Las fechas de promoción tienen resolución de segundos: una promoción deja de aplicar
+# en el segundo siguiente a su fecha_fin
+UN_SEGUNDO = timedelta(seconds=1)
+
+
+class MotorPromociones:
+    """Índice en memoria de las promociones activas.
+
+    - Carga una sola vez las promociones con estado 'activa' y sus asignaciones.
+    - Precalcula la mejor promoción vigente por producto y por categoría: consultar
+      el descuento de un producto son dos búsquedas en diccionarios.
+    - Las fechas de inicio/fin forman una lista ordenada de fronteras; al cruzar la
+      siguiente se recalcula qué promociones están vigentes, sin ir a la BD.
+    - Cualquier escritura en promocion/promocion_producto/promocion_categoria (de esta u
+      otra caja) incrementa versiones_tablas['promociones']; esa versión se revisa como
+      máximo cada `verificar_cada` segundos y solo si cambió se recarga.
+    """
+
+    def __init__(self, verificar_cada=2.0):
+        self.verificar_cada = verificar_cada
+        self._lock = threading.RLock()
+        self._cargado = False
+        self._version = None
+        self._verificado_en = None
+
+        self._promociones = {}      # → id_promocion -> {'id_promocion', 'nombre', 'descuento', 'inicio', 'fin'}
+        self._por_producto = {}     # → id_producto -> [(pct, id_promocion)]
+        self._por_categoria = {}    # → id_categoria -> [(pct, id_promocion)]
+        self._fronteras = []        # → instantes ordenados en que cambia el conjunto vigente
+        self._proxima_frontera = None
+
+        self._mejor_producto = {}   # → id_producto -> (pct, id_promocion) vigente
+        self._mejor_categoria = {}  # → id_categoria -> (pct, id_promocion) vigente
+        self._version_indice = 0    # → aumenta cada vez que cambia el conjunto vigente
+
+    @property
+    def version(self):
+        """Versión del índice: si cambió, los precios calculados antes pueden estar desactualizados."""
+        self._asegurar_vigente()
+        return self._version_indice
+
+    def invalidar(self):
+        """Fuerza revisar la versión de las tablas en el siguiente acceso."""
+        with self._lock:
+            self._verificado_en = None
+
+    def recargar(self):
+        with db.connection() as conn:
+            # Leer la versión antes que los datos: si algo cambia entre medio, la
+            # próxima verificación verá una versión distinta y volverá a cargar
+            fila = conn.execute("SELECT version FROM versiones_tablas WHERE grupo = 'promociones'").fetchone()
+            version = fila[0] if fila else None
+            filas_promo = conn.execute('''
+                SELECT id_promocion, nombre_promocion, descuento, datetime(fecha_inicio), datetime(fecha_fin)
+                FROM promocion
+                WHERE estado_promocion = 'activa'
+            ''').fetchall()
+            filas_prod = conn.execute('''
+                SELECT pp.id_producto, pp.id_promocion, pp.descuento_aplicado
+                FROM promocion_producto pp
+                JOIN promocion p ON p.id_promocion = pp.id_promocion
+                WHERE p.estado_promocion = 'activa'
+            ''').fetchall()
+            filas_cat = conn.execute('''
+                SELECT pc.id_categoria, pc.id_promocion
+                FROM promocion_categoria pc
+                JOIN promocion p ON p.id_promocion = pc.id_promocion
+                WHERE p.estado_promocion = 'activa'
+            ''').fetchall()
+
+        promociones = {}
+        fronteras = set()
+        for id_prom, nombre, descuento, inicio, fin in filas_promo:
+            if inicio is None or fin is None:
+                continue  # Fecha ilegible: SQLite tampoco la consideraría vigente
+            inicio = datetime.strptime(inicio, '%Y-%m-%d %H:%M:%S')
+            fin = datetime.strptime(fin, '%Y-%m-%d %H:%M:%S')
+            promociones[id_prom] = {'id_promocion': id_prom, 'nombre': nombre,
+                                    'descuento': float(descuento or 0), 'inicio': inicio, 'fin': fin}
+            fronteras.add(inicio)
+            fronteras.add(fin + UN_SEGUNDO)
+
+        por_producto = {}
+        for id_producto, id_prom, descuento_aplicado in filas_prod:
+            if id_prom in promociones:
+                # descuento_aplicado > 0 en la asignación tiene preferencia sobre el de la promoción
+                pct = float(descuento_aplicado) if descuento_aplicado else promociones[id_prom]['descuento']
+                por_producto.setdefault(str(id_producto), []).append((pct, id_prom))
+
+        por_categoria = {}
+        for id_categoria, id_prom in filas_cat:
+            if id_prom in promociones:
+                por_categoria.setdefault(id_categoria, []).append((promociones[id_prom]['descuento'], id_prom))
+
+        with self._lock:
+            self._promociones = promociones
+            self._por_producto = por_producto
+            self._por_categoria = por_categoria
+            self._fronteras = sorted(fronteras)
+            self._version = version
+            self._verificado_en = time.monotonic()
+            self._cargado = True
+            self._reindexar(datetime.now())
+
+    def _reindexar(self, ahora):
+        """Recalcula la mejor promoción vigente por producto/categoría para `ahora`."""
+        vigentes = {id_prom for id_prom, p in self._promociones.items() if p['inicio'] <= ahora <= p['fin']}
+
+        def mejores(asignaciones):
+            resultado = {}
+            for clave, candidatos in asignaciones.items():
+                mejor = None
+                for pct, id_prom in candidatos:
+                    if id_prom in vigentes and (mejor is None or pct > mejor[0]):
+                        mejor = (pct, id_prom)
+                if mejor is not None:
+                    resultado[clave] = mejor
+            return resultado
+
+        self._mejor_producto = mejores(self._por_producto)
+        self._mejor_categoria = mejores(self._por_categoria)
+        self._version_indice += 1
+        i = bisect.bisect_right(self._fronteras, ahora)
+        self._proxima_frontera = self._fronteras[i] if i < len(self._fronteras) else None
+
+    def _asegurar_vigente(self):
+        with self._lock:
+            if not self._cargado:
+                self.recargar()
+                return
+            if self._verificado_en is None or time.monotonic() - self._verificado_en >= self.verificar_cada:
+                self._verificado_en = time.monotonic()
+                if db.version_tablas('promociones') != self._version:
+                    self.recargar()
+                    return
+            if self._proxima_frontera is not None:
+                ahora = datetime.now()
+                if ahora >= self._proxima_frontera:
+                    self._reindexar(ahora)
+
+    def descuento(self, id_producto, id_categoria=None):
+        """(porcentaje, id_promocion) de la mejor promoción vigente; (0.0, None) si no hay.
+
+        Una promoción asignada al producto gana el empate a una asignada a su categoría.
+        """
+        self._asegurar_vigente()
+        return self._mejor(str(id_producto), id_categoria)
+
+    def descuentos(self, ids_productos):
+        """{id_producto: (porcentaje, id_promocion)} para varios productos con una sola verificación."""
+        self._asegurar_vigente()
+        return {str(i): self._mejor(str(i), None) for i in ids_productos}
+
+    def _mejor(self, id_producto, id_categoria):
+        if id_categoria is None:
+            registro = catalogo_cache.obtener(id_producto)
+            id_categoria = registro['id_categoria_productos'] if registro else None
+
+        mejor = self._mejor_producto.get(id_producto)
+        por_categoria = self._mejor_categoria.get(id_categoria)
+        if por_categoria is not None and (mejor is None or por_categoria[0] > mejor[0]):
+            mejor = por_categoria
+        return mejor if mejor is not None else (0.0, None)
+
+    def promocion(self, id_promocion):
+        """Datos de una promoción activa (nombre, descuento, inicio, fin) o None."""
+        self._asegurar_vigente()
+        return self._promociones.get(id_promocion)
+
+
+# Instancia global del motor de promociones
+motor_promociones = MotorPromociones()
 
 
 class PromocionService:
@@ -10,76 +187,22 @@ class PromocionService:
     - Revisa asignaciones a producto (`promocion_producto`) y a categoría (`promocion_categoria`).
     - Si existen varias promociones aplicables toma el mayor porcentaje.
     - Si en `promocion_producto` existe `descuento_aplicado` > 0, ese valor tiene preferencia.
+    Las consultas se resuelven contra el índice en memoria de MotorPromociones.
     """
 
     def __init__(self):
-        pass
+        self.motor = motor_promociones
 
     def obtener_descuento_producto(self, id_producto: str) -> float:
         """Retorna el porcentaje de descuento (0-100) aplicable al producto.
 
-        Busca promociones activas y revisa asignaciones. Devuelve 0.0 si no hay promociones.
+        Devuelve 0.0 si no hay promociones.
         """
-        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        conn = db.get_connection()
-        cur = conn.cursor()
-
-        # Obtener categoría del producto
-        cur.execute('SELECT id_categoria_productos FROM productos WHERE id_producto = ?', (id_producto,))
-        row = cur.fetchone()
-        id_categoria = row[0] if row else None
-
-        # Promociones asignadas directamente al producto (pueden tener descuento_aplicado)
-        cur.execute('''
-            SELECT p.id_promocion, p.descuento, pp.descuento_aplicado
-            FROM promocion p
-            JOIN promocion_producto pp ON pp.id_promocion = p.id_promocion
-            WHERE pp.id_producto = ?
-              AND p.estado_promocion = 'activa'
-              AND datetime(p.fecha_inicio) <= datetime(?)
-              AND datetime(p.fecha_fin) >= datetime(?)
-        ''', (id_producto, now, now))
-        rows_prod = cur.fetchall()
-
-        # Promociones asignadas a la categoría
-        rows_cat = []
-        if id_categoria is not None:
-            cur.execute('''
-                SELECT p.id_promocion, p.descuento
-                FROM promocion p
-                JOIN promocion_categoria pc ON pc.id_promocion = p.id_promocion
-                WHERE pc.id_categoria = ?
-                  AND p.estado_promocion = 'activa'
-                  AND datetime(p.fecha_inicio) <= datetime(?)
-                  AND datetime(p.fecha_fin) >= datetime(?)
-            ''', (id_categoria, now, now))
-            rows_cat = cur.fetchall()
-
-        conn.close()
-
-        candidatos = []  # lista de tuples (pct, id_promocion)
-        # Considerar descuentos por producto (si descuento_aplicado > 0 usarlo, sino usar p.descuento)
-        for r in rows_prod:
-            id_prom, p_desc, pp_desc = r[0], float(r[1]), float(r[2]) if r[2] is not None else 0.0
-            if pp_desc and pp_desc > 0:
-                candidatos.append((pp_desc, id_prom))
-            else:
-                candidatos.append((p_desc, id_prom))
-
-        # Considerar descuentos por categoría
-        for r in rows_cat:
-            id_prom = r[0]
-            p_desc = float(r[1])
-            candidatos.append((p_desc, id_prom))
-
-        if not candidatos:
-            return 0.0
-
-        # Seleccionar el candidato con mayor porcentaje
-        candidatos.sort(key=lambda x: x[0], reverse=True)
-        mejor_pct, mejor_id = candidatos[0]
-        # Guardar el id de promocion aplicada en la respuesta (si se solicita vía item)
-        return mejor_pct
+        return self.motor.descuento(id_producto)[0]
+
+    def obtener_promocion_producto(self, id_producto: str):
+        """Retorna (porcentaje, id_promocion) de la promoción aplicable; (0.0, None) si no hay."""
+        return self.motor.descuento(id_producto)
 
     def aplicar_descuento_a_item(self, item: dict) -> dict:
         """Modifica el `item` del carrito aplicando el porcentaje de promoción si existe.
@@ -87,14 +210,13 @@ class PromocionService:
         Espera que `item` tenga al menos keys: `id`, `precio`, `cantidad`, `base_total` o `total`.
         Retorna el item modificado (mutación in-place también ocurrirá).
         """
-        id_producto = str(item.get('id'))
-        descuento_pct = self.obtener_descuento_producto(id_producto)
-        # recalcular base_total si no existe
-        if 'base_total' in item:
-            base = float(item['base_total'])
-        else:
-            base = float(item.get('precio', 0)) * float(item.get('cantidad', 0))
-            item['base_total'] = base
+        if 'base_total' not in item:
+            item['base_total'] = float(item.get('precio', 0)) * float(item.get('cantidad', 0))
+        return self._aplicar_promocion(item, self.motor.descuento(str(item.get('id'))))
+
+    def _aplicar_promocion(self, item, promocion):
+        descuento_pct, id_promocion = promocion
+        base = float(item['base_total'])
 
         if descuento_pct and descuento_pct > 0:
             descuento_monto = round(base * (descuento_pct / 100.0), 2)
@@ -102,55 +224,7 @@ class PromocionService:
             item['descuento'] = descuento_monto
             item['total'] = nuevo_total
             item['descuento_pct_aplicado'] = float(descuento_pct)
-            # intentar obtener id_promocion aplicado para rastreo
-            try:
-                now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                conn = db.get_connection()
-                cur = conn.cursor()
-                # buscar coincidencias por producto
-                cur.execute('''
-                    SELECT p.id_promocion, p.descuento, pp.descuento_aplicado
-                    FROM promocion p
-                    JOIN promocion_producto pp ON pp.id_promocion = p.id_promocion
-                    WHERE pp.id_producto = ?
-                      AND p.estado_promocion = 'activa'
-                      AND datetime(p.fecha_inicio) <= datetime(?)
-                      AND datetime(p.fecha_fin) >= datetime(?)
-                ''', (id_producto, now, now))
-                rows_prod = cur.fetchall()
-                id_prom_aplicada = None
-                candidatos = []
-                for r in rows_prod:
-                    id_prom, p_desc, pp_desc = r[0], float(r[1]), float(r[2]) if r[2] is not None else 0.0
-                    if pp_desc and pp_desc > 0:
-                        candidatos.append((pp_desc, id_prom))
-                    else:
-                        candidatos.append((p_desc, id_prom))
-
-                # categorias
-                cur.execute('SELECT id_categoria_productos FROM productos WHERE id_producto = ?', (id_producto,))
-                row = cur.fetchone()
-                id_categoria = row[0] if row else None
-                if id_categoria is not None:
-                    cur.execute('''
-                        SELECT p.id_promocion, p.descuento
-                        FROM promocion p
-                        JOIN promocion_categoria pc ON pc.id_promocion = p.id_promocion
-                        WHERE pc.id_categoria = ?
-                          AND p.estado_promocion = 'activa'
-                          AND datetime(p.fecha_inicio) <= datetime(?)
-                          AND datetime(p.fecha_fin) >= datetime(?)
-                    ''', (id_categoria, now, now))
-                    for r in cur.fetchall():
-                        candidatos.append((float(r[1]), r[0]))
-
-                if candidatos:
-                    candidatos.sort(key=lambda x: x[0], reverse=True)
-                    id_prom_aplicada = candidatos[0][1]
-                conn.close()
-                item['id_promocion'] = id_prom_aplicada
-            except Exception:
-                item['id_promocion'] = None
+            item['id_promocion'] = id_promocion
         else:
             item['descuento'] = None
             item['descuento_pct_aplicado'] = 0.0
@@ -158,3 +232,32 @@ class PromocionService:
             item['id_promocion'] = None
 
         return item
+
+    def cotizar_carrito(self, carrito, ids=None):
+        """Calcula precios de todo el carrito en una pasada.
+
+        Resuelve las promociones de todas las líneas con una sola consulta al índice en memoria
+        y actualiza en cada línea base_total, descuento, total, descuento_pct_aplicado e id_promocion.
+
+        Args:
+            carrito: Lista de items con al menos `id`, `precio` y `cantidad`
+            ids: Si se indica, solo se recalculan las líneas de esos productos (las demás
+                 conservan sus valores y solo suman en los totales)
+
+        Returns:
+            Diccionario con base_total, descuento, total y lineas_recalculadas
+        """
+        lineas = [item for item in carrito if ids is None or str(item.get('id')) in ids]
+        promociones = self.motor.descuentos(item.get('id') for item in lineas)
+        for item in lineas:
+            item['base_total'] = float(item.get('precio', 0)) * float(item.get('cantidad', 0))
+            self._aplicar_promocion(item, promociones[str(item.get('id'))])
+
+        base_total = sum(float(item.get('base_total', 0)) for item in carrito)
+        total = sum(float(item.get('total', 0)) for item in carrito)
+        return {
+            'base_total': round(base_total, 2),
+            'descuento': round(base_total - total, 2),
+            'total': round(total, 2),
+            'lineas_recalculadas': len(lineas),
+        }
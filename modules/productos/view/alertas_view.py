@@ -1,13 +1,12 @@
-from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QTableWidget, QTableWidgetItem, 
-                             QHeaderView, QLabel, QPushButton, QAbstractItemView, QHBoxLayout,
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHeaderView, QLabel, QPushButton, QHBoxLayout,
                              QMessageBox, QInputDialog, QDoubleSpinBox)
 from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QColor
-import pandas as pd
 from shared.styles import TITULO
 from modules.productos.service.alertas_service import AlertasService
 from modules.productos.models.producto_model import ProductoModel
 from shared.helpers import formatear_precio
+from shared.components.tabla_productos import (ProductosTableModel, ColumnaTabla, TablaVirtual,
+                                               color_stock_alerta)
 from core.config import THEME_COLOR
 
 class AlertasStockView(QDialog):
@@ -28,17 +27,22 @@ class AlertasStockView(QDialog):
         titulo.setStyleSheet(TITULO)
         layout.addWidget(titulo)
         
-        self.tabla = QTableWidget()
-        self.tabla.setColumnCount(5)
-        self.tabla.setHorizontalHeaderLabels(["ID", "Producto", "Stock Actual", "Stock Mínimo", "Déficit"])
+        self.tabla = TablaVirtual()
+        self.tabla.setStyleSheet("")  # → Conserva el aspecto nativo del diálogo
+        self.modelo = ProductosTableModel([
+            ColumnaTabla("ID", lambda r: str(r['id_producto'])),
+            ColumnaTabla("Producto", lambda r: str(r['nombre_producto'])),
+            ColumnaTabla("Stock Actual", lambda r: str(float(r['stock_producto'] or 0)),
+                         color_texto=Qt.red, negrita=True),
+            ColumnaTabla("Stock Mínimo", lambda r: str(float(r['stock_minimo'] or 0))),
+            ColumnaTabla("Déficit", lambda r: f"-{float(r['stock_minimo'] or 0) - float(r['stock_producto'] or 0)}",
+                         color_texto=Qt.red, negrita=True),
+        ], color_fila=color_stock_alerta, parent=self)
+        self.tabla.setModel(self.modelo)
         
         header = self.tabla.horizontalHeader()
         header.setSectionResizeMode(1, QHeaderView.Stretch)
         
-        self.tabla.setEditTriggers(QAbstractItemView.NoEditTriggers)
-        self.tabla.setSelectionBehavior(QAbstractItemView.SelectRows)
-        self.tabla.setSelectionMode(QAbstractItemView.SingleSelection)
-        
         layout.addWidget(self.tabla)
         
         # Botones
@@ -98,68 +102,22 @@ class AlertasStockView(QDialog):
         layout.addLayout(botones_layout)
 
     def cargarDatos(self):
-        df = self.alertas_service.obtener_productos_bajo_stock()
-        self.tabla.setRowCount(len(df))
-        
-        for row_idx, (_, row) in enumerate(df.iterrows()):
-            try:
-                stock = float(row['Stock'])
-                minimo = float(row['Stock Mínimo'])
-                deficit = minimo - stock
-                
-                # Crear items
-                self.tabla.setItem(row_idx, 0, QTableWidgetItem(str(row['ID'])))
-                self.tabla.setItem(row_idx, 1, QTableWidgetItem(str(row['Nombre'])))
-                
-                item_stock = QTableWidgetItem(str(stock))
-                item_stock.setForeground(Qt.red)
-                item_stock.setFont(self._get_bold_font())
-                self.tabla.setItem(row_idx, 2, item_stock)
-                
-                self.tabla.setItem(row_idx, 3, QTableWidgetItem(str(minimo)))
-                
-                item_deficit = QTableWidgetItem(f"-{deficit}")
-                item_deficit.setForeground(Qt.red)
-                item_deficit.setFont(self._get_bold_font())
-                self.tabla.setItem(row_idx, 4, item_deficit)
-                
-                # Resaltar toda la fila según criticidad
-                if stock <= 0:
-                    # Stock agotado - rojo fuerte
-                    color_fondo = QColor(255, 180, 180)
-                elif stock <= minimo * 0.5:
-                    # Stock crítico - rojo claro
-                    color_fondo = QColor(255, 200, 200)
-                else:
-                    # Stock bajo - naranja claro
-                    color_fondo = QColor(255, 230, 180)
-                
-                for col_idx in range(self.tabla.columnCount()):
-                    self.tabla.item(row_idx, col_idx).setBackground(color_fondo)
-                self.tabla.setItem(row_idx, 4, item_deficit)
-            except Exception as e:
-                print(f"Error mostrando fila alerta: {e}")
-
-    def _get_bold_font(self):
-        from PyQt5.QtGui import QFont
-        font = QFont()
-        font.setBold(True)
-        return font
+        self.modelo.establecer_registros(self.alertas_service.obtener_registros_bajo_stock())
 
     def agregarStock(self):
         """Permite incrementar el stock del producto seleccionado"""
-        fila_seleccionada = self.tabla.currentRow()
+        producto = self.modelo.registro(self.tabla.filaSeleccionada())
         
-        if fila_seleccionada < 0:
+        if producto is None:
             QMessageBox.warning(self, "Sin selección", 
                               "Por favor selecciona un producto de la lista")
             return
         
         # Obtener datos del producto seleccionado
-        id_producto = self.tabla.item(fila_seleccionada, 0).text()
-        nombre_producto = self.tabla.item(fila_seleccionada, 1).text()
-        stock_actual = float(self.tabla.item(fila_seleccionada, 2).text())
-        stock_minimo = float(self.tabla.item(fila_seleccionada, 3).text())
+        id_producto = producto['id_producto']
+        nombre_producto = producto['nombre_producto']
+        stock_actual = float(producto['stock_producto'] or 0)
+        stock_minimo = float(producto['stock_minimo'] or 0)
         
         # Calcular cantidad sugerida (para alcanzar el stock mínimo + 20%)
         cantidad_sugerida = max(0, stock_minimo * 1.2 - stock_actual)
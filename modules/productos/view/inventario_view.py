@@ -1,15 +1,17 @@
 ## Módulo de Inventario
 
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
-                             QPushButton, QTableWidget, QTableWidgetItem, 
+                             QPushButton, QTableWidget, 
                              QHeaderView, QMessageBox, QAbstractItemView)
 from PyQt5.QtCore import Qt, QPoint, QTimer
-from PyQt5.QtGui import QColor, QPixmap
-import pandas as pd
+from PyQt5.QtGui import QPixmap
 import os
-from shared.styles import TablaNoEditableCSS, TITULO
+from shared.styles import TITULO
 from modules.productos.models.producto_model import ProductoModel
+from modules.productos.models.catalogo_cache import catalogo_cache
 from shared.components.forms import ProductoForm, ImagenViewer
+from shared.components.tabla_productos import (ProductosTableModel, ColumnaTabla, TablaVirtual,
+                                               color_stock_inventario)
 from shared.helpers import formatear_precio
 from core.config import *
 
@@ -33,18 +35,20 @@ class InventarioFrame(QWidget):
         titulo.setStyleSheet(TITULO)
         main_layout.addWidget(titulo)
         
-        # Tabla de productos - USAR TABLA PERSONALIZADA NO EDITABLE
-        self.tabla = TablaNoEditable()
-        self.tabla.setStyleSheet(TablaNoEditableCSS)
+        # Tabla de productos - modelo/vista sobre el catálogo en memoria (solo pinta filas visibles)
+        self.tabla = TablaVirtual()
+        self.modelo = ProductosTableModel([
+            ColumnaTabla("ID", lambda r: str(r['id_producto']), Qt.AlignCenter),
+            ColumnaTabla("Nombre", lambda r: str(r['nombre_producto']), Qt.AlignCenter),
+            ColumnaTabla("Categoría", lambda r: r['nombre_categoria'] or 'Sin categoría', Qt.AlignCenter),
+            ColumnaTabla("Tipo", lambda r: r['tipo_corte'] or '', Qt.AlignCenter),
+            ColumnaTabla("Precio", lambda r: formatear_precio(r['precio_producto'] or 0), Qt.AlignCenter),
+            ColumnaTabla("Stock", lambda r: str(int(r['stock_producto'] or 0)), Qt.AlignCenter),
+            ColumnaTabla("Stock Mín", lambda r: str(int(r['stock_minimo'] or 0)), Qt.AlignCenter),
+        ], color_fila=color_stock_inventario, parent=self)
+        self.tabla.setModel(self.modelo)
 
-        # Configurar tabla
-        columnas = ["ID", "Nombre", "Categoría", "Tipo", "Precio", "Stock", "Stock Mín"]
-        self.tabla.setColumnCount(len(columnas))
-        self.tabla.setHorizontalHeaderLabels(columnas)
-        
         # Configurar selección
-        self.tabla.setSelectionBehavior(QAbstractItemView.SelectRows)
-        self.tabla.setSelectionMode(QAbstractItemView.SingleSelection)
         self.tabla.setAlternatingRowColors(True)
         self.tabla.setFocusPolicy(Qt.NoFocus)
         
@@ -57,11 +61,6 @@ class InventarioFrame(QWidget):
         for i, ancho in enumerate(anchos):
             self.tabla.setColumnWidth(i, ancho)
         
-        # Bloquear edición doble clic
-        def no_edit(item):
-            return False
-        self.tabla.itemDoubleClicked.connect(no_edit)
-        
         # Habilitar tracking del mouse para tooltips
         self.tabla.setMouseTracking(True)
         self.tabla.viewport().setMouseTracking(True)
@@ -125,10 +124,9 @@ class InventarioFrame(QWidget):
     def eventFilter(self, obj, event):
         if obj == self.tabla.viewport():
             if event.type() == event.MouseMove:
-                pos = event.pos()
-                item = self.tabla.itemAt(pos)
-                if item:
-                    row = item.row()
+                indice = self.tabla.indexAt(event.pos())
+                if indice.isValid():
+                    row = indice.row()
                     if row != self.current_hover_row:
                         self.current_hover_row = row
                         self.hover_timer.start(500)  # Delay de 500ms
@@ -146,11 +144,12 @@ class InventarioFrame(QWidget):
             return
         
         try:
-            id_producto = self.tabla.item(self.current_hover_row, 0).text()
-            df = self.producto_model.obtener_todos()
-            producto = df[df["ID"] == id_producto].iloc[0]
+            # El modelo ya guarda el registro del catálogo: sin consultas en cada hover
+            producto = self.modelo.registro(self.current_hover_row)
+            if producto is None:
+                return
             
-            ruta_imagen = producto.get("Imagen", "")
+            ruta_imagen = producto.get("imagen") or ""
             if not ruta_imagen or not os.path.exists(ruta_imagen):
                 return
             
@@ -187,45 +186,8 @@ class InventarioFrame(QWidget):
         self.hover_timer.stop()
     
     def mostrarInventario(self):
-        # Limpiar tabla
-        self.tabla.setRowCount(0)
-        # Obtener productos
-        df = self.producto_model.obtener_todos()
-        # Configurar número de filas
-        self.tabla.setRowCount(len(df))
-        # Llenar tabla
-        for row_idx, (_, row) in enumerate(df.iterrows()):
-            precio = formatear_precio(row.get("Precio", 0))
-            stock_actual = int(row["Stock"]) if pd.notna(row["Stock"]) else 0
-            stock_minimo = int(row["Stock Mínimo"]) if pd.notna(row["Stock Mínimo"]) else 0
-        # Llenar celdas
-            values = [
-                str(row["ID"]), 
-                str(row["Nombre"]), 
-                str(row["Categoría"]), 
-                str(row.get("Tipo de Corte", "")),
-                precio, 
-                str(stock_actual), 
-                str(stock_minimo)
-            ]
-        # Llenar fila en la tabla
-            for col_idx, value in enumerate(values):
-                item = QTableWidgetItem(str(value))
-                item.setTextAlignment(Qt.AlignCenter)
-                # IMPORTANTE: Permitir selección completa
-                item.setFlags(Qt.ItemIsSelectable | Qt.ItemIsEnabled | Qt.ItemNeverHasChildren)
-                self.tabla.setItem(row_idx, col_idx, item)
-            # Resaltar productos con stock bajo del mínimo con fondo rojo/naranja
-            if stock_actual <= stock_minimo:
-                # Stock crítico - fondo rojo claro
-                color_fondo = QColor(255, 200, 200)  # Rojo claro
-                for col_idx in range(self.tabla.columnCount()):
-                    self.tabla.item(row_idx, col_idx).setBackground(color_fondo)
-            elif stock_actual <= stock_minimo * 1.5:
-                # Stock bajo - fondo naranja claro
-                color_fondo = QColor(255, 230, 180)  # Naranja claro
-                for col_idx in range(self.tabla.columnCount()):
-                    self.tabla.item(row_idx, col_idx).setBackground(color_fondo)
+        # El modelo solo guarda la lista de registros; el color por stock lo resuelve color_stock_inventario
+        self.modelo.establecer_registros(catalogo_cache.listar())
 
 # → Agrega un nuevo producto al inventario
     def agregarProducto(self):
@@ -234,24 +196,24 @@ class InventarioFrame(QWidget):
 
 # → Modifica el producto seleccionado en el inventario
     def modificarProducto(self):
-        fila_seleccionada = self.tabla.currentRow()
-        if fila_seleccionada < 0:
+        producto = self.modelo.registro(self.tabla.filaSeleccionada())
+        if producto is None:
             QMessageBox.warning(self, "Sin selección", "Selecciona un producto de la tabla")
             return
         
-        id_producto = self.tabla.item(fila_seleccionada, 0).text()
+        id_producto = producto['id_producto']
         formulario = ModificarProductoForm(self, id_producto)
         formulario.exec_()
 
 # → Elimina el producto seleccionado del inventario
     def eliminarProducto(self):
-        fila_seleccionada = self.tabla.currentRow()
-        if fila_seleccionada < 0:
+        producto = self.modelo.registro(self.tabla.filaSeleccionada())
+        if producto is None:
             QMessageBox.warning(self, "Sin selección", "Selecciona un producto de la tabla")
             return
         
-        id_producto = self.tabla.item(fila_seleccionada, 0).text()
-        nombre_producto = self.tabla.item(fila_seleccionada, 1).text()
+        id_producto = producto['id_producto']
+        nombre_producto = producto['nombre_producto']
         
         respuesta = QMessageBox.question(
             self,
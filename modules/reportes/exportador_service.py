@@ -1,149 +1,355 @@
 # PDF / EXCEL Exporter Module
 """Exportador de datos a PDF y Excel.
 Usa reportlab para PDF y openpyxl para Excel.
+
+Ambos formatos se escriben por bloques de filas (de un DataFrame o de un cursor con
+fetchmany), así que exportar un año de transacciones no necesita tener todas las filas
+formateadas en memoria:
+- PDF: cada página es una tabla de alto fijo con el encabezado repetido, dibujada
+  directamente en el canvas; solo las filas de la página actual existen como objetos.
+- Excel: libro openpyxl en modo write_only con formatos numéricos nativos (moneda, enteros,
+  cantidades, fechas) en vez de textos, y el gráfico insertado en la misma pasada.
 """
 import io
-import os
-import tempfile
+import math
+from datetime import datetime
+from itertools import chain, islice
 import pandas as pd
 
-def exportar_pdf(dataframe: pd.DataFrame, filename: str, titulo: str = "Reporte", chart_bytes: bytes = None):
+FILAS_POR_BLOQUE = 1000
+FILAS_MUESTRA = 200  # → filas usadas para deducir formatos y anchos de columna
+
+# number_format de Excel de cada tipo de columna (en PDF se escriben como texto, ver _texto_pdf)
+FORMATOS_EXCEL = {
+    'moneda': '"S/"#,##0.00',
+    'entero': '#,##0',
+    'cantidad': 'General',  # → 2 o 0.75 (productos por peso) tal como son, sin redondear
+    'fecha': 'yyyy-mm-dd hh:mm',
+}
+
+# Página del PDF (puntos)
+MARGEN_PDF = 36
+ALTO_FILA_PDF = 14
+TAMANO_LETRA_PDF = 8
+ANCHO_MINIMO_COLUMNA = 40
+
+# En Excel cada fila mide 20 px por defecto; el gráfico se limita a este ancho
+ALTO_FILA_EXCEL_PX = 20
+ANCHO_GRAFICO_EXCEL_PX = 900
+
+
+def bloques_dataframe(dataframe, tamano=FILAS_POR_BLOQUE):
+    """Filas de `dataframe` como tuplas, en listas de hasta `tamano`."""
+    for inicio in range(0, len(dataframe.index), tamano):
+        yield list(dataframe.iloc[inicio:inicio + tamano].itertuples(index=False, name=None))
+
+
+def bloques_consulta(conn, sql, params=(), tamano=FILAS_POR_BLOQUE):
+    """(columnas, bloques) de una consulta leída con fetchmany; `conn` debe seguir abierta al exportar."""
+    cursor = conn.execute(sql, params)
+    columnas = [d[0] for d in cursor.description]
+
+    def bloques():
+        while True:
+            filas = cursor.fetchmany(tamano)
+            if not filas:
+                return
+            yield filas
+
+    return columnas, bloques()
+
+
+def _es_nulo(valor):
+    return valor is None or (isinstance(valor, float) and math.isnan(valor)) or valor is pd.NaT
+
+
+def _resolver_formatos(columnas, muestra, formatos=None):
+    """Tipo de cada columna: el indicado en `formatos`, 'fecha' si el nombre contiene 'fecha',
+    'moneda' si los valores de la muestra son números y 'texto' en otro caso."""
+    formatos = formatos or {}
+    resultado = []
+    for i, col in enumerate(columnas):
+        if col in formatos:
+            resultado.append(formatos[col])
+        elif 'fecha' in str(col).lower():
+            resultado.append('fecha')
+        else:
+            valores = [fila[i] for fila in muestra if not _es_nulo(fila[i])]
+            numericos = valores and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in valores)
+            resultado.append('moneda' if numericos else 'texto')
+    return resultado
+
+
+def _a_fecha(valor):
+    if isinstance(valor, pd.Timestamp):
+        return valor.to_pydatetime()
+    if isinstance(valor, datetime):
+        return valor
+    texto = str(valor)
+    for formato, largo in (('%Y-%m-%d %H:%M:%S', 19), ('%Y-%m-%d %H:%M', 16), ('%Y-%m-%d', 10)):
+        try:
+            return datetime.strptime(texto[:largo], formato)
+        except ValueError:
+            continue
+    return None
+
+
+def _texto_pdf(valor, formato):
+    if _es_nulo(valor):
+        return ''
+    try:
+        if formato == 'moneda':
+            return f"S/{float(valor):,.2f}"
+        if formato == 'entero':
+            return f"{float(valor):,.0f}"
+        if formato == 'cantidad':
+            return f"{float(valor):,.3f}".rstrip('0').rstrip('.')
+        if formato == 'fecha':
+            fecha = _a_fecha(valor)
+            if fecha is not None:
+                return fecha.strftime('%Y-%m-%d %H:%M')
+    except (TypeError, ValueError):
+        pass
+    return str(valor)
+
+
+def _separar_muestra(bloques):
+    """(primeras filas, iterador de todas las filas) sin leer más que la muestra por adelantado."""
+    filas = chain.from_iterable(bloques)
+    muestra = list(islice(filas, FILAS_MUESTRA))
+    return muestra, chain(muestra, filas)
+
+
+def exportar_pdf(dataframe: pd.DataFrame, filename: str, titulo: str = "Reporte", chart_bytes: bytes = None,
+                 formatos: dict = None):
     """Exporta el DataFrame a PDF usando reportlab. Lanza ImportError con mensaje claro si falta la dependencia."""
+    exportar_pdf_bloques(list(dataframe.columns), bloques_dataframe(dataframe), filename, titulo,
+                         chart_bytes=chart_bytes, formatos=formatos)
+
+
+def exportar_pdf_bloques(columnas, bloques, filename: str, titulo: str = "Reporte", chart_bytes: bytes = None,
+                         formatos: dict = None):
+    """Exporta filas por bloques a PDF, página por página.
+
+    Args:
+        columnas: Nombres de columna (encabezado repetido en cada página)
+        bloques: Iterable de listas de filas (bloques_dataframe / bloques_consulta)
+        chart_bytes: PNG a mostrar en la primera página, bajo el título
+        formatos: {columna: 'moneda' | 'entero' | 'cantidad' | 'fecha' | 'texto'} para corregir el formato deducido
+    """
     try:
         from reportlab.lib.pagesizes import A4, landscape
         from reportlab.lib import colors
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-        from reportlab.platypus import Image as RLImage
-        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.lib.utils import ImageReader
+        from reportlab.pdfbase.pdfmetrics import stringWidth
+        from reportlab.pdfgen import canvas
     except ImportError as e:
         raise ImportError("Falta la dependencia 'reportlab'. Instálala: pip install reportlab") from e
 
-    buffer = io.BytesIO()
     # Use landscape orientation for wider charts/tables
-    doc = SimpleDocTemplate(filename, pagesize=landscape(A4))
-    elements = []
+    ancho_pagina, alto_pagina = landscape(A4)
+    ancho_util = ancho_pagina - 2 * MARGEN_PDF
+    # Páginas comprimidas: reportlab guarda cada página terminada hasta save()
+    lienzo = canvas.Canvas(filename, pagesize=landscape(A4), pageCompression=1)
+    lienzo.setTitle(titulo)
 
-    styles = getSampleStyleSheet()
-    elements.append(Paragraph(titulo, styles['Heading2']))
-    elements.append(Spacer(1, 12))
-
-    # Prepare a display-friendly copy of the dataframe (format dates/numbers)
-    df_display = dataframe.copy()
-    try:
-        # Format datetime-like columns (common name 'fecha')
-        for col in df_display.columns:
-            if 'fecha' in col.lower():
-                try:
-                    df_display[col] = pd.to_datetime(df_display[col]).dt.strftime('%Y-%m-%d %H:%M')
-                except Exception:
-                    pass
-        # Format numeric columns as currency with 2 decimals (prefix S/)
-        num_cols = df_display.select_dtypes(include=['number']).columns.tolist()
-        for nc in num_cols:
-            df_display[nc] = df_display[nc].apply(lambda x: f"S/{x:,.2f}")
-    except Exception:
-        df_display = dataframe.copy()
+    y = alto_pagina - MARGEN_PDF
+    lienzo.setFont('Helvetica-Bold', 14)
+    lienzo.drawString(MARGEN_PDF, y - 14, titulo)
+    y -= 14 + 12
 
     # If chart image bytes provided, insert image first (scaled to fit page)
     if chart_bytes:
         try:
-            img_buf = io.BytesIO(chart_bytes)
-            # attempt to get image size using PIL to preserve aspect ratio and fit within page
-            try:
-                from PIL import Image as PILImage
-                img_buf.seek(0)
-                pil_img = PILImage.open(img_buf)
-                img_w, img_h = pil_img.size  # pixels
-                # compute aspect ratio and scale to fit within doc.width x doc.height (both in points)
-                aspect = img_h / float(img_w) if img_w else 1.0
-                draw_w = doc.width
-                draw_h = draw_w * aspect
-                if draw_h > doc.height:
-                    draw_h = doc.height
-                    draw_w = draw_h / aspect if aspect else draw_w
-                img_buf = io.BytesIO(chart_bytes)
-                img = RLImage(img_buf, width=draw_w, height=draw_h)
-            except Exception:
-                # If PIL not available or fails, scale to doc.width and let reportlab handle
-                img_buf = io.BytesIO(chart_bytes)
-                img = RLImage(img_buf, width=doc.width)
-            elements.append(img)
-            elements.append(Spacer(1, 12))
+            imagen = ImageReader(io.BytesIO(chart_bytes))
+            img_w, img_h = imagen.getSize()
+            aspect = img_h / float(img_w) if img_w else 1.0
+            draw_w = ancho_util
+            draw_h = draw_w * aspect
+            if draw_h > y - MARGEN_PDF:
+                draw_h = y - MARGEN_PDF
+                draw_w = draw_h / aspect if aspect else draw_w
+            lienzo.drawImage(imagen, MARGEN_PDF, y - draw_h, width=draw_w, height=draw_h)
+            y -= draw_h + 12
         except Exception:
             # If embedding fails, continue without image
             pass
 
-    if df_display.empty:
-        elements.append(Paragraph("No hay datos", styles['Normal']))
+    muestra, filas = _separar_muestra(bloques)
+    tipos = _resolver_formatos(columnas, muestra, formatos)
+    encabezado = [str(c) for c in columnas]
+
+    # Anchos fijos para todas las páginas, según el encabezado y la muestra; si no caben, se reducen
+    naturales = []
+    for i, titulo_col in enumerate(encabezado):
+        ancho = stringWidth(titulo_col, 'Helvetica-Bold', TAMANO_LETRA_PDF)
+        for fila in muestra:
+            ancho = max(ancho, stringWidth(_texto_pdf(fila[i], tipos[i]), 'Helvetica', TAMANO_LETRA_PDF))
+        naturales.append(ancho + 12)
+    if sum(naturales) > ancho_util:
+        escala = ancho_util / sum(naturales)
+        naturales = [max(ANCHO_MINIMO_COLUMNA, a * escala) for a in naturales]
+    anchos = naturales
+
+    def recortar(texto, ancho):
+        # Texto más ancho que su columna: se corta con '…' (las filas tienen alto fijo)
+        limite = ancho - 8
+        # Ningún glifo de Helvetica mide más de 1 em: los textos cortos caben sin medirlos
+        if len(texto) * TAMANO_LETRA_PDF <= limite or stringWidth(texto, 'Helvetica', TAMANO_LETRA_PDF) <= limite:
+            return texto
+        bajo, alto = 0, len(texto)  # → búsqueda binaria del prefijo más largo que cabe
+        while bajo < alto:
+            medio = (bajo + alto + 1) // 2
+            if stringWidth(texto[:medio] + '…', 'Helvetica', TAMANO_LETRA_PDF) <= limite:
+                bajo = medio
+            else:
+                alto = medio - 1
+        return texto[:bajo] + '…'
+
+    bordes_x = [MARGEN_PDF]
+    for ancho in anchos:
+        bordes_x.append(bordes_x[-1] + ancho)
+    base_texto = (ALTO_FILA_PDF - TAMANO_LETRA_PDF) / 2 + 1.5  # → texto centrado verticalmente en la fila
+
+    def dibujar_tabla(y_tope, filas_pagina):
+        # Equivale a una Table con encabezado gris y grilla, pero sin su cálculo de layout:
+        # anchos y alto de fila son fijos, así que cada celda es un textOut en un único objeto de texto
+        n = len(filas_pagina) + 1
+        y_base = y_tope - n * ALTO_FILA_PDF
+        lienzo.setFillColor(colors.grey)
+        lienzo.rect(MARGEN_PDF, y_tope - ALTO_FILA_PDF, bordes_x[-1] - MARGEN_PDF, ALTO_FILA_PDF, stroke=0, fill=1)
+
+        texto = lienzo.beginText()
+        texto.setFont('Helvetica-Bold', TAMANO_LETRA_PDF)
+        texto.setFillColor(colors.whitesmoke)
+        for i, titulo_col in enumerate(encabezado):
+            texto.setTextOrigin(bordes_x[i] + 4, y_tope - ALTO_FILA_PDF + base_texto)
+            texto.textOut(recortar(titulo_col, anchos[i]))
+        texto.setFont('Helvetica', TAMANO_LETRA_PDF)
+        texto.setFillColor(colors.black)
+        for r, fila in enumerate(filas_pagina, start=2):
+            y_texto = y_tope - r * ALTO_FILA_PDF + base_texto
+            for i, valor in enumerate(fila):
+                celda = _texto_pdf(valor, tipos[i])
+                if celda:
+                    texto.setTextOrigin(bordes_x[i] + 4, y_texto)
+                    texto.textOut(recortar(celda, anchos[i]))
+        lienzo.drawText(texto)
+
+        lienzo.setStrokeColor(colors.black)
+        lienzo.setLineWidth(0.25)
+        lineas = [(x, y_base, x, y_tope) for x in bordes_x]
+        lineas += [(MARGEN_PDF, y_tope - r * ALTO_FILA_PDF, bordes_x[-1], y_tope - r * ALTO_FILA_PDF)
+                   for r in range(n + 1)]
+        lienzo.lines(lineas)
+
+    def capacidad(y_disponible):
+        return max(0, int((y_disponible - MARGEN_PDF) // ALTO_FILA_PDF) - 1)  # → menos el encabezado
+
+    def pie(numero):
+        lienzo.setFont('Helvetica', 8)
+        lienzo.drawRightString(ancho_pagina - MARGEN_PDF, MARGEN_PDF / 2, f"Página {numero}")
+
+    pagina = 1
+    if not muestra:
+        lienzo.setFont('Helvetica', 10)
+        lienzo.drawString(MARGEN_PDF, y - 12, "No hay datos")
     else:
-        # Convertir dataframe a lista de listas
-        data = [list(df_display.columns)] + df_display.values.tolist()
-        table = Table(data, hAlign='LEFT')
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('GRID', (0, 0), (-1, -1), 0.25, colors.black),
-        ]))
-        elements.append(table)
-
-    doc.build(elements)
-
-def exportar_excel(dataframe: pd.DataFrame, filename: str, sheet_name: str = 'Sheet1', chart_bytes: bytes = None):
-    """Exporta el DataFrame a Excel usando openpyxl engine. Lanza ImportError con mensaje claro si falta openpyxl."""
+        # Si bajo el gráfico no caben unas pocas filas, la tabla empieza en la página siguiente
+        if capacidad(y) < 3:
+            pie(pagina)
+            lienzo.showPage()
+            pagina += 1
+            y = alto_pagina - MARGEN_PDF
+        lote = list(islice(filas, capacidad(y)))
+        while lote:
+            dibujar_tabla(y, lote)
+            y = alto_pagina - MARGEN_PDF
+            lote = list(islice(filas, capacidad(y)))
+            if lote:
+                pie(pagina)
+                lienzo.showPage()
+                pagina += 1
+    pie(pagina)
+    lienzo.save()
+
+
+def exportar_excel(dataframe: pd.DataFrame, filename: str, sheet_name: str = 'Sheet1', chart_bytes: bytes = None,
+                   formatos: dict = None):
+    """Exporta el DataFrame a Excel usando openpyxl. Lanza ImportError con mensaje claro si falta openpyxl."""
+    exportar_excel_bloques(list(dataframe.columns), bloques_dataframe(dataframe), filename, sheet_name,
+                           chart_bytes=chart_bytes, formatos=formatos)
+
+
+def exportar_excel_bloques(columnas, bloques, filename: str, sheet_name: str = 'Sheet1', chart_bytes: bytes = None,
+                           formatos: dict = None):
+    """Exporta filas por bloques a un libro openpyxl write_only (memoria constante).
+
+    Los números y fechas se guardan como valores nativos con su number_format (ver FORMATOS_EXCEL),
+    así que se pueden sumar y ordenar en Excel. El gráfico va en A1 y los datos debajo.
+    """
     try:
-        import openpyxl  # noqa: F401
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font
     except ImportError as e:
         raise ImportError("Falta la dependencia 'openpyxl'. Instálala: pip install openpyxl") from e
 
-    # Basic export without chart
-    def _write_without_chart(startrow=None, chart_tmpfile=None):
-        # Prepare a formatted copy for excel
-        df_out = dataframe.copy()
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet(title=str(sheet_name)[:31])  # → Excel limita el nombre a 31 caracteres
+
+    if chart_bytes:
         try:
-            for col in df_out.columns:
-                if 'fecha' in col.lower():
-                    try:
-                        df_out[col] = pd.to_datetime(df_out[col]).dt.strftime('%Y-%m-%d %H:%M')
-                    except Exception:
-                        pass
-            num_cols = df_out.select_dtypes(include=['number']).columns.tolist()
-            for nc in num_cols:
-                df_out[nc] = df_out[nc].apply(lambda x: f"S/{x:,.2f}")
+            from openpyxl.drawing.image import Image as XLImage
+            imagen = XLImage(io.BytesIO(chart_bytes))
+            if imagen.width > ANCHO_GRAFICO_EXCEL_PX:
+                escala = ANCHO_GRAFICO_EXCEL_PX / float(imagen.width)
+                imagen.width = int(imagen.width * escala)
+                imagen.height = int(imagen.height * escala)
+            imagen.anchor = 'A1'
+            hoja.add_image(imagen)
+            # Filas vacías bajo la imagen para que la tabla empiece después del gráfico
+            for _ in range(math.ceil(imagen.height / ALTO_FILA_EXCEL_PX) + 1):
+                hoja.append([])
         except Exception:
-            df_out = dataframe.copy()
+            # Sin Pillow (o PNG ilegible) se exportan solo los datos
+            pass
 
-        kwargs = {}
-        if startrow is not None:
-            kwargs['startrow'] = startrow
-        with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-            df_out.to_excel(writer, sheet_name=sheet_name, index=False, **kwargs)
+    muestra, filas = _separar_muestra(bloques)
+    tipos = _resolver_formatos(columnas, muestra, formatos)
 
-        # If chart file provided, insert it using openpyxl after writer has closed
-        if chart_tmpfile:
-            from openpyxl import load_workbook
-            from openpyxl.drawing.image import Image as XLImage
-            wb = load_workbook(filename)
-            ws = wb[sheet_name]
-            img = XLImage(chart_tmpfile)
-            ws.add_image(img, 'A1')
-            wb.save(filename)
+    negrita = Font(bold=True)
+    encabezado = []
+    for col in columnas:
+        celda = WriteOnlyCell(hoja, value=str(col))
+        celda.font = negrita
+        encabezado.append(celda)
+    hoja.append(encabezado)
 
-    # By default, write data starting at row 15 so there is room for the chart
-    if chart_bytes:
-        # create a temporary file for the PNG image
-        tmp = None
-        try:
-            tmpf = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
-            tmpf.write(chart_bytes)
-            tmpf.close()
-            tmp = tmpf.name
-            _write_without_chart(startrow=15, chart_tmpfile=tmp)
-        finally:
-            if tmp and os.path.exists(tmp):
+    for fila in filas:
+        valores = []
+        for valor, tipo in zip(fila, tipos):
+            if _es_nulo(valor):
+                valores.append(None)
+                continue
+            if tipo == 'texto':
+                valores.append(valor if isinstance(valor, (int, float, str)) else str(valor))
+                continue
+            if tipo == 'fecha':
+                fecha = _a_fecha(valor)
+                if fecha is None:
+                    valores.append(str(valor))
+                    continue
+                valor = fecha
+            else:
                 try:
-                    os.remove(tmp)
-                except Exception:
-                    pass
-    else:
-        _write_without_chart(startrow=15)
\ No newline at end of file
+                    valor = int(round(float(valor))) if tipo == 'entero' else float(valor)
+                except (TypeError, ValueError):
+                    valores.append(str(valor))
+                    continue
+            celda = WriteOnlyCell(hoja, value=valor)
+            celda.number_format = FORMATOS_EXCEL[tipo]
+            valores.append(celda)
+        hoja.append(valores)
+
+    libro.save(filename)
@@ -0,0 +1,239 @@
+## Gráficos de reportes como imágenes PNG, con caché
+# Se dibujan con el backend Agg (sin widgets de Qt): la misma imagen se muestra en pantalla
+# y se incrusta en las exportaciones a PDF/Excel. Cada imagen se guarda con la clave
+# (reporte, desde, hasta, periodo, versión de datos): si los datos no cambiaron, volver a
+# actualizar o exportar el mismo rango no repite ningún trabajo de matplotlib.
+
+import io
+import math
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+try:
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    import matplotlib.dates as mdates
+    MATPLOTLIB_DISPONIBLE = True
+except ImportError:
+    MATPLOTLIB_DISPONIBLE = False
+
+DPI_GRAFICOS = 150  # → resolución de exportación; en pantalla se escala
+
+
+class CacheGraficos:
+    """Caché LRU de imágenes PNG de gráficos.
+
+    La clave incluye la versión de datos del grupo 'reportes' (versiones_tablas): cualquier
+    venta, devolución o cambio de nombre de producto la incrementa, así que una imagen
+    guardada nunca se muestra con datos distintos a los que la generaron.
+    """
+
+    def __init__(self, max_imagenes=32):
+        self.max_imagenes = max_imagenes
+        self._lock = threading.Lock()
+        self._imagenes = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave, dibujar):
+        """PNG de `clave`; si no está guardado lo genera con `dibujar()` y lo guarda."""
+        with self._lock:
+            png = self._imagenes.get(clave)
+            if png is not None:
+                self._imagenes.move_to_end(clave)
+                self.aciertos += 1
+                return png
+            self.fallos += 1
+        png = dibujar()
+        with self._lock:
+            self._imagenes[clave] = png
+            self._imagenes.move_to_end(clave)
+            while len(self._imagenes) > self.max_imagenes:
+                self._imagenes.popitem(last=False)
+        return png
+
+    def limpiar(self):
+        with self._lock:
+            self._imagenes.clear()
+
+
+# Instancia global del caché de gráficos
+cache_graficos = CacheGraficos()
+
+
+def _nueva_figura(figsize):
+    fig = Figure(figsize=figsize, facecolor='white')
+    FigureCanvasAgg(fig)
+    return fig, fig.add_subplot(111)
+
+
+def _a_png(fig):
+    try:
+        fig.tight_layout()
+    except Exception:
+        pass
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', bbox_inches='tight', dpi=DPI_GRAFICOS)
+    return buf.getvalue()
+
+
+def _estilo_ejes(ax, grid_axis='both'):
+    # Grid más sutil y profesional
+    ax.grid(True, axis=grid_axis, linestyle='--', alpha=0.3, color='#bdc3c7', linewidth=0.8)
+    ax.set_facecolor('#f8f9fa')
+    # Agregar borde al gráfico
+    for spine in ax.spines.values():
+        spine.set_edgecolor('#bdc3c7')
+        spine.set_linewidth(1.5)
+
+
+def grafico_ventas(serie, periodo, fecha_desde, fecha_hasta):
+    """Línea de ventas netas agregadas por periodo, con el eje X ajustado al rango elegido."""
+    fig, ax1 = _nueva_figura((10, 4))
+    if serie.empty:
+        ax1.text(0.5, 0.5, 'No hay ventas en el rango seleccionado', ha='center')
+        return _a_png(fig)
+
+    ax1.xaxis_date()
+    # choose locator/formatter but adapt interval to avoid too many ticks
+    n_points = len(serie.index)
+    interval = max(1, math.ceil(n_points / 10)) if n_points > 10 else 1
+    if periodo == 'Diario':
+        locator = mdates.DayLocator(interval=interval)
+        fmt = mdates.DateFormatter('%d-%b')
+    elif periodo == 'Semanal':
+        locator = mdates.WeekdayLocator(byweekday=mdates.MO, interval=interval)
+        fmt = mdates.DateFormatter('%d-%b')
+    else:  # Mensual
+        locator = mdates.MonthLocator(interval=interval)
+        fmt = mdates.DateFormatter('%b %Y')
+    ax1.xaxis.set_major_locator(locator)
+    ax1.xaxis.set_major_formatter(fmt)
+
+    # Plot using the aggregated series that is used for the table
+    serie.plot(ax=ax1, marker='o', linewidth=2.5, markersize=8,
+               color='#3498db', markerfacecolor='#2980b9',
+               markeredgecolor='white', markeredgewidth=2)
+    # Agregar área de relleno bajo la línea
+    ax1.fill_between(serie.index, serie.values, alpha=0.3, color='#3498db')
+
+    ax1.set_title(f"Ventas ({periodo})", fontsize=16, fontweight='bold', color='#2c3e50', pad=20)
+    ax1.set_ylabel('Total neto (S/.)', fontsize=12, fontweight='bold', color='#34495e')
+    ax1.set_xlabel('Fecha', fontsize=12, fontweight='bold', color='#34495e')
+    _estilo_ejes(ax1)
+
+    # Mejorar los ticks
+    ax1.tick_params(colors='#34495e', labelsize=10)
+    for lbl in ax1.get_xticklabels():
+        lbl.set_rotation(45)
+        lbl.set_ha('right')
+
+    # Extremos del eje X = Desde/Hasta (día completo) más un 1% de margen para el último punto
+    start_dt = datetime(fecha_desde.year, fecha_desde.month, fecha_desde.day)
+    end_dt = datetime(fecha_hasta.year, fecha_hasta.month, fecha_hasta.day, 23, 59, 59)
+    end_dt += timedelta(seconds=max(1, (end_dt - start_dt).total_seconds() * 0.01))
+    ax1.set_xlim(start_dt, end_dt)
+    return _a_png(fig)
+
+
+def grafico_productos(df_p):
+    """Barras de los 10 productos más vendidos."""
+    fig, ax2 = _nueva_figura((12, 5))
+    if df_p.empty:
+        ax2.text(0.5, 0.5, 'No hay datos', ha='center')
+        return _a_png(fig)
+
+    names = df_p['producto_nombre'].astype(str).tolist()
+    values = df_p['total_vendido'].tolist()
+    positions = list(range(len(names)))
+
+    # Crear gradiente de colores del más oscuro al más claro
+    colors = ['#1f77b4', '#2980b9', '#3498db', '#5dade2', '#7fb3d5',
+              '#a2c4e0', '#aed6f1', '#d4e6f1', '#e8f4f8', '#f0f8ff']
+    bars = ax2.bar(positions, values, color=colors[:len(names)], width=0.7,
+                   edgecolor='white', linewidth=2)
+
+    # Agregar valores sobre las barras
+    for bar, val in zip(bars, values):
+        ax2.text(bar.get_x() + bar.get_width() / 2., bar.get_height(),
+                 f'{int(val)}', ha='center', va='bottom',
+                 fontweight='bold', fontsize=10, color='#2c3e50')
+
+    ax2.set_xticks(positions)
+    # Truncar nombres largos y reducir font size
+    truncated_names = [name[:20] + '...' if len(name) > 20 else name for name in names]
+    ax2.set_xticklabels(truncated_names, rotation=30, ha='right', fontsize=8)
+    ax2.tick_params(axis='x', which='major', labelsize=8, colors='#34495e')
+    ax2.tick_params(axis='y', colors='#34495e')
+
+    ax2.set_title('Top 10 Productos más vendidos', fontsize=16, fontweight='bold', color='#2c3e50', pad=20)
+    ax2.set_ylabel('Cantidad vendida', fontsize=12, fontweight='bold', color='#34495e')
+    ax2.set_xlabel('Productos', fontsize=12, fontweight='bold', color='#34495e')
+    _estilo_ejes(ax2, grid_axis='y')
+    fig.subplots_adjust(bottom=0.15, top=0.92)
+    return _a_png(fig)
+
+
+def grafico_ganancias(totales):
+    """Barras de bruto, descuentos y neto del rango; `totales` = (bruto, descuentos, neto) o None."""
+    fig, ax3 = _nueva_figura((10, 4))
+    if totales is None:
+        ax3.text(0.5, 0.5, 'No hay datos para Ganancias/Pérdidas en el rango', ha='center')
+        return _a_png(fig)
+
+    labels = ['Bruto', 'Descuentos', 'Neto']
+    values = list(totales)
+    bars = ax3.bar(labels, values, color=['#27ae60', '#e74c3c', '#3498db'], width=0.6,
+                   edgecolor='white', linewidth=2)
+
+    # Agregar valores sobre las barras
+    for bar, val in zip(bars, values):
+        ax3.text(bar.get_x() + bar.get_width() / 2., bar.get_height(),
+                 f'${val:.2f}', ha='center', va='bottom',
+                 fontweight='bold', fontsize=12, color='#2c3e50')
+
+    ax3.set_title('Resumen de ingresos y descuentos', fontsize=16, fontweight='bold', color='#2c3e50', pad=20)
+    ax3.set_ylabel('Monto (S/.)', fontsize=12, fontweight='bold', color='#34495e')
+    _estilo_ejes(ax3, grid_axis='y')
+    # Mejorar ticks
+    ax3.tick_params(colors='#34495e', labelsize=11)
+    return _a_png(fig)
+
+
+def imagen_grafico(reporte, datos, consulta):
+    """PNG del gráfico `reporte` ('ventas', 'productos' o 'ganancias') desde el caché.
+
+    `datos` es el resultado de cargar_*() (incluye 'version') y `consulta` = (desde, hasta, periodo).
+    El periodo solo forma parte de la clave del gráfico de ventas, el único que agrega por periodo.
+    """
+    fecha_desde, fecha_hasta, periodo = consulta
+    if reporte == 'ventas':
+        dibujar = lambda: grafico_ventas(datos['serie'], periodo, fecha_desde, fecha_hasta)
+    elif reporte == 'productos':
+        dibujar = lambda: grafico_productos(datos['df'])
+    else:
+        dibujar = lambda: grafico_ganancias(datos['totales'])
+    if datos.get('version') is None:
+        return dibujar()  # → Datos sin versión (carga fallida): no se guardan
+    clave = (reporte, fecha_desde, fecha_hasta, periodo if reporte == 'ventas' else None, datos['version'])
+    return cache_graficos.obtener(clave, dibujar)
+
+
+def con_imagenes(datos, reportes, consulta):
+    """Agrega a `datos` el PNG de cada reporte en datos['png'] y lo devuelve.
+
+    Pensado para la tarea de CargaAsincrona que produjo `datos`: cada venta cambia la versión
+    de 'reportes', así que casi siempre hay que dibujar, y eso no debe ocurrir en el hilo de la
+    GUI (Agg sobre figuras propias y el caché con lock lo permiten). Un gráfico que falla queda
+    como None.
+    """
+    imagenes = {}
+    for reporte in reportes:
+        try:
+            imagenes[reporte] = imagen_grafico(reporte, datos, consulta)
+        except Exception as e:
+            print(f"Error dibujando gráfico de {reporte}: {e}")
+            imagenes[reporte] = None
+    datos['png'] = imagenes
+    return datos
@@ -0,0 +1,128 @@
+## Consultas de reportes - Sistema Minimarket
+# Todas filtran fechas con rango_dias()/filtro_fechas() para usar los índices; quedan
+# registradas para que herramientas/verificar_planes.py revise que ninguna recorra la tabla.
+
+import pandas as pd
+from core.rango_fechas import filtro_fechas, registrar_consulta
+
+# → Primer día con ventas (para el rango por defecto de los reportes)
+SQL_PRIMERA_FECHA_VENTA = registrar_consulta('reportes_primera_fecha', '''
+    SELECT MIN(fecha) FROM resumen_ventas_dia WHERE num_ventas > 0 AND fecha > ''
+''')
+
+# → Ventas por periodo: una fila por día desde resumen_ventas_dia
+SQL_VENTAS_PERIODO = registrar_consulta('reportes_ventas_periodo', f'''
+    SELECT fecha AS fecha_venta, total_venta, descuento_venta
+    FROM resumen_ventas_dia
+    WHERE {filtro_fechas('fecha')} AND num_ventas > 0
+    ORDER BY fecha ASC
+''')
+
+# → Top 10 productos desde resumen_ventas_producto
+SQL_PRODUCTOS_TOP = registrar_consulta('reportes_productos_top', f'''
+    SELECT p.nombre_producto as producto_nombre, SUM(r.cantidad) as total_vendido, SUM(r.ingresos) as ingresos_totales
+    FROM resumen_ventas_producto r
+    JOIN productos p ON r.id_producto = p.id_producto
+    WHERE {filtro_fechas('r.fecha')}
+    GROUP BY r.id_producto, p.nombre_producto
+    HAVING SUM(r.num_lineas) > 0
+    ORDER BY total_vendido DESC
+    LIMIT 10
+''')
+
+# → Comprobantes emitidos en el rango
+SQL_COMPROBANTES = registrar_consulta('reportes_comprobantes', f'''
+    SELECT 
+        c.id_comprobante as ID,
+        c.tipo_comprobante as Tipo,
+        c.serie_comprobante || '-' || c.numero_comprobante as Serie_Numero,
+        c.fecha_emision_comprobante as Fecha_Emision,
+        c.nombre_cliente as Cliente,
+        c.num_documento as DNI,
+        c.razon_social as Razon_Social,
+        c.ruc_emisor as RUC,
+        c.monto_total_comprobante as Monto_Total,
+        v.metodo_pago as Metodo_Pago,
+        c.estado_sunat as Estado_SUNAT
+    FROM comprobante c
+    INNER JOIN ventas v ON c.id_venta = v.id_venta
+    WHERE {filtro_fechas('c.fecha_emision_comprobante')}
+    ORDER BY c.fecha_emision_comprobante DESC
+''')
+
+
+# ---------------------------------------------------------------------------
+# Carga de datos de cada pestaña. Se ejecutan en hilos de CargaAsincrona: reciben
+# su propia conexión, no tocan widgets y devuelven todo listo para dibujar.
+# ---------------------------------------------------------------------------
+
+FRECUENCIAS_PERIODO = {'Diario': 'D', 'Semanal': 'W', 'Mensual': 'M'}
+
+# → Versión de los datos de reportes (la incrementan los triggers de la migración 9)
+SQL_VERSION_REPORTES = "SELECT version FROM versiones_tablas WHERE grupo = 'reportes'"
+
+
+def _version_reportes(conn):
+    # Se lee antes que los datos: si cambian entre medio, la próxima carga verá otra versión
+    fila = conn.execute(SQL_VERSION_REPORTES).fetchone()
+    return fila[0] if fila else None
+
+
+def _filas_texto(df):
+    """Valores de `df` como texto, fila por fila, para llenar una tabla sin recorrer celdas con iloc."""
+    return [[str(valor) for valor in fila] for fila in df.itertuples(index=False)]
+
+
+def cargar_ventas_periodo(conn, rango, periodo):
+    """Ventas por día del rango, su serie agregada por periodo y los totales bruto/descuento/neto."""
+    version = _version_reportes(conn)
+    df_v = pd.read_sql_query(SQL_VENTAS_PERIODO, conn, params=rango, parse_dates=['fecha_venta'])
+    if not df_v.empty:
+        df_v['fecha_venta'] = pd.to_datetime(df_v['fecha_venta'])
+        df_v.set_index('fecha_venta', inplace=True)
+        # ensure numeric columns are usable (fill NaN/None)
+        df_v['total_venta'] = df_v['total_venta'].fillna(0).astype(float)
+        df_v['descuento_venta'] = df_v['descuento_venta'].fillna(0).astype(float)
+        # total stored is net after discount; compute gross = total + descuento
+        df_v['gross'] = df_v['total_venta'] + df_v['descuento_venta']
+        serie = df_v['total_venta'].resample(FRECUENCIAS_PERIODO.get(periodo, 'D')).sum()
+        totales = (df_v['gross'].sum(), df_v['descuento_venta'].sum(), df_v['total_venta'].sum())
+    else:
+        serie = pd.Series([], dtype=float)
+        totales = None
+
+    # Versión sin índice para la tabla y las exportaciones
+    df_tabla = df_v.reset_index()
+    return {'df': df_v, 'serie': serie, 'totales': totales, 'version': version,
+            'tabla': df_tabla, 'filas': _filas_texto(df_tabla)}
+
+
+def cargar_productos_top(conn, rango):
+    """Top 10 de productos del rango."""
+    version = _version_reportes(conn)
+    df_p = pd.read_sql_query(SQL_PRODUCTOS_TOP, conn, params=rango)
+    return {'df': df_p, 'version': version, 'filas': _filas_texto(df_p)}
+
+
+def cargar_comprobantes(conn, rango):
+    """Comprobantes del rango con las celdas de la tabla ya resueltas.
+
+    Cada fila: (id, tipo, serie-número, fecha, cliente, documento, monto, método de pago, estado SUNAT).
+    En facturas se muestran razón social y RUC; en boletas, nombre y DNI.
+    """
+    df_comp = pd.read_sql_query(SQL_COMPROBANTES, conn, params=rango)
+    filas = []
+    for c in df_comp.itertuples(index=False):
+        tipo = str(c.Tipo).upper()
+        if tipo == 'FACTURA' and pd.notna(c.Razon_Social):
+            cliente = str(c.Razon_Social)
+        else:
+            cliente = str(c.Cliente)
+        if tipo == 'FACTURA' and pd.notna(c.RUC):
+            doc = str(c.RUC)
+        else:
+            doc = str(c.DNI) if pd.notna(c.DNI) else '-'
+        estado = str(c.Estado_SUNAT) if pd.notna(c.Estado_SUNAT) else 'PENDIENTE'
+        filas.append((str(c.ID), tipo, str(c.Serie_Numero), str(c.Fecha_Emision)[:19], cliente, doc,
+                      f"S/ {float(c.Monto_Total):.2f}", str(c.Metodo_Pago).lower(), estado))
+    return {'df': df_comp, 'filas': filas}
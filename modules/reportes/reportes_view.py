@@ -15,18 +15,77 @@ y pérdidas para evaluar la salud financiera del minimarket.
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
                              QPushButton, QTabWidget, QDateEdit, QComboBox, QFileDialog, QMessageBox,
                              QTableWidget, QTableWidgetItem, QSizePolicy)
-from PyQt5.QtCore import Qt, QDate
+from PyQt5.QtCore import Qt, QDate, QTimer
+from PyQt5.QtGui import QPixmap
 from shared.styles import TITULO, TablaNoEditableCSS
 from modules.ventas.service.venta_service import VentaService
-from modules.reportes.exportador_service import exportar_pdf, exportar_excel
+from modules.reportes.exportador_service import (exportar_pdf_bloques, exportar_excel_bloques,
+                                                 bloques_dataframe, bloques_consulta)
+from modules.reportes.reporte_service import (SQL_PRIMERA_FECHA_VENTA, SQL_COMPROBANTES, cargar_ventas_periodo,
+                                              cargar_productos_top, cargar_comprobantes)
+from core.rango_fechas import rango_dias
+from modules.reportes.graficos_service import MATPLOTLIB_DISPONIBLE, imagen_grafico, con_imagenes
+from shared.components.carga_async import CargaAsincrona
 from modules.productos.view.inventario_view import TablaNoEditable
 import pandas as pd
 from core.database import db
 
+class GraficoImagen(QLabel):
+    """Muestra el PNG de un gráfico (graficos_service) escalado al espacio disponible."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.png = None  # → imagen mostrada; se reutiliza tal cual al exportar
+        self._original = QPixmap()
+        self.setAlignment(Qt.AlignCenter)
+        self.setStyleSheet("background-color: white;")
+        # Tamaño mínimo explícito: sin él, el layout no podría achicar la imagen ya escalada
+        self.setMinimumSize(200, 150)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+
+    def mostrar(self, png):
+        self.png = png
+        self._original.loadFromData(png, 'PNG')
+        self._escalar()
+
+    def limpiar(self):
+        self.png = None
+        self._original = QPixmap()
+        self.clear()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._escalar()
+
+    def _escalar(self):
+        if not self._original.isNull():
+            self.setPixmap(self._original.scaled(self.contentsRect().size(), Qt.KeepAspectRatio,
+                                                 Qt.SmoothTransformation))
+
+
 class ReportesFrame(QWidget):
+    # Pestaña → datos que dibuja (Ventas y Ganancias comparten la misma consulta)
+    DATOS_POR_TAB = {0: 'ventas', 1: 'productos', 2: 'ventas', 3: 'comprobantes'}
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.venta_service = VentaService()  # Usar Service en vez de Model
+
+        # Consultas y agregaciones en segundo plano; solo se dibuja la pestaña visible
+        self._datos = {}            # → clave -> resultado de cargar_*
+        self._tabs_sucias = set()   # → pestañas con datos nuevos aún sin dibujar
+        self._consulta = None       # → (desde, hasta, periodo) de los datos cargados
+        self._carga = CargaAsincrona(self)
+        self._carga.resultado.connect(self._al_cargar)
+        self._carga.error.connect(self._al_fallar_carga)
+        self._carga.terminado.connect(self._al_terminar_carga)
+
+        # Al cambiar un filtro se espera a que el usuario termine antes de recalcular
+        self._timer_actualizar = QTimer(self)
+        self._timer_actualizar.setSingleShot(True)
+        self._timer_actualizar.setInterval(400)
+        self._timer_actualizar.timeout.connect(self.actualizar)
+
         self.init_ui()
 
     def init_ui(self):
@@ -120,6 +179,10 @@ class ReportesFrame(QWidget):
 
         filtros_layout.addStretch()
 
+        self.lbl_estado = QLabel("")
+        self.lbl_estado.setStyleSheet("QLabel { color: #7f8c8d; font-size: 12px; }")
+        filtros_layout.addWidget(self.lbl_estado)
+
         btn_refresh = QPushButton("Actualizar")
         btn_refresh.setStyleSheet("""
             QPushButton {
@@ -140,6 +203,9 @@ class ReportesFrame(QWidget):
             }
         """)
         btn_refresh.clicked.connect(self.actualizar)
+        self.fecha_desde.dateChanged.connect(self._programar_actualizacion)
+        self.fecha_hasta.dateChanged.connect(self._programar_actualizacion)
+        self.combo_periodo.currentIndexChanged.connect(self._programar_actualizacion)
         filtros_layout.addWidget(btn_refresh)
         layout.addWidget(filtros_widget)
 
@@ -177,25 +243,9 @@ class ReportesFrame(QWidget):
         v1.setSpacing(15)
         self.tab_ventas.setMinimumWidth(300)
 
-        # Try to import matplotlib and prepare canvases; if missing, show a helpful label
-        try:
-            from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-            from matplotlib.figure import Figure
-            self._has_mpl = True
-        except Exception:
-            self._has_mpl = False
-
-        if self._has_mpl:
-            self.canvas1 = FigureCanvas(Figure(figsize=(10, 4), facecolor='white'))
-            # allow canvas to expand and resize
-            self.canvas1.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
-            v1.addWidget(self.canvas1)
-            self.placeholder1 = None
-        else:
-            self.canvas1 = None
-            self.placeholder1 = QLabel("Matplotlib no está instalado. Instala: pip install matplotlib")
-            self.placeholder1.setStyleSheet('color: red;')
-            v1.addWidget(self.placeholder1)
+        # Los gráficos se dibujan como imágenes con matplotlib (Agg); si falta, se muestra un aviso
+        self._has_mpl = MATPLOTLIB_DISPONIBLE
+        self.grafico1 = self._crear_grafico(v1)
         self.tabs.addTab(self.tab_ventas, "Ventas por periodo")
         # Tabla debajo del gráfico (ventas)
         self.table_ventas = TablaNoEditable()
@@ -207,17 +257,7 @@ class ReportesFrame(QWidget):
         v2 = QVBoxLayout(self.tab_prod)
         v2.setContentsMargins(15, 15, 15, 15)
         v2.setSpacing(15)
-        if self._has_mpl:
-            # make canvas wider and slightly taller so bars have room
-            self.canvas2 = FigureCanvas(Figure(figsize=(12, 5), facecolor='white'))
-            self.canvas2.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
-            v2.addWidget(self.canvas2)
-            self.placeholder2 = None
-        else:
-            self.canvas2 = None
-            self.placeholder2 = QLabel("Matplotlib no está instalado. Instala: pip install matplotlib")
-            self.placeholder2.setStyleSheet('color: red;')
-            v2.addWidget(self.placeholder2)
+        self.grafico2 = self._crear_grafico(v2)
         self.tabs.addTab(self.tab_prod, "Productos Top 10")
         # Tabla debajo del gráfico (productos)
         self.table_prod = TablaNoEditable()
@@ -229,16 +269,7 @@ class ReportesFrame(QWidget):
         v3 = QVBoxLayout(self.tab_gan)
         v3.setContentsMargins(15, 15, 15, 15)
         v3.setSpacing(15)
-        if self._has_mpl:
-            self.canvas3 = FigureCanvas(Figure(figsize=(10, 4), facecolor='white'))
-            self.canvas3.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
-            v3.addWidget(self.canvas3)
-            self.placeholder3 = None
-        else:
-            self.canvas3 = None
-            self.placeholder3 = QLabel("Matplotlib no está instalado. Instala: pip install matplotlib")
-            self.placeholder3.setStyleSheet('color: red;')
-            v3.addWidget(self.placeholder3)
+        self.grafico3 = self._crear_grafico(v3)
         self.tabs.addTab(self.tab_gan, "Ganancias/Pérdidas")
         # Tabla debajo del gráfico (resumen)
         self.table_gan = TablaNoEditable()
@@ -366,6 +397,32 @@ class ReportesFrame(QWidget):
         # Inicializar gráficos
         self.actualizar()
 
+# → Gráfico de una pestaña (o aviso si matplotlib no está instalado)
+    def _crear_grafico(self, layout):
+        if self._has_mpl:
+            grafico = GraficoImagen()
+            layout.addWidget(grafico)
+            return grafico
+        placeholder = QLabel("Matplotlib no está instalado. Instala: pip install matplotlib")
+        placeholder.setStyleSheet('color: red;')
+        layout.addWidget(placeholder)
+        return None
+
+    def _mostrar_grafico(self, grafico, reporte, datos):
+        # El PNG llega dibujado desde la tarea de carga; solo una carga fallida (datos vacíos,
+        # sin 'png') se dibuja aquí, y es el aviso de "sin datos"
+        if grafico is None:
+            return
+        try:
+            imagenes = datos.get('png')
+            png = imagenes.get(reporte) if imagenes is not None else imagen_grafico(reporte, datos, self._consulta)
+            if png is None:
+                grafico.limpiar()
+            else:
+                grafico.mostrar(png)
+        except Exception as e:
+            print(f"Error dibujando gráfico de {reporte}: {e}")
+
 # → Aplicar estilo a las tablas
     def _style_table(self, table):
         table.setStyleSheet(TablaNoEditableCSS)
@@ -384,6 +441,9 @@ class ReportesFrame(QWidget):
         except Exception:
             # ignore if controls not ready
             pass
+        # Dibujar al abrirla si llegaron datos mientras estaba oculta
+        if index in self._tabs_sucias:
+            self._renderizar_tab(index)
 
     def _rango_fechas(self):
         d = self.fecha_desde.date().toPyDate()
@@ -395,7 +455,7 @@ class ReportesFrame(QWidget):
         try:
             conn = db.get_connection()
             cur = conn.cursor()
-            cur.execute("SELECT MIN(DATE(fecha_venta)) FROM ventas")
+            cur.execute(SQL_PRIMERA_FECHA_VENTA)
             row = cur.fetchone()
             conn.close()
             if row and row[0]:
@@ -405,518 +465,184 @@ class ReportesFrame(QWidget):
             return None
 
     def actualizar(self):
+        """Lanza la carga de todas las pestañas en segundo plano.
+
+        Una carga anterior que siga en curso se cancela. Cada pestaña se dibuja apenas llegan
+        sus datos si es la visible; las demás quedan pendientes hasta que se abran.
+        """
+        self._timer_actualizar.stop()
         fecha_desde, fecha_hasta = self._rango_fechas()
-        # use ISO date strings for SQLite queries
-        fecha_desde_str = fecha_desde.strftime('%Y-%m-%d')
-        fecha_hasta_str = fecha_hasta.strftime('%Y-%m-%d')
+        # Intervalo semiabierto [desde, hasta + 1 día) para filtrar por índice
+        rango = list(rango_dias(fecha_desde, fecha_hasta))
         periodo = self.combo_periodo.currentText()
 
-        # Tab 1: Ventas por periodo
-        try:
-            conn = db.get_connection()
-            df_v = pd.read_sql_query(
-                "SELECT fecha_venta, total_venta, descuento_venta FROM ventas WHERE DATE(fecha_venta) BETWEEN ? AND ? ORDER BY fecha_venta ASC",
-                conn, params=[fecha_desde_str, fecha_hasta_str], parse_dates=['fecha_venta']
-            )
-            conn.close()
-        except Exception:
-            df_v = pd.DataFrame(columns=['fecha_venta', 'total_venta', 'descuento_venta'])
-
-        if not df_v.empty:
-            df_v['fecha_venta'] = pd.to_datetime(df_v['fecha_venta'])
-            df_v.set_index('fecha_venta', inplace=True)
-            # ensure numeric columns are usable (fill NaN/None)
-            df_v['total_venta'] = df_v['total_venta'].fillna(0).astype(float)
-            df_v['descuento_venta'] = df_v['descuento_venta'].fillna(0).astype(float)
-            # total stored is net after discount; compute gross = total + descuento
-            df_v['gross'] = df_v['total_venta'] + df_v['descuento_venta']
-            freq = {'Diario': 'D', 'Semanal': 'W', 'Mensual': 'M'}.get(periodo, 'D')
-            series = df_v['total_venta'].resample(freq).sum()
-        else:
-            series = pd.Series([], dtype=float)
-
-        # Draw chart if matplotlib available
-        if self._has_mpl and self.canvas1 is not None:
-            # Clear entire figure to avoid overlapping axes
-            try:
-                if hasattr(self.canvas1, 'figure') and self.canvas1.figure:
-                    self.canvas1.figure.clear()
-                    ax1 = self.canvas1.figure.add_subplot(111)
-                else:
-                    return  # No figure disponible
-            except Exception as e:
-                print(f"Error creando gráfico de ventas: {e}")
-                return
-
-            if not series.empty:
-                # apply date locators/formatters according to granularity
-                try:
-                    import matplotlib.dates as mdates
-                    has_mdates = True
-                except Exception:
-                    has_mdates = False
-
-                if has_mdates:
-                    ax1.xaxis_date()
-                    # choose locator/formatter but adapt interval to avoid too many ticks
-                    try:
-                        # number of aggregated points
-                        n_points = len(series.index)
-                        if periodo == 'Diario':
-                            interval = 1
-                            if n_points > 10:
-                                import math
-                                interval = max(1, math.ceil(n_points / 10))
-                            locator = mdates.DayLocator(interval=interval)
-                            fmt = mdates.DateFormatter('%d-%b')
-                        elif periodo == 'Semanal':
-                            interval = 1
-                            if n_points > 10:
-                                import math
-                                interval = max(1, math.ceil(n_points / 10))
-                            locator = mdates.WeekdayLocator(byweekday=mdates.MO, interval=interval)
-                            fmt = mdates.DateFormatter('%d-%b')
-                        else:  # Mensual
-                            interval = 1
-                            if n_points > 10:
-                                import math
-                                interval = max(1, math.ceil(n_points / 10))
-                            locator = mdates.MonthLocator(interval=interval)
-                            fmt = mdates.DateFormatter('%b %Y')
-                        ax1.xaxis.set_major_locator(locator)
-                        ax1.xaxis.set_major_formatter(fmt)
-                    except Exception:
-                        pass
-
-                # Plot using the aggregated series that is used for the table
-                series.plot(ax=ax1, marker='o', linewidth=2.5, markersize=8,
-                          color='#3498db', markerfacecolor='#2980b9',
-                          markeredgecolor='white', markeredgewidth=2)
-
-                # Agregar área de relleno bajo la línea
-                ax1.fill_between(series.index, series.values, alpha=0.3, color='#3498db')
-
-                ax1.set_title(f"Ventas ({periodo})", fontsize=16, fontweight='bold',
-                            color='#2c3e50', pad=20)
-                ax1.set_ylabel('Total neto (S/.)', fontsize=12, fontweight='bold', color='#34495e')
-                ax1.set_xlabel('Fecha', fontsize=12, fontweight='bold', color='#34495e')
-
-                # Grid más sutil y profesional
-                ax1.grid(True, linestyle='--', alpha=0.3, color='#bdc3c7', linewidth=0.8)
-                ax1.set_facecolor('#f8f9fa')
-
-                # Mejorar los ticks
-                ax1.tick_params(colors='#34495e', labelsize=10)
-                for lbl in ax1.get_xticklabels():
-                    lbl.set_rotation(45)
-                    lbl.set_ha('right')
-
-                # Agregar borde al gráfico
-                for spine in ax1.spines.values():
-                    spine.set_edgecolor('#bdc3c7')
-                    spine.set_linewidth(1.5)
-                # Set x-axis limits based on the selected date range so the
-                # left/right extremes match the Desde/Hasta controls.
-                try:
-                    from datetime import datetime, timedelta
-                    # fecha_desde and fecha_hasta are date objects from _rango_fechas
-                    start_dt = datetime(fecha_desde.year, fecha_desde.month, fecha_desde.day, 0, 0, 0)
-                    # include the full 'hasta' day by setting time to 23:59:59, add small padding day
-                    end_dt = datetime(fecha_hasta.year, fecha_hasta.month, fecha_hasta.day, 23, 59, 59) + timedelta(days=0)
-                    # add a tiny padding (1% of range) so last point isn't on the border
-                    try:
-                        total_seconds = (end_dt - start_dt).total_seconds()
-                        pad = timedelta(seconds=max(1, total_seconds * 0.01))
-                        end_dt = end_dt + pad
-                    except Exception:
-                        pass
-                    ax1.set_xlim(start_dt, end_dt)
-                except Exception:
-                    # if anything goes wrong, skip setting limits
-                    pass
+        self._consulta = (fecha_desde, fecha_hasta, periodo)
+        self._datos = {}
+        self._tabs_sucias = set()
+        # Nada del rango anterior debe poder exportarse con el título del nuevo
+        self._df_v = self._df_p = self._df_comp = pd.DataFrame()
+        for grafico in (self.grafico1, self.grafico2, self.grafico3):
+            if grafico is not None:
+                grafico.limpiar()
+        self.lbl_estado.setText("Calculando...")
+        # Los gráficos se dibujan en la misma tarea que carga sus datos, fuera del hilo de la GUI
+        consulta = self._consulta
+        graficos_ventas = ('ventas', 'ganancias') if self._has_mpl else ()
+        graficos_productos = ('productos',) if self._has_mpl else ()
+        self._carga.lanzar({
+            'ventas': lambda conn: con_imagenes(cargar_ventas_periodo(conn, rango, periodo),
+                                                graficos_ventas, consulta),
+            'productos': lambda conn: con_imagenes(cargar_productos_top(conn, rango),
+                                                   graficos_productos, consulta),
+            'comprobantes': lambda conn: cargar_comprobantes(conn, rango),
+        })
+
+    def _programar_actualizacion(self, *_):
+        # Cambió un filtro: lo que se estaba calculando ya no sirve
+        self._carga.cancelar()
+        self._timer_actualizar.start()
+
+    def _al_cargar(self, clave, resultado):
+        self._datos[clave] = resultado
+        # Datos para exportar
+        if clave == 'ventas':
+            self._df_v = resultado['tabla']
+        elif clave == 'productos':
+            self._df_p = resultado['df']
+        elif clave == 'comprobantes':
+            self._df_comp = resultado['df']
+
+        actual = self.tabs.currentIndex()
+        for idx, clave_tab in self.DATOS_POR_TAB.items():
+            if clave_tab != clave:
+                continue
+            if idx == actual:
+                self._renderizar_tab(idx)
             else:
-                ax1.text(0.5, 0.5, 'No hay ventas en el rango seleccionado', ha='center')
-
-            try:
-                if hasattr(self.canvas1, 'figure') and self.canvas1.figure:
-                    self.canvas1.figure.tight_layout()
-                    self.canvas1.draw()
-            except Exception as e:
-                print(f"Error dibujando gráfico: {e}")
-        else:
-            # Update placeholder text if present
-            if getattr(self, 'placeholder1', None) is not None:
-                self.placeholder1.setText("Matplotlib no está instalado. Instala: pip install matplotlib")
+                self._tabs_sucias.add(idx)
 
-        # Tab 2: Productos más vendidos (Top 10)
-        try:
-            conn = db.get_connection()
-            query = '''
-                SELECT p.nombre_producto as producto_nombre, SUM(dv.cantidad_detalle) as total_vendido, SUM(dv.subtotal_detalle) as ingresos_totales
-                FROM detalle_venta dv
-                JOIN ventas v ON dv.id_venta = v.id_venta
-                JOIN productos p ON dv.id_producto = p.id_producto
-                WHERE DATE(v.fecha_venta) BETWEEN ? AND ?
-                GROUP BY dv.id_producto, p.nombre_producto
-                ORDER BY total_vendido DESC
-                LIMIT 10
-            '''
-            df_p = pd.read_sql_query(query, conn, params=[fecha_desde_str, fecha_hasta_str])
-            conn.close()
-        except Exception:
-            df_p = pd.DataFrame()
-
-        if self._has_mpl and self.canvas2 is not None:
-            try:
-                if hasattr(self.canvas2, 'figure') and self.canvas2.figure:
-                    self.canvas2.figure.clear()
-                    ax2 = self.canvas2.figure.add_subplot(111)
-                else:
-                    return
-            except Exception as e:
-                print(f"Error creando gráfico de productos: {e}")
-                return
-
-            if not df_p.empty:
-                names = df_p['producto_nombre'].astype(str).tolist()
-                values = df_p['total_vendido'].tolist()
-                positions = list(range(len(names)))
-
-                # Crear gradiente de colores del más oscuro al más claro
-                colors = ['#1f77b4', '#2980b9', '#3498db', '#5dade2', '#7fb3d5',
-                         '#a2c4e0', '#aed6f1', '#d4e6f1', '#e8f4f8', '#f0f8ff']
-                bar_colors = colors[:len(names)]
-
-                # draw bars con colores degradados
-                bars = ax2.bar(positions, values, color=bar_colors, width=0.7,
-                              edgecolor='white', linewidth=2)
-
-                # Agregar valores sobre las barras
-                for i, (bar, val) in enumerate(zip(bars, values)):
-                    height = bar.get_height()
-                    ax2.text(bar.get_x() + bar.get_width()/2., height,
-                            f'{int(val)}', ha='center', va='bottom',
-                            fontweight='bold', fontsize=10, color='#2c3e50')
-
-                ax2.set_xticks(positions)
-                # Truncar nombres largos y reducir font size
-                truncated_names = [name[:20] + '...' if len(name) > 20 else name for name in names]
-                ax2.set_xticklabels(truncated_names, rotation=30, ha='right', fontsize=8)
-                ax2.tick_params(axis='x', which='major', labelsize=8, colors='#34495e')
-                ax2.tick_params(axis='y', colors='#34495e')
-
-                ax2.set_title('Top 10 Productos más vendidos', fontsize=16,
-                            fontweight='bold', color='#2c3e50', pad=20)
-                ax2.set_ylabel('Cantidad vendida', fontsize=12, fontweight='bold',
-                             color='#34495e')
-                ax2.set_xlabel('Productos', fontsize=12, fontweight='bold',
-                             color='#34495e')
-
-                # Grid más sutil
-                ax2.grid(axis='y', linestyle='--', alpha=0.3, color='#bdc3c7', linewidth=0.8)
-                ax2.set_facecolor('#f8f9fa')
-
-                # Mejorar bordes
-                for spine in ax2.spines.values():
-                    spine.set_edgecolor('#bdc3c7')
-                    spine.set_linewidth(1.5)
-
-                # Reducir margen inferior
-                try:
-                    self.canvas2.figure.subplots_adjust(bottom=0.15, top=0.92)
-                except Exception:
-                    pass
-            else:
-                ax2.text(0.5, 0.5, 'No hay datos', ha='center')
-
-            try:
-                if hasattr(self.canvas2, 'figure') and self.canvas2.figure:
-                    self.canvas2.figure.tight_layout()
-                    self.canvas2.draw()
-            except Exception as e:
-                print(f"Error dibujando gráfico productos: {e}")
-        else:
-            if getattr(self, 'placeholder2', None) is not None:
-                self.placeholder2.setText("Matplotlib no está instalado. Instala: pip install matplotlib")
-        # Poblar tabla de productos
-        try:
-            cols_p = list(df_p.columns)
-            # Traducir nombres de columnas
-            col_map = {
-                'producto_nombre': 'Producto',
-                'total_vendido': 'Cantidad Vendida',
-                'ingresos_totales': 'Ingresos Totales (S/.)'
-            }
-            display_cols_p = [col_map.get(c, c) for c in cols_p]
-
-            self.table_prod.setColumnCount(len(cols_p))
-            self.table_prod.setRowCount(len(df_p.index))
-            self.table_prod.setHorizontalHeaderLabels(display_cols_p)
-            
-            # Anchos fijos para tabla de productos
-            anchos_productos = [400, 180, 200]  # Producto, Cantidad Vendida, Ingresos Totales
-            for i, ancho in enumerate(anchos_productos[:len(cols_p)]):
-                self.table_prod.setColumnWidth(i, ancho)
-            
-            for r_idx in range(len(df_p.index)):
-                for c, col in enumerate(cols_p):
-                    val = df_p.iloc[r_idx][col]
-                    item = QTableWidgetItem(str(val))
-                    # Alinear números a la derecha y texto al centro
-                    if c == 0:  # nombre del producto
-                        item.setTextAlignment(Qt.AlignLeft | Qt.AlignVCenter)
-                    else:
-                        item.setTextAlignment(Qt.AlignCenter)
-                    self.table_prod.setItem(r_idx, c, item)
-        except Exception:
-            # limpiar tabla
-            self.table_prod.setRowCount(0)
-            self.table_prod.setColumnCount(0)
-        try:
-            if self.canvas2 and hasattr(self.canvas2, 'figure') and self.canvas2.figure:
-                self.canvas2.figure.tight_layout()
-                self.canvas2.draw()
-        except Exception as e:
-            print(f"Error finalizando gráfico productos: {e}")
-
-        # Tab 3: Ganancias y pérdidas (resumen simple)
-        if self._has_mpl and self.canvas3 is not None:
-            try:
-                if hasattr(self.canvas3, 'figure') and self.canvas3.figure:
-                    self.canvas3.figure.clear()
-                    ax3 = self.canvas3.figure.add_subplot(111)
-                else:
-                    return
-            except Exception as e:
-                print(f"Error creando gráfico de ganancias: {e}")
-                return
-
-            if not df_v.empty:
-                total_net = df_v['total_venta'].sum()
-                total_gross = df_v['gross'].sum()
-                total_discount = df_v['descuento_venta'].sum()
-                labels = ['Bruto', 'Descuentos', 'Neto']
-                values = [total_gross, total_discount, total_net]
-                colors = ['#27ae60', '#e74c3c', '#3498db']
-
-                bars = ax3.bar(labels, values, color=colors, width=0.6,
-                              edgecolor='white', linewidth=2)
-
-                # Agregar valores sobre las barras
-                for bar, val in zip(bars, values):
-                    height = bar.get_height()
-                    ax3.text(bar.get_x() + bar.get_width()/2., height,
-                            f'${val:.2f}', ha='center', va='bottom',
-                            fontweight='bold', fontsize=12, color='#2c3e50')
-
-                ax3.set_title('Resumen de ingresos y descuentos', fontsize=16,
-                            fontweight='bold', color='#2c3e50', pad=20)
-                ax3.set_ylabel('Monto (S/.)', fontsize=12, fontweight='bold',
-                             color='#34495e')
-
-                # Grid más sutil
-                ax3.grid(axis='y', linestyle='--', alpha=0.3, color='#bdc3c7', linewidth=0.8)
-                ax3.set_facecolor('#f8f9fa')
-
-                # Mejorar ticks
-                ax3.tick_params(colors='#34495e', labelsize=11)
-
-                # Mejorar bordes
-                for spine in ax3.spines.values():
-                    spine.set_edgecolor('#bdc3c7')
-                    spine.set_linewidth(1.5)
-
-                # Poblar tabla resumen
-                try:
-                    df_summary = pd.DataFrame([{
-                        'Bruto': f'${total_gross:.2f}',
-                        'Descuentos': f'${total_discount:.2f}',
-                        'Neto': f'${total_net:.2f}'
-                    }])
-                    cols_s = list(df_summary.columns)
-                    self.table_gan.setColumnCount(len(cols_s))
-                    self.table_gan.setRowCount(len(df_summary.index))
-                    self.table_gan.setHorizontalHeaderLabels(cols_s)
-                    for r_idx in range(len(df_summary.index)):
-                        for c, col in enumerate(cols_s):
-                            val = df_summary.iloc[r_idx][col]
-                            item = QTableWidgetItem(str(val))
-                            item.setTextAlignment(Qt.AlignCenter)
-                            self.table_gan.setItem(r_idx, c, item)
-                    self.table_gan.resizeColumnsToContents()
-                    self.table_gan.horizontalHeader().setStretchLastSection(True)
-                except Exception:
-                    self.table_gan.setRowCount(0)
-                    self.table_gan.setColumnCount(0)
-            else:
-                ax3.text(0.5, 0.5, 'No hay datos para Ganancias/Pérdidas en el rango', ha='center')
-                self.table_gan.setRowCount(0)
-                self.table_gan.setColumnCount(0)
-
-            try:
-                if hasattr(self.canvas3, 'figure') and self.canvas3.figure:
-                    self.canvas3.figure.tight_layout()
-                    self.canvas3.draw()
-            except Exception as e:
-                print(f"Error dibujando gráfico ganancias: {e}")
-        else:
-            if getattr(self, 'placeholder3', None) is not None:
-                self.placeholder3.setText("Matplotlib no está instalado. Instala: pip install matplotlib")
+    def _al_fallar_carga(self, clave, mensaje):
+        print(f"Error cargando reporte ({clave}): {mensaje}")
+        vacio = {'df': pd.DataFrame(), 'filas': []}
+        if clave == 'ventas':
+            vacio.update({'df': pd.DataFrame(columns=['fecha_venta', 'total_venta', 'descuento_venta']),
+                          'serie': pd.Series([], dtype=float), 'totales': None, 'tabla': pd.DataFrame()})
+        self._al_cargar(clave, vacio)
 
-        # Store dataframes for export (use non-indexed df for exports)
-        try:
-            self._df_v = df_v.reset_index()
-        except Exception:
-            self._df_v = pd.DataFrame()
-        self._df_p = df_p if not df_p.empty else pd.DataFrame()
+    def _al_terminar_carga(self):
+        self.lbl_estado.setText("")
+
+    def _renderizar_tab(self, idx):
+        self._tabs_sucias.discard(idx)
+        if idx == 0:
+            self._dibujar_ventas()
+        elif idx == 1:
+            self._dibujar_productos()
+        elif idx == 2:
+            self._dibujar_ganancias()
+        elif idx == 3:
+            self._dibujar_comprobantes()
 
-        # Tab 4: Cargar comprobantes emitidos
+    def _llenar_tabla(self, tabla, encabezados, filas, anchos=(), alinear=None):
+        # Sin repintar hasta terminar: una sola pasada de layout para toda la tabla
+        tabla.setUpdatesEnabled(False)
         try:
-            conn = db.get_connection()
-            df_comp = pd.read_sql_query("""
-                SELECT 
-                    c.id_comprobante as ID,
-                    c.tipo_comprobante as Tipo,
-                    c.serie_comprobante || '-' || c.numero_comprobante as Serie_Numero,
-                    c.fecha_emision_comprobante as Fecha_Emision,
-                    c.nombre_cliente as Cliente,
-                    c.num_documento as DNI,
-                    c.razon_social as Razon_Social,
-                    c.ruc_emisor as RUC,
-                    c.monto_total_comprobante as Monto_Total,
-                    v.metodo_pago as Metodo_Pago,
-                    c.estado_sunat as Estado_SUNAT
-                FROM comprobante c
-                INNER JOIN ventas v ON c.id_venta = v.id_venta
-                WHERE DATE(c.fecha_emision_comprobante) BETWEEN ? AND ?
-                ORDER BY c.fecha_emision_comprobante DESC
-            """, conn, params=[fecha_desde_str, fecha_hasta_str])
-            conn.close()
-        except Exception as e:
-            print(f"Error cargando comprobantes: {e}")
-            df_comp = pd.DataFrame()
-        
-        self._df_comp = df_comp
-        
-        # Poblar tabla de comprobantes con anchos fijos
-        if not df_comp.empty:
-            cols_comp = ['ID', 'Tipo', 'Serie-Número', 'Fecha Emisión', 'Cliente', 
-                        'DNI/RUC', 'Monto Total', 'Método Pago', 'Estado SUNAT']
-            self.table_comprobantes.setColumnCount(len(cols_comp))
-            self.table_comprobantes.setRowCount(len(df_comp))
-            self.table_comprobantes.setHorizontalHeaderLabels(cols_comp)
-            
-            # Anchos fijos para las columnas
-            anchos_comprobantes = [60, 100, 140, 150, 350, 100, 110, 130, 120]
-            for i, ancho in enumerate(anchos_comprobantes):
-                self.table_comprobantes.setColumnWidth(i, ancho)
-            
-            for r_idx in range(len(df_comp)):
-                # ID
-                item = QTableWidgetItem(str(df_comp.iloc[r_idx]['ID']))
-                item.setTextAlignment(Qt.AlignCenter)
-                self.table_comprobantes.setItem(r_idx, 0, item)
-                
-                # Tipo con color
-                tipo = str(df_comp.iloc[r_idx]['Tipo']).upper()
-                item_tipo = QTableWidgetItem(tipo)
-                item_tipo.setTextAlignment(Qt.AlignCenter)
-                if tipo == 'BOLETA':
-                    item_tipo.setForeground(Qt.darkGreen)
-                else:
-                    item_tipo.setForeground(Qt.blue)
-                self.table_comprobantes.setItem(r_idx, 1, item_tipo)
-                
-                # Serie-Número
-                item = QTableWidgetItem(str(df_comp.iloc[r_idx]['Serie_Numero']))
-                item.setTextAlignment(Qt.AlignCenter)
-                self.table_comprobantes.setItem(r_idx, 2, item)
-                
-                # Fecha
-                fecha_str = str(df_comp.iloc[r_idx]['Fecha_Emision'])[:19]
-                item = QTableWidgetItem(fecha_str)
-                item.setTextAlignment(Qt.AlignCenter)
-                self.table_comprobantes.setItem(r_idx, 3, item)
-                
-                # Cliente (usar razón social si es factura, nombre si es boleta)
-                if tipo == 'FACTURA' and pd.notna(df_comp.iloc[r_idx].get('Razon_Social')):
-                    cliente = str(df_comp.iloc[r_idx]['Razon_Social'])
-                else:
-                    cliente = str(df_comp.iloc[r_idx]['Cliente'])
-                item = QTableWidgetItem(cliente)
-                self.table_comprobantes.setItem(r_idx, 4, item)
-                
-                # DNI/RUC
-                if tipo == 'FACTURA' and pd.notna(df_comp.iloc[r_idx].get('RUC')):
-                    doc = str(df_comp.iloc[r_idx]['RUC'])
-                else:
-                    doc = str(df_comp.iloc[r_idx]['DNI']) if pd.notna(df_comp.iloc[r_idx].get('DNI')) else '-'
-                item = QTableWidgetItem(doc)
-                item.setTextAlignment(Qt.AlignCenter)
-                self.table_comprobantes.setItem(r_idx, 5, item)
-                
-                # Monto
-                monto = float(df_comp.iloc[r_idx]['Monto_Total'])
-                item = QTableWidgetItem(f"S/ {monto:.2f}")
-                item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-                self.table_comprobantes.setItem(r_idx, 6, item)
-                
-                # Método de pago con color
-                metodo = str(df_comp.iloc[r_idx]['Metodo_Pago']).lower()
-                item_metodo = QTableWidgetItem(metodo.upper())
-                item_metodo.setTextAlignment(Qt.AlignCenter)
-                
-                # Colorear según método de pago
-                if 'tarjeta' in metodo:
-                    item_metodo.setForeground(Qt.darkMagenta)
-                elif 'efectivo' in metodo:
-                    item_metodo.setForeground(Qt.darkGreen)
-                elif 'yape' in metodo or 'plin' in metodo:
-                    item_metodo.setForeground(Qt.red)
-                elif 'transfer' in metodo:
-                    item_metodo.setForeground(Qt.darkYellow)
-                
-                self.table_comprobantes.setItem(r_idx, 7, item_metodo)
-                
-                # Estado SUNAT
-                estado = str(df_comp.iloc[r_idx]['Estado_SUNAT']) if pd.notna(df_comp.iloc[r_idx].get('Estado_SUNAT')) else 'PENDIENTE'
-                item = QTableWidgetItem(estado)
-                item.setTextAlignment(Qt.AlignCenter)
-                self.table_comprobantes.setItem(r_idx, 8, item)
-        else:
+            tabla.setColumnCount(len(encabezados))
+            tabla.setRowCount(len(filas))
+            tabla.setHorizontalHeaderLabels(encabezados)
+            for i, ancho in enumerate(anchos[:len(encabezados)]):
+                tabla.setColumnWidth(i, ancho)
+            for r_idx, fila in enumerate(filas):
+                for c, val in enumerate(fila):
+                    item = QTableWidgetItem(val)
+                    item.setTextAlignment(alinear(c) if alinear else Qt.AlignCenter)
+                    tabla.setItem(r_idx, c, item)
+        finally:
+            tabla.setUpdatesEnabled(True)
+
+    def _dibujar_ventas(self):
+        datos = self._datos['ventas']
+        self._mostrar_grafico(self.grafico1, 'ventas', datos)
+
+        # Tabla debajo del gráfico (df sin índice, como se exporta)
+        cols_v = list(datos['tabla'].columns) if datos['filas'] else []
+        # Map internal column names to display titles
+        title_map = {'total': 'precio', 'gross': 'total'}
+        self._llenar_tabla(self.table_ventas, [title_map.get(c, c) for c in cols_v], datos['filas'],
+                           anchos=[180, 120, 120, 120])  # fecha_venta, total_venta, descuento_venta, gross
+
+    def _dibujar_productos(self):
+        datos = self._datos['productos']
+        df_p = datos['df']
+
+        self._mostrar_grafico(self.grafico2, 'productos', datos)
+
+        # Poblar tabla de productos
+        cols_p = list(df_p.columns)
+        # Traducir nombres de columnas
+        col_map = {
+            'producto_nombre': 'Producto',
+            'total_vendido': 'Cantidad Vendida',
+            'ingresos_totales': 'Ingresos Totales (S/.)'
+        }
+        # Alinear el nombre del producto a la izquierda y los números al centro
+        self._llenar_tabla(self.table_prod, [col_map.get(c, c) for c in cols_p], datos['filas'],
+                           anchos=[400, 180, 200],  # Producto, Cantidad Vendida, Ingresos Totales
+                           alinear=lambda c: Qt.AlignLeft | Qt.AlignVCenter if c == 0 else Qt.AlignCenter)
+
+    def _dibujar_ganancias(self):
+        # Tab 3: Ganancias y pérdidas (resumen simple, totales calculados al cargar)
+        datos = self._datos['ventas']
+        self._mostrar_grafico(self.grafico3, 'ganancias', datos)
+
+        # Poblar tabla resumen
+        if datos['totales'] is None:
+            self.table_gan.setRowCount(0)
+            self.table_gan.setColumnCount(0)
+            return
+        total_gross, total_discount, total_net = datos['totales']
+        self._llenar_tabla(self.table_gan, ['Bruto', 'Descuentos', 'Neto'],
+                           [[f'${total_gross:.2f}', f'${total_discount:.2f}', f'${total_net:.2f}']])
+        self.table_gan.resizeColumnsToContents()
+        self.table_gan.horizontalHeader().setStretchLastSection(True)
+
+    def _dibujar_comprobantes(self):
+        filas = self._datos['comprobantes']['filas']
+        if not filas:
             self.table_comprobantes.setRowCount(0)
             self.table_comprobantes.setColumnCount(0)
+            return
 
-        # Poblar tabla de ventas (df_v may be empty)
-        try:
-            if not self._df_v.empty:
-                cols_v = list(self._df_v.columns)
-                # Map internal column names to display titles
-                title_map = {'total': 'precio', 'gross': 'total'}
-                display_cols = [title_map.get(c, c) for c in cols_v]
-                self.table_ventas.setColumnCount(len(cols_v))
-                self.table_ventas.setRowCount(len(self._df_v.index))
-                self.table_ventas.setHorizontalHeaderLabels(display_cols)
-                
-                # Anchos fijos para tabla de ventas
-                anchos_ventas = [180, 120, 120, 120]  # fecha_venta, total_venta, descuento_venta, gross
-                for i, ancho in enumerate(anchos_ventas[:len(cols_v)]):
-                    self.table_ventas.setColumnWidth(i, ancho)
-                
-                for r_idx in range(len(self._df_v.index)):
-                    for c, col in enumerate(cols_v):
-                        val = self._df_v.iloc[r_idx][col]
-                        item = QTableWidgetItem(str(val))
-                        item.setTextAlignment(Qt.AlignCenter)
-                        self.table_ventas.setItem(r_idx, c, item)
-            else:
-                self.table_ventas.setRowCount(0)
-                self.table_ventas.setColumnCount(0)
-        except Exception:
-            self.table_ventas.setRowCount(0)
-            self.table_ventas.setColumnCount(0)
+        cols_comp = ['ID', 'Tipo', 'Serie-Número', 'Fecha Emisión', 'Cliente', 
+                    'DNI/RUC', 'Monto Total', 'Método Pago', 'Estado SUNAT']
+        # Cliente a la izquierda, monto a la derecha, el resto centrado
+        alineacion = {4: Qt.AlignLeft | Qt.AlignVCenter, 6: Qt.AlignRight | Qt.AlignVCenter}
+        self._llenar_tabla(self.table_comprobantes, cols_comp,
+                           [fila[:7] + (fila[7].upper(), fila[8]) for fila in filas],
+                           anchos=[60, 100, 140, 150, 350, 100, 110, 130, 120],
+                           alinear=lambda c: alineacion.get(c, Qt.AlignCenter))
+
+        # Colores de tipo y método de pago (ver leyenda)
+        for r_idx, fila in enumerate(filas):
+            tipo, metodo = fila[1], fila[7]
+            self.table_comprobantes.item(r_idx, 1).setForeground(Qt.darkGreen if tipo == 'BOLETA' else Qt.blue)
+            item_metodo = self.table_comprobantes.item(r_idx, 7)
+            if 'tarjeta' in metodo:
+                item_metodo.setForeground(Qt.darkMagenta)
+            elif 'efectivo' in metodo:
+                item_metodo.setForeground(Qt.darkGreen)
+            elif 'yape' in metodo or 'plin' in metodo:
+                item_metodo.setForeground(Qt.red)
+            elif 'transfer' in metodo:
+                item_metodo.setForeground(Qt.darkYellow)
 
     def exportar(self, forma='pdf'):
+        # Con un filtro recién cambiado (timer pendiente) o una carga en curso, lo que hay en
+        # pantalla no corresponde a las fechas elegidas
+        if self._carga.en_curso or self._timer_actualizar.isActive():
+            QMessageBox.information(self, 'Exportar', 'El reporte aún se está calculando')
+            return
+
         # Export the active tab data
         idx = self.tabs.currentIndex()
         if idx == 0:
@@ -955,72 +681,44 @@ class ReportesFrame(QWidget):
         # Ask for filename and attempt export; catch ImportError and show instructions
         try:
             # build descriptive filename including period and date range
-            periodo = self.combo_periodo.currentText()
-            fecha_desde, fecha_hasta = self._rango_fechas()
+            fecha_desde, fecha_hasta, periodo = self._consulta  # → Rango de los datos cargados
             fecha_desde_str = fecha_desde.strftime('%Y-%m-%d')
             fecha_hasta_str = fecha_hasta.strftime('%Y-%m-%d')
             if idx == 0:
                 suggested_base = f"{titulo} ({periodo}) de {fecha_desde_str} a {fecha_hasta_str}"
             else:
                 suggested_base = f"{titulo} de {fecha_desde_str} a {fecha_hasta_str}"
-            # capture chart image from current canvas (if available)
-            chart_bytes = None
-            try:
-                import io
-                if idx == 0 and getattr(self, 'canvas1', None) is not None:
-                    buf = io.BytesIO()
-                    self.canvas1.figure.savefig(buf, format='png', bbox_inches='tight', dpi=150)
-                    chart_bytes = buf.getvalue()
-                elif idx == 1 and getattr(self, 'canvas2', None) is not None:
-                    buf = io.BytesIO()
-                    # temporarily reduce xtick label fontsize so product names fit better in export
-                    try:
-                        fig = self.canvas2.figure
-                        if fig.axes:
-                            ax = fig.axes[0]
-                            orig_sizes = [lbl.get_fontsize() for lbl in ax.get_xticklabels()]
-                            for lbl in ax.get_xticklabels():
-                                lbl.set_fontsize(max(6, min(lbl.get_fontsize(), 8)))
-                    except Exception:
-                        orig_sizes = None
-                    try:
-                        self.canvas2.figure.savefig(buf, format='png', bbox_inches='tight', dpi=150)
-                        chart_bytes = buf.getvalue()
-                    finally:
-                        # restore original sizes
-                        try:
-                            if orig_sizes is not None and fig.axes:
-                                ax = fig.axes[0]
-                                for lbl, s in zip(ax.get_xticklabels(), orig_sizes):
-                                    lbl.set_fontsize(s)
-                        except Exception:
-                            pass
-                elif idx == 2 and getattr(self, 'canvas3', None) is not None:
-                    buf = io.BytesIO()
-                    self.canvas3.figure.savefig(buf, format='png', bbox_inches='tight', dpi=150)
-                    chart_bytes = buf.getvalue()
-            except Exception:
-                chart_bytes = None
+            # La imagen mostrada en pantalla es la del caché: exportar no vuelve a dibujar
+            grafico = {0: self.grafico1, 1: self.grafico2, 2: self.grafico3}.get(idx)
+            chart_bytes = grafico.png if grafico is not None else None
 
+            # Números que no son montos (el resto se exporta con formato de moneda); las
+            # cantidades vendidas son fraccionarias en productos por peso
+            formatos = {'ID': 'entero', 'total_vendido': 'cantidad'}
             if forma == 'pdf':
                 path, _ = QFileDialog.getSaveFileName(self, 'Guardar PDF', f'{suggested_base}.pdf', 'PDF Files (*.pdf)')
                 if not path:
                     return
-                # Apply display title mapping for ventas tab so exported headers match UI
-                df_export = df.copy()
-                if idx == 0:
-                    df_export = df_export.rename(columns={'total': 'precio', 'gross': 'total'})
-                exportar_pdf(df_export, path, titulo, chart_bytes=chart_bytes)
-                QMessageBox.information(self, 'Exportar', f'PDF guardado en: {path}')
+                escribir = lambda columnas, bloques: exportar_pdf_bloques(
+                    columnas, bloques, path, titulo, chart_bytes=chart_bytes, formatos=formatos)
             else:
                 path, _ = QFileDialog.getSaveFileName(self, 'Guardar Excel', f'{suggested_base}.xlsx', 'Excel Files (*.xlsx)')
                 if not path:
                     return
-                df_export = df.copy()
-                if idx == 0:
-                    df_export = df_export.rename(columns={'total': 'precio', 'gross': 'total'})
-                exportar_excel(df_export, path, sheet_name=default_name, chart_bytes=chart_bytes)
-                QMessageBox.information(self, 'Exportar', f'Excel guardado en: {path}')
+                escribir = lambda columnas, bloques: exportar_excel_bloques(
+                    columnas, bloques, path, sheet_name=default_name, chart_bytes=chart_bytes, formatos=formatos)
+
+            if idx == 3:
+                # Comprobantes: se leen por bloques con fetchmany en vez de recorrer el DataFrame en memoria
+                desde, hasta, _ = self._consulta
+                with db.connection() as conn:
+                    escribir(*bloques_consulta(conn, SQL_COMPROBANTES, list(rango_dias(desde, hasta))))
+            else:
+                # Apply display title mapping for ventas tab so exported headers match UI
+                df_export = df.rename(columns={'total': 'precio', 'gross': 'total'}) if idx == 0 else df
+                escribir(list(df_export.columns), bloques_dataframe(df_export))
+            formato = 'PDF' if forma == 'pdf' else 'Excel'
+            QMessageBox.information(self, 'Exportar', f'{formato} guardado en: {path}')
         except ImportError as e:
             # Show a user-friendly message explaining which package is missing
             msg = str(e)
@@ -5,8 +5,6 @@ Gestiona backups automáticos y manuales de la base de datos
 """
 
 import os
-import shutil
-import gzip
 import sqlite3
 import threading
 import time
@@ -15,16 +13,42 @@ from pathlib import Path
 from typing import Tuple, Optional, List
 from core.database import db
 from core.config import BASE_DIR
+from core.planificador import planificador
+from modules.sistema.repositorio_backups import RepositorioBackups
+from modules.sistema.compresion_backups import obtener_compresor, compresor_de_archivo, CompresorGzip, CompresorZstd
+from modules.sistema.manifiesto_backups import (
+    leer_manifiesto, crear_manifiesto, verificar_bloques, registrar_verificacion,
+    listar_manifiestos, eliminar_manifiesto, SIN_VERIFICAR
+)
+
+# Un backup comprimido de hasta este tamaño se descomprime en memoria y se entrega a la API de
+# backup de SQLite sin escribir archivos temporales; uno más grande se descomprime a disco
+LIMITE_RESTAURACION_EN_MEMORIA = 512 * 1024 * 1024
+EXTENSIONES_COMPRIMIDAS = (CompresorGzip.extension, CompresorZstd.extension)
+
+# Copia online: páginas por paso de la API de backup y pausa entre pasos para ceder la BD a las cajas
+PAGINAS_POR_PASO = 256
+PAUSA_ENTRE_PASOS = 0.002
+
+# Verificación de los backups automáticos: siempre se comparan los hashes del manifiesto y, en
+# el primero de cada sesión y luego uno de cada N, también PRAGMA quick_check sobre la copia
+VERIFICACION_PROFUNDA_CADA = 8
+
+
+class BackupCancelado(Exception):
+    """El backup en curso se canceló a pedido del usuario"""
 
 
 class BackupService:
     """
     Servicio para realizar backups automáticos y manuales de la base de datos.
     Características:
-    - Backups automáticos diarios a las 2:00 AM
-    - Compresión GZIP para ahorrar espacio
-    - Retención de backups (últimos 30 días)
-    - Verificación de integridad de backups
+    - Backups automáticos diarios a las 2:00 AM e incrementales cada hora (core/planificador.py)
+    - Compresión gzip o zstd en paralelo para ahorrar espacio (compresion_backups.py)
+    - Retención de backups (últimos 30 días; incrementales horarios, 2 días)
+    - Copia online por pasos: las ventas siguen registrándose durante el backup
+    - Verificación de integridad por hashes de bloques, sin descomprimir (manifiesto_backups.py)
+    - Backups incrementales: solo los bloques de páginas que cambiaron (repositorio_backups.py)
     - Registro de operaciones en backup_log
     """
     
@@ -32,13 +56,24 @@ class BackupService:
         """Inicializa el servicio de backup"""
         self.db_path = os.path.join(BASE_DIR, 'db', 'minimarket.db')
         self.backup_dir = self._crear_directorio_backups()
+        self.repositorio = RepositorioBackups(os.path.join(self.backup_dir, 'repositorio'))
         self.running = False
-        self.thread = None
+        self._lock_automatico = threading.Lock()  # → Un solo backup automático a la vez
         
         # Configuración
         self.hora_backup = "02:00"  # 2:00 AM
+        self.intervalo_incremental = 3600  # → Segundos entre backups incrementales; None los desactiva
+        self.jitter_backup = 120  # → Hasta 2 min de retraso aleatorio: varias cajas no copian a la vez
         self.dias_retencion = 30  # Mantener últimos 30 días
+        self.dias_retencion_incremental = 2  # → Los incrementales horarios; los diarios siguen 30 días
         self.compresion = True  # Comprimir backups
+        self.formato_compresion = 'gzip'  # → 'gzip' o 'zstd' (requiere el paquete zstandard)
+        self.nivel_compresion = None  # → None = nivel por defecto del compresor (gzip 6, zstd 3)
+        self.hilos_compresion = None  # → None = un hilo por núcleo
+        self.paginas_por_paso = PAGINAS_POR_PASO
+        self.pausa_entre_pasos = PAUSA_ENTRE_PASOS
+        self.verificacion_profunda_cada = VERIFICACION_PROFUNDA_CADA
+        self._backups_sin_quick_check = 0
     
     def _crear_directorio_backups(self) -> str:
         """Crea el directorio de backups si no existe"""
@@ -59,22 +94,29 @@ class BackupService:
                 os.makedirs(backup_dir)
             return backup_dir
     
-    def realizar_backup_manual(self, id_usuario: int = 1) -> Tuple[bool, str, Optional[str]]:
+    def realizar_backup_manual(self, id_usuario: int = 1, progreso=None,
+                               cancelar=None) -> Tuple[bool, str, Optional[str]]:
         """
         Realiza un backup manual de la base de datos
         
         Args:
             id_usuario: ID del usuario que solicita el backup
+            progreso: función (etapa, hechas, total) llamada durante la copia ('copiando'),
+                      la compresión ('comprimiendo') y la verificación ('verificando')
+            cancelar: threading.Event; al activarlo el backup se detiene y se borra
+        
+        Un backup manual siempre pasa PRAGMA quick_check (sobre la copia sin comprimir) además
+        de la verificación de hashes del manifiesto.
         
         Returns:
             Tupla (success, mensaje, ruta_archivo)
         """
+        ruta_backup = None
         try:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             nombre_archivo = f"minimarket_manual_{timestamp}.db"
             
-            if self.compresion:
-                nombre_archivo += ".gz"
+            nombre_archivo += self._compresor().extension
             
             ruta_backup = os.path.join(self.backup_dir, nombre_archivo)
             
@@ -83,17 +125,14 @@ class BackupService:
                 return False, "Base de datos no encontrada", None
             
             # Realizar backup
-            if self.compresion:
-                success = self._backup_comprimido(ruta_backup)
-            else:
-                success = self._backup_simple(ruta_backup)
+            success = self._backup_comprimido(ruta_backup, progreso, cancelar, tipo='manual', profunda=True)
             
             if success:
                 # Verificar integridad
-                if self._verificar_integridad(ruta_backup):
+                if self._verificar_integridad(ruta_backup, progreso, cancelar):
                     # Registrar en log
                     self._registrar_backup(
-                        tipo='manual',
+                        tipo='completo',  # → backup_log solo admite 'completo' o 'incremental'
                         estado='exitoso',
                         ubicacion=ruta_backup,
                         descripcion='Backup manual realizado por usuario',
@@ -106,13 +145,19 @@ class BackupService:
                     return True, f"Backup realizado exitosamente ({tamanio_mb:.2f} MB)", ruta_backup
                 else:
                     os.remove(ruta_backup)  # Eliminar backup corrupto
+                    eliminar_manifiesto(ruta_backup)
                     return False, "Backup creado pero falló la verificación de integridad", None
             else:
                 return False, "Error al crear el archivo de backup", None
-                
+        
+        except BackupCancelado:
+            if ruta_backup and os.path.exists(ruta_backup):
+                os.remove(ruta_backup)
+                eliminar_manifiesto(ruta_backup)
+            return False, "Backup cancelado", None
         except Exception as e:
             self._registrar_backup(
-                tipo='manual',
+                tipo='completo',
                 estado='fallido',
                 ubicacion='',
                 descripcion=f'Error: {str(e)}',
@@ -120,83 +165,306 @@ class BackupService:
             )
             return False, f"Error al realizar backup: {str(e)}", None
     
-    def _backup_simple(self, ruta_destino: str) -> bool:
-        """Copia simple de la base de datos"""
+    def realizar_backup_incremental(self, id_usuario: int = 1, progreso=None,
+                                    cancelar=None, profunda: bool = None) -> Tuple[bool, str, Optional[str]]:
+        """
+        Realiza un backup incremental en el repositorio de bloques
+        
+        Toma una foto consistente con la API de backup de SQLite, la verifica sin necesidad
+        de descomprimir nada y guarda solo los bloques de páginas que no estén ya en el
+        repositorio. El manifiesto resultante restaura ese punto completo por sí solo.
+        
+        Args:
+            id_usuario: ID del usuario que solicita el backup
+            progreso, cancelar: como en realizar_backup_manual; la etapa de guardar
+                                bloques se informa como 'comprimiendo'
+            profunda: correr PRAGMA quick_check sobre la foto; None = según el muestreo
+                      de VERIFICACION_PROFUNDA_CADA (los bloques ya se verifican por hash)
+        
+        Returns:
+            Tupla (success, mensaje, ruta_manifiesto)
+        """
+        return self._backup_en_repositorio('incremental', id_usuario, progreso, cancelar, profunda)
+    
+    def _backup_en_repositorio(self, tipo: str, id_usuario: int, progreso=None, cancelar=None,
+                               profunda: bool = None) -> Tuple[bool, str, Optional[str]]:
+        """Foto de la BD guardada en el repositorio como backup `tipo` ('incremental' o 'diario')"""
+        tipo_log = 'incremental' if tipo == 'incremental' else 'completo'  # → CHECK de backup_log
+        foto = os.path.join(self.repositorio.raiz, 'foto_temp.db')
         try:
-            # Cerrar cualquier conexión abierta
-            conn = sqlite3.connect(self.db_path)
+            if not os.path.exists(self.db_path):
+                return False, "Base de datos no encontrada", None
+            
+            if not self._backup_simple(foto, progreso, cancelar):
+                return False, "Error al crear la foto de la base de datos", None
+            
+            if profunda is None:
+                profunda = self._toca_verificacion_profunda()
+            if profunda and not self._quick_check(foto, progreso, cancelar):
+                return False, "La foto de la base de datos falló la verificación de integridad", None
+            
+            nombre = f"minimarket_{tipo}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            manifiesto = self.repositorio.crear_backup(
+                foto, nombre, tipo=tipo,
+                progreso=lambda hechos, total: self._avisar(progreso, cancelar, 'comprimiendo', hechos, total)
+            )
+            
+            nuevos_mb = manifiesto['bytes_nuevos'] / (1024 * 1024)
+            resumen = f"{manifiesto['bloques_nuevos']} de {len(manifiesto['bloques'])} bloques nuevos ({nuevos_mb:.2f} MB)"
+            self._registrar_backup(
+                tipo=tipo_log,
+                estado='exitoso',
+                ubicacion=manifiesto['ruta'],
+                descripcion=f'Backup {tipo}: {resumen}',
+                usuario_id=id_usuario
+            )
+            
+            return True, f"Backup {tipo} realizado: {resumen}", manifiesto['ruta']
+        
+        except BackupCancelado:
+            return False, "Backup cancelado", None
+        except Exception as e:
+            self._registrar_backup(
+                tipo=tipo_log,
+                estado='fallido',
+                ubicacion='',
+                descripcion=f'Error: {str(e)}',
+                usuario_id=id_usuario
+            )
+            return False, f"Error al realizar backup {tipo}: {str(e)}", None
+        finally:
+            if os.path.exists(foto):
+                os.remove(foto)
+    
+    @staticmethod
+    def _avisar(progreso, cancelar, etapa: str, hechas: int, total: int):
+        """Informa el avance de una etapa; lanza BackupCancelado si se pidió cancelar"""
+        if cancelar is not None and cancelar.is_set():
+            raise BackupCancelado()
+        if progreso:
+            progreso(etapa, hechas, total)
+    
+    def _backup_simple(self, ruta_destino: str, progreso=None, cancelar=None) -> bool:
+        """
+        Copia online de la base de datos con la API de backup de SQLite
+        
+        - Copia de a `paginas_por_paso` páginas con una pausa entre pasos, así las cajas
+          siguen registrando ventas sin esperar al backup.
+        - En modo WAL mantiene una transacción de lectura durante toda la copia: todos los
+          pasos leen la misma foto, consistente aunque entren ventas mientras tanto, y la copia
+          nunca vuelve a empezar. Sin esa transacción, cada escritura de otra conexión reinicia
+          la API de backup, que con ventas continuas no termina nunca. Los escritores no se
+          bloquean; solo el checkpoint del WAL espera al final de la copia.
+        """
+        conn = None
+        backup_conn = None
+        try:
+            conn = sqlite3.connect(self.db_path, isolation_level=None)
             backup_conn = sqlite3.connect(ruta_destino)
             
-            # Usar API de backup de SQLite (más seguro)
-            conn.backup(backup_conn)
+            if conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal':
+                conn.execute("BEGIN")
+                conn.execute("SELECT COUNT(*) FROM sqlite_master")  # → Fija la foto de lectura
             
-            backup_conn.close()
-            conn.close()
+            def paso(status, restantes, total):
+                self._avisar(progreso, cancelar, 'copiando', total - restantes, total)
+                if restantes:
+                    time.sleep(self.pausa_entre_pasos)
+            
+            # Usar API de backup de SQLite (más seguro)
+            conn.backup(backup_conn, pages=self.paginas_por_paso, progress=paso)
             
             return True
+        except BackupCancelado:
+            raise
         except Exception as e:
             print(f"Error en backup simple: {e}")
             return False
+        finally:
+            if backup_conn is not None:
+                backup_conn.close()
+            if conn is not None:
+                conn.close()
+    
+    def _compresor(self):
+        """Compresor configurado para los backups nuevos ('ninguno' si compresion está desactivada)"""
+        if not self.compresion:
+            return obtener_compresor('ninguno', hilos=self.hilos_compresion)
+        return obtener_compresor(self.formato_compresion, self.nivel_compresion, self.hilos_compresion)
+    
+    def _toca_verificacion_profunda(self) -> bool:
+        """Muestreo de PRAGMA quick_check: el primer backup automático de la sesión y luego uno de cada N"""
+        toca = self._backups_sin_quick_check == 0
+        self._backups_sin_quick_check = (self._backups_sin_quick_check + 1) % max(1, self.verificacion_profunda_cada)
+        return toca
     
-    def _backup_comprimido(self, ruta_destino: str) -> bool:
-        """Backup comprimido con GZIP"""
+    def _backup_comprimido(self, ruta_destino: str, progreso=None, cancelar=None,
+                           tipo: str = 'automatico', profunda: bool = False) -> bool:
+        """
+        Backup completo con el compresor configurado (gzip o zstd en paralelo) y su manifiesto
+        
+        Los hashes de cada bloque comprimido se calculan al escribirlo. Con `profunda`, la copia
+        sin comprimir pasa PRAGMA quick_check antes de comprimirse: nunca hace falta
+        descomprimir el backup para revisarlo.
+        """
+        # Primero crear backup temporal sin comprimir
+        temp_backup = ruta_destino + '_temp.db'
         try:
-            # Primero crear backup temporal sin comprimir
-            temp_backup = ruta_destino.replace('.gz', '_temp.db')
+            if not self._backup_simple(temp_backup, progreso, cancelar):
+                return False
             
-            if not self._backup_simple(temp_backup):
+            if profunda and not self._quick_check(temp_backup, progreso, cancelar):
+                print("Error en backup comprimido: la copia no pasó PRAGMA quick_check")
                 return False
             
-            # Comprimir el archivo
+            # Comprimir el archivo por bloques en varios hilos
+            compresor = self._compresor()
+            total = os.path.getsize(temp_backup)
             with open(temp_backup, 'rb') as f_in:
-                with gzip.open(ruta_destino, 'wb', compresslevel=9) as f_out:
-                    shutil.copyfileobj(f_in, f_out)
-            
-            # Eliminar temporal
-            os.remove(temp_backup)
+                with open(ruta_destino, 'wb') as f_out:
+                    bloques = compresor.comprimir(
+                        f_in, f_out,
+                        progreso=lambda hechos: self._avisar(progreso, cancelar, 'comprimiendo', hechos, total)
+                    )
             
+            crear_manifiesto(ruta_destino, tipo, compresor.nombre, bloques, quick_check=profunda)
             return True
+        except BackupCancelado:
+            if os.path.exists(ruta_destino):
+                os.remove(ruta_destino)
+            raise
         except Exception as e:
             print(f"Error en backup comprimido: {e}")
+            if os.path.exists(ruta_destino):
+                os.remove(ruta_destino)
+            eliminar_manifiesto(ruta_destino)
+            return False
+        finally:
             # Limpiar archivos temporales
-            temp_backup = ruta_destino.replace('.gz', '_temp.db')
             if os.path.exists(temp_backup):
                 os.remove(temp_backup)
-            return False
     
-    def _verificar_integridad(self, ruta_backup: str) -> bool:
-        """Verifica la integridad del backup"""
+    def _abrir_backup(self, ruta_backup: str):
+        """
+        Abre un backup como conexión SQLite para verificarlo o restaurarlo
+        
+        - Comprimido: se descomprime por flujo; si cabe en LIMITE_RESTAURACION_EN_MEMORIA
+          queda como BD en memoria (Connection.deserialize), si no, en un archivo temporal.
+        - Incremental (.json): se reconstruye desde el repositorio en un archivo temporal.
+        - Sin comprimir: se abre directamente.
+        
+        Returns:
+            Tupla (conexión, ruta_temporal o None); el llamador cierra y borra el temporal
+        """
+        if ruta_backup.endswith('.json'):
+            temporal = os.path.join(self.repositorio.raiz, 'restauracion_temp.db')
+            self.repositorio.restaurar(ruta_backup, temporal)  # → Verifica el hash de cada bloque
+            return sqlite3.connect(temporal), temporal
+        
+        if not ruta_backup.endswith(EXTENSIONES_COMPRIMIDAS):
+            return sqlite3.connect(ruta_backup), None
+        
+        temporal = None
+        datos = bytearray()
+        f_temp = None
         try:
-            if ruta_backup.endswith('.gz'):
-                # Descomprimir temporalmente para verificar
-                temp_db = ruta_backup.replace('.gz', '_verify.db')
-                
-                with gzip.open(ruta_backup, 'rb') as f_in:
-                    with open(temp_db, 'wb') as f_out:
-                        shutil.copyfileobj(f_in, f_out)
-                
-                # Verificar
-                conn = sqlite3.connect(temp_db)
-                cursor = conn.cursor()
-                cursor.execute("PRAGMA integrity_check")
-                result = cursor.fetchone()
-                conn.close()
-                
-                # Limpiar
-                os.remove(temp_db)
-                
-                return result[0] == 'ok'
-            else:
-                # Verificar directamente
-                conn = sqlite3.connect(ruta_backup)
+            with compresor_de_archivo(ruta_backup).abrir_lectura(ruta_backup) as f_in:
+                while True:
+                    parte = f_in.read(1024 * 1024)
+                    if not parte:
+                        break
+                    if f_temp is None and len(datos) + len(parte) <= LIMITE_RESTAURACION_EN_MEMORIA:
+                        datos += parte
+                        continue
+                    if f_temp is None:
+                        # Demasiado grande para memoria: seguir descomprimiendo a disco
+                        temporal = ruta_backup + '_temp.db'
+                        f_temp = open(temporal, 'wb')
+                        f_temp.write(datos)
+                        datos = bytearray()
+                    f_temp.write(parte)
+        except BaseException:
+            if f_temp is not None:
+                f_temp.close()
+                os.remove(temporal)
+            raise
+        
+        if f_temp is not None:
+            f_temp.close()
+            return sqlite3.connect(temporal), temporal
+        
+        if not hasattr(sqlite3.Connection, 'deserialize'):  # → Python < 3.11
+            temporal = ruta_backup + '_temp.db'
+            with open(temporal, 'wb') as f_temp:
+                f_temp.write(datos)
+            return sqlite3.connect(temporal), temporal
+        
+        # Una BD en memoria no admite WAL: marcar la copia como journal clásico (bytes 18-19)
+        if len(datos) >= 20 and datos[18] == 2 and datos[19] == 2:
+            datos[18] = datos[19] = 1
+        conn = sqlite3.connect(':memory:')
+        conn.deserialize(bytes(datos))
+        return conn, None
+    
+    def _quick_check(self, ruta_bd: str, progreso=None, cancelar=None) -> bool:
+        """PRAGMA quick_check sobre un archivo SQLite sin comprimir"""
+        self._avisar(progreso, cancelar, 'verificando', 0, 1)
+        conn = sqlite3.connect(ruta_bd)
+        try:
+            if cancelar is not None:
+                conn.set_progress_handler(lambda: 1 if cancelar.is_set() else 0, 100000)
+            try:
+                resultado = conn.execute("PRAGMA quick_check").fetchone()[0]
+            except sqlite3.OperationalError:
+                if cancelar is not None and cancelar.is_set():
+                    raise BackupCancelado()
+                raise
+        finally:
+            conn.close()
+        self._avisar(progreso, cancelar, 'verificando', 1, 1)
+        return resultado == 'ok'
+    
+    def _verificar_integridad(self, ruta_backup: str, progreso=None, cancelar=None) -> bool:
+        """
+        Verifica la integridad del backup
+        
+        Con manifiesto: una lectura secuencial del archivo comparando el hash de cada bloque
+        (sin descomprimir) y el resultado queda anotado en el manifiesto. Sin manifiesto
+        (backups anteriores o incrementales): se abre la copia y se corre PRAGMA integrity_check.
+        """
+        try:
+            manifiesto = leer_manifiesto(ruta_backup)
+            if manifiesto is not None:
+                self._avisar(progreso, cancelar, 'verificando', 0, manifiesto['tamano'])
+                correcto = verificar_bloques(
+                    ruta_backup, manifiesto,
+                    progreso=lambda hechos, total: self._avisar(progreso, cancelar, 'verificando', hechos, total)
+                )
+                registrar_verificacion(ruta_backup, manifiesto, correcto)
+                return correcto
+            
+            self._avisar(progreso, cancelar, 'verificando', 0, 1)
+            conn, temporal = self._abrir_backup(ruta_backup)
+            try:
+                if cancelar is not None:
+                    # Interrumpe el integrity_check en curso (OperationalError) al cancelar
+                    conn.set_progress_handler(lambda: 1 if cancelar.is_set() else 0, 100000)
                 cursor = conn.cursor()
                 cursor.execute("PRAGMA integrity_check")
                 result = cursor.fetchone()
+            finally:
                 conn.close()
-                
-                return result[0] == 'ok'
-                
+                if temporal and os.path.exists(temporal):
+                    os.remove(temporal)
+            
+            self._avisar(progreso, cancelar, 'verificando', 1, 1)
+            return result[0] == 'ok'
+        
+        except BackupCancelado:
+            raise
         except Exception as e:
+            if cancelar is not None and cancelar.is_set():
+                raise BackupCancelado()
             print(f"Error verificando integridad: {e}")
             return False
     
@@ -204,18 +472,19 @@ class BackupService:
                          descripcion: str, usuario_id: int):
         """Registra el backup en la tabla backup_log"""
         try:
-            conn = db.get_connection()
-            cur = conn.cursor()
-            
-            cur.execute("""
-                INSERT INTO backup_log (
-                    tipo_backup, estado_backup, ubicacion_archivo_backup,
-                    descripcion_backup, usuario_responsable
-                ) VALUES (?, ?, ?, ?, ?)
-            """, (tipo, estado, ubicacion, descripcion, usuario_id))
-            
-            conn.commit()
-            conn.close()
+            # El context manager devuelve la conexión al pool (con rollback) aunque el INSERT
+            # falle; antes quedaba prestada y con la transacción abierta, bloqueando escrituras
+            with db.connection() as conn:
+                cur = conn.cursor()
+                
+                cur.execute("""
+                    INSERT INTO backup_log (
+                        tipo_backup, estado_backup, ubicacion_archivo_backup,
+                        descripcion_backup, usuario_responsable
+                    ) VALUES (?, ?, ?, ?, ?)
+                """, (tipo, estado, ubicacion, descripcion, usuario_id))
+                
+                conn.commit()
         except Exception as e:
             print(f"Error registrando backup en log: {e}")
     
@@ -224,43 +493,118 @@ class BackupService:
         try:
             fecha_limite = datetime.now() - timedelta(days=self.dias_retencion)
             eliminados = 0
+            manifiestos = {m['archivo']: m for m in listar_manifiestos(self.backup_dir)}
+            archivos = set(os.listdir(self.backup_dir))
             
-            for archivo in os.listdir(self.backup_dir):
+            for archivo in archivos:
                 if not archivo.startswith('minimarket_'):
                     continue
                 
                 ruta_completa = os.path.join(self.backup_dir, archivo)
-                fecha_archivo = datetime.fromtimestamp(os.path.getmtime(ruta_completa))
+                manifiesto = manifiestos.get(archivo)
+                if manifiesto is not None:
+                    fecha_archivo = datetime.strptime(manifiesto['fecha'], '%Y-%m-%d %H:%M:%S')
+                else:
+                    fecha_archivo = datetime.fromtimestamp(os.path.getmtime(ruta_completa))
                 
                 if fecha_archivo < fecha_limite:
                     os.remove(ruta_completa)
+                    eliminar_manifiesto(ruta_completa)
                     eliminados += 1
                     print(f"Backup antiguo eliminado: {archivo}")
             
-            return eliminados
+            # Manifiestos de backups que ya no existen (borrados a mano)
+            for archivo in manifiestos.keys() - archivos:
+                eliminar_manifiesto(os.path.join(self.backup_dir, archivo))
+            
+            return eliminados + self._limpiar_repositorio()
         except Exception as e:
             print(f"Error limpiando backups antiguos: {e}")
             return 0
     
+    def _limpiar_repositorio(self) -> int:
+        """
+        Retira del repositorio los backups vencidos (incrementales tras dias_retencion_incremental,
+        el resto tras dias_retencion) y borra los bloques que ya nadie referencia. El backup más
+        reciente nunca se retira.
+        """
+        try:
+            ahora = datetime.now()
+            eliminados = 0
+            liberados = 0
+            
+            for ruta_manifiesto in self.repositorio.listar_manifiestos()[:-1]:
+                manifiesto = self.repositorio.leer_manifiesto(ruta_manifiesto)
+                dias = self.dias_retencion_incremental if manifiesto['tipo'] == 'incremental' else self.dias_retencion
+                if datetime.strptime(manifiesto['fecha'], '%Y-%m-%d %H:%M:%S') < ahora - timedelta(days=dias):
+                    liberados += self.repositorio.eliminar_backup(ruta_manifiesto)
+                    eliminados += 1
+            
+            _, huerfanos = self.repositorio.recolectar_basura()  # → Restos de backups interrumpidos
+            liberados += huerfanos
+            
+            if eliminados or liberados:
+                uso = self.repositorio.estadisticas()
+                print(f"Repositorio de backups: {eliminados} backups vencidos, "
+                      f"{liberados / (1024 * 1024):.2f} MB liberados; {uso['backups']} backups "
+                      f"ocupan {uso['bytes_disco'] / (1024 * 1024):.2f} MB")
+            
+            return eliminados
+        except Exception as e:
+            print(f"Error limpiando el repositorio de backups: {e}")
+            return 0
+    
     def listar_backups(self) -> List[dict]:
-        """Lista todos los backups disponibles"""
+        """
+        Lista todos los backups disponibles
+        
+        Tamaño, fecha, tipo y estado ('sin verificar', 'verificado' o 'corrupto') salen del
+        manifiesto de cada backup; solo los backups sin manifiesto se consultan con os.stat.
+        """
         try:
             backups = []
+            manifiestos = {m['archivo']: m for m in listar_manifiestos(self.backup_dir)}
             
             for archivo in os.listdir(self.backup_dir):
                 if not archivo.startswith('minimarket_'):
                     continue
                 
                 ruta_completa = os.path.join(self.backup_dir, archivo)
-                stat = os.stat(ruta_completa)
+                manifiesto = manifiestos.get(archivo)
+                
+                if manifiesto is not None:
+                    tamano = manifiesto['tamano']
+                    fecha = datetime.strptime(manifiesto['fecha'], '%Y-%m-%d %H:%M:%S')
+                    tipo = manifiesto['tipo']
+                    estado = manifiesto['estado']
+                else:
+                    stat = os.stat(ruta_completa)
+                    tamano = stat.st_size
+                    fecha = datetime.fromtimestamp(stat.st_mtime)
+                    tipo = 'manual' if 'manual' in archivo else 'automatico'
+                    estado = SIN_VERIFICAR
                 
                 backups.append({
                     'nombre': archivo,
                     'ruta': ruta_completa,
-                    'tamanio_mb': stat.st_size / (1024 * 1024),
-                    'fecha': datetime.fromtimestamp(stat.st_mtime),
-                    'tipo': 'manual' if 'manual' in archivo else 'automatico',
-                    'comprimido': archivo.endswith('.gz')
+                    'tamanio_mb': tamano / (1024 * 1024),
+                    'fecha': fecha,
+                    'tipo': tipo,
+                    'estado': estado,
+                    'comprimido': archivo.endswith(EXTENSIONES_COMPRIMIDAS)
+                })
+            
+            # Backups incrementales: uno por manifiesto; el tamaño es lo que agregó al repositorio
+            for ruta_manifiesto in self.repositorio.listar_manifiestos():
+                manifiesto = self.repositorio.leer_manifiesto(ruta_manifiesto)
+                backups.append({
+                    'nombre': os.path.basename(ruta_manifiesto),
+                    'ruta': ruta_manifiesto,
+                    'tamanio_mb': manifiesto['bytes_nuevos'] / (1024 * 1024),
+                    'fecha': datetime.strptime(manifiesto['fecha'], '%Y-%m-%d %H:%M:%S'),
+                    'tipo': manifiesto['tipo'],
+                    'estado': SIN_VERIFICAR,  # → Cada bloque se verifica por hash al restaurar
+                    'comprimido': True
                 })
             
             # Ordenar por fecha (más recientes primero)
@@ -286,40 +630,37 @@ class BackupService:
             if not os.path.exists(ruta_backup):
                 return False, "Archivo de backup no encontrado"
             
-            # Verificar integridad antes de restaurar
-            if not self._verificar_integridad(ruta_backup):
+            # Con manifiesto, un bloque dañado se detecta sin descomprimir nada
+            if leer_manifiesto(ruta_backup) is not None and not self._verificar_integridad(ruta_backup):
                 return False, "El backup está corrupto o no es válido"
             
-            # Crear backup de seguridad de la BD actual
-            backup_seguridad = os.path.join(
-                self.backup_dir,
-                f"minimarket_pre_restauracion_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db.gz"
-            )
-            self._backup_comprimido(backup_seguridad)
-            
-            # Descomprimir si es necesario
-            if ruta_backup.endswith('.gz'):
-                temp_db = os.path.join(BASE_DIR, 'db', 'minimarket_temp.db')
+            # Descomprimir (o reconstruir) una sola vez: la misma copia se verifica y se restaura
+            origen, temporal = self._abrir_backup(ruta_backup)
+            try:
+                if origen.execute("PRAGMA integrity_check").fetchone()[0] != 'ok':
+                    return False, "El backup está corrupto o no es válido"
                 
-                with gzip.open(ruta_backup, 'rb') as f_in:
-                    with open(temp_db, 'wb') as f_out:
-                        shutil.copyfileobj(f_in, f_out)
+                # Crear backup de seguridad de la BD actual
+                backup_seguridad = os.path.join(
+                    self.backup_dir,
+                    f"minimarket_pre_restauracion_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db{self._compresor().extension}"
+                )
+                self._backup_comprimido(backup_seguridad, tipo='pre_restauracion')
                 
-                # Cerrar todas las conexiones
-                db._connection = None
+                # Cerrar todas las conexiones del pool
+                db.pool.close_all()
                 
-                # Reemplazar BD actual
-                if os.path.exists(self.db_path):
-                    os.remove(self.db_path)
-                shutil.move(temp_db, self.db_path)
-            else:
-                # Cerrar conexiones
-                db._connection = None
-                
-                # Reemplazar BD actual
-                if os.path.exists(self.db_path):
-                    os.remove(self.db_path)
-                shutil.copy2(ruta_backup, self.db_path)
+                # Copiar sobre la BD actual con la API de backup: reemplaza el contenido de
+                # forma atómica y deja en orden el WAL, sin borrar archivos en uso
+                destino = sqlite3.connect(self.db_path)
+                try:
+                    origen.backup(destino)
+                finally:
+                    destino.close()
+            finally:
+                origen.close()
+                if temporal and os.path.exists(temporal):
+                    os.remove(temporal)
             
             # Registrar restauración
             self._registrar_backup(
@@ -338,89 +679,65 @@ class BackupService:
     # ==================== BACKUP AUTOMÁTICO ====================
     
     def iniciar_backup_automatico(self):
-        """Inicia el servicio de backup automático en segundo plano"""
+        """
+        Programa los backups automáticos en el planificador (core/planificador.py):
+        - completo: diario a las hora_backup, y al iniciar si la última ejecución se perdió
+        - incremental: cada intervalo_incremental segundos (None los desactiva)
+        """
         if self.running:
             return False, "El servicio de backup automático ya está en ejecución"
         
         self.running = True
-        self.thread = threading.Thread(target=self._bucle_backup_automatico, daemon=True)
-        self.thread.start()
+        planificador.registrar('backup_completo', self._backup_automatico,
+                               a_las=self.hora_backup, jitter=self.jitter_backup)
+        mensaje = f"Backup automático iniciado (diario a las {self.hora_backup}"
+        if self.intervalo_incremental:
+            planificador.registrar('backup_incremental', self._backup_incremental_automatico,
+                                   cada=self.intervalo_incremental, jitter=self.jitter_backup)
+            mensaje += f", incremental cada {self.intervalo_incremental // 60} min"
+        planificador.iniciar()
         
-        return True, f"Backup automático iniciado (diario a las {self.hora_backup})"
+        return True, mensaje + ")"
     
     def detener_backup_automatico(self):
-        """Detiene el servicio de backup automático"""
+        """Retira los backups del planificador; un backup en curso termina por su cuenta"""
         self.running = False
-        if self.thread:
-            self.thread.join(timeout=5)
+        planificador.quitar('backup_completo')
+        planificador.quitar('backup_incremental')
         return True, "Servicio de backup automático detenido"
     
-    def _bucle_backup_automatico(self):
-        """Bucle principal del servicio de backup automático"""
-        print(f"Servicio de backup automático iniciado")
-        ultimo_backup_fecha = None
-        
-        while self.running:
-            try:
-                ahora = datetime.now()
-                hora_actual = ahora.strftime("%H:%M")
-                fecha_actual = ahora.date()
-                
-                # Verificar si es hora de hacer backup
-                if hora_actual == self.hora_backup and ultimo_backup_fecha != fecha_actual:
-                    print(f"Iniciando backup automático...")
-                    
-                    timestamp = ahora.strftime('%Y%m%d_%H%M%S')
-                    nombre_archivo = f"minimarket_auto_{timestamp}.db"
-                    
-                    if self.compresion:
-                        nombre_archivo += ".gz"
-                    
-                    ruta_backup = os.path.join(self.backup_dir, nombre_archivo)
-                    
-                    # Realizar backup
-                    if self.compresion:
-                        success = self._backup_comprimido(ruta_backup)
-                    else:
-                        success = self._backup_simple(ruta_backup)
-                    
-                    if success and self._verificar_integridad(ruta_backup):
-                        tamanio_mb = os.path.getsize(ruta_backup) / (1024 * 1024)
-                        
-                        self._registrar_backup(
-                            tipo='completo',
-                            estado='exitoso',
-                            ubicacion=ruta_backup,
-                            descripcion=f'Backup automático diario ({tamanio_mb:.2f} MB)',
-                            usuario_id=1  # Sistema
-                        )
-                        
-                        print(f"Backup automático completado: {nombre_archivo} ({tamanio_mb:.2f} MB)")
-                        
-                        # Limpiar backups antiguos
-                        eliminados = self.limpiar_backups_antiguos()
-                        if eliminados > 0:
-                            print(f"Eliminados {eliminados} backups antiguos")
-                    else:
-                        self._registrar_backup(
-                            tipo='completo',
-                            estado='fallido',
-                            ubicacion=ruta_backup,
-                            descripcion='Backup automático falló o no pasó verificación',
-                            usuario_id=1
-                        )
-                        print("Backup automático falló")
-                    
-                    ultimo_backup_fecha = fecha_actual
-                
-                # Esperar 1 minuto antes de verificar de nuevo
-                time.sleep(60)
-                
-            except Exception as e:
-                print(f"Error en bucle de backup automático: {e}")
-                time.sleep(300)  # Esperar 5 minutos en caso de error
+    def _backup_automatico(self):
+        """
+        Backup diario (tarea del planificador)
         
-        print("Servicio de backup automático detenido")
+        Se guarda en el repositorio deduplicado: cada día solo agrega los bloques de páginas
+        que cambiaron, pero restaura la BD completa. Los backups manuales siguen siendo
+        archivos .db.gz/.zst independientes.
+        """
+        with self._lock_automatico:  # → Si hay un incremental en curso, espera a que termine
+            print("Iniciando backup automático...")
+            
+            success, mensaje, _ = self._backup_en_repositorio(
+                'diario', 1, profunda=self._toca_verificacion_profunda()  # → 1 = Sistema
+            )
+            print(mensaje)
+            
+            if success:
+                # Limpiar backups antiguos
+                eliminados = self.limpiar_backups_antiguos()
+                if eliminados > 0:
+                    print(f"Eliminados {eliminados} backups antiguos")
+    
+    def _backup_incremental_automatico(self):
+        """Backup incremental periódico (tarea del planificador)"""
+        if not self._lock_automatico.acquire(blocking=False):
+            return  # → El completo diario ya está copiando la BD
+        try:
+            success, mensaje, _ = self.realizar_backup_incremental(id_usuario=1)
+            if not success:
+                print(mensaje)
+        finally:
+            self._lock_automatico.release()
 
 
 # Instancia global del servicio
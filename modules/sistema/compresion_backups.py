@@ -0,0 +1,154 @@
+"""
+Compresión de backups
+Sistema Minimarket Don Manuelito
+
+Compresores intercambiables para los backups completos:
+- gzip: estilo pigz. El archivo se corta en bloques de TAMANO_BLOQUE y cada bloque se
+  comprime en paralelo como un miembro gzip independiente; la concatenación de miembros es
+  un .gz estándar que abren gzip, gunzip o 7-Zip.
+- zstd: igual, un frame zstd por bloque (requiere el paquete opcional 'zstandard').
+- ninguno: copia por bloques.
+zlib y zstandard liberan el GIL mientras comprimen, así que los hilos sí trabajan en paralelo.
+Se escribe siempre en orden y con a lo sumo 2 bloques por hilo en memoria. Cada bloque ya
+comprimido se resume con BLAKE2 en el mismo hilo: esos hashes forman el manifiesto que permite
+verificar el backup sin descomprimirlo (manifiesto_backups.py).
+"""
+
+import gzip
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+from modules.sistema.repositorio_backups import hash_bloque
+
+try:
+    import zstandard
+    ZSTD_DISPONIBLE = True
+except ImportError:
+    ZSTD_DISPONIBLE = False
+
+TAMANO_BLOQUE = 4 * 1024 * 1024
+HILOS_POR_DEFECTO = os.cpu_count() or 1
+
+
+class _CompresorPorBloques:
+    """Base: comprime bloques independientes en un pool de hilos y los escribe en orden"""
+
+    nombre = ''
+    extension = ''
+    nivel_por_defecto = 0
+
+    def __init__(self, nivel: int = None, hilos: int = None, tamano_bloque: int = TAMANO_BLOQUE):
+        self.nivel = self.nivel_por_defecto if nivel is None else nivel
+        self.hilos = max(1, hilos or HILOS_POR_DEFECTO)
+        self.tamano_bloque = tamano_bloque
+
+    def _comprimir_bloque(self, datos: bytes) -> bytes:
+        raise NotImplementedError
+
+    def abrir_lectura(self, ruta: str):
+        """Archivo binario de solo lectura con el contenido descomprimido (por flujo)."""
+        raise NotImplementedError
+
+    def _comprimir_y_resumir(self, datos: bytes) -> Tuple[bytes, str]:
+        comprimido = self._comprimir_bloque(datos)
+        return comprimido, hash_bloque(comprimido)
+
+    def comprimir(self, f_in, f_out, progreso=None) -> List[Tuple[int, int, str]]:
+        """Comprime `f_in` en `f_out`; retorna (bytes originales, bytes comprimidos, hash del
+        bloque comprimido) de cada bloque.
+
+        progreso(bytes originales escritos) se llama después de escribir cada bloque.
+        """
+        bloques = []
+        pendientes = deque()
+        procesados = 0
+
+        def escribir_siguiente():
+            nonlocal procesados
+            futuro, tamano_original = pendientes.popleft()
+            comprimido, hash_hex = futuro.result()
+            f_out.write(comprimido)
+            bloques.append((tamano_original, len(comprimido), hash_hex))
+            procesados += tamano_original
+            if progreso:
+                progreso(procesados)
+
+        with ThreadPoolExecutor(max_workers=self.hilos) as ejecutor:
+            while True:
+                datos = f_in.read(self.tamano_bloque)
+                if not datos:
+                    break
+                pendientes.append((ejecutor.submit(self._comprimir_y_resumir, datos), len(datos)))
+                if len(pendientes) >= self.hilos * 2:
+                    escribir_siguiente()
+            while pendientes:
+                escribir_siguiente()
+        return bloques
+
+
+class CompresorGzip(_CompresorPorBloques):
+    nombre = 'gzip'
+    extension = '.gz'
+    nivel_por_defecto = 6  # → 9 apenas reduce el tamaño de una BD y tarda varias veces más
+
+    def _comprimir_bloque(self, datos):
+        return gzip.compress(datos, compresslevel=self.nivel, mtime=0)
+
+    def abrir_lectura(self, ruta):
+        return gzip.open(ruta, 'rb')  # → Lee los miembros concatenados uno tras otro
+
+
+class CompresorZstd(_CompresorPorBloques):
+    nombre = 'zstd'
+    extension = '.zst'
+    nivel_por_defecto = 3
+
+    def _comprimir_bloque(self, datos):
+        # Un ZstdCompressor no se comparte entre hilos
+        return zstandard.ZstdCompressor(level=self.nivel).compress(datos)
+
+    def abrir_lectura(self, ruta):
+        return zstandard.ZstdDecompressor().stream_reader(open(ruta, 'rb'), read_across_frames=True, closefd=True)
+
+
+class SinCompresion(_CompresorPorBloques):
+    nombre = 'ninguno'
+    extension = ''
+
+    def _comprimir_bloque(self, datos):
+        return datos
+
+    def abrir_lectura(self, ruta):
+        return open(ruta, 'rb')
+
+
+COMPRESORES = {
+    'gzip': CompresorGzip,
+    'zstd': CompresorZstd,
+    'ninguno': SinCompresion,
+}
+
+
+def obtener_compresor(nombre: str = 'gzip', nivel: int = None, hilos: int = None) -> _CompresorPorBloques:
+    """Compresor `nombre` con el nivel e hilos dados (None = valores por defecto).
+
+    Si se pide zstd y 'zstandard' no está instalado, se usa gzip.
+    """
+    if nombre not in COMPRESORES:
+        raise ValueError(f"Compresor desconocido: {nombre} (use {', '.join(COMPRESORES)})")
+    if nombre == 'zstd' and not ZSTD_DISPONIBLE:
+        print("Advertencia: 'zstandard' no está instalado; se usará gzip para los backups")
+        nombre, nivel = 'gzip', None
+    return COMPRESORES[nombre](nivel=nivel, hilos=hilos)
+
+
+def compresor_de_archivo(ruta: str) -> _CompresorPorBloques:
+    """Compresor con el que se lee un backup, según su extensión."""
+    if ruta.endswith(CompresorZstd.extension):
+        if not ZSTD_DISPONIBLE:
+            raise ImportError("Falta la dependencia 'zstandard' para leer backups .zst. Instálala: pip install zstandard")
+        return CompresorZstd()
+    if ruta.endswith(CompresorGzip.extension):
+        return CompresorGzip()
+    return SinCompresion()
@@ -1,19 +1,54 @@
 ## Vista para gestión de configuraciones del sistema
 
+import threading
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
                              QPushButton, QLineEdit, QMessageBox, QGroupBox,
-                             QFormLayout, QScrollArea, QSpinBox, QComboBox)
-from PyQt5.QtCore import Qt
+                             QFormLayout, QScrollArea, QSpinBox, QComboBox, QProgressDialog)
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
 from shared.styles import TITULO
 from modules.sistema.models.configuracion_model import ConfiguracionModel
 from core.config import *
 
+# Etapas del backup manual → (inicio %, fin %, texto) en la barra de progreso
+ETAPAS_BACKUP = {
+    'copiando': (0, 60, "Copiando base de datos..."),
+    'comprimiendo': (60, 90, "Comprimiendo backup..."),
+    'verificando': (90, 100, "Verificando integridad..."),
+}
+
+
+class _TrabajoBackup(QThread):
+    # Ejecuta el backup manual fuera del hilo de la GUI; las señales llegan encoladas a ella
+    progreso = pyqtSignal(str, float)          # → (etapa, fracción 0..1)
+    terminado = pyqtSignal(bool, str, object)  # → (success, mensaje, ruta)
+
+    def __init__(self, cancelar, parent=None):
+        super().__init__(parent)
+        self.cancelar = cancelar
+
+    def _avisar(self, etapa, hechas, total):
+        self.progreso.emit(etapa, hechas / total if total else 1.0)
+
+    def run(self):
+        from modules.sistema.backup_service import backup_service
+        try:
+            resultado = backup_service.realizar_backup_manual(
+                id_usuario=1, progreso=self._avisar, cancelar=self.cancelar
+            )
+        except Exception as e:
+            resultado = (False, str(e), None)
+        self.terminado.emit(*resultado)
+
+
 class ConfiguracionWidget(QWidget):
     def __init__(self, usuario_rol='empleado'):
         super().__init__()
         self.config_model = ConfiguracionModel()
         self.usuario_rol = usuario_rol
         self.campos = {}  # Diccionario para almacenar los widgets de entrada
+        self._trabajo_backup = None
+        self._dialogo_backup = None
+        self._cancelar_backup = None
         self.init_ui()
         self.cargar_configuraciones()
 
@@ -255,7 +290,7 @@ class ConfiguracionWidget(QWidget):
         grupo_layout.setSpacing(15)
         
         # Información de backups
-        info_label = QLabel("El sistema realiza backups automáticos diariamente a las 2:00 AM")
+        info_label = QLabel("El sistema realiza backups automáticos diariamente a las 2:00 AM e incrementales cada hora")
         info_label.setStyleSheet("""
             QLabel {
                 color: #7f8c8d;
@@ -331,9 +366,10 @@ class ConfiguracionWidget(QWidget):
         layout.addWidget(grupo)
     
     def crear_backup_manual(self):
-        """Crea un backup manual de la base de datos"""
+        """Crea un backup manual de la base de datos en segundo plano, con progreso y cancelación"""
         try:
-            from modules.sistema.backup_service import backup_service
+            if self._trabajo_backup is not None and self._trabajo_backup.isRunning():
+                return  # → Ya hay un backup en curso
             
             # Confirmar acción
             respuesta = QMessageBox.question(
@@ -344,28 +380,22 @@ class ConfiguracionWidget(QWidget):
             )
             
             if respuesta == QMessageBox.Yes:
-                # Mostrar mensaje de espera
-                QMessageBox.information(
-                    self,
-                    "Creando Backup",
-                    "Creando backup de la base de datos. Por favor espere..."
-                )
+                # Diálogo de progreso; el backup corre en otro hilo y la ventana sigue respondiendo
+                self._cancelar_backup = threading.Event()
+                self._dialogo_backup = QProgressDialog(ETAPAS_BACKUP['copiando'][2], "Cancelar", 0, 100, self)
+                self._dialogo_backup.setWindowTitle("Creando Backup")
+                self._dialogo_backup.setWindowModality(Qt.WindowModal)
+                self._dialogo_backup.setMinimumDuration(0)
+                self._dialogo_backup.setAutoClose(False)
+                self._dialogo_backup.setAutoReset(False)
+                self._dialogo_backup.canceled.connect(self._cancelar_backup.set)  # → El diálogo se oculta solo
+                self._dialogo_backup.setValue(0)
                 
-                # Realizar backup
-                success, mensaje, ruta = backup_service.realizar_backup_manual(id_usuario=1)
-                
-                if success:
-                    QMessageBox.information(
-                        self,
-                        "Backup Exitoso",
-                        f"{mensaje}\n\nUbicación: {ruta}"
-                    )
-                else:
-                    QMessageBox.critical(
-                        self,
-                        "Error",
-                        f"No se pudo crear el backup:\n{mensaje}"
-                    )
+                self._trabajo_backup = _TrabajoBackup(self._cancelar_backup, self)
+                self._trabajo_backup.progreso.connect(self._al_progresar_backup)
+                self._trabajo_backup.terminado.connect(self._al_terminar_backup)
+                self._trabajo_backup.finished.connect(self._trabajo_backup.deleteLater)
+                self._trabajo_backup.start()
         except Exception as e:
             QMessageBox.critical(
                 self,
@@ -373,6 +403,38 @@ class ConfiguracionWidget(QWidget):
                 f"Error al crear backup: {str(e)}"
             )
     
+    def _al_progresar_backup(self, etapa, fraccion):
+        if self._cancelar_backup.is_set():
+            return
+        inicio, fin, texto = ETAPAS_BACKUP.get(etapa, (0, 100, etapa))
+        self._dialogo_backup.setLabelText(texto)
+        self._dialogo_backup.setValue(int(inicio + (fin - inicio) * fraccion))
+    
+    def _al_terminar_backup(self, success, mensaje, ruta):
+        cancelado = self._cancelar_backup.is_set()
+        self._dialogo_backup.close()
+        self._dialogo_backup = None
+        self._trabajo_backup = None
+        
+        if success:
+            QMessageBox.information(
+                self,
+                "Backup Exitoso",
+                f"{mensaje}\n\nUbicación: {ruta}"
+            )
+        elif cancelado:
+            QMessageBox.information(
+                self,
+                "Backup Cancelado",
+                "El backup se canceló; no se guardó ningún archivo."
+            )
+        else:
+            QMessageBox.critical(
+                self,
+                "Error",
+                f"No se pudo crear el backup:\n{mensaje}"
+            )
+    
     def ver_backups(self):
         """Muestra la lista de backups disponibles"""
         try:
@@ -398,9 +460,9 @@ class ConfiguracionWidget(QWidget):
             
             # Tabla de backups
             tabla = QTableWidget()
-            tabla.setColumnCount(5)
+            tabla.setColumnCount(6)
             tabla.setHorizontalHeaderLabels([
-                "Fecha", "Nombre", "Tipo", "Tamaño (MB)", "Ubicación"
+                "Fecha", "Nombre", "Tipo", "Tamaño (MB)", "Estado", "Ubicación"
             ])
             tabla.setRowCount(len(backups))
             
@@ -409,7 +471,8 @@ class ConfiguracionWidget(QWidget):
                 tabla.setItem(i, 1, QTableWidgetItem(backup['nombre']))
                 tabla.setItem(i, 2, QTableWidgetItem(backup['tipo']))
                 tabla.setItem(i, 3, QTableWidgetItem(f"{backup['tamanio_mb']:.2f}"))
-                tabla.setItem(i, 4, QTableWidgetItem(backup['ruta']))
+                tabla.setItem(i, 4, QTableWidgetItem(backup['estado']))
+                tabla.setItem(i, 5, QTableWidgetItem(backup['ruta']))
             
             tabla.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
             tabla.setEditTriggers(QTableWidget.NoEditTriggers)
@@ -458,7 +521,7 @@ class ConfiguracionWidget(QWidget):
                 self,
                 "Seleccionar Backup",
                 backup_service.backup_dir,
-                "Archivos de Backup (*.db *.db.gz)"
+                "Archivos de Backup (*.db *.db.gz *.db.zst *.json)"
             )
             
             if not archivo:
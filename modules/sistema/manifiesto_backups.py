@@ -0,0 +1,131 @@
+"""
+Manifiestos de los backups completos
+Sistema Minimarket Don Manuelito
+
+Al escribir un backup se guarda junto a él (en backups/manifiestos/) un JSON con su tamaño,
+fecha, tipo, compresor y el hash BLAKE2 de cada bloque tal como quedó en disco (cada miembro
+gzip o frame zstd, ver compresion_backups.py):
+
+    backups/
+        minimarket_auto_20250301_020000.db.gz
+        manifiestos/minimarket_auto_20250301_020000.db.gz.json
+
+Verificar un backup es entonces una sola lectura secuencial del archivo comprimido,
+comparando hashes: no se descomprime ni se abre con SQLite. El manifiesto también guarda el
+estado de la última verificación, así listar los backups no necesita tocar cada archivo.
+"""
+
+import json
+import os
+from datetime import datetime
+from typing import List, Optional, Tuple
+from modules.sistema.repositorio_backups import hash_bloque
+
+VERSION = 1
+
+# Estados de un backup según su última verificación
+SIN_VERIFICAR = 'sin verificar'
+VERIFICADO = 'verificado'
+CORRUPTO = 'corrupto'
+
+
+def ruta_manifiesto(ruta_backup: str) -> str:
+    carpeta, archivo = os.path.split(ruta_backup)
+    return os.path.join(carpeta, 'manifiestos', f"{archivo}.json")
+
+
+def leer_manifiesto(ruta_backup: str) -> Optional[dict]:
+    """Manifiesto del backup, o None si no tiene (backups anteriores a los manifiestos)."""
+    try:
+        with open(ruta_manifiesto(ruta_backup), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def guardar_manifiesto(ruta_backup: str, manifiesto: dict) -> str:
+    ruta = ruta_manifiesto(ruta_backup)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    temporal = ruta + '.tmp'
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f)
+    os.replace(temporal, ruta)
+    return ruta
+
+
+def eliminar_manifiesto(ruta_backup: str):
+    ruta = ruta_manifiesto(ruta_backup)
+    if os.path.exists(ruta):
+        os.remove(ruta)
+
+
+def listar_manifiestos(carpeta_backups: str) -> List[dict]:
+    """Manifiestos de todos los backups de la carpeta (una lectura de directorio más un JSON por backup)."""
+    carpeta = os.path.join(carpeta_backups, 'manifiestos')
+    if not os.path.isdir(carpeta):
+        return []
+    manifiestos = []
+    for archivo in os.listdir(carpeta):
+        if not archivo.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(carpeta, archivo), 'r', encoding='utf-8') as f:
+                manifiestos.append(json.load(f))
+        except (OSError, ValueError):
+            continue  # → Manifiesto ilegible: el backup se lista con os.stat
+    return manifiestos
+
+
+def crear_manifiesto(ruta_backup: str, tipo: str, compresor: str,
+                     bloques: List[Tuple[int, int, str]], quick_check: Optional[bool] = None) -> dict:
+    """
+    Guarda el manifiesto de un backup recién escrito.
+
+    Args:
+        bloques: (bytes originales, bytes en disco, hash BLAKE2 de los bytes en disco) por bloque
+        quick_check: resultado de PRAGMA quick_check sobre la copia sin comprimir (None = no se hizo)
+    """
+    ahora = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    manifiesto = {
+        'version': VERSION,
+        'archivo': os.path.basename(ruta_backup),
+        'tipo': tipo,
+        'fecha': ahora,
+        'compresor': compresor,
+        'tamano': sum(b[1] for b in bloques),
+        'tamano_bd': sum(b[0] for b in bloques),
+        'bloques': [[b[1], b[2]] for b in bloques],
+        'estado': SIN_VERIFICAR,
+        'verificado': None,
+        'quick_check': ahora if quick_check else None,
+    }
+    guardar_manifiesto(ruta_backup, manifiesto)
+    return manifiesto
+
+
+def verificar_bloques(ruta_backup: str, manifiesto: dict, progreso=None) -> bool:
+    """
+    Compara el archivo con los hashes del manifiesto en una lectura secuencial.
+
+    progreso(bytes leídos, total) se llama tras cada bloque. Retorna False si algún bloque
+    no coincide o el archivo es más corto o más largo que lo registrado.
+    """
+    total = manifiesto['tamano']
+    leidos = 0
+    with open(ruta_backup, 'rb') as f:
+        for tamano, hash_hex in manifiesto['bloques']:
+            datos = f.read(tamano)
+            if len(datos) != tamano or hash_bloque(datos) != hash_hex:
+                return False
+            leidos += tamano
+            if progreso:
+                progreso(leidos, total)
+        return not f.read(1)
+
+
+def registrar_verificacion(ruta_backup: str, manifiesto: dict, correcto: bool) -> dict:
+    """Anota en el manifiesto el resultado y la fecha de la verificación."""
+    manifiesto['estado'] = VERIFICADO if correcto else CORRUPTO
+    manifiesto['verificado'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    guardar_manifiesto(ruta_backup, manifiesto)
+    return manifiesto
@@ -1,10 +1,11 @@
 ## Modelo para gestión de configuraciones del sistema
 
-from core.database import Database
+from core.database import db
 
 class ConfiguracionModel:
     def __init__(self):
-        self.db = Database()
+        # Usar la instancia global: crear otra Database() volvería a comprobar el esquema
+        self.db = db
 
     def obtener_configuracion(self, clave):
         """Obtiene el valor de una configuración específica"""
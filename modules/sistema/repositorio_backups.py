@@ -0,0 +1,288 @@
+"""
+Repositorio de backups incrementales por bloques de páginas
+Sistema Minimarket Don Manuelito
+
+Una foto de la BD (archivo SQLite consistente) se divide en bloques de PAGINAS_POR_BLOQUE
+páginas. Cada bloque se guarda una sola vez con su hash BLAKE2 como nombre, y cada backup
+es un manifiesto JSON con la lista ordenada de hashes de sus bloques:
+
+    repositorio/
+        bloques/3f/3fa9...c1      → contenido de 16 páginas comprimido
+        manifiestos/minimarket_incremental_20250301_020000.json
+
+Un backup solo escribe los bloques que cambiaron desde cualquier backup anterior, pero su
+manifiesto describe la BD completa: cualquier punto se restaura solo, sin aplicar una cadena
+de deltas.
+
+referencias.json cuenta cuántas veces aparece cada bloque en los manifiestos vigentes.
+Eliminar un backup resta sus referencias y borra los bloques que quedan en cero; si el
+índice no corresponde a los manifiestos en disco (p. ej. tras un corte de luz) se vuelve a
+contar desde ellos. Las páginas de SQLite tienen tamaño fijo y no se desplazan al insertar,
+así que los bloques fijos deduplican igual que un corte por contenido (rolling hash).
+"""
+
+import hashlib
+import json
+import os
+import threading
+import zlib
+from collections import Counter
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+# Las páginas cambian en grupos (hojas vecinas de un índice, el final de una tabla): bloques de
+# 16 páginas (64 KB con páginas de 4 KB) evitan tener cientos de miles de archivos diminutos
+PAGINAS_POR_BLOQUE = 16
+NIVEL_COMPRESION = 6
+
+
+def tamano_pagina(ruta_bd: str) -> int:
+    """Tamaño de página leído del encabezado del archivo SQLite (bytes 16-17; 1 significa 65536)."""
+    with open(ruta_bd, 'rb') as f:
+        encabezado = f.read(100)
+    if len(encabezado) < 100 or not encabezado.startswith(b'SQLite format 3\x00'):
+        raise ValueError(f"No es una base de datos SQLite: {ruta_bd}")
+    valor = int.from_bytes(encabezado[16:18], 'big')
+    return 65536 if valor == 1 else valor
+
+
+def hash_bloque(datos: bytes) -> str:
+    return hashlib.blake2b(datos, digest_size=20).hexdigest()
+
+
+class RepositorioBackups:
+    """Almacén direccionado por contenido de bloques de páginas más un manifiesto por backup"""
+
+    def __init__(self, raiz: str):
+        self.raiz = raiz
+        self.dir_bloques = os.path.join(raiz, 'bloques')
+        self.dir_manifiestos = os.path.join(raiz, 'manifiestos')
+        self.ruta_referencias = os.path.join(raiz, 'referencias.json')
+        os.makedirs(self.dir_bloques, exist_ok=True)
+        os.makedirs(self.dir_manifiestos, exist_ok=True)
+        # Crear, eliminar y recolectar no se mezclan: un bloque que un backup en curso da por
+        # existente no puede desaparecer antes de que su manifiesto lo referencie
+        self._lock = threading.RLock()
+
+    # ==================== BLOQUES ====================
+
+    def ruta_bloque(self, hash_hex: str) -> str:
+        return os.path.join(self.dir_bloques, hash_hex[:2], hash_hex)
+
+    def existe_bloque(self, hash_hex: str) -> bool:
+        return os.path.exists(self.ruta_bloque(hash_hex))
+
+    def guardar_bloque(self, hash_hex: str, datos: bytes) -> int:
+        """Guarda el bloque comprimido; retorna los bytes escritos en disco."""
+        ruta = self.ruta_bloque(hash_hex)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        comprimido = zlib.compress(datos, NIVEL_COMPRESION)
+        temporal = ruta + '.tmp'  # → Un bloque a medias nunca queda con su nombre final
+        with open(temporal, 'wb') as f:
+            f.write(comprimido)
+        os.replace(temporal, ruta)
+        return len(comprimido)
+
+    def _borrar_bloque(self, hash_hex: str) -> int:
+        ruta = self.ruta_bloque(hash_hex)
+        try:
+            tamano = os.path.getsize(ruta)
+            os.remove(ruta)
+            return tamano
+        except OSError:
+            return 0
+
+    def leer_bloque(self, hash_hex: str) -> bytes:
+        """Contenido del bloque; falla si el archivo no coincide con su hash."""
+        with open(self.ruta_bloque(hash_hex), 'rb') as f:
+            datos = zlib.decompress(f.read())
+        if hash_bloque(datos) != hash_hex:
+            raise ValueError(f"Bloque corrupto: {hash_hex}")
+        return datos
+
+    # ==================== MANIFIESTOS ====================
+
+    def ruta_manifiesto(self, nombre: str) -> str:
+        return os.path.join(self.dir_manifiestos, f"{nombre}.json")
+
+    def leer_manifiesto(self, ruta_o_nombre: str) -> dict:
+        ruta = ruta_o_nombre if ruta_o_nombre.endswith('.json') else self.ruta_manifiesto(ruta_o_nombre)
+        with open(ruta, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _guardar_manifiesto(self, manifiesto: dict) -> str:
+        ruta = self.ruta_manifiesto(manifiesto['nombre'])
+        temporal = ruta + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(manifiesto, f)
+        os.replace(temporal, ruta)
+        return ruta
+
+    def listar_manifiestos(self) -> List[str]:
+        """Rutas de los manifiestos, del más antiguo al más reciente."""
+        rutas = [os.path.join(self.dir_manifiestos, a) for a in os.listdir(self.dir_manifiestos)
+                 if a.endswith('.json')]
+        return sorted(rutas, key=lambda r: (os.path.getmtime(r), r))
+
+    def ultimo_manifiesto(self) -> Optional[dict]:
+        rutas = self.listar_manifiestos()
+        return self.leer_manifiesto(rutas[-1]) if rutas else None
+
+    # ==================== REFERENCIAS ====================
+
+    def _contar_referencias(self) -> dict:
+        referencias = Counter()
+        nombres = []
+        for ruta in self.listar_manifiestos():
+            manifiesto = self.leer_manifiesto(ruta)
+            nombres.append(manifiesto['nombre'])
+            referencias.update(manifiesto['bloques'])
+        return {'manifiestos': nombres, 'bloques': dict(referencias)}
+
+    def _guardar_referencias(self, referencias: dict):
+        temporal = self.ruta_referencias + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(referencias, f)
+        os.replace(temporal, self.ruta_referencias)
+
+    def _referencias(self) -> dict:
+        """{'manifiestos': [nombres], 'bloques': {hash: referencias}}, recontado si quedó desfasado."""
+        try:
+            with open(self.ruta_referencias, 'r', encoding='utf-8') as f:
+                referencias = json.load(f)
+        except (OSError, ValueError):
+            referencias = None
+        en_disco = {os.path.basename(r)[:-len('.json')] for r in self.listar_manifiestos()}
+        if referencias is None or set(referencias['manifiestos']) != en_disco:
+            referencias = self._contar_referencias()
+            self._guardar_referencias(referencias)
+        return referencias
+
+    # ==================== RETENCIÓN ====================
+
+    def eliminar_backup(self, ruta_o_nombre: str) -> int:
+        """Retira un backup del repositorio; retorna los bytes de bloques que quedaron sin uso y se borraron."""
+        with self._lock:
+            referencias = self._referencias()
+            manifiesto = self.leer_manifiesto(ruta_o_nombre)
+            os.remove(self.ruta_manifiesto(manifiesto['nombre']))
+            referencias['manifiestos'].remove(manifiesto['nombre'])
+
+            liberados = 0
+            for hash_hex in manifiesto['bloques']:
+                restantes = referencias['bloques'].get(hash_hex, 0) - 1
+                if restantes > 0:
+                    referencias['bloques'][hash_hex] = restantes
+                elif referencias['bloques'].pop(hash_hex, None) is not None:
+                    liberados += self._borrar_bloque(hash_hex)
+            self._guardar_referencias(referencias)
+            return liberados
+
+    def recolectar_basura(self) -> Tuple[int, int]:
+        """
+        Borra los archivos de bloque que ningún manifiesto referencia (restos de un backup
+        interrumpido o de una eliminación cortada a medias). Retorna (archivos, bytes).
+        """
+        with self._lock:
+            vigentes = self._referencias()['bloques']
+            archivos = 0
+            liberados = 0
+            for carpeta in os.listdir(self.dir_bloques):
+                ruta_carpeta = os.path.join(self.dir_bloques, carpeta)
+                for archivo in os.listdir(ruta_carpeta):
+                    if archivo in vigentes:
+                        continue
+                    ruta = os.path.join(ruta_carpeta, archivo)
+                    liberados += os.path.getsize(ruta)
+                    os.remove(ruta)
+                    archivos += 1
+            return archivos, liberados
+
+    def estadisticas(self) -> dict:
+        """Backups, bloques únicos, bytes en disco y bytes que ocuparían los backups por separado."""
+        with self._lock:
+            referencias = self._referencias()
+            bytes_disco = sum(os.path.getsize(self.ruta_bloque(h)) for h in referencias['bloques']
+                              if self.existe_bloque(h))
+            bytes_bd = sum(self.leer_manifiesto(n)['tamano_bd'] for n in referencias['manifiestos'])
+            return {
+                'backups': len(referencias['manifiestos']),
+                'bloques': len(referencias['bloques']),
+                'bytes_disco': bytes_disco,
+                'bytes_bd': bytes_bd,
+            }
+
+    # ==================== BACKUP / RESTAURACIÓN ====================
+
+    def crear_backup(self, ruta_foto: str, nombre: str, tipo: str = 'incremental', progreso=None) -> dict:
+        """
+        Guarda la foto `ruta_foto` (BD SQLite consistente, p. ej. hecha con la API de backup)
+        y retorna su manifiesto.
+
+        Cada bloque se compara primero con el bloque en la misma posición del último backup
+        (el caso común: la página no cambió) y luego con el almacén; solo los bloques nuevos
+        se comprimen y escriben. progreso(bytes leídos, total) se llama tras cada bloque.
+        """
+        with self._lock:
+            return self._crear_backup(ruta_foto, nombre, tipo, progreso)
+
+    def _crear_backup(self, ruta_foto, nombre, tipo, progreso):
+        referencias = self._referencias()
+        pagina = tamano_pagina(ruta_foto)
+        tamano = pagina * PAGINAS_POR_BLOQUE
+        sufijo = 1
+        nombre_base = nombre
+        while os.path.exists(self.ruta_manifiesto(nombre)):  # → Dos backups en el mismo segundo
+            nombre = f"{nombre_base}_{sufijo}"
+            sufijo += 1
+        base = self.ultimo_manifiesto()
+        bloques_base = base['bloques'] if base else []
+        total = os.path.getsize(ruta_foto)
+
+        bloques = []
+        bloques_nuevos = 0
+        bytes_nuevos = 0
+        with open(ruta_foto, 'rb') as f:
+            while True:
+                datos = f.read(tamano)
+                if not datos:
+                    break
+                hash_hex = hash_bloque(datos)
+                indice = len(bloques)
+                sin_cambios = indice < len(bloques_base) and bloques_base[indice] == hash_hex
+                if not sin_cambios and not self.existe_bloque(hash_hex):
+                    bytes_nuevos += self.guardar_bloque(hash_hex, datos)
+                    bloques_nuevos += 1
+                bloques.append(hash_hex)
+                if progreso:
+                    progreso(min(len(bloques) * tamano, total), total)
+
+        manifiesto = {
+            'version': 1,
+            'nombre': nombre,
+            'tipo': tipo,
+            'fecha': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'base': base['nombre'] if base else None,
+            'tamano_pagina': pagina,
+            'paginas_por_bloque': PAGINAS_POR_BLOQUE,
+            'tamano_bd': total,
+            'bloques': bloques,
+            'bloques_nuevos': bloques_nuevos,
+            'bytes_nuevos': bytes_nuevos,
+        }
+        manifiesto['ruta'] = self._guardar_manifiesto(manifiesto)
+        referencias['manifiestos'].append(nombre)
+        referencias['bloques'] = dict(Counter(referencias['bloques']) + Counter(bloques))
+        self._guardar_referencias(referencias)
+        return manifiesto
+
+    def restaurar(self, ruta_o_nombre: str, ruta_destino: str) -> dict:
+        """Reconstruye en `ruta_destino` la BD del manifiesto, verificando el hash de cada bloque."""
+        with self._lock:
+            manifiesto = self.leer_manifiesto(ruta_o_nombre)
+            with open(ruta_destino, 'wb') as f:
+                for hash_hex in manifiesto['bloques']:
+                    f.write(self.leer_bloque(hash_hex))
+        if os.path.getsize(ruta_destino) != manifiesto['tamano_bd']:
+            raise ValueError("El tamaño restaurado no coincide con el manifiesto")
+        return manifiesto
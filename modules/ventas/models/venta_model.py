@@ -2,63 +2,100 @@
 
 import pandas as pd
 from core.database import db
+from core.rango_fechas import rango_dias, filtro_fechas, registrar_consulta
+
+# → Ventas de un día con cantidad de ítems. El conteo va en subconsulta: con JOIN + GROUP BY id_venta
+# SQLite recorría toda la tabla por su clave en vez de buscar el día en idx_ventas_fecha
+SQL_VENTAS_POR_FECHA = registrar_consulta('ventas_por_fecha', f'''
+    SELECT v.*,
+           (SELECT COUNT(*) FROM detalle_venta dv WHERE dv.id_venta = v.id_venta) as items_vendidos
+    FROM ventas v
+    WHERE {filtro_fechas('v.fecha_venta')}
+    ORDER BY v.fecha_venta DESC
+''')
+
+# → Resumen de un día (una fila de resumen_ventas_dia, mantenida por triggers)
+SQL_ESTADISTICAS_FECHA = registrar_consulta('ventas_estadisticas_fecha', '''
+    SELECT 
+        num_ventas as total_ventas,
+        total_venta as monto_total,
+        CASE WHEN num_ventas > 0 THEN total_venta / num_ventas ELSE 0 END as venta_promedio
+    FROM resumen_ventas_dia 
+    WHERE fecha = ?
+''')
+
+# → Productos más vendidos (filtro de fecha opcional sobre resumen_ventas_producto)
+# num_ventas = líneas con el producto, una por venta porque el carrito agrupa por producto
+SQL_PRODUCTOS_MAS_VENDIDOS = '''
+    SELECT 
+        p.nombre_producto as producto_nombre,
+        SUM(r.cantidad) as total_vendido,
+        SUM(r.ingresos) as ingresos_totales,
+        SUM(r.num_lineas) as num_ventas
+    FROM resumen_ventas_producto r
+    JOIN productos p ON r.id_producto = p.id_producto
+    {filtro}
+    GROUP BY r.id_producto, p.nombre_producto
+    HAVING SUM(r.num_lineas) > 0
+    ORDER BY total_vendido DESC
+    LIMIT ?
+'''
+registrar_consulta('ventas_productos_mas_vendidos_fecha',
+                   SQL_PRODUCTOS_MAS_VENDIDOS.format(filtro=f"WHERE {filtro_fechas('r.fecha')}"))
 
 # → Modelo de datos para ventas: Realiza operaciones CRUD en la BD.
 class VentaModel:
 # → Inserta una nueva venta  
     def crear_venta(self, venta_id, fecha, empleado_id, total, descuento, 
                     descuento_pct, descuento_tipo, metodo_pago, estado='completado'):
-        conexion = db.get_connection()
-        cursor = conexion.cursor()
-        
-        cursor.execute('''
-            INSERT INTO ventas (id_venta, fecha_venta, id_empleado, total_venta, descuento_venta,
-                                descuento_pct, descuento_tipo, metodo_pago, estado_venta)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (venta_id, fecha, empleado_id, total, descuento,
-              descuento_pct, descuento_tipo, metodo_pago, estado))
-        
-        conexion.commit()
-        conexion.close()
+        with db.connection() as conexion:
+            cursor = conexion.cursor()
+
+            cursor.execute('''
+                INSERT INTO ventas (id_venta, fecha_venta, id_empleado, total_venta, descuento_venta,
+                                    descuento_pct, descuento_tipo, metodo_pago, estado_venta)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (venta_id, fecha, empleado_id, total, descuento,
+                  descuento_pct, descuento_tipo, metodo_pago, estado))
+
+            conexion.commit()
     
 # → Inserta un nuevo detalle de venta - los triggers de BD validan stock y actualizan automáticamente.    
     def crear_detalle_venta(self, venta_id, producto_id, cantidad, precio_unitario, subtotal, descuento=0):
-        conexion = db.get_connection()
-        cursor = conexion.cursor()
-        
-        cursor.execute('''
-            INSERT INTO detalle_venta 
-            (id_venta, id_producto, cantidad_detalle, precio_unitario_detalle, subtotal_detalle, descuento_aplicado)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (venta_id, producto_id, cantidad, precio_unitario, subtotal, descuento))
-        
-        conexion.commit()
-        conexion.close()
+        with db.connection() as conexion:
+            cursor = conexion.cursor()
+
+            cursor.execute('''
+                INSERT INTO detalle_venta 
+                (id_venta, id_producto, cantidad_detalle, precio_unitario_detalle, subtotal_detalle, descuento_aplicado)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (venta_id, producto_id, cantidad, precio_unitario, subtotal, descuento))
+
+            conexion.commit()
 
 # → Obtiene una venta y sus detalles por ID
     def obtener_venta_por_id(self, venta_id):
         try:
-            conexion = db.get_connection()
+            with db.connection() as conexion:
             
-            # Información principal de la venta
-            venta = pd.read_sql_query('''
-                SELECT * FROM ventas WHERE id_venta = ?
-            ''', conexion, params=[venta_id])
-
-            # Detalles de la venta
-            detalles = pd.read_sql_query('''
-                SELECT dv.id_detalle_venta, dv.id_venta, dv.id_producto, 
-                       dv.cantidad_detalle, dv.precio_unitario_detalle, 
-                       dv.descuento_aplicado, dv.subtotal_detalle,
-                       p.nombre_producto as producto_nombre,
-                       um.nombre_unidad
-                FROM detalle_venta dv
-                JOIN productos p ON dv.id_producto = p.id_producto
-                LEFT JOIN unidad_medida um ON p.id_unidad_medida = um.id_unidad_medida
-                WHERE dv.id_venta = ?
-            ''', conexion, params=[venta_id])
+                # Información principal de la venta
+                venta = pd.read_sql_query('''
+                    SELECT * FROM ventas WHERE id_venta = ?
+                ''', conexion, params=[venta_id])
+
+                # Detalles de la venta
+                detalles = pd.read_sql_query('''
+                    SELECT dv.id_detalle_venta, dv.id_venta, dv.id_producto, 
+                           dv.cantidad_detalle, dv.precio_unitario_detalle, 
+                           dv.descuento_aplicado, dv.subtotal_detalle,
+                           p.nombre_producto as producto_nombre,
+                           um.nombre_unidad
+                    FROM detalle_venta dv
+                    JOIN productos p ON dv.id_producto = p.id_producto
+                    LEFT JOIN unidad_medida um ON p.id_unidad_medida = um.id_unidad_medida
+                    WHERE dv.id_venta = ?
+                ''', conexion, params=[venta_id])
             
-            conexion.close()
             return venta, detalles
 
         except Exception as e:
@@ -68,18 +105,9 @@ class VentaModel:
 # → Obtiene todas las ventas de una fecha específica.
     def obtener_ventas_por_fecha(self, fecha):
         try:
-            conexion = db.get_connection()
-            query = '''
-                SELECT v.*, COUNT(dv.id_detalle_venta) as items_vendidos
-                FROM ventas v
-                LEFT JOIN detalle_venta dv ON v.id_venta = dv.id_venta
-                WHERE DATE(v.fecha_venta) = ?
-                GROUP BY v.id_venta
-                ORDER BY v.fecha_venta DESC
-            '''
-            # pd.read_sql_query para mayor eficiencia con grandes volúmenes de datos
-            ventas = pd.read_sql_query(query, conexion, params=[fecha])
-            conexion.close()
+            with db.connection() as conexion:
+                # pd.read_sql_query para mayor eficiencia con grandes volúmenes de datos
+                ventas = pd.read_sql_query(SQL_VENTAS_POR_FECHA, conexion, params=list(rango_dias(fecha)))
             return ventas
 
         except Exception as e:
@@ -89,20 +117,12 @@ class VentaModel:
 # → Obtiene estadísticas agregadas de ventas para una fecha
     def obtener_estadisticas_fecha(self, fecha):
         try:
-            conexion = db.get_connection()
-            cursor = conexion.cursor()
+            with db.connection() as conexion:
+                cursor = conexion.cursor()
 
-            cursor.execute('''
-                SELECT 
-                    COUNT(*) as total_ventas,
-                    COALESCE(SUM(total_venta), 0) as monto_total,
-                    COALESCE(AVG(total_venta), 0) as venta_promedio
-                FROM ventas 
-                WHERE DATE(fecha_venta) = ?
-            ''', [fecha])
+                cursor.execute(SQL_ESTADISTICAS_FECHA, [fecha])
 
-            resumen = cursor.fetchone()
-            conexion.close()
+                resumen = cursor.fetchone()
 
             return {
                 'total_ventas': resumen[0] if resumen else 0,
@@ -125,30 +145,16 @@ class VentaModel:
         params = []
         
         if fecha:
-            fecha_filtro = "WHERE DATE(v.fecha_venta) = ?"
-            params.append(fecha)
+            fecha_filtro = f"WHERE {filtro_fechas('r.fecha')}"
+            params.extend(rango_dias(fecha))
         # append es para agregar elementos a la lista params
         params.append(limite)
         
         try:
-            conexion = db.get_connection()
-            query = f'''
-                SELECT 
-                    p.nombre_producto as producto_nombre,
-                    SUM(dv.cantidad_detalle) as total_vendido,
-                    SUM(dv.subtotal_detalle) as ingresos_totales,
-                    COUNT(DISTINCT dv.id_venta) as num_ventas
-                FROM detalle_venta dv
-                JOIN ventas v ON dv.id_venta = v.id_venta
-                JOIN productos p ON dv.id_producto = p.id_producto
-                {fecha_filtro}
-                GROUP BY dv.id_producto, p.nombre_producto
-                ORDER BY total_vendido DESC
-                LIMIT ?
-            '''
-
-            productos = pd.read_sql_query(query, conexion, params=params)
-            conexion.close()
+            with db.connection() as conexion:
+                query = SQL_PRODUCTOS_MAS_VENDIDOS.format(filtro=fecha_filtro)
+
+                productos = pd.read_sql_query(query, conexion, params=params)
             return productos
             
         except Exception as e:
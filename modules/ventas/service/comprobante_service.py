@@ -7,8 +7,16 @@ import requests
 import sqlite3
 from datetime import datetime
 from core.database import db
+from core.rango_fechas import registrar_consulta
 from modules.ventas.service.nubefact_service import NubefactService
 
+# → Último número emitido de una serie (busca por idx_comprobante_serie)
+SQL_ULTIMO_NUMERO = registrar_consulta('comprobante_ultimo_numero', '''
+    SELECT COALESCE(MAX(CAST(numero_comprobante AS INTEGER)), 0)
+    FROM comprobante
+    WHERE tipo_comprobante = ? AND serie_comprobante = ?
+''')
+
 class ComprobanteService:
     def __init__(self):
         # Cargarmos las credenciales desde el .env 
@@ -276,10 +284,7 @@ class ComprobanteService:
         
         conn = db.get_connection()
         cur = conn.cursor()
-        cur.execute(
-            "SELECT COALESCE(MAX(CAST(numero_comprobante AS INTEGER)), 0) FROM comprobante WHERE tipo_comprobante = ? AND serie_comprobante = ?",
-            (tipo, serie)
-        )
+        cur.execute(SQL_ULTIMO_NUMERO, (tipo, serie))
         last = cur.fetchone()[0]
         conn.close()
         return serie, int(last) + 1
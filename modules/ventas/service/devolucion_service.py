@@ -4,6 +4,7 @@ from modules.ventas.models.devolucion_model import DevolucionModel
 from modules.ventas.models.detalle_devolucion_model import DetalleDevolucionModel
 from modules.ventas.models.venta_model import VentaModel
 from modules.productos.models.producto_model import ProductoModel
+from modules.productos.models.catalogo_cache import catalogo_cache, version_catalogo
 from core.database import db
 import pandas as pd
 
@@ -92,6 +93,11 @@ class DevolucionService:
                 else:
                     return False, None, f"Error: No se encontraron detalles de venta para la venta {id_venta}"
             
+            # Tomar el bloqueo de escritura: la versión del catálogo leída aquí y tras los
+            # detalles enmarca exactamente los cambios de esta devolución
+            cursor.execute("BEGIN IMMEDIATE")
+            version_antes = version_catalogo(cursor)
+
             # Crear la devolución principal
             cursor.execute('''
                 INSERT INTO devolucion 
@@ -133,7 +139,11 @@ class DevolucionService:
                       monto_producto, 'completada'))
             
             # Commit de la transacción
+            versiones = (version_antes, version_catalogo(cursor))
             conexion.commit()
+
+            # El trigger repuso stock: refrescar esos productos en el catálogo en memoria
+            catalogo_cache.refrescar_productos((p['id_producto'] for p in productos_devolver), versiones)
             
             return True, id_devolucion, f"Devolución procesada exitosamente. ID: {id_devolucion}"
             
@@ -2,23 +2,31 @@
 
 from datetime import datetime
 import json
+from core.config import TERMINAL_ID
+from core.secuencias import BloqueIds
 from modules.ventas.models.venta_model import VentaModel
 
+# Correlativo propio de cada caja: el prefijo evita choques entre cajas que comparten la BD
+ids_venta = BloqueIds(f"ventas_{TERMINAL_ID}", f"V{TERMINAL_ID}-", 8)
+
 # → Servicio de ventas. Contiene toda la lógica de negocio.
 class VentaService:
     # __init__, venta_model = venta_model() sirve para inicializar el modelo de ventas
     def __init__(self):
         self.venta_model = VentaModel()
 
-# → Genera un ID único para la venta usando timestamp.
+# → Genera un ID único para la venta: V<caja>-<correlativo>, p. ej. V01-00000042.
     def generar_id_venta(self):
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S%f")[:-3]
-        return f"V{timestamp}"
+        return ids_venta.siguiente()
 
 # → Procesa una venta completa con validación y manejo de transacciones. Los triggers de BD se encargan de validar stock y actualizar automáticamente.
 # Las promociones se aplican automáticamente desde la BD según configuración previa.
+# Todo ocurre en una sola transacción BEGIN IMMEDIATE: una lectura de stock con IN (...), la venta,
+# los detalles con executemany y las alertas calculadas con el stock antes/después ya conocido.
     def procesar_venta_completa(self, carrito, empleado_id=1, metodo_pago="efectivo", datos_pago_tarjeta=None):
         from core.database import db
+        from modules.productos.models.catalogo_cache import catalogo_cache, version_catalogo
+        from modules.productos.service.alertas_service import AlertasService
         
         # Si es pago con tarjeta, guardar datos como JSON en metodo_pago
         if metodo_pago == 'tarjeta' and datos_pago_tarjeta:
@@ -31,102 +39,78 @@ class VentaService:
         else:
             metodo_pago_str = metodo_pago
         
-        conexion = None
+        # Validaciones de negocio
+        if not carrito:
+            return False, None, "El carrito está vacío", []
+
         try:
-            # Validaciones de negocio
-            if not carrito:
-                return False, None, "El carrito está vacío", []
-
-            # Capturar stock inicial para alertas
-            from modules.productos.models.producto_model import ProductoModel
-            pm_temp = ProductoModel()
-            stock_inicial_map = {}
-            try:
-                for item in carrito:
-                    df_temp = pm_temp.obtenerPorId(item['id'])
-                    if not df_temp.empty:
-                        stock_inicial_map[item['id']] = {
-                            'stock': df_temp['Stock'].iloc[0],
-                            'minimo': df_temp['Stock Mínimo'].iloc[0],
-                            'nombre': df_temp['Nombre'].iloc[0]
-                        }
-            except Exception as e:
-                print(f"Error capturando stock inicial: {e}")
-
-            # Generar ID y calcular totales
+            # Generar ID y calcular totales. La reserva del ID puede abrir su propia transacción
+            # (bloque de IDs agotado) y un ítem mal formado falla aquí: ambos se informan con la
+            # misma tupla que un error de BD, nunca como excepción hacia la vista
             venta_id = self.generar_id_venta()
             fecha_hora = datetime.now()
             total = sum(item['total'] for item in carrito)
 
-            # Iniciar transacción
-            conexion = db.get_connection()
-            cursor = conexion.cursor()
-
             # Calcular descuentos y totales a persistir
             descuento_total = sum(float(item.get('descuento') or 0.0) for item in carrito)
-            descuento_pct_global = 0.0
-            try:
-                descuento_pct_global = max(float(item.get('descuento_pct_aplicado') or 0.0) for item in carrito)
-            except Exception:
-                descuento_pct_global = 0.0
-
-            # 1. Insertar venta principal con descuentos calculados
-            cursor.execute('''
-                INSERT INTO ventas (id_venta, fecha_venta, id_empleado, total_venta, descuento_venta,
-                                    descuento_pct, descuento_tipo, metodo_pago, estado_venta)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (venta_id, fecha_hora, empleado_id, total, round(descuento_total,2), descuento_pct_global, "promocion", metodo_pago_str, 'completado'))
-
-            # 2. Insertar detalles de venta
-            # Los triggers automáticamente:
-            # - Validan stock suficiente
-            # - Actualizan el stock
-            # - Validan precios y cantidades positivas
-            # Las promociones activas se aplican desde la BD
+            descuento_pct_global = max(float(item.get('descuento_pct_aplicado') or 0.0) for item in carrito)
+
+            # Persistir detalle: guardar subtotal antes de descuento (base_total), descuento_aplicado y id_promocion si existe
+            detalles = [
+                (venta_id, item['id'], item['cantidad'], item['precio'],
+                 float(item.get('base_total', item.get('precio', 0) * item.get('cantidad', 0))),
+                 float(item.get('descuento') or 0.0),
+                 item.get('id_promocion') or None)
+                for item in carrito
+            ]
+
+            # Cantidad total a descontar por producto (un producto podría repetirse en el carrito)
+            vendido = {}
             for item in carrito:
-                # Persistir detalle: guardar subtotal antes de descuento (base_total), descuento_aplicado y id_promocion si existe
-                subtotal_detalle = float(item.get('base_total', item.get('precio',0) * item.get('cantidad',0)))
-                descuento_aplicado = float(item.get('descuento') or 0.0)
-                id_prom = item.get('id_promocion') if item.get('id_promocion') else None
+                vendido[item['id']] = vendido.get(item['id'], 0) + item['cantidad']
+
+            with db.connection() as conexion:
+                cursor = conexion.cursor()
+                # Tomar el bloqueo de escritura antes de leer stock: lo leído no cambia hasta el commit
+                cursor.execute("BEGIN IMMEDIATE")
+
+                # 1. Stock de todos los productos del carrito en una sola consulta
+                marcadores = ",".join("?" * len(vendido))
+                stock_inicial_map = {
+                    fila[0]: {'stock': fila[1], 'minimo': fila[2], 'nombre': fila[3]}
+                    for fila in cursor.execute(f'''
+                        SELECT id_producto, stock_producto, stock_minimo, nombre_producto
+                        FROM productos
+                        WHERE id_producto IN ({marcadores})
+                    ''', list(vendido)).fetchall()
+                }
+                version_antes = version_catalogo(cursor)
+
+                # 2. Insertar venta principal con descuentos calculados
                 cursor.execute('''
+                    INSERT INTO ventas (id_venta, fecha_venta, id_empleado, total_venta, descuento_venta,
+                                        descuento_pct, descuento_tipo, metodo_pago, estado_venta)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (venta_id, fecha_hora, empleado_id, total, round(descuento_total,2), descuento_pct_global, "promocion", metodo_pago_str, 'completado'))
+
+                # 3. Insertar detalles de venta
+                # Los triggers automáticamente:
+                # - Validan stock suficiente
+                # - Actualizan el stock
+                # - Validan precios y cantidades positivas
+                cursor.executemany('''
                     INSERT INTO detalle_venta 
                     (id_venta, id_producto, cantidad_detalle, precio_unitario_detalle, subtotal_detalle, descuento_aplicado, id_promocion)
                     VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (venta_id, item['id'], item['cantidad'],
-                      item['precio'], subtotal_detalle, descuento_aplicado, id_prom))
-
-            conexion.commit()
-            conexion.close()
-
-            # Verificar alertas de stock (Después de commit para ver stock actualizado)
-            from modules.productos.models.producto_model import ProductoModel
-            from modules.productos.service.alertas_service import AlertasService
-            
-            alertas = []
-            try:
-                producto_model = ProductoModel()
-                alertas_service = AlertasService()
-                
-                for item in carrito:
-                    id_prod = item['id']
-                    # Verificar si tenemos datos iniciales para comparar
-                    if id_prod in stock_inicial_map:
-                        df_nuevo = producto_model.obtenerPorId(id_prod)
-                        if not df_nuevo.empty:
-                            stock_nuevo = df_nuevo['Stock'].iloc[0]
-                            datos_ini = stock_inicial_map[id_prod]
-                            
-                            if alertas_service.verificar_cambio_stock(datos_ini['stock'], stock_nuevo, datos_ini['minimo']):
-                                alertas.append(f"ALERTA: El stock de '{datos_ini['nombre']}' ha bajado del mínimo ({datos_ini['minimo']}). Stock actual: {stock_nuevo}")
-            except Exception as e:
-                print(f"Error verificando alertas: {e}")
-
-            return True, venta_id, f"Venta {venta_id} procesada exitosamente", alertas
+                ''', detalles)
+
+                # Versión del catálogo tras los triggers de stock: el caché en memoria se pone al
+                # día con el parche de abajo sin recargar todo el catálogo
+                versiones = (version_antes, version_catalogo(cursor))
+                conexion.commit()
 
         except Exception as e:
-            if conexion:
-                conexion.rollback()
-                conexion.close()
+            # La conexión vuelve al pool con rollback de lo no confirmado
 
             # Interpretar errores de los triggers
             error_msg = str(e)
@@ -139,6 +123,23 @@ class VentaService:
             else:
                 return False, None, f"Error al procesar venta: {error_msg}", [] 
 
+        # Stock final = stock leído bajo el bloqueo menos lo vendido (es lo que hicieron los triggers)
+        stock_final_map = {id_prod: datos['stock'] - vendido[id_prod]
+                           for id_prod, datos in stock_inicial_map.items()}
+
+        # Actualizar solo estos productos en el catálogo en memoria, sin volver a la BD
+        catalogo_cache.actualizar_stock(stock_final_map, versiones)
+
+        # Verificar alertas de stock: transición de >= mínimo a < mínimo
+        alertas = []
+        alertas_service = AlertasService()
+        for id_prod, datos_ini in stock_inicial_map.items():
+            stock_nuevo = stock_final_map[id_prod]
+            if alertas_service.verificar_cambio_stock(datos_ini['stock'], stock_nuevo, datos_ini['minimo']):
+                alertas.append(f"ALERTA: El stock de '{datos_ini['nombre']}' ha bajado del mínimo ({datos_ini['minimo']}). Stock actual: {stock_nuevo}")
+
+        return True, venta_id, f"Venta {venta_id} procesada exitosamente", alertas
+
 # → Obtiene información completa de una venta.
     def obtener_venta(self, venta_id):
         return self.venta_model.obtener_venta_por_id(venta_id)
@@ -81,7 +81,7 @@ class DevolucionesFrame(QWidget):
         search_layout.addWidget(label)
         
         self.input_id_venta = QLineEdit()
-        self.input_id_venta.setPlaceholderText("V[AÑO/MES/DÍA-HORA-NUMERO]")
+        self.input_id_venta.setPlaceholderText("V[CAJA]-[NÚMERO]")
         self.input_id_venta.setStyleSheet("""
             QLineEdit {
                 background-color: white;
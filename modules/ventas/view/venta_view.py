@@ -3,7 +3,7 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
                              QPushButton, QTableWidget, QTableWidgetItem, 
                              QLineEdit, QSpinBox, QMessageBox, QFrame, 
-                             QAbstractItemView, QHeaderView, QDialog, QDialogButtonBox,
+                             QHeaderView, QDialog, QDialogButtonBox,
                              QComboBox, QGroupBox)
 from PyQt5.QtCore import Qt
 from core.config import *
@@ -16,6 +16,14 @@ from shared.styles import TablaNoEditableCSS, TITULO
 from modules.productos.view.inventario_view import TablaNoEditable
 import pandas as pd
 from modules.productos.models.unidad_medida_model import UnidadMedidaModel
+from shared.components.busqueda_async import BusquedaAsincrona
+from shared.components.tabla_productos import (ProductosTableModel, ColumnaTabla,
+                                               BotonAgregarDelegate, TablaVirtual)
+from modules.productos.service.promocion_service import PromocionService, motor_promociones
+
+# Filas que muestra la búsqueda del POS: un prefijo de una o dos letras coincide con decenas de
+# miles de productos; más allá de este tope se pide afinar la búsqueda
+MAX_RESULTADOS_BUSQUEDA = 200
 
 class VentasFrame(QWidget):
     def __init__(self, parent):
@@ -26,8 +34,16 @@ class VentasFrame(QWidget):
         self.comprobante_service = ComprobanteService()
         self.carrito = []  # Lista de productos en el carrito
         self.total = 0.0
+        self.promocion_service = PromocionService()
+        self._lineas_sucias = set()        # → ids de líneas cuyo precio hay que recalcular
+        self._version_promociones = None   # → versión del motor con la que se cotizó el carrito
+        self._filas_mostradas = []         # → firma de lo dibujado en cada fila de tabla_carrito
         self.datos_cliente = None  # Para almacenar datos del cliente temporal
 
+        # Búsqueda de productos fuera del hilo de la GUI
+        self.busqueda = BusquedaAsincrona(self._buscarDisponibles, self)
+        self.busqueda.resultados.connect(self.mostrarResultadosBusqueda)
+
         self.crearInterfaz()
         self.cargarProductos()
     
@@ -85,19 +101,32 @@ class VentasFrame(QWidget):
         search_layout.addWidget(self.search_input)
         search_layout.addWidget(btn_limpiar)
         left_layout.addLayout(search_layout)
+
+        # Aviso cuando la búsqueda llegó al tope de resultados
+        self.lbl_mas_resultados = QLabel(
+            f"Se muestran los primeros {MAX_RESULTADOS_BUSQUEDA} resultados: refina la búsqueda")
+        self.lbl_mas_resultados.setStyleSheet("color: #7f8c8d; font-size: 13px;")
+        self.lbl_mas_resultados.hide()
+        left_layout.addWidget(self.lbl_mas_resultados)
         
         # Tabla de productos - DIRECTAMENTE SIN PANEL
-        self.tabla_productos = TablaNoEditable()
-        self.tabla_productos.setStyleSheet(TablaNoEditableCSS)
+        # Modelo/vista: solo se pintan las filas visibles, sin un widget por fila
+        self.tabla_productos = TablaVirtual()
+        self.modelo_productos = ProductosTableModel([
+            ColumnaTabla("ID", lambda r: str(r['id_producto'])),
+            ColumnaTabla("Nombre", lambda r: str(r['nombre_producto'])),
+            ColumnaTabla("Precio", lambda r: formatear_precio(r['precio_producto'])),
+            ColumnaTabla("Stock", lambda r: str(int(r['stock_producto'] or 0))),
+            ColumnaTabla("Acción", None),
+        ], parent=self)
+        self.tabla_productos.setModel(self.modelo_productos)
+
+        # Botón agregar dibujado por delegate
+        self.delegate_agregar = BotonAgregarDelegate(self.tabla_productos)
+        self.delegate_agregar.clicked.connect(self._agregarFila)
+        self.tabla_productos.setItemDelegateForColumn(4, self.delegate_agregar)
 
-        # Configurar tabla
-        columnas = ["ID", "Nombre", "Precio", "Stock", "Acción"]        
-        self.tabla_productos.setColumnCount(len(columnas))
-        self.tabla_productos.setHorizontalHeaderLabels(columnas)
-        
         # Configurar selección
-        self.tabla_productos.setSelectionBehavior(QAbstractItemView.SelectRows)
-        self.tabla_productos.setSelectionMode(QAbstractItemView.SingleSelection)
         self.tabla_productos.setAlternatingRowColors(True)
         self.tabla_productos.setFocusPolicy(Qt.NoFocus)
 
@@ -223,79 +252,38 @@ class VentasFrame(QWidget):
         return info_frame
     
     def cargarProductos(self):
-        df = self.producto_model.obtener_todos()
-        
-        # Filtrar productos con stock > 0
-        productos_disponibles = []
-        for _, row in df.iterrows():
-            stock = int(row["Stock"]) if pd.notna(row["Stock"]) else 0
-            if stock > 0:
-                productos_disponibles.append(row)
-        
-        # Configurar número exacto de filas
-        self.tabla_productos.setRowCount(len(productos_disponibles))
-        
-        for row_idx, row in enumerate(productos_disponibles):
-            stock = int(row["Stock"]) if pd.notna(row["Stock"]) else 0
-            
-            # ID
-            self.tabla_productos.setItem(row_idx, 0, QTableWidgetItem(str(row["ID"])))
-            
-            # Nombre
-            self.tabla_productos.setItem(row_idx, 1, QTableWidgetItem(str(row["Nombre"])))
-            
-            # Precio
-            precio_texto = formatear_precio(row["Precio"])
-            self.tabla_productos.setItem(row_idx, 2, QTableWidgetItem(precio_texto))
-            
-            # Stock
-            self.tabla_productos.setItem(row_idx, 3, QTableWidgetItem(str(stock)))
-
-            # Botón agregar
-            btn_agregar = QPushButton("➕")
-            btn_agregar.setStyleSheet(f"""
-                QPushButton {{
-                    background-color: {INFO_COLOR};
-                    color: white;
-                    border: none;
-                    border-radius: 3px;
-                    font-weight: bold;
-                }}
-                QPushButton:hover {{
-                    background-color: #2980b9;
-                }}
-            """)
-            btn_agregar.clicked.connect(lambda checked, r=row: self.agregarCarrito(r))
-            self.tabla_productos.setCellWidget(row_idx, 4, btn_agregar)
+        self.busqueda.cancelar()
+        self.mostrarProductos(*self._buscarDisponibles(""))
 
+# → Se ejecuta en el hilo de trabajo: solo datos (sin widgets). Filtra productos con stock > 0.
+#   Devuelve (registros, hay_mas): se pide uno más que el tope para saber si hubo más coincidencias.
+    def _buscarDisponibles(self, texto):
+        registros = self.producto_model.buscar_registros(texto, MAX_RESULTADOS_BUSQUEDA + 1)
+        hay_mas = len(registros) > MAX_RESULTADOS_BUSQUEDA
+        disponibles = [r for r in registros[:MAX_RESULTADOS_BUSQUEDA] if (r['stock_producto'] or 0) > 0]
+        return disponibles, hay_mas
+
+# → Conectado a textChanged: solo reprograma la búsqueda (debounce + hilo de trabajo)
     def buscarProducto(self, texto):
-        if not texto.strip():
-            self.cargarProductos()
-            return
-        
-        df = self.producto_model.buscarProducto(texto)
-        
-        # Filtrar productos con stock > 0
-        productos_encontrados = []
-        for _, row in df.iterrows():
-            stock = int(row["Stock"]) if pd.notna(row["Stock"]) else 0
-            if stock > 0:
-                productos_encontrados.append(row)
-        
-        # Configurar número exacto de filas
-        self.tabla_productos.setRowCount(len(productos_encontrados))
-        
-        for row_idx, row in enumerate(productos_encontrados):
-            stock = int(row["Stock"]) if pd.notna(row["Stock"]) else 0
-            
-            self.tabla_productos.setItem(row_idx, 0, QTableWidgetItem(str(row["ID"])))
-            self.tabla_productos.setItem(row_idx, 1, QTableWidgetItem(str(row["Nombre"])))
-            self.tabla_productos.setItem(row_idx, 2, QTableWidgetItem(formatear_precio(row["Precio"])))
-            self.tabla_productos.setItem(row_idx, 3, QTableWidgetItem(str(stock)))
-            
-            btn_agregar = QPushButton("➕")
-            btn_agregar.clicked.connect(lambda checked, r=row: self.agregarCarrito(r))
-            self.tabla_productos.setCellWidget(row_idx, 4, btn_agregar)
+        self.busqueda.buscar(texto)
+
+    def mostrarResultadosBusqueda(self, texto, resultado):
+        self.mostrarProductos(*resultado)
+
+    def mostrarProductos(self, registros, hay_mas=False):
+        self.modelo_productos.establecer_registros(registros)
+        self.lbl_mas_resultados.setVisible(hay_mas)
+
+    def _agregarFila(self, row_idx):
+        registro = self.modelo_productos.registro(row_idx)
+        if registro is not None:
+            self.agregarCarrito({
+                "ID": registro['id_producto'],
+                "Nombre": registro['nombre_producto'],
+                "Precio": registro['precio_producto'],
+                "Stock": registro['stock_producto'],
+                "id_unidad_medida": registro['id_unidad_medida'],
+            })
     
     def limpiarBusqueda(self):
         self.search_input.clear()
@@ -359,13 +347,6 @@ class VentasFrame(QWidget):
                 item["cantidad"] += cantidad_kg  # Siempre almacenar en kg
                 item["base_total"] = item["cantidad"] * item["precio"]
                 item["total"] = item["base_total"]
-                # Aplicar promoción automática si existe
-                try:
-                    from modules.productos.service.promocion_service import PromocionService
-                    PromocionService().aplicar_descuento_a_item(item)
-                except Exception:
-                    # No detener la operación por errores en promociones
-                    pass
                 break
         else:
             # Agregar nuevo producto al carrito (cantidad siempre en kg)
@@ -379,14 +360,10 @@ class VentasFrame(QWidget):
                 "descuento": None,
                 "es_peso": es_peso  # Guardar si es producto por peso
             }
-            # Aplicar promoción automática si existe
-            try:
-                from modules.productos.service.promocion_service import PromocionService
-                PromocionService().aplicar_descuento_a_item(nuevo_item)
-            except Exception:
-                pass
             self.carrito.append(nuevo_item)
 
+        # La promoción automática se aplica al cotizar el carrito
+        self._lineas_sucias.add(id_producto)
         self.actualizarCarrito()
         
         # Mensaje de confirmación
@@ -475,82 +452,89 @@ class VentasFrame(QWidget):
         return None
 
     def actualizarCarrito(self):
+        self.cotizarCarrito()
         self.tabla_carrito.setRowCount(len(self.carrito))
-        self.total = 0.0
-        # Resetear descuento_aplicado temporal antes de cálculo (se actualizará si existe)
-        # NOTE: descuentos se aplican sobre item['total'] que debe representar el estado actual
+        del self._filas_mostradas[len(self.carrito):]
+
         for row_idx, item in enumerate(self.carrito):
-            # Recalcular/promocionar item antes de mostrar (asegura datos actualizados)
-            try:
-                from modules.productos.service.promocion_service import PromocionService
-                from modules.productos.models.promocion_model import PromocionModel
-                PromocionService().aplicar_descuento_a_item(item)
-            except Exception:
-                # Silenciar errores en promociones para no romper la vista
-                pass
-
-            self.tabla_carrito.setItem(row_idx, 0, QTableWidgetItem(item["nombre"]))
-            
-            # Mostrar cantidad en kilogramos o unidades según corresponda
-            if item.get("es_peso", False):
-                cantidad_display = f"{item['cantidad']:.3f} kg"  # Mostrar en kilogramos con 3 decimales
+            # Solo redibujar filas cuyo contenido cambió (o que se desplazaron al remover otra)
+            firma = (item["id"], item["cantidad"], item.get("total"), item.get("id_promocion"))
+            if row_idx < len(self._filas_mostradas) and self._filas_mostradas[row_idx] == firma:
+                continue
+            self.mostrarFilaCarrito(row_idx, item)
+            if row_idx < len(self._filas_mostradas):
+                self._filas_mostradas[row_idx] = firma
             else:
-                cantidad_display = str(int(item["cantidad"]))
-            self.tabla_carrito.setItem(row_idx, 1, QTableWidgetItem(cantidad_display))
-            
-            self.tabla_carrito.setItem(row_idx, 2, QTableWidgetItem(formatear_precio(item["precio"])))
-            self.tabla_carrito.setItem(row_idx, 3, QTableWidgetItem(formatear_precio(item.get("total", 0))))
-
-            # Promoción: mostrar badge si existe
-            try:
-                from modules.productos.models.promocion_model import PromocionModel
-                id_prom = item.get('id_promocion')
-                if id_prom:
-                    prom = PromocionModel().obtener_por_id(id_prom)
-                    if prom:
-                        prom_name = prom.get('nombre', '')
-                        prom_pct = prom.get('descuento', item.get('descuento_pct_aplicado', 0))
-                        promo_label = QLabel(f"{prom_name} ({prom_pct:.0f}% )")
-                        promo_label.setStyleSheet("background-color:#27ae60; color:white; padding:4px 8px; border-radius:8px; font-weight:bold;")
-                        promo_label.setToolTip(f"Promoción: {prom_name}\nDescuento: {prom_pct:.0f}%")
-                    else:
-                        promo_label = QLabel("")
-                else:
-                    promo_label = QLabel("")
-            except Exception:
-                promo_label = QLabel("")
-
-            promo_label.setAlignment(Qt.AlignCenter)
-            self.tabla_carrito.setCellWidget(row_idx, 4, promo_label)
-
-            # Acciones: solo botón remover
-            action_widget = QWidget()
-            action_layout = QHBoxLayout(action_widget)
-            action_layout.setContentsMargins(0, 0, 0, 0)
-
-            # Botón remover
-            btn_remover = QPushButton("🗑️")
-            btn_remover.setStyleSheet(f"""
-                QPushButton {{
-                    background-color: {ERROR_COLOR};
-                    color: white;
-                    border: none;
-                    border-radius: 3px;
-                    font-weight: bold;
-                    padding: 4px;
-                }}
-                QPushButton:hover {{
-                    background-color: #c0392b;
-                }}
-            """)
-            btn_remover.clicked.connect(lambda checked, idx=row_idx: self.removerCarrito(idx))
-            action_layout.addWidget(btn_remover)
-            action_widget.setLayout(action_layout)
-            self.tabla_carrito.setCellWidget(row_idx, 5, action_widget)
-            self.total += float(item.get("total", 0))
+                self._filas_mostradas.append(firma)
 
         self.label_total.setText(f"Total: {formatear_precio(self.total)}")
 
+# → Recalcular precios: solo las líneas modificadas, o todas si cambiaron las promociones vigentes
+    def cotizarCarrito(self):
+        try:
+            version = motor_promociones.version
+            ids = None if version != self._version_promociones else self._lineas_sucias
+            totales = self.promocion_service.cotizar_carrito(self.carrito, ids)
+            self._version_promociones = version
+            self.total = totales['total']
+        except Exception as e:
+            # No detener la venta por errores en promociones: se cobra el precio base
+            print(f"Error al aplicar promociones: {e}")
+            self._version_promociones = None
+            self.total = round(sum(float(item.get("total", 0)) for item in self.carrito), 2)
+        self._lineas_sucias.clear()
+
+    def mostrarFilaCarrito(self, row_idx, item):
+        self.tabla_carrito.setItem(row_idx, 0, QTableWidgetItem(item["nombre"]))
+
+        # Mostrar cantidad en kilogramos o unidades según corresponda
+        if item.get("es_peso", False):
+            cantidad_display = f"{item['cantidad']:.3f} kg"  # Mostrar en kilogramos con 3 decimales
+        else:
+            cantidad_display = str(int(item["cantidad"]))
+        self.tabla_carrito.setItem(row_idx, 1, QTableWidgetItem(cantidad_display))
+
+        self.tabla_carrito.setItem(row_idx, 2, QTableWidgetItem(formatear_precio(item["precio"])))
+        self.tabla_carrito.setItem(row_idx, 3, QTableWidgetItem(formatear_precio(item.get("total", 0))))
+
+        # Promoción: mostrar badge si existe
+        promo_label = QLabel("")
+        id_prom = item.get('id_promocion')
+        prom = motor_promociones.promocion(id_prom) if id_prom else None
+        if prom:
+            prom_name = prom.get('nombre', '')
+            prom_pct = item.get('descuento_pct_aplicado') or prom.get('descuento', 0)
+            promo_label.setText(f"{prom_name} ({prom_pct:.0f}% )")
+            promo_label.setStyleSheet("background-color:#27ae60; color:white; padding:4px 8px; border-radius:8px; font-weight:bold;")
+            promo_label.setToolTip(f"Promoción: {prom_name}\nDescuento: {prom_pct:.0f}%")
+        promo_label.setAlignment(Qt.AlignCenter)
+        self.tabla_carrito.setCellWidget(row_idx, 4, promo_label)
+
+        # Acciones: solo botón remover
+        action_widget = QWidget()
+        action_layout = QHBoxLayout(action_widget)
+        action_layout.setContentsMargins(0, 0, 0, 0)
+
+        # Botón remover
+        btn_remover = QPushButton("🗑️")
+        btn_remover.setStyleSheet(f"""
+            QPushButton {{
+                background-color: {ERROR_COLOR};
+                color: white;
+                border: none;
+                border-radius: 3px;
+                font-weight: bold;
+                padding: 4px;
+            }}
+            QPushButton:hover {{
+                background-color: #c0392b;
+            }}
+        """)
+        btn_remover.clicked.connect(lambda checked, idx=row_idx: self.removerCarrito(idx))
+        action_layout.addWidget(btn_remover)
+        action_widget.setLayout(action_layout)
+        self.tabla_carrito.setCellWidget(row_idx, 5, action_widget)
+
     def removerCarrito(self, indice):
         if 0 <= indice < len(self.carrito):
             producto_removido = self.carrito.pop(indice)
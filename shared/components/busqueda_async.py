@@ -0,0 +1,102 @@
+## Búsqueda asíncrona con debounce para cajas de búsqueda
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+
+
+class _SenalesBusqueda(QObject):
+    # Las señales viven en el hilo de la GUI: emitirlas desde el worker las encola allí
+    terminado = pyqtSignal(int, str, object)
+    fallido = pyqtSignal(int, str)
+
+
+class _TareaBusqueda(QRunnable):
+    def __init__(self, generacion, texto, funcion, senales, vigente):
+        super().__init__()
+        self.generacion = generacion
+        self.texto = texto
+        self.funcion = funcion
+        self.senales = senales
+        self.vigente = vigente
+
+    def run(self):
+        # Si el usuario siguió escribiendo, esta búsqueda ya no interesa
+        if not self.vigente(self.generacion):
+            return
+        try:
+            resultado = self.funcion(self.texto)
+        except Exception as e:
+            self.senales.fallido.emit(self.generacion, str(e))
+            return
+        if self.vigente(self.generacion):
+            self.senales.terminado.emit(self.generacion, self.texto, resultado)
+
+
+class BusquedaAsincrona(QObject):
+    """Ejecuta `funcion_busqueda(texto)` fuera del hilo de la GUI.
+
+    - Debounce: solo se busca cuando el usuario deja de escribir `espera_ms`.
+    - Generaciones: cada tecla invalida las búsquedas anteriores; sus resultados se descartan.
+    - Un único worker: las búsquedas en cola que quedaron obsoletas se retiran sin ejecutarse.
+    La función de búsqueda no debe tocar widgets de Qt.
+    """
+
+    resultados = pyqtSignal(str, object)   # → (texto buscado, resultado)
+    error = pyqtSignal(str)
+
+    def __init__(self, funcion_busqueda, parent=None, espera_ms=180):
+        super().__init__(parent)
+        self.funcion_busqueda = funcion_busqueda
+        self._generacion = 0
+        self._texto = ""
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(espera_ms)
+        self._timer.timeout.connect(self._lanzar)
+
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+
+        self._senales = _SenalesBusqueda()
+        self._senales.terminado.connect(self._al_terminar)
+        self._senales.fallido.connect(self._al_fallar)
+
+    @property
+    def generacion(self):
+        return self._generacion
+
+    def _vigente(self, generacion):
+        return generacion == self._generacion
+
+    def buscar(self, texto):
+        """Programa una búsqueda; reinicia el debounce si ya había una pendiente."""
+        self._texto = texto
+        self._generacion += 1
+        self._timer.start()
+
+    def buscar_ahora(self, texto):
+        """Busca sin esperar el debounce (p. ej. al pulsar Enter)."""
+        self._texto = texto
+        self._generacion += 1
+        self._timer.stop()
+        self._lanzar()
+
+    def cancelar(self):
+        """Descarta la búsqueda pendiente y cualquier resultado en vuelo."""
+        self._generacion += 1
+        self._timer.stop()
+        self._pool.clear()
+
+    def _lanzar(self):
+        self._pool.clear()  # → Retirar tareas encoladas que aún no empezaron
+        tarea = _TareaBusqueda(self._generacion, self._texto, self.funcion_busqueda,
+                               self._senales, self._vigente)
+        self._pool.start(tarea)
+
+    def _al_terminar(self, generacion, texto, resultado):
+        if self._vigente(generacion):
+            self.resultados.emit(texto, resultado)
+
+    def _al_fallar(self, generacion, mensaje):
+        if self._vigente(generacion):
+            self.error.emit(mensaje)
@@ -0,0 +1,115 @@
+## Carga en segundo plano de varias consultas independientes (p. ej. las pestañas de reportes)
+
+import threading
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from core.database import db
+
+
+class _SenalesCarga(QObject):
+    # Las señales viven en el hilo de la GUI: emitirlas desde el worker las encola allí
+    terminado = pyqtSignal(int, str, object)
+    fallido = pyqtSignal(int, str, str)
+
+
+class _TareaCarga(QRunnable):
+    def __init__(self, generacion, clave, funcion, carga):
+        super().__init__()
+        self.generacion = generacion
+        self.clave = clave
+        self.funcion = funcion
+        self.carga = carga
+
+    def run(self):
+        # Si la carga fue reemplazada antes de empezar, no se consulta nada
+        if not self.carga._vigente(self.generacion):
+            return
+        try:
+            with db.connection() as conn:
+                self.carga._registrar_conexion(conn)
+                try:
+                    resultado = self.funcion(conn)
+                finally:
+                    self.carga._liberar_conexion(conn)
+        except Exception as e:
+            if self.carga._vigente(self.generacion):
+                self.carga._senales.fallido.emit(self.generacion, self.clave, str(e))
+            return
+        if self.carga._vigente(self.generacion):
+            self.carga._senales.terminado.emit(self.generacion, self.clave, resultado)
+
+
+class CargaAsincrona(QObject):
+    """Ejecuta varias funciones `funcion(conn)` en paralelo fuera del hilo de la GUI.
+
+    - Cada función recibe su propia conexión del pool y se publica apenas termina
+      (`resultado(clave, valor)`), sin esperar a las demás.
+    - Generaciones: lanzar() o cancelar() invalidan la carga anterior; las tareas en cola
+      se retiran y las consultas en curso se interrumpen con Connection.interrupt().
+    - `terminado` se emite cuando todas las tareas de la carga vigente respondieron.
+    Las funciones no deben tocar widgets de Qt.
+    """
+
+    resultado = pyqtSignal(str, object)   # → (clave, valor devuelto)
+    error = pyqtSignal(str, str)          # → (clave, mensaje)
+    terminado = pyqtSignal()
+
+    def __init__(self, parent=None, max_hilos=3):
+        super().__init__(parent)
+        self._generacion = 0
+        self._pendientes = set()
+
+        self._lock = threading.Lock()
+        self._conexiones = set()  # → conexiones con una consulta en curso
+
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max_hilos)
+
+        self._senales = _SenalesCarga()
+        self._senales.terminado.connect(self._al_terminar)
+        self._senales.fallido.connect(self._al_fallar)
+
+    @property
+    def en_curso(self):
+        return bool(self._pendientes)
+
+    def _vigente(self, generacion):
+        return generacion == self._generacion
+
+    def _registrar_conexion(self, conn):
+        with self._lock:
+            self._conexiones.add(conn)
+
+    def _liberar_conexion(self, conn):
+        with self._lock:
+            self._conexiones.discard(conn)
+
+    def lanzar(self, tareas):
+        """Cancela la carga anterior y ejecuta `tareas` ({clave: funcion(conn)})."""
+        self.cancelar()
+        self._pendientes = set(tareas)
+        for clave, funcion in tareas.items():
+            self._pool.start(_TareaCarga(self._generacion, clave, funcion, self))
+
+    def cancelar(self):
+        """Descarta la carga en curso: retira las tareas en cola e interrumpe las consultas."""
+        self._generacion += 1
+        self._pendientes = set()
+        self._pool.clear()  # → Retirar tareas encoladas que aún no empezaron
+        with self._lock:
+            for conn in self._conexiones:
+                conn.interrupt()  # → La consulta en curso termina con OperationalError
+
+    def _marcar_respondida(self, clave):
+        self._pendientes.discard(clave)
+        if not self._pendientes:
+            self.terminado.emit()
+
+    def _al_terminar(self, generacion, clave, valor):
+        if self._vigente(generacion):
+            self.resultado.emit(clave, valor)
+            self._marcar_respondida(clave)
+
+    def _al_fallar(self, generacion, clave, mensaje):
+        if self._vigente(generacion):
+            self.error.emit(clave, mensaje)
+            self._marcar_respondida(clave)
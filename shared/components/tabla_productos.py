@@ -0,0 +1,165 @@
+## Tabla virtual de productos (modelo/vista) para listados grandes
+
+from PyQt5.QtWidgets import QTableView, QAbstractItemView, QStyledItemDelegate, QStyle, QHeaderView
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QEvent, pyqtSignal
+from PyQt5.QtGui import QColor, QFont
+from core.config import INFO_COLOR
+from shared.styles import TablaNoEditableCSS
+
+# Misma apariencia que TablaNoEditable, aplicada a QTableView
+TablaVirtualCSS = TablaNoEditableCSS.replace("QTableWidget", "QTableView")
+
+# Colores de fondo según nivel de stock (los mismos que usaban las tablas con QTableWidgetItem)
+COLOR_STOCK_AGOTADO = QColor(255, 180, 180)
+COLOR_STOCK_CRITICO = QColor(255, 200, 200)
+COLOR_STOCK_BAJO = QColor(255, 230, 180)
+
+
+def color_stock_inventario(registro):
+    """Rojo si el stock está en o bajo el mínimo, naranja hasta 1.5 veces el mínimo."""
+    stock = registro['stock_producto'] or 0
+    minimo = registro['stock_minimo'] or 0
+    if stock <= minimo:
+        return COLOR_STOCK_CRITICO
+    if stock <= minimo * 1.5:
+        return COLOR_STOCK_BAJO
+    return None
+
+
+def color_stock_alerta(registro):
+    """Agotado, crítico (hasta la mitad del mínimo) o bajo."""
+    stock = registro['stock_producto'] or 0
+    minimo = registro['stock_minimo'] or 0
+    if stock <= 0:
+        return COLOR_STOCK_AGOTADO
+    if stock <= minimo * 0.5:
+        return COLOR_STOCK_CRITICO
+    return COLOR_STOCK_BAJO
+
+
+class ColumnaTabla:
+    """Definición de una columna: título, cómo obtener el texto del registro y su estilo."""
+
+    def __init__(self, titulo, valor, alineacion=Qt.AlignLeft | Qt.AlignVCenter,
+                 color_texto=None, negrita=False):
+        self.titulo = titulo
+        self.valor = valor
+        self.alineacion = alineacion
+        self.color_texto = QColor(color_texto) if color_texto is not None else None
+        self.negrita = negrita
+
+
+class ProductosTableModel(QAbstractTableModel):
+    """Modelo de solo lectura sobre una lista de registros del catálogo.
+
+    No copia ni preformatea nada: la vista pide data() solo para las filas visibles,
+    así que mostrar 50.000 productos cuesta lo mismo que mostrar 30.
+    """
+
+    def __init__(self, columnas, color_fila=None, parent=None):
+        super().__init__(parent)
+        self.columnas = columnas
+        self.color_fila = color_fila
+        self._registros = []
+        self._fuente_negrita = QFont()
+        self._fuente_negrita.setBold(True)
+
+    def establecer_registros(self, registros):
+        self.beginResetModel()
+        self._registros = registros
+        self.endResetModel()
+
+    def registro(self, fila):
+        if 0 <= fila < len(self._registros):
+            return self._registros[fila]
+        return None
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._registros)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columnas)
+
+    def headerData(self, seccion, orientacion, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientacion == Qt.Horizontal:
+            return self.columnas[seccion].titulo
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        registro = self._registros[index.row()]
+        columna = self.columnas[index.column()]
+
+        if role == Qt.DisplayRole:
+            return columna.valor(registro) if columna.valor else None
+        if role == Qt.TextAlignmentRole:
+            return int(columna.alineacion)
+        if role == Qt.BackgroundRole and self.color_fila:
+            return self.color_fila(registro)
+        if role == Qt.ForegroundRole and columna.color_texto is not None:
+            return columna.color_texto
+        if role == Qt.FontRole and columna.negrita:
+            return self._fuente_negrita
+        if role == Qt.UserRole:
+            return registro
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsSelectable | Qt.ItemIsEnabled | Qt.ItemNeverHasChildren
+
+
+class BotonAgregarDelegate(QStyledItemDelegate):
+    """Dibuja un botón ➕ en la celda y emite `clicked(fila)`; no crea un widget por fila."""
+
+    clicked = pyqtSignal(int)
+
+    def __init__(self, parent=None, texto="➕", color=INFO_COLOR, color_hover="#2980b9"):
+        super().__init__(parent)
+        self.texto = texto
+        self.color = QColor(color)
+        self.color_hover = QColor(color_hover)
+
+    def _rect_boton(self, option):
+        return option.rect.adjusted(4, 3, -4, -3)
+
+    def paint(self, painter, option, index):
+        painter.save()
+        painter.setRenderHint(painter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        hover = bool(option.state & QStyle.State_MouseOver)
+        painter.setBrush(self.color_hover if hover else self.color)
+        rect = self._rect_boton(option)
+        painter.drawRoundedRect(rect, 3, 3)
+        painter.setPen(Qt.white)
+        painter.drawText(rect, Qt.AlignCenter, self.texto)
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        if (event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton
+                and self._rect_boton(option).contains(event.pos())):
+            self.clicked.emit(index.row())
+            return True
+        return super().editorEvent(event, model, option, index)
+
+
+class TablaVirtual(QTableView):
+    """QTableView no editable con filas de alto fijo (equivalente a TablaNoEditable)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.setStyleSheet(TablaVirtualCSS)
+        # Alto fijo: la vista no mide cada fila, solo calcula las visibles
+        self.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.verticalHeader().setDefaultSectionSize(36)
+        self.setMouseTracking(True)
+        self.viewport().setMouseTracking(True)
+
+    def filaSeleccionada(self):
+        indice = self.currentIndex()
+        return indice.row() if indice.isValid() else -1
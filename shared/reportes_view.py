@@ -6,6 +6,7 @@ from models.venta import VentaModel
 from exportador import exportar_pdf, exportar_excel
 import pandas as pd
 from db.database import db
+from core.rango_fechas import rango_dias, filtro_fechas
 
 # Import matplotlib lazily; if missing, we'll show a helpful message in the UI
 
@@ -168,28 +169,28 @@ class ReportesFrame(QWidget):
         try:
             conn = db.get_connection()
             cur = conn.cursor()
-            cur.execute("SELECT MIN(DATE(fecha)) FROM ventas")
+            cur.execute("SELECT MIN(fecha) FROM ventas")
             row = cur.fetchone()
             conn.close()
             if row and row[0]:
                 from datetime import datetime
-                return datetime.strptime(row[0], '%Y-%m-%d').date()
+                return datetime.strptime(str(row[0])[:10], '%Y-%m-%d').date()
         except Exception:
             return None
 
     def actualizar(self):
         fecha_desde, fecha_hasta = self._rango_fechas()
         # use ISO date strings for SQLite queries
-        fecha_desde_str = fecha_desde.strftime('%Y-%m-%d')
-        fecha_hasta_str = fecha_hasta.strftime('%Y-%m-%d')
+        # Intervalo semiabierto [desde, hasta + 1 día) para filtrar por índice
+        rango = list(rango_dias(fecha_desde, fecha_hasta))
         periodo = self.combo_periodo.currentText()
 
         # Tab 1: Ventas por periodo
         try:
             conn = db.get_connection()
             df_v = pd.read_sql_query(
-                "SELECT fecha, total, descuento FROM ventas WHERE DATE(fecha) BETWEEN ? AND ? ORDER BY fecha ASC",
-                conn, params=[fecha_desde_str, fecha_hasta_str], parse_dates=['fecha']
+                f"SELECT fecha, total, descuento FROM ventas WHERE {filtro_fechas('fecha')} ORDER BY fecha ASC",
+                conn, params=rango, parse_dates=['fecha']
             )
             conn.close()
         except Exception:
@@ -300,17 +301,17 @@ class ReportesFrame(QWidget):
         # Tab 2: Productos más vendidos (Top 10)
         try:
             conn = db.get_connection()
-            query = '''
+            query = f'''
                 SELECT p.nombre as producto_nombre, SUM(dv.cantidad) as total_vendido, SUM(dv.subtotal) as ingresos_totales
                 FROM detalle_ventas dv
                 JOIN ventas v ON dv.venta_id = v.id
                 JOIN productos p ON dv.producto_id = p.id
-                WHERE DATE(v.fecha) BETWEEN ? AND ?
+                WHERE {filtro_fechas('v.fecha')}
                 GROUP BY dv.producto_id, p.nombre
                 ORDER BY total_vendido DESC
                 LIMIT 10
             '''
-            df_p = pd.read_sql_query(query, conn, params=[fecha_desde_str, fecha_hasta_str])
+            df_p = pd.read_sql_query(query, conn, params=rango)
             conn.close()
         except Exception:
             df_p = pd.DataFrame()